@@ -1,18 +1,33 @@
 # -*- coding: utf-8 -*-
 # backend/app.py – punkt wejścia FastAPI/uvicorn
+import asyncio
+import logging
 import os
+import time
+from typing import TYPE_CHECKING, Awaitable, Dict, Optional, TypeVar
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from backend.core.config import settings, ensure_dirs
+from backend.core.config import PROCESS_LAYOUT, settings, ensure_dirs
 from backend.core.db import init_db
 from backend.core.mqtt_client import mqtt_start
-from backend.core.controller import Controller
-from backend.core.rs485 import RS485Manager
-from backend.core.scheduler import Scheduler
-from backend.core.update_manager import UpdateManager
+from backend.core.remote_control import SnapshotUnavailable
+from backend.core.shared_state import CommandError
 from backend.routers import api, installer, ws
 
+if TYPE_CHECKING:  # pragma: no cover - tylko dla typów; importy ładowane leniwie przy starcie
+    from backend.core.controller import Controller
+    from backend.core.remote_control import RemoteState
+    from backend.core.rs485 import RS485Manager
+    from backend.core.scheduler import Scheduler
+    from backend.core.update_manager import UpdateManager
+    from backend.core.warm_start import SensorWindowCheckpointer
+    from backend.core.zones import ZoneRegistry
+
+logger = logging.getLogger("farmcare.startup")
+
 app = FastAPI(title="FarmCare 2.0", version="2.0.0")
 
 # CORS (ułatwia podmianę frontu zewnętrznego)
@@ -37,43 +52,176 @@ app.include_router(installer.router, prefix="/installer", tags=["installer"])
 app.include_router(ws.router, tags=["ws"])
 
 # Obiekty runtime
-controller: Controller = None
-rs485: RS485Manager = None
-scheduler: Scheduler = None
-update_manager: UpdateManager = None
+controller: Optional["Controller"] = None  # strefa główna
+zones: Optional["ZoneRegistry"] = None  # wszystkie strefy: jedna pętla, MQTT, RS485 i baza
+rs485: Optional["RS485Manager"] = None
+scheduler: Optional["Scheduler"] = None
+update_manager: Optional["UpdateManager"] = None
+checkpointer: Optional["SensorWindowCheckpointer"] = None
+# układ split: worker API czyta snapshot procesu sterowania (python -m backend.control)
+remote_state: Optional["RemoteState"] = None
+
+# Czasy faz startu [ms] – wystawiane przez /api/diagnostics/startup
+STARTUP_TIMINGS: Dict[str, float] = {}
+# Opóźnienie startu podsystemów niekrytycznych (updater) względem sterowania
+DEFERRED_START_DELAY_S = 5.0
+
+_T = TypeVar("_T")
+_deferred_task: Optional[asyncio.Task] = None
+
+
+def _record_phase(name: str, started: float) -> None:
+    elapsed_ms = (time.perf_counter() - started) * 1000.0
+    STARTUP_TIMINGS[name] = round(elapsed_ms, 1)
+    logger.info("Startup phase '%s' finished in %.1f ms", name, elapsed_ms)
+
+
+async def _timed(name: str, awaitable: Awaitable[_T]) -> _T:
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        _record_phase(name, started)
+
+
+def _build_rs485() -> "RS485Manager":
+    from backend.core.rs485 import RS485Manager
+
+    return RS485Manager()
+
+
+def _build_controller(manager: "RS485Manager") -> "Controller":
+    from backend.core.controller import Controller
+
+    return Controller(rs485_manager=manager)
+
+
+def _build_zones(manager: "RS485Manager", primary: "Controller") -> "ZoneRegistry":
+    """Kontrolery dodatkowych stref (sekcja ``zones``) na wspólnym RS485."""
+    from backend.core.controller import Controller
+    from backend.core.zones import ZoneRegistry
+
+    return ZoneRegistry.build(primary, lambda zone: Controller(rs485_manager=manager, zone=zone))
+
+
+def _warm_start(manager: "RS485Manager") -> Optional["SensorWindowCheckpointer"]:
+    """Przywraca okna uśredniania z checkpointu, zanim kontroler podejmie pierwszą decyzję."""
+    from backend.core.config import WARM_START
+    from backend.core.mqtt_client import sensor_bus
+    from backend.core.warm_start import SensorWindowCheckpointer
+
+    if not WARM_START.get("enabled", True):
+        return None
+    instance = SensorWindowCheckpointer({"mqtt": sensor_bus, "rs485": manager.snapshot})
+    instance.restore()
+    return instance
+
+
+def _build_update_manager() -> "UpdateManager":
+    from backend.core.update_manager import UpdateManager
+
+    manager = UpdateManager(current_version=app.version)
+    manager.start()
+    return manager
+
+
+async def _start_deferred_services(delay_s: float) -> None:
+    """Podsystemy niepotrzebne do sterowania startują dopiero gdy pętla już działa."""
+    global update_manager
+    if delay_s > 0:
+        await asyncio.sleep(delay_s)
+    try:
+        update_manager = await _timed("updater", asyncio.to_thread(_build_update_manager))
+    except Exception as exc:
+        logger.warning("Deferred updater start failed: %s", exc)
+
+
+@app.exception_handler(SnapshotUnavailable)
+@app.exception_handler(CommandError)
+async def _control_process_unavailable(request, exc):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+
+def _start_api_worker() -> None:
+    """Worker API układu split: odczyty ze snapshotu w pamięci współdzielonej, polecenia przez kolejkę."""
+    global controller, zones, scheduler, remote_state
+    from backend.core.remote_control import RemoteScheduler, RemoteState, RemoteZones
+    from backend.core.shared_state import CommandClient, SnapshotReader
+
+    remote_state = RemoteState(SnapshotReader(PROCESS_LAYOUT["snapshot_path"]), PROCESS_LAYOUT["snapshot_stale_s"])
+    client = CommandClient(
+        PROCESS_LAYOUT["command_socket"],
+        settings.ADMIN_TOKEN.encode(),
+        timeout_s=PROCESS_LAYOUT["command_timeout_s"],
+    )
+    zones = RemoteZones(remote_state, client)
+    controller = zones.primary
+    scheduler = RemoteScheduler(remote_state)
+
 
 @app.on_event("startup")
 async def on_startup():
+    if PROCESS_LAYOUT.get("mode") == "split":
+        _start_api_worker()
+        return
+    await start_control_stack()
+
+
+async def _init_db_then_mqtt() -> None:
+    await _timed("db_init", asyncio.to_thread(init_db))
+    await _timed("mqtt_start", mqtt_start())
+
+
+async def start_control_stack() -> None:
+    """MQTT, RS485, kontrolery stref i harmonogram – w uvicorn (single) albo w backend.control (split)."""
+    global rs485, controller, zones, scheduler, checkpointer, _deferred_task
+    STARTUP_TIMINGS.clear()
+    started = time.perf_counter()
     ensure_dirs()
-    init_db()
-    # RS485 – dwie magistrale wg settings.yaml
-    global rs485
-    rs485 = RS485Manager()
-    await rs485.start()  # czyta okresowo i buforuje średnie
 
-    # MQTT (lokalny broker)
-    await mqtt_start()
+    # Równolegle: schemat bazy, a po nim MQTT (pierwszy odczyt zapisuje SensorLog) oraz magistrale RS485
+    _, rs485 = await asyncio.gather(
+        _init_db_then_mqtt(),
+        _timed("rs485_init", asyncio.to_thread(_build_rs485)),
+    )
+    # Warm restart: średnie z poprzedniego procesu, jeśli checkpoint jest świeży
+    try:
+        checkpointer = await _timed("warm_start", asyncio.to_thread(_warm_start, rs485))
+    except Exception as exc:
+        logger.warning("Warm start skipped: %s", exc)
+        checkpointer = None
+    await _timed("rs485_start", rs485.start())  # czyta okresowo i buforuje średnie
 
-    # Kontroler (logika + grupy/partie + kalibracja)
-    global controller
-    controller = Controller(rs485_manager=rs485)
-    controller.start()  # startuje wątki/async task pętli sterowania
+    # Kontroler (logika + grupy/partie + kalibracja) – odczyty z bazy poza pętlą zdarzeń
+    controller = await _timed("controller_init", asyncio.to_thread(_build_controller, rs485))
+    zones = await _timed("zones_init", asyncio.to_thread(_build_zones, rs485, controller))
+    zones.start()  # startuje wątek pętli sterowania (wszystkie strefy na jednej pętli asyncio)
 
     # Harmonogram (przewietrzanie, kalibracja dzienna)
-    global scheduler
-    scheduler = Scheduler(controller)
+    from backend.core.scheduler import Scheduler
+
+    scheduler = Scheduler(controller, zones=zones.secondary)
     scheduler.start()
-    global update_manager
-    update_manager = UpdateManager(current_version=app.version)
-    update_manager.start()
+    if checkpointer:
+        checkpointer.start()
+    _record_phase("control_ready", started)
+
+    _deferred_task = asyncio.create_task(_start_deferred_services(DEFERRED_START_DELAY_S))
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    if remote_state is not None:
+        remote_state.reader.close()
+        return
+    if _deferred_task and not _deferred_task.done():
+        _deferred_task.cancel()
     if scheduler: scheduler.stop()
-    if controller: controller.stop()
+    if zones: zones.stop()
+    elif controller: controller.stop()
     if update_manager: update_manager.stop()
     if rs485: await rs485.stop()
+    if checkpointer: checkpointer.stop()  # końcowy zapis okien czujników
 
 # Strona główna i panel instalatora
 @app.get("/")
@@ -83,4 +231,3 @@ async def index():
 @app.get("/installer")
 async def installer_index():
     return {"ok": True, "message": "Open /static/installer.html"}
-
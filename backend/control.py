@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Ingest + control process of the split layout: ``python -m backend.control``.
+
+Runs what uvicorn runs in the single layout (MQTT, RS485, zone controllers,
+scheduler, updater) without HTTP, publishes the snapshot to shared memory
+and executes commands queued by the API workers
+(``uvicorn backend.app:app --workers N`` with ``process_layout.mode: split``).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+from typing import Optional
+
+from backend import app as app_module
+from backend.core.config import PROCESS_LAYOUT, settings
+from backend.core.remote_control import SnapshotPublisher, build_snapshot, dispatch_command
+from backend.core.shared_state import CommandServer, SnapshotWriter
+
+logger = logging.getLogger("farmcare.control")
+
+
+async def run(stop: Optional[asyncio.Event] = None) -> None:
+    await app_module.start_control_stack()
+    writer = SnapshotWriter(PROCESS_LAYOUT["snapshot_path"], int(PROCESS_LAYOUT["snapshot_size_kb"]) * 1024)
+    publisher = SnapshotPublisher(
+        writer,
+        lambda: build_snapshot(app_module.zones, app_module.scheduler),
+        PROCESS_LAYOUT["snapshot_interval_s"],
+    )
+    server = CommandServer(
+        PROCESS_LAYOUT["command_socket"],
+        lambda zone, name, kwargs: dispatch_command(app_module.zones, zone, name, kwargs),
+        settings.ADMIN_TOKEN.encode(),
+    )
+    publisher.publish()  # pierwszy snapshot zanim workery API zaczną pytać
+    publisher.start()
+    server.start()
+    logger.info("Control process ready: snapshot %s, commands %s", writer.path, server.address)
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # pragma: no cover - Windows / wątek poboczny
+            pass
+    try:
+        await stop.wait()
+    finally:
+        server.stop()
+        publisher.stop()
+        await app_module.on_shutdown()
+        writer.close()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
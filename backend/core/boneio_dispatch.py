@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""Per-BoneIO relay command dispatch: batching, motor caps and latency.
+
+Every vent on a BoneIO drives its relays through the device's dispatcher.
+With a ``command_topic`` configured, commands issued within
+``batch_window_ms`` are merged into one JSON message
+(``{"vent1": "up", "vent3": "stop"}``) handled by the ``on_json_message``
+block of the ESPHome config; without it the dispatcher publishes the usual
+per-relay ON/OFF topics. ``max_concurrent_motors`` caps how many vents on
+one device run at the same time – the rest wait for a free slot.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Publisher = Callable[[str, str], Awaitable[None]]
+
+ACTIONS = ("up", "down", "stop")
+_LATENCY_SAMPLES = 256
+
+
+def relay_messages(action: str, up_topic: str, down_topic: str) -> List[Tuple[str, str]]:
+    """Per-topic publishes for one action; the opposite relay always goes OFF first."""
+    if action == "up":
+        return [(down_topic, "OFF"), (up_topic, "ON")]
+    if action == "down":
+        return [(up_topic, "OFF"), (down_topic, "ON")]
+    if action == "stop":
+        return [(up_topic, "OFF"), (down_topic, "OFF")]
+    raise ValueError(f"unknown relay action: {action!r}")
+
+
+def channel_from_topic(up_topic: str) -> str:
+    """``boneio/1/cover/vent1/up`` -> ``vent1`` (the level above the relay)."""
+    levels = [level for level in str(up_topic or "").split("/") if level]
+    return levels[-2] if len(levels) >= 2 else (levels[0] if levels else "")
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc) -> bool:
+        return False
+
+
+NO_LIMIT = _NoLimit()
+
+
+class _MotorSlot:
+    __slots__ = ("_dispatcher",)
+
+    def __init__(self, dispatcher: "BoneIODispatcher") -> None:
+        self._dispatcher = dispatcher
+
+    async def __aenter__(self):
+        await self._dispatcher._acquire_motor()
+        return None
+
+    async def __aexit__(self, *exc) -> bool:
+        self._dispatcher._release_motor()
+        return False
+
+
+class _LoopState:
+    """Asyncio objects of one event loop (moves run on the controller loop, tests on their own)."""
+
+    __slots__ = ("loop", "pending", "flush", "motors")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_motors: int) -> None:
+        self.loop = loop
+        self.pending: Dict[str, str] = {}
+        self.flush: Optional[asyncio.Future] = None
+        self.motors = asyncio.Semaphore(max_motors) if max_motors > 0 else None
+
+
+class BoneIODispatcher:
+    """Relay commands of a single BoneIO device."""
+
+    def __init__(
+        self,
+        device_id: str,
+        *,
+        command_topic: Optional[str] = None,
+        publisher: Optional[Publisher] = None,
+        batch_window_s: float = 0.02,
+        max_concurrent_motors: int = 0,
+    ) -> None:
+        self.device_id = device_id
+        self.command_topic = command_topic or None
+        self.batch_window_s = max(0.0, float(batch_window_s))
+        self.max_concurrent_motors = max(0, int(max_concurrent_motors or 0))
+        self._publisher = publisher
+        self._state: Optional[_LoopState] = None
+        self.commands = 0
+        self.messages = 0
+        self.errors = 0
+        self.active_motors = 0
+        self.peak_motors = 0
+        self.motor_waits = 0
+        self.max_motor_wait_s = 0.0
+        self._latencies: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+        self._latency_count = 0
+        self._latency_total_s = 0.0
+        self._latency_max_s = 0.0
+
+    def _loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._state
+        if state is None or state.loop is not loop:
+            state = self._state = _LoopState(loop, self.max_concurrent_motors)
+        return state
+
+    async def _publish(self, topic: str, payload: str) -> bool:
+        if self._publisher is None:
+            from backend.core.mqtt_client import mqtt_publish  # import leniwy – brak cyklu z vents
+
+            self._publisher = mqtt_publish
+        self.messages += 1
+        # False = nie dostarczono; publishery bez wyniku (symulator) liczą się jako dostarczone
+        return await self._publisher(topic, payload) is not False
+
+    async def send(self, channel: str, action: str, messages: Iterable[Tuple[str, str]]) -> bool:
+        """Drive one vent's relays; returns once the command has been published.
+
+        ``messages`` are the per-relay publishes of the action (see :func:`relay_messages`),
+        used when the device has no ``command_topic``. False when a publish did
+        not reach the broker.
+        """
+        if action not in ACTIONS:
+            raise ValueError(f"unknown relay action: {action!r}")
+        state = self._loop_state()
+        started = state.loop.time()
+        self.commands += 1
+        try:
+            if self.command_topic:
+                delivered = await self._send_batched(state, channel, action)
+            else:
+                delivered = True
+                for topic, payload in messages:
+                    delivered = await self._publish(topic, payload) and delivered
+        except Exception as exc:
+            self.errors += 1
+            logger.warning("BoneIO %s: command %s=%s failed: %s", self.device_id, channel, action, exc)
+            raise
+        if not delivered:
+            self.errors += 1
+            logger.warning("BoneIO %s: command %s=%s not delivered", self.device_id, channel, action)
+            return False
+        self._record(state.loop.time() - started)
+        return True
+
+    async def _send_batched(self, state: _LoopState, channel: str, action: str) -> bool:
+        # drugie polecenie tego samego kanału w oknie idzie w następnej paczce – żadne przejście nie ginie
+        while channel in state.pending and state.flush is not None:
+            await asyncio.shield(state.flush)
+        state.pending[channel] = action
+        if state.flush is None:
+            state.flush = state.loop.create_task(self._flush_later(state))
+        return await asyncio.shield(state.flush)
+
+    async def _flush_later(self, state: _LoopState) -> bool:
+        try:
+            if self.batch_window_s > 0:
+                await asyncio.sleep(self.batch_window_s)
+        finally:
+            batch, state.pending = state.pending, {}
+            state.flush = None
+        return await self._publish(self.command_topic, json.dumps(batch, separators=(",", ":")))
+
+    def _record(self, latency_s: float) -> None:
+        self._latency_count += 1
+        self._latencies.append(latency_s)
+        self._latency_total_s += latency_s
+        if latency_s > self._latency_max_s:
+            self._latency_max_s = latency_s
+
+    def motor_slot(self):
+        """Async context held while a motor runs; without a cap it never waits."""
+        if self.max_concurrent_motors <= 0:
+            return NO_LIMIT
+        return _MotorSlot(self)
+
+    async def _acquire_motor(self) -> None:
+        state = self._loop_state()
+        if state.motors.locked():
+            started = state.loop.time()
+            self.motor_waits += 1
+            await state.motors.acquire()
+            self.max_motor_wait_s = max(self.max_motor_wait_s, state.loop.time() - started)
+        else:
+            await state.motors.acquire()
+        self.active_motors += 1
+        self.peak_motors = max(self.peak_motors, self.active_motors)
+
+    def _release_motor(self) -> None:
+        self.active_motors -= 1
+        self._loop_state().motors.release()
+
+    def stats(self) -> Dict[str, object]:
+        samples = sorted(self._latencies)
+        count = len(samples)
+        return {
+            "command_topic": self.command_topic,
+            "commands": self.commands,
+            "messages": self.messages,
+            "errors": self.errors,
+            "latency_ms": {
+                "avg": round(self._latency_total_s / self._latency_count * 1000.0, 3) if self._latency_count else 0.0,
+                "p95": round(samples[min(count - 1, int(count * 0.95))] * 1000.0, 3) if count else 0.0,
+                "max": round(self._latency_max_s * 1000.0, 3),
+            },
+            "motors": {
+                "limit": self.max_concurrent_motors,
+                "active": self.active_motors,
+                "peak": self.peak_motors,
+                "waits": self.motor_waits,
+                "max_wait_s": round(self.max_motor_wait_s, 3),
+            },
+        }
+
+
+def build_dispatchers(
+    devices: Iterable[Mapping[str, object]], publisher: Optional[Publisher] = None
+) -> Dict[str, BoneIODispatcher]:
+    """Device id -> dispatcher from ``boneio_devices`` entries."""
+    dispatchers: Dict[str, BoneIODispatcher] = {}
+    for device in devices or ():
+        dev_id = str(device.get("id") or "")
+        if not dev_id:
+            continue
+        dispatchers[dev_id] = BoneIODispatcher(
+            dev_id,
+            command_topic=device.get("command_topic"),
+            publisher=publisher,
+            batch_window_s=float(device.get("batch_window_ms", 20)) / 1000.0,
+            max_concurrent_motors=int(device.get("max_concurrent_motors", 0) or 0),
+        )
+    return dispatchers
+
+
+__all__ = [
+    "ACTIONS",
+    "BoneIODispatcher",
+    "NO_LIMIT",
+    "build_dispatchers",
+    "channel_from_topic",
+    "relay_messages",
+]
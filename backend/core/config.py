@@ -95,6 +95,17 @@ if isinstance(_RAW_BONEIO, list):
         availability = raw.get("availability_topic")
         if isinstance(availability, str) and availability.strip():
             entry["availability_topic"] = availability.strip()
+        if raw.get("confirm_relay_state"):                        # stany przełączników ESPHome potwierdzają cień przekaźników
+            entry["confirm_relay_state"] = True
+        command_topic = raw.get("command_topic")                  # paczki poleceń JSON (on_json_message w ESPHome)
+        if isinstance(command_topic, str) and command_topic.strip():
+            entry["command_topic"] = command_topic.strip()
+        try:
+            entry["batch_window_ms"] = max(0.0, float(raw.get("batch_window_ms", 20)))
+            entry["max_concurrent_motors"] = max(0, int(raw.get("max_concurrent_motors", 0) or 0))  # 0 = bez limitu
+        except (TypeError, ValueError):
+            entry["batch_window_ms"] = 20.0
+            entry["max_concurrent_motors"] = 0
         BONEIOS.append(entry)
         seen_devices.add(dev_id)
 VENT_DEFAULTS = yaml_cfg.get("vent_defaults", {})           # domyślne parametry wietrzników
@@ -139,6 +150,8 @@ if isinstance(EXTERNAL_CONNECTION, dict):
     EXTERNAL_CONNECTION.setdefault("path", "/")
     EXTERNAL_CONNECTION.setdefault("token", "")
 SENSORS = yaml_cfg.get("sensors", {})                       # mapowanie czujników
+_RAW_SENSOR_MESSAGES = yaml_cfg.get("sensor_messages", [])    # komunikaty JSON z kilkoma odczytami
+SENSOR_MESSAGES: list[dict] = [m for m in _RAW_SENSOR_MESSAGES if isinstance(m, dict)] if isinstance(_RAW_SENSOR_MESSAGES, list) else []
 RS485_BUSES = yaml_cfg.get("rs485_buses", [])               # dwie magistrale
 CONTROL = yaml_cfg.get("control", {})                       # progi, czasy itp.
 CONTROL.setdefault("temp_diff_percent", 5.0)
@@ -148,6 +161,8 @@ CONTROL.setdefault("day_start", "06:00")
 CONTROL.setdefault("night_start", "20:00")
 CONTROL.setdefault("night_max_open_percent", 40.0)
 CONTROL.setdefault("wind_lock_enabled", True)
+CONTROL.setdefault("wind_lock_hysteresis_deg", 10.0)
+CONTROL.setdefault("wind_lock_release_s", 60.0)
 if "co2_thr_ppm" not in CONTROL:
     CONTROL["co2_thr_ppm"] = None
 CONTROL.setdefault("min_open_co2_percent", CONTROL.get("min_open_hum_percent", 20.0))
@@ -166,13 +181,36 @@ if isinstance(UPDATES, dict):
     UPDATES.setdefault("enabled", False)
     UPDATES.setdefault("manifest_url", "")
     UPDATES.setdefault("check_interval_hours", 24)
+    UPDATES.setdefault("check_jitter_fraction", 0.1)      # losowe +/-10% interwału
+    UPDATES.setdefault("startup_jitter_s", 600)           # rozłożenie pierwszego sprawdzenia po restarcie floty
+    UPDATES.setdefault("retry_backoff_s", 300)            # baza wykładniczego backoffu po błędzie
     UPDATES.setdefault("apply_script", "")
     UPDATES.setdefault("channel", "stable")
     default_dir = str(BASE_DIR / "updates")
     UPDATES.setdefault("download_dir", default_dir)
+    UPDATES.setdefault("download_rate_limit_kbps", 0)   # 0 = bez limitu (łącze komórkowe: np. 64)
+    UPDATES.setdefault("download_retries", 3)
+    UPDATES.setdefault("install_mode", "script")         # "script" (apply_script) albo "slots" (A/B)
+    UPDATES.setdefault("slots_root", "/opt/farmcare-releases")
+    UPDATES.setdefault("restart_command", "systemctl restart farmcare.service")
+    UPDATES.setdefault("health_url", "http://127.0.0.1:8000/")
+    UPDATES.setdefault("health_timeout_s", 90)
 else:
-    UPDATES = {"enabled": False, "manifest_url": "", "check_interval_hours": 24, "apply_script": "", "channel": "stable", "download_dir": str(BASE_DIR / "updates")}
+    UPDATES = {"enabled": False, "manifest_url": "", "check_interval_hours": 24, "apply_script": "", "channel": "stable", "download_dir": str(BASE_DIR / "updates"), "download_rate_limit_kbps": 0, "download_retries": 3, "install_mode": "script"}
 AVG_WINDOW_S = yaml_cfg.get("sensor_avg_window_s", 5)
+WARM_START = yaml_cfg.get("warm_start", {})                 # checkpoint okien czujników
+if not isinstance(WARM_START, dict):
+    WARM_START = {}
+WARM_START.setdefault("enabled", True)
+WARM_START.setdefault("max_age_s", 300)
+WARM_START.setdefault("checkpoint_interval_s", 30)
+WARM_START.setdefault("path", str(DB_DIR / "sensor_windows.json"))
+SENSOR_HISTORY = yaml_cfg.get("sensor_history", {})         # historia odczytów w pamięci (ostatnie godziny)
+if not isinstance(SENSOR_HISTORY, dict):
+    SENSOR_HISTORY = {}
+SENSOR_HISTORY.setdefault("enabled", True)
+SENSOR_HISTORY.setdefault("hours", 6)
+SENSOR_HISTORY.setdefault("resolution_s", 10)
 
 # Przygotuj listę grup oraz plan etapów (kompatybilność wsteczna)
 VENT_GROUPS: list[dict] = []
@@ -200,3 +238,47 @@ if not VENT_PLAN_STAGES and VENT_GROUPS:
             "delay_s": fallback_delay,
         })
 
+# Strefy: kolejne tunele w tym samym procesie (wietrzniki z listy vents, własne czujniki/grupy/plan/progi)
+_RAW_ZONES = yaml_cfg.get("zones") or []
+ZONES: list[dict] = []
+if isinstance(_RAW_ZONES, list):
+    seen_zones = {"main"}                                     # strefa główna to konfiguracja najwyższego poziomu
+    claimed_vents: set = set()
+    for idx, raw in enumerate(_RAW_ZONES, start=1):
+        if not isinstance(raw, dict):
+            continue
+        zone_id = str(raw.get("id") or f"zone_{idx}").strip()
+        if not zone_id or zone_id in seen_zones:
+            continue
+        zone_vents = []
+        for vid in raw.get("vents") or []:
+            try:
+                vid = int(vid)
+            except (TypeError, ValueError):
+                continue
+            if vid not in claimed_vents:                      # wietrznik należy do jednej strefy
+                claimed_vents.add(vid)
+                zone_vents.append(vid)
+        zone_plan = raw.get("vent_plan") if isinstance(raw.get("vent_plan"), dict) else {}
+        ZONES.append({
+            "id": zone_id,
+            "name": str(raw.get("name") or zone_id),
+            "vents": zone_vents,
+            "sensors": raw.get("sensors") if isinstance(raw.get("sensors"), dict) else {},
+            "control": raw.get("control") if isinstance(raw.get("control"), dict) else {},
+            "vent_groups": [dict(grp) for grp in raw.get("vent_groups") or [] if isinstance(grp, dict)],
+            "vent_plan_stages": list(zone_plan.get("stages") or []),
+            "close_strategy": _parse_close_strategy(zone_plan.get("close_strategy"), "fifo"),
+        })
+        seen_zones.add(zone_id)
+# Układ procesów: single (wszystko w uvicorn) albo split (python -m backend.control + N workerów API)
+PROCESS_LAYOUT = yaml_cfg.get("process_layout", {})
+if not isinstance(PROCESS_LAYOUT, dict):
+    PROCESS_LAYOUT = {}
+PROCESS_LAYOUT.setdefault("mode", "single")
+PROCESS_LAYOUT.setdefault("snapshot_path", "/dev/shm/farmcare_snapshot")
+PROCESS_LAYOUT.setdefault("snapshot_size_kb", 1024)
+PROCESS_LAYOUT.setdefault("snapshot_interval_s", 0.5)
+PROCESS_LAYOUT.setdefault("snapshot_stale_s", 10)
+PROCESS_LAYOUT.setdefault("command_socket", str(DB_DIR / "farmcare_control.sock"))
+PROCESS_LAYOUT.setdefault("command_timeout_s", 5)
@@ -2,7 +2,7 @@
 """Helper utilities for validating and exporting installer configuration data."""
 from __future__ import annotations
 
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Mapping, Optional
 
 from backend.core.config import (
     CONTROL,
@@ -64,6 +64,8 @@ CONTROL_FIELD_DEFINITIONS: Dict[str, Dict[str, Any]] = {
     "crit_hum_crack_percent": {"type": float, "min": 0.0, "max": 100.0, "category": "advanced"},
     "risk_open_limit_percent": {"type": float, "min": 0.0, "max": 100.0, "category": "advanced"},
     "wind_lock_enabled": {"type": bool, "category": "advanced"},
+    "wind_lock_hysteresis_deg": {"type": float, "min": 0.0, "max": 90.0, "category": "advanced"},
+    "wind_lock_release_s": {"type": float, "min": 0.0, "max": 3600.0, "category": "advanced"},
     "day_start": {"type": str, "category": "advanced"},
     "night_start": {"type": str, "category": "advanced"},
 }
@@ -164,17 +166,18 @@ def _control_field_from_meta(key: str, meta: Dict[str, Any], value: Any) -> Cont
     )
 
 
-def build_control_fields() -> Dict[str, Any]:
+def build_control_fields(values: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    current = CONTROL if values is None else values  # w workerze API: progi ze snapshotu
     sections: Dict[str, List[ControlFieldSchema]] = {"dashboard": [], "advanced": []}
     seen: set[str] = set()
 
     for key, meta in CONTROL_FIELD_DEFINITIONS.items():
-        current_value = CONTROL.get(key)
+        current_value = current.get(key)
         field = _control_field_from_meta(key, meta, current_value)
         sections[field.category].append(field)
         seen.add(key)
 
-    for key, value in CONTROL.items():
+    for key, value in current.items():
         if key in seen:
             continue
         meta = CONTROL_FIELD_DEFINITIONS.get(key, {"category": "advanced"})
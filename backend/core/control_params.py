@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Immutable, pre-parsed snapshot of the ``control`` section used by the control loop."""
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, fields
+from datetime import time as dt_time
+from typing import Any, Mapping, Optional
+
+
+_VERSION = itertools.count(1)
+
+
+def _float(value: Any, default: float) -> float:
+    if value is None:
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _float_opt(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bool(value: Any, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in {"1", "true", "yes", "on"}:
+            return True
+        if lowered in {"0", "false", "no", "off", ""}:
+            return False
+        return default
+    return bool(value)
+
+
+def _percent(value: Any, default: float) -> float:
+    return max(0.0, min(100.0, _float(value, default)))
+
+
+def parse_time_of_day(value: Any) -> Optional[dt_time]:
+    if value is None:
+        return None
+    if isinstance(value, dt_time):
+        return value
+    if isinstance(value, str):
+        try:
+            hour_str, minute_str = value.strip().split(":", 1)
+            hour = int(hour_str)
+            minute = int(minute_str)
+        except ValueError:
+            return None
+        hour = max(0, min(23, hour))
+        minute = max(0, min(59, minute))
+        return dt_time(hour=hour, minute=minute)
+    return None
+
+
+@dataclass(frozen=True, slots=True)
+class ControlParams:
+    """Typed view of ``CONTROL`` compiled once per configuration change.
+
+    The controller swaps the whole object on every update, so a tick that
+    grabbed a reference keeps seeing one consistent set of values even if the
+    API thread changes the configuration in the meantime.
+    """
+
+    version: int
+    target_temp_c: float
+    day_target_temp_c: float
+    night_target_temp_c: float
+    day_start: Optional[dt_time]
+    night_start: Optional[dt_time]
+    night_max_open_percent: float
+    temp_diff_percent: float
+    humidity_thr: float
+    min_open_hum_percent: float
+    vpd_min_kpa: Optional[float]
+    dew_point_margin_c: Optional[float]
+    co2_thr_ppm: Optional[float]
+    min_open_co2_percent: float
+    wind_risk_ms: float
+    wind_crit_ms: float
+    risk_open_limit_percent: float
+    rain_threshold: float
+    allow_humidity_override: bool
+    crit_hum_crack_percent: float
+    wind_lock_enabled: bool
+    wind_lock_hysteresis_deg: float
+    wind_lock_release_s: float
+    ignore_delta_percent: float
+    step_percent: float
+    step_delay_s: float
+    controller_loop_s: float
+
+    def as_dict(self) -> dict:
+        data = {}
+        for item in fields(self):
+            value = getattr(self, item.name)
+            if isinstance(value, dt_time):
+                value = value.strftime("%H:%M")
+            data[item.name] = value
+        return data
+
+
+def compile_control_params(control: Mapping[str, Any]) -> ControlParams:
+    """Parse ``control`` into a :class:`ControlParams` with the controller's historical fallbacks."""
+    source = dict(control)
+    base_target = _float(source.get("target_temp_c"), 25.0)
+    min_open_hum = _float(source.get("min_open_hum_percent"), 20.0)
+    co2_open_raw = source.get("min_open_co2_percent", source.get("min_open_hum_percent", 20.0))
+    night_cap = source.get("night_max_open_percent")
+    step = _float(source.get("step_percent"), 10.0)
+    if step <= 0:
+        step = 1.0
+    loop_s = _float(source.get("controller_loop_s"), 1.0)
+    return ControlParams(
+        version=next(_VERSION),
+        target_temp_c=base_target,
+        day_target_temp_c=_float(source.get("day_target_temp_c"), base_target),
+        night_target_temp_c=_float(source.get("night_target_temp_c"), base_target),
+        day_start=parse_time_of_day(source.get("day_start")),
+        night_start=parse_time_of_day(source.get("night_start")),
+        night_max_open_percent=40.0 if _float_opt(night_cap) is None else _percent(night_cap, 40.0),
+        temp_diff_percent=_float(source.get("temp_diff_percent"), 5.0),
+        humidity_thr=_float(source.get("humidity_thr"), 70.0),
+        min_open_hum_percent=min_open_hum,
+        vpd_min_kpa=_float_opt(source.get("vpd_min_kpa")),
+        dew_point_margin_c=_float_opt(source.get("dew_point_margin_c")),
+        co2_thr_ppm=_float_opt(source.get("co2_thr_ppm")),
+        min_open_co2_percent=_percent(co2_open_raw, min_open_hum),
+        wind_risk_ms=_float(source.get("wind_risk_ms"), 10.0),
+        wind_crit_ms=_float(source.get("wind_crit_ms"), 20.0),
+        risk_open_limit_percent=_float(source.get("risk_open_limit_percent"), 50.0),
+        rain_threshold=_float(source.get("rain_threshold"), 0.5),
+        allow_humidity_override=_bool(source.get("allow_humidity_override"), False),
+        crit_hum_crack_percent=_float(source.get("crit_hum_crack_percent"), 10.0),
+        wind_lock_enabled=_bool(source.get("wind_lock_enabled"), True),
+        wind_lock_hysteresis_deg=min(90.0, max(0.0, _float(source.get("wind_lock_hysteresis_deg"), 10.0))),
+        wind_lock_release_s=max(0.0, _float(source.get("wind_lock_release_s"), 60.0)),
+        ignore_delta_percent=_float(source.get("ignore_delta_percent"), 0.5) or 0.5,
+        step_percent=step,
+        step_delay_s=max(0.0, _float(source.get("step_delay_s"), 0.0)),
+        controller_loop_s=loop_s if loop_s > 0 else 1.0,
+    )
+
+
+__all__ = ["ControlParams", "compile_control_params", "parse_time_of_day"]
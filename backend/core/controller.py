@@ -3,58 +3,123 @@
 import asyncio, threading, time, json
 from datetime import datetime, time as dt_time
 from collections import OrderedDict
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from backend.core.config import (
     VENTS,
-    CONTROL,
     HEATING,
-    VENT_GROUPS,
-    VENT_PLAN_STAGES,
     VENT_PLAN_CLOSE_STRATEGY,
     VENT_DEFAULTS,
     EXTERNAL_CONNECTION,
     BONEIOS,
+    SENSOR_HISTORY,
 )
 from backend.core.db import SessionLocal, VentState, RuntimeState, Setting, EventLog
-from backend.core.mqtt_client import sensor_bus, mqtt_publish
+from backend.core.mqtt_client import mqtt_publish, refresh_topic_maps
 from backend.core.rs485 import RS485Manager
 from backend.core import test_mode
 from backend.core.vents import Vent
 from backend.core.notifications import log_event
-from backend.core.heating_valve import ThreeWayValve
+from backend.core.heating_valve import SetpointActuator, ThreeWayValve
+from backend.core.heating_pid import HeatingPid, PidSettings, PidState
+from backend.core.boneio_dispatch import build_dispatchers
+from backend.core.relay_shadow import RelayShadow
+from backend.core.sensor_history import SensorHistory
+from backend.core.psychrometrics import DERIVED_KEYS, derive_metrics
+from backend.core.vent_caps import VentCaps
+from backend.core.wind_lock import WindLock
+from backend.core.tick_scheduler import TickScheduler
+from backend.core.zones import Zone, primary_zone
+from backend.core.reconfigure import (
+    GROUP_RUNTIME,
+    WIRING_ATTRS,
+    Topology,
+    carry_group_state,
+    reuse_dispatchers,
+    vent_changes,
+    vent_settings,
+)
+from backend.core.control_params import ControlParams, compile_control_params, parse_time_of_day
 
 class Controller:
-    def __init__(self, rs485_manager: RS485Manager):
+    def __init__(self, rs485_manager: RS485Manager, clock=None, publisher=None, zone: Optional[Zone] = None):
         self.rs485 = rs485_manager
+        # strefa: własne wietrzniki, grupy, plan, progi i czujniki; domyślnie konfiguracja główna
+        self.zone = zone if zone is not None else primary_zone()
+        self._control = self.zone.control
+        # clock/publisher: domyślnie czas systemowy i MQTT; symulator podstawia wirtualne
+        self._clock = clock
+        self._publisher = publisher
         self.mode = "auto"  # 'auto' | 'manual'
         self.vents: Dict[int, Vent] = {}
         self._running = False
         self._thread = None
         self._async_loop = None
+        # łącza z availability_topic/LWT: urządzenie BoneIO i pojedyncze wietrzniki
+        self._device_online: Dict[str, bool] = {}
+        self._vent_link: Dict[int, bool] = {}
+        self._offline_since: Dict[int, datetime] = {}
+        self._dispatchers = build_dispatchers(BONEIOS, publisher=publisher)
+        # cień stanu przekaźników: pomijamy publikacje, które niczego nie przełączają
+        self._relay_shadow = RelayShadow(
+            self._control.get("relay_refresh_s", 300.0),
+            clock=clock.monotonic if clock is not None else time.monotonic,
+        )
+        # zmiany konfiguracji (instalator) podmieniamy między tickami, nigdy w trakcie
+        self._topology_lock = threading.RLock()
+        self._in_tick = False
+        self._deferred_moves: Optional[list] = None  # step_async: ruchy ticku czekają na await zamiast blokować pętlę
+        self._pending_topology: Optional[Topology] = None
+        self._deferred_vent_updates: Dict[int, dict] = {}  # okablowanie wietrzników w ruchu
+        # limity celu per wietrznik z nadpisań grup – przeliczane tylko przy zmianie blokady
+        self._caps = VentCaps()
+        # blokada wiatrowa: tablica 360° -> maska grup, histereza kątowa i czasowa
+        self._wind_lock = WindLock()
+        self._wind_uninitialized: List[str] = []
+        self._monotonic = clock.monotonic if clock is not None else time.monotonic
+        # rytm pętli z terminów monotonicznych: przekroczenia, pominięte ticki, histogram spóźnień
+        self._ticker = TickScheduler("controller", clock=self._monotonic, sleep=self._sleep)
         self._load_vents_from_config()
         self._load_state_from_db()
-        self._groups: OrderedDict[str, dict] = OrderedDict()
-        self._plan: List[dict] = []
-        self._vent_to_groups: Dict[int, List[str]] = {}
+        self._groups: OrderedDict[str, dict] = OrderedDict()
+        self._plan: List[dict] = []
+        self._vent_to_groups: Dict[int, List[str]] = {}
+        self._group_specs: List[dict] = []
+        self._stage_specs: List[dict] = []
         self._last_env: dict = {}
         self._last_env_snapshot: dict = {"sensors": {}, "sources": {}}
+        # punkt rosy, VPD, wilgotność bezwzględna, entalpia – liczone raz na tick
+        self._derived: Dict[str, Optional[float]] = dict.fromkeys(DERIVED_KEYS)
+        # odczyty z ostatnich godzin w kolumnach o stałym rozmiarze – wykresy i trendy bez SQLite
+        self.history: Optional[SensorHistory] = None
+        if SENSOR_HISTORY.get("enabled", True):
+            self.history = SensorHistory(SENSOR_HISTORY["hours"], SENSOR_HISTORY["resolution_s"])
         self._heating_state: Optional[float | bool] = None
         self._heating_mode: str = self._current_heating_mode()
         self._heating_valve: Optional[ThreeWayValve] = None
         self._heating_valve_tolerance: float = 1.0
+        self._heating_pid: Optional[HeatingPid] = None  # tryb PI/PID zaworu (heating.valve_control)
+        self._heating_pid_saved_at: Optional[float] = None
+        self._heating_actuator = SetpointActuator(
+            self._apply_heating,
+            on_applied=self._heating_applied,
+            on_error=self._heating_failed,
+            name="heating-actuator",
+        )
         self._co2_alert_active: bool = False
         self._heating_day_start: Optional[dt_time] = None
         self._heating_night_start: Optional[dt_time] = None
         self._thermal_day_start: Optional[dt_time] = None
         self._thermal_night_start: Optional[dt_time] = None
         self._night_max_open: float = 40.0
-        self._close_strategy = self._normalize_close_strategy(VENT_PLAN_CLOSE_STRATEGY)
+        self._params: ControlParams = compile_control_params(self._control)
+        self._tick_params: Optional[ControlParams] = None
+        self._close_strategy = self._normalize_close_strategy(self.zone.close_strategy)
         self._apply_control_overrides()
         self._apply_heating_overrides()
         self._init_heating_valve()
-        self._tolerance = float(CONTROL.get("ignore_delta_percent", 0.5)) or 0.5
-        self._configure_plan(VENT_GROUPS, VENT_PLAN_STAGES, self._close_strategy)
+        self._swap_control_params()
+        self._configure_plan(self.zone.vent_groups, self.zone.vent_plan_stages, self._close_strategy)
         self._apply_plan_overrides()
         self._refresh_schedules()
         self._last_auto_target = None
@@ -62,27 +127,34 @@ class Controller:
 
     def _load_vents_from_config(self, vent_specs: Optional[List[dict]] = None):
         self.vents.clear()
-        data = vent_specs if vent_specs is not None else VENTS
+        data = self.zone.vent_specs(vent_specs if vent_specs is not None else VENTS)
         for v in data:
-            vent = Vent(
-                vid=v["id"],
-                name=v["name"],
-                travel_time_s=v["travel_time_s"],
-                boneio_device=v.get("boneio_device", "boneio_main"),
-                up_topic=v["topics"]["up"],
-                down_topic=v["topics"]["down"],
-                err_input_topic=v["topics"].get("error_in"),
-                reverse_pause_s=v.get("reverse_pause_s", VENT_DEFAULTS.get("reverse_pause_s", 1.0)),
-                min_move_s=v.get("min_move_s", VENT_DEFAULTS.get("min_move_s", 0.5)),
-                calibration_buffer_s=v.get("calibration_buffer_s", VENT_DEFAULTS.get("calibration_buffer_s", 0.5)),
-                ignore_delta_percent=v.get("ignore_delta_percent", VENT_DEFAULTS.get("ignore_delta_percent", 0.5)),
-            )
+            vent = self._build_vent(v["id"], vent_settings(v, VENT_DEFAULTS), self._dispatchers)
             self.vents[vent.id] = vent
 
+    def _build_vent(self, vid: int, settings: dict, dispatchers: Dict[str, object]) -> Vent:
+        return Vent(
+            vid=vid,
+            name=settings["name"],
+            travel_time_s=settings["travel_time"],
+            boneio_device=settings["boneio_device"],
+            up_topic=settings["up_topic"],
+            down_topic=settings["down_topic"],
+            err_input_topic=settings["err_input_topic"],
+            reverse_pause_s=settings["reverse_pause_s"],
+            min_move_s=settings["min_move_s"],
+            calibration_buffer_s=settings["calibration_buffer_s"],
+            ignore_delta_percent=settings["ignore_delta_percent"],
+            publisher=self._publisher,
+            dispatcher=dispatchers.get(settings["boneio_device"]),
+            channel=settings["channel"],
+            shadow=self._relay_shadow,
+        )
+
     def _load_state_from_db(self):
         with SessionLocal() as s:
             # runtime mode
-            kv = s.get(RuntimeState, "mode")
+            kv = s.get(RuntimeState, self.zone.setting_key("mode"))
             if kv:
                 stored_mode = str(kv.value).strip().lower()
                 if stored_mode == "auto":
@@ -92,8 +164,13 @@ class Controller:
                     # zawsze wracamy do trybu automatycznego i aktualizujemy wpis.
                     self.mode = "auto"
                     kv.value = "auto"
-            # vent states
-            for v in self.vents.values():
+            s.commit()
+        self._load_vent_states(self.vents.values())
+
+    def _load_vent_states(self, vents) -> None:
+        """Pozycje i dostępność z bazy; brakujące wiersze są dodawane."""
+        with SessionLocal() as s:
+            for v in vents:
                 vs = s.get(VentState, v.id)
                 if vs:
                     position = vs.position
@@ -143,10 +220,9 @@ class Controller:
         try:
             step = float(value)
         except (TypeError, ValueError):
-            step = float(CONTROL.get("step_percent", 10.0))
+            return self._control_params().step_percent
         if step <= 0:
-            fallback = float(CONTROL.get("step_percent", 10.0)) or 1.0
-            return fallback
+            return self._control_params().step_percent
         return step
 
     def _sanitize_delay(self, value) -> float:
@@ -194,16 +270,9 @@ class Controller:
             ranges.append([start_val, end_val])
         return ranges
 
-    def _direction_in_range(self, direction: float, start: float, end: float) -> bool:
-        if start == end:
-            return True
-        if start <= end:
-            return start <= direction <= end
-        return direction >= start or direction <= end
-
     def export_groups(self) -> List[dict]:
         groups: List[dict] = []
-        for data in self._groups.values():
+        for data in self._topology_base().groups.values():
             item = {
                 "id": data["id"],
                 "name": data["name"],
@@ -216,9 +285,10 @@ class Controller:
         return groups
 
     def export_plan(self) -> dict:
+        topology = self._topology_base()  # zmiana czekająca na koniec ticku jest już widoczna w API
         return {
-            "close_strategy": self._close_strategy,
-            "close_strategy_flag": 1 if self._close_strategy == "lifo" else 0,
+            "close_strategy": topology.close_strategy,
+            "close_strategy_flag": 1 if topology.close_strategy == "lifo" else 0,
             "stages": [
                 {
                     "id": stage["id"],
@@ -230,7 +300,7 @@ class Controller:
                     "close_strategy_flag": 1 if stage["close_strategy"] == "lifo" else 0,
                     "groups": list(stage["groups"]),
                 }
-                for stage in self._plan
+                for stage in topology.plan
             ],
         }
 
@@ -238,13 +308,22 @@ class Controller:
         return {
             "sensors": dict(self._last_env_snapshot.get("sensors", {})),
             "sources": dict(self._last_env_snapshot.get("sources", {})),
+            "derived": dict(self._derived),
         }
 
     def export_rs485_status(self) -> List[dict]:
         return self.rs485.status()
 
+    def export_site_config(self) -> dict:
+        """Wietrzniki, BoneIO i połączenie zewnętrzne obiektu – tak, jak je widzi proces sterowania."""
+        return {
+            "vents": [dict(vent) for vent in VENTS],
+            "boneio": [dict(device) for device in BONEIOS],
+            "external": dict(EXTERNAL_CONNECTION),
+        }
+
     def export_heating(self) -> Optional[dict]:
-        if not isinstance(HEATING, dict):
+        if not isinstance(HEATING, dict) or not self.zone.primary:
             return None
         def _float_or_none(value):
             if value is None:
@@ -272,6 +351,12 @@ class Controller:
     def _configure_plan(
         self, group_cfg: List[dict], stage_cfg: List[dict], close_strategy: Optional[str] = None
     ) -> None:
+        self._reconfigure(groups=group_cfg, stages=stage_cfg, close_strategy=close_strategy)
+
+    def _compile_groups(
+        self, group_cfg: List[dict], known_vents: Dict[int, Vent], previous: Dict[str, dict]
+    ) -> tuple:
+        """Groups restricted to existing vents; unchanged groups keep their dict (and wind state)."""
         groups: "OrderedDict[str, dict]" = OrderedDict()
         vent_to_groups: Dict[int, List[str]] = {}
         for idx, grp in enumerate(group_cfg):
@@ -282,7 +367,7 @@ class Controller:
                     vid_int = int(vid)
                 except (TypeError, ValueError):
                     continue
-                if vid_int in self.vents:
+                if vid_int in known_vents:
                     vents.append(vid_int)
             wind_raw = grp.get("wind_upwind_deg")
             if wind_raw is None:
@@ -305,16 +390,20 @@ class Controller:
                 "wind_locked": False,
                 "wind_last_state": None,
             }
+            old = previous.get(gid)
+            if old is not None and all(
+                old.get(key) == value for key, value in group_data.items() if key not in GROUP_RUNTIME
+            ):
+                group_data = old
             groups[gid] = group_data
             for vid in vents:
                 vent_to_groups.setdefault(vid, []).append(gid)
-        self._groups = groups
-        self._vent_to_groups = vent_to_groups
+        return groups, vent_to_groups
 
-        base_default = getattr(self, "_close_strategy", "fifo")
+    def _compile_plan(
+        self, stage_cfg: List[dict], groups: Dict[str, dict], close_strategy: Optional[str], base_default: str
+    ) -> tuple:
         default_close = self._normalize_close_strategy(close_strategy, base_default)
-        self._close_strategy = default_close
-
         plan: List[dict] = []
         valid_groups = set(groups.keys())
         for idx, stage in enumerate(stage_cfg or []):
@@ -338,7 +427,154 @@ class Controller:
                 "close_strategy": stage_close,
                 "groups": stage_groups,
             })
-        self._plan = plan
+        return plan, default_close
+
+    def _topology_base(self) -> Topology:
+        """Topology waiting for the end of the tick, or the live one."""
+        pending = self._pending_topology
+        if pending is not None:
+            return pending
+        return Topology(
+            vents=self.vents,
+            groups=self._groups,
+            vent_to_groups=self._vent_to_groups,
+            plan=self._plan,
+            close_strategy=getattr(self, "_close_strategy", "fifo"),
+            dispatchers=self._dispatchers,
+            group_specs=self._group_specs,
+            stage_specs=self._stage_specs,
+        )
+
+    def _diff_vents(self, base: Topology, specs: List[dict], dispatchers: Dict[str, object]) -> tuple:
+        """New vent map plus per-vent attribute changes; only added vents are built (and read from the DB)."""
+        live = self.vents
+        vents: Dict[int, Vent] = {}
+        updates: Dict[int, dict] = {}
+        created: List[Vent] = []
+        for spec in specs:
+            vid = int(spec["id"])
+            settings = vent_settings(spec, VENT_DEFAULTS)
+            settings["_dispatcher"] = dispatchers.get(settings["boneio_device"])
+            vent = base.vents.get(vid)
+            if vent is None:
+                vent = self._build_vent(vid, settings, dispatchers)
+                vent.set_online(self._device_online.get(vent.boneio_device, True) and self._vent_link.get(vid, True))
+                created.append(vent)
+            elif live.get(vid) is not vent:
+                # dodany w zmianie, która jeszcze czeka – obiekt nie jest używany w ticku
+                for key, value in settings.items():
+                    setattr(vent, key, value)
+            else:
+                # porównanie z żywym obiektem obejmuje też zmiany odłożone do końca ruchu
+                changes = vent_changes(vent, settings)
+                if changes:
+                    updates[vid] = changes
+            vents[vid] = vent
+        if created:
+            self._load_vent_states(created)
+        return vents, updates
+
+    def _reconfigure(
+        self,
+        *,
+        vents: Optional[List[dict]] = None,
+        devices: Optional[List[dict]] = None,
+        groups: Optional[List[dict]] = None,
+        stages: Optional[List[dict]] = None,
+        close_strategy: Optional[str] = None,
+    ) -> Topology:
+        """Apply only what changed; between ticks immediately, during a tick after it ends."""
+        with self._topology_lock:
+            base = self._topology_base()
+            dispatchers = base.dispatchers
+            if devices is not None:
+                dispatchers = reuse_dispatchers(base.dispatchers, devices, publisher=self._publisher)
+            vent_map, vent_updates = base.vents, base.vent_updates
+            if vents is not None or dispatchers is not base.dispatchers:
+                specs = self.zone.vent_specs(vents if vents is not None else VENTS)
+                vent_map, vent_updates = self._diff_vents(base, specs, dispatchers)
+            group_specs = list(groups) if groups is not None else base.group_specs
+            stage_specs = list(stages) if stages is not None else base.stage_specs
+            group_map, vent_to_groups = base.groups, base.vent_to_groups
+            if groups is not None or vent_map.keys() != base.vents.keys():
+                group_map, vent_to_groups = self._compile_groups(group_specs, vent_map, base.groups)
+            plan, strategy = base.plan, base.close_strategy
+            if stages is not None or close_strategy is not None or group_map is not base.groups:
+                plan, strategy = self._compile_plan(stage_specs, group_map, close_strategy, base.close_strategy)
+            topology = Topology(
+                vents=vent_map,
+                groups=group_map,
+                vent_to_groups=vent_to_groups,
+                plan=plan,
+                close_strategy=strategy,
+                dispatchers=dispatchers,
+                group_specs=group_specs,
+                stage_specs=stage_specs,
+                vent_updates=vent_updates,
+                added=[v for vid, v in vent_map.items() if self.vents.get(vid) is not v],
+                removed=[v for vid, v in self.vents.items() if vent_map.get(vid) is not v],
+            )
+            if self._in_tick:
+                self._pending_topology = topology
+            else:
+                self._swap_topology(topology)
+        return topology
+
+    def _swap_topology(self, topology: Topology) -> None:
+        # wywołanie pod _topology_lock, poza tickiem
+        self._pending_topology = None
+        if topology.vent_updates is not None:
+            # pełne porównanie wietrzników już uwzględniło odłożone zmiany
+            self._deferred_vent_updates = {}
+            for vid, changes in topology.vent_updates.items():
+                vent = topology.vents.get(vid)
+                if vent is not None:
+                    self._update_vent(vent, changes)
+        for vent in topology.removed:
+            self._vent_link.pop(vent.id, None)
+            self._offline_since.pop(vent.id, None)
+        carry_group_state(self._groups, topology.groups)
+        self.vents = topology.vents
+        self._dispatchers = topology.dispatchers
+        self._groups = topology.groups
+        self._vent_to_groups = topology.vent_to_groups
+        self._plan = topology.plan
+        self._close_strategy = topology.close_strategy
+        self._group_specs = topology.group_specs
+        self._stage_specs = topology.stage_specs
+        self._caps.rebuild(self.vents, self._groups, self._vent_to_groups)
+        self._wind_lock.rebuild(self._groups)
+        self._wind_uninitialized = [gid for gid, group in self._groups.items() if group.get("wind_last_state") is None]
+        summary = topology.summary()
+        if any(summary.values()):
+            self._log_event("VENTS_RECONFIGURED", meta=summary)
+
+    def _update_vent(self, vent: Vent, changes: dict) -> None:
+        """Configuration change of a live vent; wiring of a vent in motion waits for the move to end."""
+        if vent._moving:
+            wiring = {key: value for key, value in changes.items() if key in WIRING_ATTRS}
+            if wiring:
+                self._deferred_vent_updates[vent.id] = wiring
+                changes = {key: value for key, value in changes.items() if key not in WIRING_ATTRS}
+        if "up_topic" in changes or "down_topic" in changes:
+            self._relay_shadow.forget((vent.up_topic, vent.down_topic))
+        for key, value in changes.items():
+            setattr(vent, key, value)
+        if "boneio_device" in changes:
+            self._apply_link_state([vent])
+
+    def _end_tick(self) -> None:
+        with self._topology_lock:
+            self._in_tick = False
+            if self._pending_topology is not None:
+                self._swap_topology(self._pending_topology)
+            for vid, changes in list(self._deferred_vent_updates.items()):
+                vent = self.vents.get(vid)
+                if vent is None:
+                    self._deferred_vent_updates.pop(vid, None)
+                elif not vent._moving:
+                    del self._deferred_vent_updates[vid]
+                    self._update_vent(vent, changes)
 
     def _log_event(self, event: str, *, level: str = "INFO", meta: Optional[dict] = None, category: Optional[str] = None) -> None:
         payload = dict(meta or {})
@@ -364,16 +600,23 @@ class Controller:
             wind_dir = None if wind_raw is None else float(wind_raw) % 360.0
         except (TypeError, ValueError):
             wind_dir = None
-        global_enabled = bool(CONTROL.get("wind_lock_enabled", True))
-        for gid, group in self._groups.items():
+        params = self._control_params()
+        global_enabled = params.wind_lock_enabled
+        wind = self._wind_lock
+        wind.configure(params.wind_lock_hysteresis_deg, params.wind_lock_release_s)
+        previous = wind.locked
+        wind.update(wind_dir, global_enabled, self._monotonic())
+        # tylko grupy, które zmieniły stan (i nowe, jeszcze bez stanu) – reszta bez zmian
+        touched = wind.changed(previous)
+        if self._wind_uninitialized:
+            touched = list(dict.fromkeys(self._wind_uninitialized + touched))
+            self._wind_uninitialized = []
+        changed: List[str] = []
+        for gid in touched:
+            group = self._groups[gid]
             ranges = group.get("_wind_ranges") or []
             use_lock = bool(ranges) and global_enabled and group.get("wind_lock_enabled", True)
-            locked = False
-            if use_lock and wind_dir is not None:
-                for start, end in ranges:
-                    if self._direction_in_range(wind_dir, start, end):
-                        locked = True
-                        break
+            locked = wind.is_locked(gid)
             override = None
             force_close = False
             if locked and use_lock:
@@ -383,6 +626,8 @@ class Controller:
                 override = close_pct
                 force_close = True
             group["wind_locked"] = locked
+            if group.get("target_override") != override or group.get("force_close") != force_close:
+                changed.append(gid)
             group["target_override"] = override
             group["force_close"] = force_close
             prev_state = group.get("wind_last_state")
@@ -394,14 +639,32 @@ class Controller:
                 group["wind_last_state"] = locked
                 if use_lock and wind_dir is not None:
                     self._log_wind_event(gid, locked, wind_dir)
+        if changed:
+            self._caps.refresh_groups(changed)
+
+    def loop_stats(self) -> Dict[str, object]:
+        return self._ticker.stats()
+
+    def wind_lock_stats(self) -> Dict[str, object]:
+        """Blokady wiatrowe: przełączenia, trzepotanie i zmiany zatrzymane przez histerezę."""
+        return self._wind_lock.stats()
+
+    def _control_params(self) -> ControlParams:
+        """Parameters pinned for the current tick, or the latest compiled ones outside a tick."""
+        return self._tick_params or self._params
+
+    def _swap_control_params(self) -> ControlParams:
+        # kompilacja poza pętlą i atomowa podmiana referencji – tick widzi starą albo nową wersję
+        params = compile_control_params(self._control)
+        self._params = params
+        self._tolerance = params.ignore_delta_percent
+        return params
 
     def _refresh_control_schedule(self) -> None:
-        self._thermal_day_start = self._parse_time_of_day(CONTROL.get("day_start"))
-        self._thermal_night_start = self._parse_time_of_day(CONTROL.get("night_start"))
-        cap = self._clamp_percent(CONTROL.get("night_max_open_percent"), None)
-        if cap is None:
-            cap = 40.0
-        self._night_max_open = cap
+        params = self._swap_control_params()
+        self._thermal_day_start = params.day_start
+        self._thermal_night_start = params.night_start
+        self._night_max_open = params.night_max_open_percent
 
     def _refresh_heating_schedule(self) -> None:
         if isinstance(HEATING, dict):
@@ -507,30 +770,17 @@ class Controller:
         return current >= day_start or current < night_start
 
     def _is_nighttime(self, now: datetime) -> bool:
-        return not self._is_daytime(now, self._thermal_day_start, self._thermal_night_start)
+        params = self._control_params()
+        return not self._is_daytime(now, params.day_start, params.night_start)
 
     def _resolve_environment_target(self, now: datetime) -> float:
-        base = CONTROL.get("target_temp_c", 25.0)
-        try:
-            base_val = float(base)
-        except (TypeError, ValueError):
-            base_val = 25.0
-        day_raw = CONTROL.get("day_target_temp_c")
-        night_raw = CONTROL.get("night_target_temp_c")
-        try:
-            day_val = float(day_raw) if day_raw is not None else base_val
-        except (TypeError, ValueError):
-            day_val = base_val
-        try:
-            night_val = float(night_raw) if night_raw is not None else base_val
-        except (TypeError, ValueError):
-            night_val = base_val
-        if self._is_daytime(now, self._thermal_day_start, self._thermal_night_start):
-            return day_val
-        return night_val
+        params = self._control_params()
+        if self._is_daytime(now, params.day_start, params.night_start):
+            return params.day_target_temp_c
+        return params.night_target_temp_c
 
     def _is_heating_enabled(self) -> bool:
-        return isinstance(HEATING, dict) and bool(HEATING.get("enabled"))
+        return self.zone.primary and isinstance(HEATING, dict) and bool(HEATING.get("enabled"))
 
     def _current_heating_mode(self) -> str:
         if not isinstance(HEATING, dict):
@@ -579,8 +829,9 @@ class Controller:
 
     def _init_heating_valve(self) -> None:
         self._heating_valve = None
+        self._heating_pid = None
         self._heating_valve_tolerance = 1.0
-        if self._current_heating_mode() != "three_way_valve":
+        if not self.zone.primary or self._current_heating_mode() != "three_way_valve":
             return
         valve_cfg = self._get_heating_valve_config()
         if not valve_cfg:
@@ -602,11 +853,45 @@ class Controller:
                 reverse_pause_s=valve_cfg.get("reverse_pause_s") or 1.0,
                 min_move_s=valve_cfg.get("min_move_s") or 0.5,
                 ignore_delta_percent=self._heating_valve_tolerance,
+                publisher=self._publisher,
+                shadow=self._relay_shadow,
             )
             if isinstance(self._heating_state, (int, float)) and self._heating_valve:
                 self._heating_valve.position = float(self._heating_state)
         except Exception:
             self._heating_valve = None
+        settings = PidSettings.from_config(HEATING.get("valve_control"), deadband_percent=self._heating_valve_tolerance)
+        if self._heating_valve is not None and settings is not None:
+            self._heating_pid = HeatingPid(settings, self._load_heating_pid())
+
+    def _load_heating_pid(self) -> PidState:
+        try:
+            with SessionLocal() as session:
+                row = session.get(RuntimeState, "heating_pid")
+                return PidState.from_json(row.value if row else None)
+        except Exception:
+            return PidState()
+
+    def _store_heating_pid(self, value: str) -> None:
+        try:
+            with SessionLocal() as session:
+                session.merge(RuntimeState(key="heating_pid", value=value))
+                session.commit()
+        except Exception:
+            pass
+
+    def _save_heating_pid(self, force: bool = False) -> None:
+        # całka przetrwa restart; zapis przy ruchu zaworu i najwyżej raz na minutę poza nim
+        pid = self._heating_pid
+        if pid is None:
+            return
+        state = pid.state
+        moved = state.last_move is not None and state.last_move == state.last_update
+        saved_at = self._heating_pid_saved_at
+        now = state.last_update or 0.0
+        if force or moved or saved_at is None or now - saved_at >= 60.0:
+            self._store_heating_pid(state.to_json())
+            self._heating_pid_saved_at = now
 
     def _update_co2_alert(self, co2_value: Optional[float], threshold: Optional[float]) -> None:
         active = bool(threshold is not None and co2_value is not None and co2_value > threshold)
@@ -619,21 +904,7 @@ class Controller:
         self._log_event(event, level=level, meta=meta, category="environment")
 
     def _parse_time_of_day(self, value) -> Optional[dt_time]:
-        if value is None:
-            return None
-        if isinstance(value, dt_time):
-            return value
-        if isinstance(value, str):
-            try:
-                hour_str, minute_str = value.strip().split(":", 1)
-                hour = int(hour_str)
-                minute = int(minute_str)
-            except ValueError:
-                return None
-            hour = max(0, min(23, hour))
-            minute = max(0, min(59, minute))
-            return dt_time(hour=hour, minute=minute)
-        return None
+        return parse_time_of_day(value)
 
     def _resolve_heating_target(self, now: datetime) -> Optional[float]:
         if not isinstance(HEATING, dict):
@@ -663,7 +934,7 @@ class Controller:
         return night_val
 
     def _handle_heating(self, sensors: dict) -> None:
-        if not isinstance(HEATING, dict):
+        if not isinstance(HEATING, dict) or not self.zone.primary:  # jeden obieg grzania: strefa główna
             self._heating_state = None
             return
         mode = self._current_heating_mode()
@@ -677,6 +948,9 @@ class Controller:
                 if valve_cfg and (self._heating_state is None or float(self._heating_state) > self._heating_valve_tolerance):
                     self._set_heating(0.0, valve_cfg=valve_cfg)
                 self._heating_state = 0.0
+                if self._heating_pid is not None and self._heating_pid.state.last_update is not None:
+                    self._heating_pid.reset()
+                    self._save_heating_pid(force=True)
             else:
                 if self._heating_state:
                     topic = str(HEATING.get("topic") or "").strip()
@@ -699,7 +973,7 @@ class Controller:
             internal_temp = float(sensors.get("internal_temp"))
         except (TypeError, ValueError):
             return
-        target = self._resolve_heating_target(datetime.now())
+        target = self._resolve_heating_target(self._now())
         if target is None:
             return
         hysteresis = HEATING.get("hysteresis_c", 5.0)
@@ -710,7 +984,11 @@ class Controller:
         if hysteresis < 0.0:
             hysteresis = 0.0
         if mode == "three_way_valve":
-            desired_percent = self._compute_heating_valve_target(internal_temp, target, hysteresis)
+            if self._heating_pid is not None:
+                desired_percent = self._heating_pid.update(target, internal_temp, self._now().timestamp())
+                self._save_heating_pid()
+            else:
+                desired_percent = self._compute_heating_valve_target(internal_temp, target, hysteresis)
             current_percent = float(self._heating_state) if isinstance(self._heating_state, (int, float)) else None
             tolerance = self._heating_valve_tolerance or 0.0
             if current_percent is None or abs(desired_percent - current_percent) >= tolerance:
@@ -755,9 +1033,8 @@ class Controller:
     ) -> None:
         mode = self._heating_mode
         meta: Dict[str, object] = {"mode": mode}
-        event_name = "HEATING_STATE"
         if mode == "three_way_valve":
-            if not valve_cfg or not self._heating_valve or not self._async_loop:
+            if not valve_cfg or not self._heating_valve or not self._heating_actuator_ready():
                 return
             try:
                 desired = max(0.0, min(100.0, float(state)))
@@ -767,56 +1044,58 @@ class Controller:
             tolerance = self._heating_valve_tolerance or 0.0
             if current is not None and abs(desired - current) < tolerance:
                 return
-            try:
-                position = self._async_loop.run_until_complete(self._heating_valve.move_to(desired))
-            except Exception as exc:
-                print("Heating valve move error:", exc)
-                return
-            self._heating_state = float(position)
             meta.update({
                 "target_percent": desired,
-                "position": position,
                 "open_topic": valve_cfg.get("open_topic"),
                 "close_topic": valve_cfg.get("close_topic"),
                 "stop_topic": valve_cfg.get("stop_topic"),
             })
-            event_name = "HEATING_VALVE_TARGET"
+            # ruch zaworu w tle – tick nie czeka na przejazd, nowsza nastawa zastępuje oczekującą
+            self._heating_actuator.submit(("valve", self._heating_valve, desired, meta))
+            self._heating_state = desired
         else:
             bool_state = bool(state)
             if not topic:
                 return
-            success, extra = self._publish_heating_binary(bool_state, topic)
-            if not success:
-                return
+            payload_key = "payload_on" if bool_state else "payload_off"
+            payload = HEATING.get(payload_key) or ("ON" if bool_state else "OFF")
+            meta.update({"topic": topic, "payload": payload})
             self._heating_state = bool_state
-            meta.update(extra)
-            event_name = "HEATING_ON" if bool_state else "HEATING_OFF"
-        try:
-            with SessionLocal() as session:
-                session.add(EventLog(
-                    level="INFO",
-                    event=event_name,
-                    meta=meta,
-                ))
-                session.commit()
-        except Exception:
-            pass
+            if not self._heating_actuator_ready():
+                self._log_event("HEATING_ON" if bool_state else "HEATING_OFF", meta=meta)
+                return
+            self._heating_actuator.submit(("binary", topic, payload, bool_state, meta))
 
-    def _publish_heating_binary(self, state: bool, topic: str) -> tuple[bool, Dict[str, object]]:
-        payload_key = "payload_on" if state else "payload_off"
-        payload = HEATING.get(payload_key) or ("ON" if state else "OFF")
-        success = True
-        if topic and self._async_loop:
-            try:
-                self._async_loop.run_until_complete(mqtt_publish(topic, payload))
-            except Exception as exc:
-                print("Heating publish error:", exc)
-                success = False
-        meta = {"topic": topic, "payload": payload}
-        return success, meta
+    def _heating_actuator_ready(self) -> bool:
+        # bez własnego wątku aktuator działa na pętli sterownika (symulator, testy)
+        if self._heating_actuator.loop is None and self._async_loop is not None:
+            self._heating_actuator.bind(self._async_loop)
+        return self._heating_actuator.loop is not None
+
+    async def _apply_heating(self, command: tuple):
+        if command[0] == "valve":
+            _, valve, desired, _ = command
+            return await valve.move_to(desired)
+        _, topic, payload, _, _ = command
+        delivered = await (self._publisher or mqtt_publish)(topic, payload)
+        if delivered is False:
+            # mqtt_publish nie rzuca MqttError – bez wyjątku _heating_failed nie ponowiłby polecenia
+            raise ConnectionError(f"{topic} {payload} not delivered")
+        return None
+
+    def _heating_applied(self, command: tuple, result) -> None:
+        if command[0] == "valve":
+            self._log_event("HEATING_VALVE_TARGET", meta={**command[3], "position": result})
+        else:
+            self._log_event("HEATING_ON" if command[3] else "HEATING_OFF", meta=command[4])
+
+    def _heating_failed(self, command: tuple, exc: BaseException) -> None:
+        print("Heating valve move error:" if command[0] == "valve" else "Heating publish error:", exc)
+        # stan nieznany – następny tick ponowi nastawę
+        self._heating_state = None
 
     def _coerce_control_value(self, key: str, raw: object):
-        baseline = CONTROL.get(key)
+        baseline = self._control.get(key)
         value = raw
         if isinstance(value, str):
             stripped = value.strip()
@@ -853,31 +1132,32 @@ class Controller:
         return value
 
     def _apply_control_overrides(self) -> None:
+        prefix = self.zone.setting_key("control.")
         try:
             with SessionLocal() as session:
-                rows = session.query(Setting).filter(Setting.key.like("control.%")).all()
+                rows = session.query(Setting).filter(Setting.key.like(f"{prefix}%")).all()
         except Exception:
             return
         if not rows:
             return
         overrides: Dict[str, object] = {}
         for row in rows:
-            if not row.key or not row.key.startswith("control."):
+            if not row.key or not row.key.startswith(prefix):
                 continue
-            suffix = row.key.split(".", 1)[1]
+            suffix = row.key[len(prefix):]
             if not suffix:
                 continue
             value = self._coerce_control_value(suffix, row.value)
             if value is not None:
                 overrides[suffix] = value
         if overrides:
-            CONTROL.update(overrides)
+            self._control.update(overrides)
 
     def _persist_control_overrides(self, control: Dict[str, object]) -> None:
         try:
             with SessionLocal() as session:
                 for key, value in control.items():
-                    session.merge(Setting(key=f"control.{key}", value=str(value)))
+                    session.merge(Setting(key=self.zone.setting_key(f"control.{key}"), value=str(value)))
                 session.commit()
         except Exception:
             pass
@@ -922,8 +1202,8 @@ class Controller:
     def _apply_plan_overrides(self) -> None:
         try:
             with SessionLocal() as session:
-                stored_groups = session.get(Setting, "vent_groups")
-                stored_plan = session.get(Setting, "vent_plan")
+                stored_groups = session.get(Setting, self.zone.setting_key("vent_groups"))
+                stored_plan = session.get(Setting, self.zone.setting_key("vent_plan"))
         except Exception:
             return
 
@@ -943,25 +1223,30 @@ class Controller:
                     plan_cfg = data
             except json.JSONDecodeError:
                 pass
+        self._apply_plan_config(groups_cfg, plan_cfg)
 
+    def _apply_plan_config(self, groups_cfg: Optional[List[dict]], plan_cfg: Optional[dict]) -> None:
         if groups_cfg is None and plan_cfg is None:
             return
 
-        base_plan = self.export_plan()
-        base_groups = self.export_groups()
-        final_groups = groups_cfg if groups_cfg is not None else base_groups
-        stages_cfg = base_plan["stages"]
-        close_strategy = base_plan["close_strategy"]
+        stages_cfg = None
+        close_strategy = None
         if plan_cfg is not None:
-            stages_cfg = plan_cfg.get("stages", stages_cfg)
-            close_strategy = plan_cfg.get("close_strategy", close_strategy)
+            stages_cfg = plan_cfg.get("stages")
+            close_strategy = plan_cfg.get("close_strategy")
             if close_strategy is None:
-                close_strategy = plan_cfg.get("close_strategy_flag", close_strategy)
-        self._configure_plan(final_groups, stages_cfg, close_strategy)
+                close_strategy = plan_cfg.get("close_strategy_flag")
+        self._reconfigure(groups=groups_cfg, stages=stages_cfg, close_strategy=close_strategy)
 
     def _infer_closing(self, target_pct: float) -> bool:
-        closers = sum(1 for v in self.vents.values() if v.position - target_pct > self._tolerance)
-        openers = sum(1 for v in self.vents.values() if target_pct - v.position > self._tolerance)
+        tolerance = self._tolerance
+        closers = openers = 0
+        for v in self.vents.values():
+            diff = v.position - target_pct
+            if diff > tolerance:
+                closers += 1
+            elif diff < -tolerance:
+                openers += 1
         if closers > openers:
             return True
         if openers > closers:
@@ -975,29 +1260,10 @@ class Controller:
             target = float(requested_pct)
         except (TypeError, ValueError):
             target = 0.0
-        target = max(0.0, min(100.0, target))
-        for gid in self._vent_to_groups.get(vent_id, []):
-            group = self._groups.get(gid)
-            if not group:
-                continue
-            override = group.get("target_override")
-            force_close = group.get("force_close", False)
-            if override is None:
-                continue
-            if force_close or target > override:
-                target = override
-        return max(0.0, min(100.0, target))
+        return self._caps.effective(vent_id, max(0.0, min(100.0, target)))
 
     def _auto_adjustment_needed(self, target_pct: float) -> bool:
-        for group in self._groups.values():
-            for vid in group.get("vents", []):
-                vent = self.vents.get(vid)
-                if not vent or not vent.available:
-                    continue
-                effective = self._enforce_vent_target(vent.id, target_pct)
-                if abs(effective - vent.position) > self._tolerance:
-                    return True
-        return False
+        return self._caps.needs_adjustment(max(0.0, min(100.0, float(target_pct))), self._tolerance)
 
     async def _move_group_step(self, group_id: str, target_pct: float, step: float, closing: bool) -> bool:
         group = self._groups.get(group_id)
@@ -1005,11 +1271,12 @@ class Controller:
             return False
         tasks = []
         force_close = group.get("force_close", False)
-        for vid in group.get("vents", []):
-            vent = self.vents.get(vid)
-            if not vent or not vent.available:
+        # cele wszystkich wietrzników liczone raz na cel – kolejne kroki biorą je z pamięci
+        targets = self._caps.targets(max(0.0, min(100.0, float(target_pct))))
+        for slot, vent in self._caps.group_members.get(group_id, ()):
+            if not vent.available:
                 continue
-            effective_target = self._enforce_vent_target(vent.id, target_pct)
+            effective_target = targets[slot]
             diff = effective_target - vent.position
             if abs(diff) <= self._tolerance:
                 continue
@@ -1083,14 +1350,13 @@ class Controller:
 
     def stop(self):
         self._running = False
+        self._heating_actuator.stop_thread()
 
     def set_mode(self, mode: str):
         if mode not in ("auto","manual"): return
         prev = self.mode
         self.mode = mode
-        with SessionLocal() as s:
-            s.merge(RuntimeState(key="mode", value=self.mode))
-            s.commit()
+        self._save_mode()
         if prev != mode:
             self._log_event(
                 "MODE_CHANGE",
@@ -1112,57 +1378,59 @@ class Controller:
                 self.calibrate_all()
 
     def _compute_auto_target(self, s: dict) -> float:
-        target_temp = self._resolve_environment_target(datetime.now())
-        hum_thr     = CONTROL.get("humidity_thr", 70.0)
-        diff_pct    = CONTROL.get("temp_diff_percent", 5.0)
+        params = self._control_params()
+        target_temp = self._resolve_environment_target(self._now())
         diff = s["internal_temp"] - target_temp
-        # prosta proporcja: temp_diff_percent% / 1Ä‚â€šĂ‚Â°C
+        # prosta proporcja: temp_diff_percent% / 1°C
         pct = 0.0
         if diff > 0 and s["external_temp"] < s["internal_temp"]:
-            pct = min(100.0, diff * diff_pct)
+            pct = min(100.0, diff * params.temp_diff_percent)
         elif diff < 0 and s["external_temp"] > s["internal_temp"]:
-            pct = min(100.0, abs(diff) * diff_pct)
-        # wilgotnoĂ„Ä…Ă˘â‚¬ĹźÄ‚â€žĂ˘â‚¬Ë‡ wymusza min. wietrzenie (gdy bez deszczu/wiatru krytycznego Ä‚ËĂ˘â€šÂ¬Ă˘â‚¬Ĺ› sprawdzimy niĂ„Ä…Ă„Ëťej)
-        if s["internal_hum"] > hum_thr and pct < CONTROL.get("min_open_hum_percent", 20.0):
-            pct = CONTROL.get("min_open_hum_percent", 20.0)
-        co2_thr = CONTROL.get("co2_thr_ppm")
-        try:
-            co2_thr_val = float(co2_thr) if co2_thr is not None else None
-        except (TypeError, ValueError):
-            co2_thr_val = None
+            pct = min(100.0, abs(diff) * params.temp_diff_percent)
+        # wilgotność wymusza min. wietrzenie (deszcz/wiatr krytyczny sprawdzamy niżej)
+        if pct < params.min_open_hum_percent and self._humidity_demand(s, params):
+            pct = params.min_open_hum_percent
+        co2_thr_val = params.co2_thr_ppm
         try:
             co2_value = float(s.get("internal_co2"))
         except (TypeError, ValueError):
             co2_value = None
         self._update_co2_alert(co2_value, co2_thr_val)
         if co2_thr_val is not None and co2_value is not None and co2_value > co2_thr_val:
-            co2_open_raw = CONTROL.get("min_open_co2_percent", CONTROL.get("min_open_hum_percent", 20.0))
-            try:
-                co2_open = float(co2_open_raw)
-            except (TypeError, ValueError):
-                co2_open = float(CONTROL.get("min_open_hum_percent", 20.0))
-            co2_open = max(0.0, min(100.0, co2_open))
-            if pct < co2_open:
-                pct = co2_open
+            if pct < params.min_open_co2_percent:
+                pct = params.min_open_co2_percent
         return pct
 
+    def _humidity_demand(self, s: dict, params: ControlParams) -> bool:
+        """Za wilgotno: próg RH albo (jeśli ustawione) niski VPD / mały zapas do punktu rosy."""
+        if s["internal_hum"] > params.humidity_thr:
+            return True
+        inside = s.get("internal_abs_humidity_g_m3")
+        outside = s.get("external_abs_humidity_g_m3")
+        if inside is not None and outside is not None and outside >= inside:
+            return False  # powietrze z zewnątrz nie osuszy tunelu
+        vpd = s.get("internal_vpd_kpa")
+        if params.vpd_min_kpa is not None and vpd is not None and vpd < params.vpd_min_kpa:
+            return True
+        dew_point = s.get("internal_dew_point_c")
+        if params.dew_point_margin_c is not None and dew_point is not None:
+            return s["internal_temp"] - dew_point < params.dew_point_margin_c
+        return False
+
     def _apply_safety(self, base_pct: float, s: dict, manual: bool) -> float:
-        risk = CONTROL.get("wind_risk_ms", 10.0)
-        crit = CONTROL.get("wind_crit_ms", 20.0)
-        lim  = CONTROL.get("risk_open_limit_percent", 50.0)
-        rain = s["rain"] > CONTROL.get("rain_threshold", 0.5)
-        allow_override = CONTROL.get("allow_humidity_override", False)
-        # krytyk: domyĂ„Ä…Ă˘â‚¬Ĺźlnie zamknij wszystko; opcjonalna szczelina przy wilgotnoĂ„Ä…Ă˘â‚¬Ĺźci
-        if s["wind_speed"] >= crit or rain:
-            if allow_override and s["internal_hum"] > CONTROL.get("humidity_thr", 70.0):
-                return CONTROL.get("crit_hum_crack_percent", 10.0)
+        params = self._control_params()
+        rain = s["rain"] > params.rain_threshold
+        # krytyk: domyślnie zamknij wszystko; opcjonalna szczelina przy wilgotności
+        if s["wind_speed"] >= params.wind_crit_ms or rain:
+            if params.allow_humidity_override and self._humidity_demand(s, params):
+                return params.crit_hum_crack_percent
             return 0.0
         # ryzykowny wiatr: ogranicz max
-        if s["wind_speed"] >= risk and base_pct > lim:
-            return lim
+        if s["wind_speed"] >= params.wind_risk_ms and base_pct > params.risk_open_limit_percent:
+            return params.risk_open_limit_percent
         if not manual and not self._is_heating_enabled():
-            if self._is_nighttime(datetime.now()):
-                night_cap = self._night_max_open
+            if self._is_nighttime(self._now()):
+                night_cap = params.night_max_open_percent
                 if night_cap is not None and base_pct > night_cap:
                     return night_cap
         return base_pct
@@ -1180,7 +1448,7 @@ class Controller:
                 ]
             )
             return
-        step_delay = self._sanitize_delay(CONTROL.get("step_delay_s", 0.0))
+        step_delay = self._control_params().step_delay_s
         stage_sequence = (
             self._plan
             if not closing or self._close_strategy == "fifo"
@@ -1205,74 +1473,171 @@ class Controller:
         inferred_closing = self._infer_closing(target_pct)
         await self._move_in_batches(target_pct, closing=inferred_closing)
 
+    def _save_mode(self) -> None:
+        with SessionLocal() as s:
+            s.merge(RuntimeState(key=self.zone.setting_key("mode"), value=self.mode))
+            s.commit()
+
     def _save_vent_state(self, vid: int):
         v = self.vents[vid]
         with SessionLocal() as s:
             row = s.get(VentState, vid); 
             if row:
                 row.position = float(v.position)
-                row.available = bool(v.available)
+                row.available = not v.fault  # brak łącza nie jest trwałym stanem
                 row.user_target = float(v.user_target)
             s.commit()
 
-    def _loop(self):
-        self._async_loop = asyncio.new_event_loop()
+    def _now(self) -> datetime:
+        return self._clock.now() if self._clock is not None else datetime.now()
+
+    def _sleep(self, seconds: float) -> None:
+        if self._clock is not None:
+            self._clock.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def attach_event_loop(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> asyncio.AbstractEventLoop:
+        """Pętla asyncio dla ruchów wietrzników; symulator podaje pętlę z czasem wirtualnym."""
+        self._async_loop = loop or asyncio.new_event_loop()
         asyncio.set_event_loop(self._async_loop)
         self._manual_lock = asyncio.Lock()
+        return self._async_loop
+
+    def step(self, sensors: Optional[dict] = None) -> ControlParams:
+        """Jeden tick sterowania z przypiętą wersją parametrów; zwraca użyte parametry.
+
+        ``sensors`` pomija odczyt z MQTT/RS485 – tak odtwarzanie historii podaje średnie.
+        """
+        params = self._begin_step()
+        try:
+            self._run_step(params, sensors)
+        except Exception as e:
+            print("Controller loop error:", e)
+        finally:
+            self._finish_step()
+        return params
+
+    async def step_async(self, sensors: Optional[dict] = None) -> ControlParams:
+        """Tick jako zadanie na pętli sterownika: ruchy są awaitowane, więc ticki innych stref (wspólna pętla) biegną w tym czasie."""
+        params = self._begin_step()
+        self._deferred_moves = []
+        moves: list = []
+        try:
+            self._run_step(params, sensors)
+            moves, self._deferred_moves = self._deferred_moves, None
+            while moves:
+                await moves.pop(0)
+        except Exception as e:
+            print("Controller loop error:", e)
+        finally:
+            for move in [*(self._deferred_moves or ()), *moves]:
+                move.close()  # niewykonane ruchy po błędzie – bez ostrzeżeń "never awaited"
+            self._deferred_moves = None
+            self._finish_step()
+        return params
+
+    def _begin_step(self) -> ControlParams:
+        # jedna wersja parametrów na cały tick – zmiany z API wchodzą od następnego
+        params = self._params
+        self._tick_params = params
+        with self._topology_lock:
+            self._in_tick = True
+        return params
+
+    def _run_step(self, params: ControlParams, sensors: Optional[dict]) -> None:
+        if sensors is None:
+            self._tick(params)
+        else:
+            self._evaluate(dict(sensors), params)
+
+    def _finish_step(self) -> None:
+        self._tick_params = None
+        self._end_tick()  # zmiany konfiguracji z czasu ticku wchodzą teraz, w całości
+
+    def _run_move(self, coro) -> None:
+        """Ruch z ticku: w step() czekamy na pętli od razu, w step_async() po ocenie – przez await."""
+        if self._deferred_moves is not None:
+            self._deferred_moves.append(coro)
+        else:
+            self._async_loop.run_until_complete(coro)
+
+    def _loop(self):
+        self.attach_event_loop()
+        self._heating_actuator.start_thread()  # zawór/przekaźnik grzania równolegle z ruchami wietrzników
         while self._running:
-            try:
-                # zbierz Ă„Ä…Ă˘â‚¬Ĺźrednie: z MQTT i RS485 (Ă„Ä…Ă˘â‚¬ĹˇÄ‚â€žĂ˘â‚¬Â¦czymy Ä‚ËĂ˘â€šÂ¬Ă˘â‚¬Ĺ› preferuj RS485 jeĂ„Ä…Ă˘â‚¬Ĺźli skonfigurowany)
-                s1 = sensor_bus.averages()
-                sources = {key: 'mqtt' for key, val in s1.items() if val is not None}
-                s2 = self.rs485.averages()
-                for k, v in s2.items():
-                    if v is not None:
-                        s1[k] = v
-                        sources[k] = 'rs485'
-                merged = test_mode.apply_overrides(s1)
-                if merged is not s1:
-                    for key, value in merged.items():
-                        if key not in s1 or merged[key] != s1.get(key):
-                            sources[key] = 'override'
-                    s1 = merged
-                if s1.get('rain') is None:
-                    s1['rain'] = 0.0
-                    sources.setdefault('rain', 'default')
-                self._last_env = dict(s1)
-                self._last_env_snapshot = {'sensors': dict(s1), 'sources': sources}
-                self._update_group_wind_state(self._last_env)
-                required_keys = ('internal_temp', 'external_temp', 'internal_hum', 'wind_speed')
-                missing_required = any(s1.get(key) is None for key in required_keys)
-                if missing_required:
-                    time.sleep(CONTROL.get('controller_loop_s', 1.0))
-                    continue
-                self._handle_heating(self._last_env)
-                # tryb
-                if self.mode == "auto":
-                    base = self._compute_auto_target(s1)
-                    target = self._apply_safety(base, s1, manual=False)
-                    needs_adjustment = self._auto_adjustment_needed(target)
-                    if (self._last_auto_target is None
-                            or abs(target - self._last_auto_target) >= 1.0
-                            or needs_adjustment):
-                        critical = s1["wind_speed"] >= CONTROL.get("wind_crit_ms", 20.0) or s1["rain"] > CONTROL.get("rain_threshold", 0.5)
-                        self._async_loop.run_until_complete(self._auto_move_to(target, critical))
-                        for vid in self.vents:
-                            self.vents[vid].user_target = target
-                            self._save_vent_state(vid)
-                        self._last_auto_target = target
-                else:
-                    # manual Ä‚ËĂ˘â€šÂ¬Ă˘â‚¬Ĺ› tylko bezpieczeĂ„Ä…Ă˘â‚¬Ĺľstwo
-                    for vid, v in self.vents.items():
-                        desired = v.user_target
-                        safe = self._apply_safety(desired, s1, manual=True)
-                        if abs(safe - v.position) >= 1.0:
-                            self._async_loop.run_until_complete(v.move_to(safe))
-                            self._save_vent_state(vid)
-                time.sleep(CONTROL.get("controller_loop_s", 1.0))
-            except Exception as e:
-                print("Controller loop error:", e)
-                time.sleep(CONTROL.get("controller_loop_s", 1.0))
+            params = self.step()
+            self._ticker.wait(params.controller_loop_s)
+
+    def _tick(self, params: ControlParams) -> None:
+        # zbierz średnie: z MQTT i RS485 (łączymy – preferuj RS485 jeśli skonfigurowany)
+        s1 = self.zone.sensors.averages()
+        sources = {key: 'mqtt' for key, val in s1.items() if val is not None}
+        s2 = self.rs485.averages()
+        own = self.zone.own_sensors  # własne czujniki strefy mają pierwszeństwo przed wspólnym RS485
+        for k, v in s2.items():
+            if v is not None and k not in own:
+                s1[k] = v
+                sources[k] = 'rs485'
+        merged = test_mode.apply_overrides(s1)
+        if merged is not s1:
+            for key, value in merged.items():
+                if key not in s1 or merged[key] != s1.get(key):
+                    sources[key] = 'override'
+            s1 = merged
+        if s1.get('rain') is None:
+            s1['rain'] = 0.0
+            sources.setdefault('rain', 'default')
+        self._last_env_snapshot = {'sensors': dict(s1), 'sources': sources}
+        self._evaluate(s1, params)
+
+    def _evaluate(self, s1: dict, params: ControlParams) -> None:
+        if s1.get('rain') is None:
+            s1['rain'] = 0.0
+        # metryki pochodne raz na tick: reguły, historia, API i WS czytają te same wartości
+        self._derived = derive_metrics(s1)
+        s1.update(self._derived)
+        self._last_env = dict(s1)
+        if self.history is not None:
+            self.history.record(self._last_env, self._now().timestamp())
+        self._update_group_wind_state(self._last_env)
+        required_keys = ('internal_temp', 'external_temp', 'internal_hum', 'wind_speed')
+        missing_required = any(s1.get(key) is None for key in required_keys)
+        if missing_required:
+            return
+        self._handle_heating(self._last_env)
+        # tryb
+        if self.mode == "auto":
+            base = self._compute_auto_target(s1)
+            target = self._apply_safety(base, s1, manual=False)
+            needs_adjustment = self._auto_adjustment_needed(target)
+            if (self._last_auto_target is None
+                    or abs(target - self._last_auto_target) >= 1.0
+                    or needs_adjustment):
+                critical = s1["wind_speed"] >= params.wind_crit_ms or s1["rain"] > params.rain_threshold
+                self._run_move(self._auto_move_and_store(target, critical))
+        else:
+            # manual – tylko bezpieczeństwo
+            moves = []
+            for vid, v in self.vents.items():
+                desired = v.user_target
+                safe = self._apply_safety(desired, s1, manual=True)
+                if abs(safe - v.position) >= 1.0:
+                    moves.append((vid, safe))
+            if moves:
+                self._run_move(self._safety_moves(moves))
+
+    async def _auto_move_and_store(self, target: float, critical: bool) -> None:
+        await self._auto_move_to(target, critical)
+        for vid in self.vents:
+            self.vents[vid].user_target = target
+            self._save_vent_state(vid)
+        self._last_auto_target = target
+
+    async def _safety_moves(self, moves: List[Tuple[int, float]]) -> None:
+        for vid, safe in moves:
+            await self.vents[vid].move_to(safe)
+            self._save_vent_state(vid)
 
     # API akcji
     def _submit_manual(self, coro_func):
@@ -1291,6 +1656,11 @@ class Controller:
     def manual_set_all(self, pct: float):
         self.set_mode("manual")
         async def _task():
+            # cel ustawiamy przed ruchem etapami – inaczej tick trybu ręcznego
+            # cofa wietrzniki do starego user_target między krokami
+            for v in self.vents.values():
+                if v.available:
+                    v.user_target = self._enforce_vent_target(v.id, pct)
             await self._move_in_batches(pct)
             for v in self.vents.values():
                 if not v.available:
@@ -1387,6 +1757,67 @@ class Controller:
             self.vents[vent_id].available = not state  # error=true => available=false
             self._save_vent_state(vent_id)
 
+    def set_device_online(self, device_id: str, online: bool) -> None:
+        """Stan BoneIO z availability_topic (birth/LWT) – dotyczy wszystkich jego wietrzników."""
+        self._device_online[device_id] = bool(online)
+        self._apply_link_state([v for v in self.vents.values() if v.boneio_device == device_id])
+
+    def set_vent_online(self, vent_id: int, online: bool) -> None:
+        """Stan z farmcare/vents/<id>/available."""
+        self._vent_link[vent_id] = bool(online)
+        vent = self.vents.get(vent_id)
+        if vent is not None:
+            self._apply_link_state([vent])
+
+    def device_online(self, device_id: str) -> bool:
+        return self._device_online.get(device_id, True)
+
+    def dispatch_stats(self) -> Dict[str, dict]:
+        """Liczniki poleceń BoneIO: paczki, opóźnienia i limit silników per urządzenie."""
+        return {dev_id: dispatcher.stats() for dev_id, dispatcher in self._dispatchers.items()}
+
+    def relay_stats(self) -> Dict[str, object]:
+        return self._relay_shadow.stats()
+
+    def confirm_relay_state(self, command_topic: str, payload: str) -> bool:
+        """Stan przekaźnika zgłoszony przez BoneIO (retained); True, gdy różnił się od wysłanego."""
+        return self._relay_shadow.confirm(command_topic, payload)
+
+    def _apply_link_state(self, vents: List[Vent]) -> None:
+        grace_s = float(self._control.get("availability_resync_after_s", 60.0) or 0.0)
+        returned = []
+        for vent in vents:
+            online = self._device_online.get(vent.boneio_device, True) and self._vent_link.get(vent.id, True)
+            if online == vent.online:
+                continue
+            vent.set_online(online)
+            # po zaniku łącza stan przekaźników jest nieznany (ESPHome wyłącza je przy starcie)
+            self._relay_shadow.forget((vent.up_topic, vent.down_topic))
+            meta = {"vent": vent.id, "device": vent.boneio_device}
+            if not online:
+                self._offline_since[vent.id] = self._now()
+                self._log_event("VENT_OFFLINE", level="WARN", meta=meta)
+                continue
+            since = self._offline_since.pop(vent.id, None)
+            offline_s = (self._now() - since).total_seconds() if since is not None else 0.0
+            # krótki zanik bez ruchu nie zmienia pozycji; dłuższy mógł oznaczać restart urządzenia
+            if offline_s >= grace_s:
+                vent.needs_resync = True
+            self._log_event("VENT_ONLINE", meta={**meta, "offline_s": round(offline_s, 1), "resync": vent.needs_resync})
+            if vent.needs_resync:
+                returned.append(vent)
+        if returned:
+            self._resync_vents(returned)
+
+    def _resync_vents(self, vents: List[Vent]) -> None:
+        """Kalibracja tylko wietrzników, które wróciły z niepewną pozycją; następny tick odtwarza cel."""
+        async def _cal():
+            await asyncio.gather(*(v.calibrate_close() for v in vents if v.available))
+            for v in vents:
+                self._save_vent_state(v.id)
+        if self._async_loop:
+            asyncio.run_coroutine_threadsafe(_cal(), self._async_loop)
+
     def calibrate_all(self):
         async def _cal():
             for v in self.vents.values():
@@ -1411,9 +1842,8 @@ class Controller:
             normalized: Dict[str, object] = {}
             for key, value in control.items():
                 normalized[key] = self._coerce_control_value(key, value)
-            CONTROL.update(normalized)
+            self._control.update(normalized)
             self._persist_control_overrides(normalized)
-            self._tolerance = float(CONTROL.get('ignore_delta_percent', 0.5)) or 0.5
             schedule_dirty = True
         if heating:
             sanitized = self._sanitize_heating_config(heating)
@@ -1434,26 +1864,33 @@ class Controller:
         if vents is not None:
             VENTS.clear()
             VENTS.extend(vents)
-            self._load_vents_from_config(vents)
-            self._load_state_from_db()
             schedule_dirty = True
-        if vent_groups is not None or vent_plan is not None:
-            if vent_groups is not None:
-                VENT_GROUPS.clear()
-                VENT_GROUPS.extend(vent_groups)
-            groups_cfg = vent_groups if vent_groups is not None else self.export_groups()
-            plan_cfg = vent_plan if isinstance(vent_plan, dict) else self.export_plan()
-            stages_cfg = plan_cfg.get('stages', [])
-            close_strategy = plan_cfg.get('close_strategy')
+        if vents is not None or boneio_devices is not None:
+            refresh_topic_maps()  # wejścia błędów, LWT i stany przekaźników nowych wietrzników/BoneIO
+        stages_cfg = None
+        close_strategy = None
+        if vent_groups is not None:
+            self.zone.vent_groups[:] = vent_groups  # w strefie głównej to VENT_GROUPS
+        if isinstance(vent_plan, dict):
+            stages_cfg = vent_plan.get('stages', [])
+            close_strategy = vent_plan.get('close_strategy')
             if close_strategy is None:
-                close_strategy = plan_cfg.get('close_strategy_flag')
-            if vent_plan is not None:
-                VENT_PLAN_STAGES.clear()
-                VENT_PLAN_STAGES.extend(stages_cfg)
-                strategy_norm = self._normalize_close_strategy(close_strategy, self._close_strategy)
+                close_strategy = vent_plan.get('close_strategy_flag')
+            self.zone.vent_plan_stages[:] = stages_cfg
+            strategy_norm = self._normalize_close_strategy(close_strategy, self._topology_base().close_strategy)
+            self.zone.close_strategy = strategy_norm
+            if self.zone.primary:
                 global VENT_PLAN_CLOSE_STRATEGY
                 VENT_PLAN_CLOSE_STRATEGY = strategy_norm
-            self._configure_plan(groups_cfg, stages_cfg, close_strategy)
+        if any(item is not None for item in (vents, boneio_devices, vent_groups, stages_cfg)):
+            # tylko zmienione wietrzniki, grupy i etapy; stan w pamięci zostaje
+            self._reconfigure(
+                vents=vents,
+                devices=boneio_devices,
+                groups=vent_groups,
+                stages=stages_cfg,
+                close_strategy=close_strategy,
+            )
         if schedule_dirty:
             self._refresh_schedules()
 
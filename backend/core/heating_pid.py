@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""PI/PID set-point computation for the three-way heating valve.
+
+The default valve law is a proportional ramp over ``hysteresis_c``; it has
+no memory, so measurement noise around the ramp turns into a valve move
+on almost every tick. :class:`HeatingPid` replaces it when
+``heating.valve_control.algorithm`` is ``pi`` or ``pid``:
+
+* integral with conditional-integration anti-windup (no integration while
+  the output is saturated in the direction of the error),
+* derivative on the measurement through a first-order filter,
+* output rate limit (% per minute) and a minimum dwell time between moves,
+  with moves smaller than ``deadband_percent`` suppressed.
+
+The state is a small JSON document the controller keeps in ``RuntimeState``
+so a restart does not reset the integral.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("proportional", "pi", "pid")
+# dłuższa przerwa (restart, brak odczytów) nie może wpompować całki naraz
+MAX_STEP_S = 300.0
+
+
+@dataclass(frozen=True)
+class PidSettings:
+    algorithm: str = "pi"
+    kp: float = 20.0                          # % zaworu na 1 °C uchybu
+    ti_s: float = 900.0                       # czas zdwojenia; ki = kp / ti_s
+    td_s: float = 0.0                         # czas wyprzedzenia (tylko "pid")
+    derivative_filter_s: float = 60.0         # stała czasowa filtru pochodnej
+    rate_limit_percent_per_min: float = 20.0  # 0 = bez limitu
+    min_dwell_s: float = 120.0                # minimalny odstęp między ruchami
+    deadband_percent: float = 1.0             # mniejsze zmiany nie ruszają zaworu
+
+    @classmethod
+    def from_config(cls, cfg: Any, *, deadband_percent: Optional[float] = None) -> Optional["PidSettings"]:
+        """Settings from ``heating.valve_control``; None for the proportional ramp or bad input."""
+        if not isinstance(cfg, Mapping):
+            return None
+        algorithm = str(cfg.get("algorithm") or "proportional").strip().lower()
+        if algorithm not in ALGORITHMS:
+            logger.warning("Unknown heating valve algorithm %r, using proportional", algorithm)
+            return None
+        if algorithm == "proportional":
+            return None
+        values = {}
+        for item in fields(cls):
+            if item.name == "algorithm" or cfg.get(item.name) is None:
+                continue
+            try:
+                values[item.name] = max(0.0, float(cfg[item.name]))
+            except (TypeError, ValueError):
+                logger.warning("Ignoring heating.valve_control.%s=%r", item.name, cfg[item.name])
+        if deadband_percent is not None and "deadband_percent" not in values:
+            values["deadband_percent"] = max(0.0, float(deadband_percent))
+        return cls(algorithm=algorithm, **values)
+
+
+@dataclass
+class PidState:
+    integral: float = 0.0
+    output: Optional[float] = None            # ostatnio zadana pozycja zaworu
+    last_measurement: Optional[float] = None
+    derivative: float = 0.0                   # przefiltrowana pochodna pomiaru (°C/s)
+    last_update: Optional[float] = None       # epoch s
+    last_move: Optional[float] = None         # epoch s
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, text: Optional[str]) -> "PidState":
+        try:
+            data = json.loads(text) if text else {}
+        except (TypeError, ValueError):
+            return cls()
+        if not isinstance(data, dict):
+            return cls()
+        known = {item.name for item in fields(cls)}
+        try:
+            return cls(**{key: value for key, value in data.items() if key in known})
+        except TypeError:
+            return cls()
+
+
+class HeatingPid:
+    """Valve position (0–100 %) from the heating target and the measured temperature."""
+
+    def __init__(self, settings: PidSettings, state: Optional[PidState] = None) -> None:
+        self.settings = settings
+        self.state = state or PidState()
+
+    def reset(self) -> None:
+        self.state = PidState()
+
+    def update(self, setpoint: float, measurement: float, now: float) -> float:
+        """Commanded valve position for this tick; unchanged while dwelling or inside the deadband."""
+        cfg = self.settings
+        st = self.state
+        error = float(setpoint) - float(measurement)
+        dt = 0.0 if st.last_update is None else min(MAX_STEP_S, max(0.0, now - st.last_update))
+
+        # pochodna z pomiaru (bez skoku przy zmianie nastawy dzień/noc), filtr pierwszego rzędu
+        if cfg.algorithm == "pid" and cfg.td_s > 0 and st.last_measurement is not None and dt > 0:
+            raw = -(float(measurement) - st.last_measurement) / dt
+            alpha = dt / (cfg.derivative_filter_s + dt) if cfg.derivative_filter_s > 0 else 1.0
+            st.derivative += alpha * (raw - st.derivative)
+        derivative_term = cfg.kp * cfg.td_s * st.derivative if cfg.algorithm == "pid" else 0.0
+
+        proportional = cfg.kp * error
+        integral = st.integral
+        if cfg.ti_s > 0 and dt > 0:
+            candidate = integral + cfg.kp / cfg.ti_s * error * dt
+            unsaturated = proportional + candidate + derivative_term
+            # anti-windup: nie całkujemy, gdy wyjście już stoi na ograniczeniu w kierunku uchybu
+            if not ((unsaturated > 100.0 and error > 0) or (unsaturated < 0.0 and error < 0)):
+                integral = max(0.0, min(100.0, candidate))
+        st.integral = integral
+        st.last_measurement = float(measurement)
+        st.last_update = now
+
+        wanted = max(0.0, min(100.0, proportional + integral + derivative_term))
+        if st.output is None:
+            st.output = wanted
+            st.last_move = now
+            return wanted
+        since_move = now - st.last_move if st.last_move is not None else float("inf")
+        if since_move < cfg.min_dwell_s:
+            return st.output
+        if cfg.rate_limit_percent_per_min > 0:
+            max_step = cfg.rate_limit_percent_per_min * since_move / 60.0
+            wanted = max(st.output - max_step, min(st.output + max_step, wanted))
+        # krańce zawsze osiągalne – inaczej strefa nieczułości blokowałaby pełne zamknięcie
+        at_limit = wanted in (0.0, 100.0) and wanted != st.output
+        if abs(wanted - st.output) < cfg.deadband_percent and not at_limit:
+            return st.output
+        st.output = wanted
+        st.last_move = now
+        return wanted
+
+
+__all__ = ["ALGORITHMS", "HeatingPid", "PidSettings", "PidState"]
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
-"""Timed control helper for three-way heating valves driven over MQTT."""
+"""Timed control helper for three-way heating valves driven over MQTT, plus the
+background set-point actuator that drives heating outputs off the control tick."""
 from __future__ import annotations
 
 import asyncio
-from typing import Optional
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from backend.core.mqtt_client import mqtt_publish
+from backend.core.relay_shadow import RelayShadow
 
 
 class ThreeWayValve:
@@ -24,6 +27,8 @@ class ThreeWayValve:
         reverse_pause_s: float = 1.0,
         min_move_s: float = 0.5,
         ignore_delta_percent: float = 1.0,
+        publisher: Optional[Callable[[str, str], Awaitable[None]]] = None,
+        shadow: Optional[RelayShadow] = None,
     ) -> None:
         self.open_topic = open_topic
         self.close_topic = close_topic
@@ -39,18 +44,35 @@ class ThreeWayValve:
         self._moving = False
         self._last_dir = 0  # -1 close, +1 open
         self._lock = asyncio.Lock()
+        self._publisher = publisher
+        self._shadow = shadow
 
-    async def _publish(self, topic: Optional[str], payload: str) -> None:
-        if topic:
-            await mqtt_publish(topic, payload)
+    async def _send(self, messages: List[Tuple[Optional[str], str]]) -> None:
+        """Publish in order; with a relay shadow only the payloads that change a topic."""
+        pending = [(topic, payload) for topic, payload in messages if topic]
+        if self._shadow is not None:
+            pending = self._shadow.pending(pending)
+        failed = []
+        try:
+            for topic, payload in pending:
+                if await (self._publisher or mqtt_publish)(topic, payload) is False:
+                    failed.append(topic)
+        except Exception:
+            if self._shadow is not None:
+                self._shadow.forget(topic for topic, _ in pending)
+            raise
+        if self._shadow is not None:
+            self._shadow.commanded((topic, payload) for topic, payload in pending if topic not in failed)
+            self._shadow.forget(failed)
+
+    def _halt_messages(self) -> List[Tuple[Optional[str], str]]:
+        stop_payload = self.stop_payload or "OFF"
+        return [(self.open_topic, stop_payload), (self.close_topic, stop_payload), (self.stop_topic, stop_payload)]
 
     async def stop(self) -> None:
         """Stop movement and ensure all topics are set to stop payload."""
         async with self._lock:
-            await self._publish(self.open_topic, self.stop_payload)
-            await self._publish(self.close_topic, self.stop_payload)
-            if self.stop_topic:
-                await self._publish(self.stop_topic, self.stop_payload)
+            await self._send(self._halt_messages())
             self._moving = False
             self._last_dir = 0
 
@@ -62,10 +84,7 @@ class ThreeWayValve:
                 return self.position
             direction = 1 if target > self.position else -1
             if self._moving and self._last_dir != direction and self.reverse_pause_s > 0:
-                await self._publish(self.open_topic, self.stop_payload)
-                await self._publish(self.close_topic, self.stop_payload)
-                if self.stop_topic:
-                    await self._publish(self.stop_topic, self.stop_payload)
+                await self._send(self._halt_messages())
                 await asyncio.sleep(self.reverse_pause_s)
             delta = abs(target - self.position) / 100.0
             move_time = self.travel_time * delta
@@ -75,26 +94,137 @@ class ThreeWayValve:
                 move_time = max(move_time, self.min_move_s if delta > 0 else 0.0)
             stop_payload = self.stop_payload or "OFF"
             if direction > 0:
-                await self._publish(self.close_topic, stop_payload)
-                if self.stop_topic:
-                    await self._publish(self.stop_topic, stop_payload)
-                await self._publish(self.open_topic, self.open_payload)
+                await self._send([
+                    (self.close_topic, stop_payload),
+                    (self.stop_topic, stop_payload),
+                    (self.open_topic, self.open_payload),
+                ])
             elif direction < 0:
-                await self._publish(self.open_topic, stop_payload)
-                if self.stop_topic:
-                    await self._publish(self.stop_topic, stop_payload)
-                await self._publish(self.close_topic, self.close_payload)
+                await self._send([
+                    (self.open_topic, stop_payload),
+                    (self.stop_topic, stop_payload),
+                    (self.close_topic, self.close_payload),
+                ])
             else:
                 return self.position
             self._moving = True
             self._last_dir = direction
             if move_time > 0.0:
                 await asyncio.sleep(move_time)
-            await self._publish(self.open_topic, stop_payload)
-            await self._publish(self.close_topic, stop_payload)
-            if self.stop_topic:
-                await self._publish(self.stop_topic, stop_payload)
+            await self._send(self._halt_messages())
             self._moving = False
             self._last_dir = direction
             self.position = target
             return self.position
+
+
+_NOTHING = object()
+
+
+class SetpointActuator:
+    """Applies set-points in the background, newest wins.
+
+    ``submit`` never waits: the value replaces any set-point that has not
+    started yet, and a single task applies them one after another, so a
+    long valve swing never holds up the caller. The task runs on a bound
+    event loop (the simulator's virtual-time loop) or on a private loop in
+    a daemon thread after :meth:`start_thread`.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[Any], Awaitable[Any]],
+        *,
+        on_applied: Optional[Callable[[Any, Any], None]] = None,
+        on_error: Optional[Callable[[Any, BaseException], None]] = None,
+        name: str = "actuator",
+    ) -> None:
+        self._apply = apply
+        self._on_applied = on_applied
+        self._on_error = on_error
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pending: Any = _NOTHING
+        self._task: Optional[asyncio.Task] = None
+        self.busy = False
+        self.submitted = 0
+        self.applied = 0
+        self.superseded = 0
+        self.failed = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+    def start_thread(self) -> asyncio.AbstractEventLoop:
+        """Own event loop in a daemon thread, independent of the control tick."""
+        if self._thread is None or not self._thread.is_alive():
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name=self.name, daemon=True)
+            self._thread.start()
+            self.loop = loop
+        return self.loop
+
+    def stop_thread(self, timeout: float = 2.0) -> None:
+        """Stop the loop started by :meth:`start_thread`; a bound loop is left alone."""
+        thread = self._thread
+        if thread is None:
+            return
+        loop = self.loop
+        self._thread = None
+        self.loop = None
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout)
+            if not thread.is_alive():
+                loop.close()
+
+    @property
+    def idle(self) -> bool:
+        return not self.busy and self._pending is _NOTHING
+
+    def submit(self, value: Any) -> bool:
+        """Queue ``value``; False without an event loop to run it on."""
+        if self.loop is None or self.loop.is_closed():
+            return False
+        with self._lock:
+            if self._pending is not _NOTHING:
+                self.superseded += 1
+            self._pending = value
+            self.submitted += 1
+        self.loop.call_soon_threadsafe(self._kick)
+        return True
+
+    def _kick(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = self.loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            with self._lock:
+                value, self._pending = self._pending, _NOTHING
+                if value is _NOTHING:
+                    return
+                self.busy = True
+            try:
+                result = await self._apply(value)
+            except Exception as exc:
+                self.failed += 1
+                if self._on_error is not None:
+                    self._on_error(value, exc)
+            else:
+                self.applied += 1
+                if self._on_applied is not None:
+                    self._on_applied(value, result)
+            finally:
+                self.busy = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "submitted": self.submitted,
+            "applied": self.applied,
+            "superseded": self.superseded,
+            "failed": self.failed,
+            "busy": self.busy,
+        }
@@ -354,6 +354,7 @@ class BoneIODeviceStatus(BaseModel):
     device: str
     vents: List[BoneIOVentStatus] = Field(default_factory=list)
     all_available: bool = True
+    online: bool = True
 
 
 class VentTestStatus(BaseModel):
@@ -407,6 +408,7 @@ class TestLogsResponse(BaseModel):
     total: int
     offset: int
     limit: int
+    has_more: bool = False
 
 
 class TestPingPayload(BaseModel):
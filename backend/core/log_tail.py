@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""Newest-first log reader backed by a sparse, incrementally updated line index.
+
+The installer log viewer only ever shows a page of recent lines, so instead of
+loading whole files the reader keeps, per log path, the byte offset of every
+``INDEX_STRIDE``-th line. The index is extended by scanning only bytes appended
+since the previous request and rebuilt when the file is rotated or truncated.
+Filtered queries walk the file backwards in fixed-size chunks and stop as soon
+as the requested page is filled.
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from itertools import accumulate
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+INDEX_STRIDE = 256          # co ile linii zapamiętujemy offset
+CHUNK_SIZE = 64 * 1024      # rozmiar bloku przy czytaniu pliku
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+_LEVEL_ALIASES = {"WARN": "WARNING", "FATAL": "CRITICAL"}
+_LEVEL_RE = re.compile(r"\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL)\b")
+# Dla każdego progu: tokeny (bajty) poziomów równych lub wyższych – do szybkiego odsiewu bloków
+_LEVEL_TOKENS = {
+    level: tuple(
+        name.encode("ascii")
+        for name in (*LEVELS, *_LEVEL_ALIASES)
+        if LEVELS.index(_LEVEL_ALIASES.get(name, name)) >= LEVELS.index(level)
+    )
+    for level in LEVELS
+}
+
+
+def decode_line(raw: bytes) -> str:
+    raw = raw.rstrip(b"\r\n")
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1", errors="replace")
+
+
+def normalize_level(level: Optional[str]) -> Optional[str]:
+    if not level:
+        return None
+    key = level.strip().upper()
+    key = _LEVEL_ALIASES.get(key, key)
+    if key not in LEVELS:
+        raise ValueError(f"Unknown log level: {level}")
+    return key
+
+
+def line_level(line: str) -> Optional[str]:
+    match = _LEVEL_RE.search(line)
+    if not match:
+        return None
+    token = match.group(1)
+    return _LEVEL_ALIASES.get(token, token)
+
+
+@dataclass(frozen=True)
+class LineFilter:
+    """Minimum level and/or case-insensitive substring; empty filter matches everything."""
+
+    min_level: Optional[str] = None
+    contains: Optional[str] = None
+
+    @classmethod
+    def build(cls, level: Optional[str] = None, contains: Optional[str] = None) -> "LineFilter":
+        return cls(normalize_level(level), contains.lower() if contains else None)
+
+    @property
+    def active(self) -> bool:
+        return self.min_level is not None or self.contains is not None
+
+    def block_may_match(self, block: bytes) -> bool:
+        """Cheap bytes-level pre-check so whole chunks without candidates are skipped."""
+        if self.contains is not None and self.contains.isascii():
+            if self.contains.encode("ascii") not in block.lower():
+                return False
+        if self.min_level is not None:
+            if not any(token in block for token in _LEVEL_TOKENS[self.min_level]):
+                return False
+        return True
+
+    def matches(self, line: str) -> bool:
+        if self.contains is not None and self.contains not in line.lower():
+            return False
+        if self.min_level is not None:
+            level = line_level(line)
+            if level is None or LEVELS.index(level) < LEVELS.index(self.min_level):
+                return False
+        return True
+
+
+@dataclass
+class TailPage:
+    entries: List[str]
+    total: int
+    has_more: bool
+
+
+@dataclass
+class _LineIndex:
+    inode: int = -1
+    size: int = 0               # ile bajtów pliku zostało zindeksowanych
+    lines: int = 0              # liczba zakończonych linii (znaków \n)
+    last_line_end: int = 0      # offset za ostatnim \n
+    checkpoints: List[int] = field(default_factory=lambda: [0])
+
+    def total(self) -> int:
+        return self.lines + (1 if self.size > self.last_line_end else 0)
+
+
+class LogTailReader:
+    """Thread-safe cache of sparse line indexes, one per log file."""
+
+    def __init__(self, stride: int = INDEX_STRIDE, chunk_size: int = CHUNK_SIZE) -> None:
+        self.stride = max(1, int(stride))
+        self.chunk_size = max(1024, int(chunk_size))
+        self._indexes: Dict[Path, _LineIndex] = {}
+        self._lock = threading.Lock()
+
+    # ---------- indeks ----------
+    def _refresh(self, path: Path, handle, stat: os.stat_result) -> _LineIndex:
+        index = self._indexes.get(path)
+        if index is None or index.inode != stat.st_ino or stat.st_size < index.size:
+            index = _LineIndex(inode=stat.st_ino)
+            self._indexes[path] = index
+        if stat.st_size == index.size:
+            return index
+        handle.seek(index.size)
+        pos = index.size
+        remaining = stat.st_size - pos
+        while remaining > 0:
+            chunk = handle.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            parts = chunk.split(b"\n")
+            found = len(parts) - 1
+            if found:
+                # Offsety liczone w C (accumulate), Python tylko dla punktów kontrolnych
+                first_cp = self.stride - index.lines % self.stride - 1
+                if first_cp < found:
+                    ends = list(accumulate(map(len, parts[:found])))
+                    for i in range(first_cp, found, self.stride):
+                        index.checkpoints.append(pos + ends[i] + i + 1)
+                index.last_line_end = pos + len(chunk) - len(parts[-1])
+                index.lines += found
+            pos += len(chunk)
+            remaining -= len(chunk)
+        index.size = pos
+        return index
+
+    def line_count(self, path: Path) -> int:
+        try:
+            with path.open("rb") as handle:
+                with self._lock:
+                    return self._refresh(path, handle, os.fstat(handle.fileno())).total()
+        except FileNotFoundError:
+            return 0
+
+    # ---------- odczyt ----------
+    def _read_range(self, handle, index: _LineIndex, first: int, count: int) -> List[str]:
+        """Lines ``first .. first+count-1`` (oldest-first) located via the nearest checkpoint."""
+        slot = first // self.stride
+        handle.seek(index.checkpoints[slot])
+        skip = first - slot * self.stride
+        lines: List[str] = []
+        limit_pos = index.size
+        while len(lines) < count and handle.tell() < limit_pos:
+            raw = handle.readline(limit_pos - handle.tell())
+            if not raw:
+                break
+            if skip:
+                skip -= 1
+                continue
+            lines.append(decode_line(raw))
+        return lines
+
+    def _iter_reverse_blocks(self, handle, end: int) -> Iterator[Tuple[bytes, List[bytes]]]:
+        """Yield ``(block, lines)`` walking from ``end`` to the start; lines are newest first."""
+        pos = end
+        tail = b""
+        while pos > 0:
+            size = min(self.chunk_size, pos)
+            pos -= size
+            handle.seek(pos)
+            block = handle.read(size) + tail
+            parts = block.split(b"\n")
+            tail = parts[0]
+            complete = block[len(tail) + 1 :] if len(parts) > 1 else b""
+            yield complete, parts[:0:-1]
+        yield tail, [tail]
+
+    def page(self, path: Path, offset: int = 0, limit: int = 100, line_filter: Optional[LineFilter] = None) -> TailPage:
+        """Return ``limit`` lines newest-first after skipping ``offset`` (matching) lines.
+
+        Without a filter ``total`` is the exact line count. With a filter it counts
+        matches seen during the backward scan and is exact only when ``has_more`` is False.
+        """
+        offset = max(0, offset)
+        limit = max(0, limit)
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            return TailPage([], 0, False)
+        with handle:
+            with self._lock:
+                index = self._refresh(path, handle, os.fstat(handle.fileno()))
+                index = _LineIndex(index.inode, index.size, index.lines, index.last_line_end, list(index.checkpoints))
+            total = index.total()
+            if line_filter is None or not line_filter.active:
+                newest = total - offset
+                first = max(0, newest - limit)
+                if newest <= 0 or limit == 0:
+                    return TailPage([], total, offset < total)
+                lines = self._read_range(handle, index, first, newest - first)
+                lines.reverse()
+                return TailPage(lines, total, first > 0)
+            return self._filtered_page(handle, index, offset, limit, line_filter)
+
+    def _filtered_page(self, handle, index: _LineIndex, offset: int, limit: int, line_filter: LineFilter) -> TailPage:
+        entries: List[str] = []
+        matched = 0
+        # Pomijamy pusty "ogon" po końcowym \n
+        skip_empty_tail = index.last_line_end == index.size
+        for block, raw_lines in self._iter_reverse_blocks(handle, index.size):
+            if skip_empty_tail:
+                skip_empty_tail = False
+                if raw_lines and not raw_lines[0]:
+                    raw_lines = raw_lines[1:]
+            if not line_filter.block_may_match(block):
+                continue
+            for raw in raw_lines:
+                line = decode_line(raw)
+                if not line_filter.matches(line):
+                    continue
+                if matched >= offset + limit:
+                    return TailPage(entries, matched + 1, True)
+                if matched >= offset:
+                    entries.append(line)
+                matched += 1
+        return TailPage(entries, matched, False)
+
+    # ---------- follow ----------
+    def read_from(self, path: Path, position: Optional[int]) -> Tuple[List[str], int]:
+        """Complete lines appended after byte ``position`` and the new position.
+
+        ``None`` starts at the current end of file. A position past the end
+        (truncation or rotation) restarts from the beginning of the new file.
+        """
+        try:
+            handle = path.open("rb")
+        except FileNotFoundError:
+            return [], 0
+        with handle:
+            size = os.fstat(handle.fileno()).st_size
+            if position is None:
+                return [], size
+            if position > size:
+                position = 0
+            handle.seek(position)
+            data = handle.read(size - position)
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            return [], position
+        return [decode_line(raw) for raw in data[: cut + 1].splitlines()], position + cut + 1
+
+
+log_tail_reader = LogTailReader()
+
+__all__ = ["LogTailReader", "LineFilter", "TailPage", "log_tail_reader", "normalize_level", "LEVELS"]
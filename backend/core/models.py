@@ -1,17 +1,21 @@
 # -*- coding: utf-8 -*-
 # backend/core/models.py - runtime models (in-memory) + sensor averages
+import time
 from dataclasses import dataclass, field
 from collections import deque
-from typing import Deque
+from typing import Any, Deque, Dict, Optional
 
 
 @dataclass
 class SensorAverager:
     window: int = 5
     q: Deque[float] = field(default_factory=lambda: deque(maxlen=5))
+    updated_at: Optional[float] = None  # czas ostatniej próbki (epoch, do warm restartu)
 
-    def add(self, v: float):
+    def add(self, v: float, ts: Optional[float] = None):
         self.q.append(float(v))
+        # ts z treści komunikatu (epoch) – inaczej czas odbioru
+        self.updated_at = time.time() if ts is None else ts
 
     def avg(self) -> float | None:
         if not self.q:
@@ -25,6 +29,27 @@ class SensorAverager:
         # trim samples to the new window size
         self.q = deque(list(self.q)[-window:], maxlen=window)
 
+    def export_state(self) -> Optional[Dict[str, Any]]:
+        values = list(self.q)
+        if not values or self.updated_at is None:
+            return None
+        return {"v": values, "t": self.updated_at}
+
+    def restore_state(self, state: Dict[str, Any], max_age_s: float, now: float) -> bool:
+        """Restore samples from a checkpoint unless they are stale or live data already arrived."""
+        if self.q:
+            return False
+        try:
+            ts = float(state["t"])
+            values = [float(v) for v in state["v"]]
+        except (KeyError, TypeError, ValueError):
+            return False
+        if not values or now - ts > max_age_s or ts > now + 60.0:
+            return False
+        self.q.extend(values[-self.window:])
+        self.updated_at = ts
+        return True
+
 
 @dataclass
 class SensorSnapshot:
@@ -51,3 +76,20 @@ class SensorSnapshot:
 
     def averages(self) -> dict[str, float | None]:
         return {name: getattr(self, name).avg() for name in self.__dataclass_fields__}
+
+    def export_state(self) -> Dict[str, Dict[str, Any]]:
+        exported = {}
+        for name in self.__dataclass_fields__:
+            state = getattr(self, name).export_state()
+            if state is not None:
+                exported[name] = state
+        return exported
+
+    def restore_state(self, data: Dict[str, Any], max_age_s: float, now: Optional[float] = None) -> list[str]:
+        current = time.time() if now is None else now
+        restored = []
+        for name, state in data.items():
+            if name in self.__dataclass_fields__ and isinstance(state, dict):
+                if getattr(self, name).restore_state(state, max_age_s, current):
+                    restored.append(name)
+        return restored
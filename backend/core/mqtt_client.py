@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 # backend/core/mqtt_client.py – MQTT (asyncio-mqtt)
-import asyncio, json
+import asyncio
 from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Optional
 try:
     from asyncio_mqtt import Client, MqttError
 except Exception:  # pragma: no cover - brak biblioteki w środowisku testowym
     Client = MqttError = None
-from backend.core.config import settings, SENSORS, VENTS, AVG_WINDOW_S
+from backend.core.config import settings, SENSORS, SENSOR_MESSAGES, VENTS, AVG_WINDOW_S, BONEIOS, ZONES
 from backend.core.models import SensorSnapshot
+from backend.core.mqtt_router import TopicRouter, filter_matches
+from backend.core.payload_decoders import build_decoders
+from backend.core.boneio_dispatch import channel_from_topic
+from backend.core.zones import zone_sensor_decoders
 try:
     from backend.core.db import SessionLocal, SensorLog
     from sqlalchemy.orm import Session
@@ -18,6 +24,10 @@ except Exception:  # pragma: no cover - brak bazy w testach
 
 sensor_bus = SensorSnapshot()
 sensor_bus.set_window(AVG_WINDOW_S)
+# własne czujniki stref (jedno połączenie MQTT dla wszystkich tuneli)
+zone_sensor_buses = {zone["id"]: SensorSnapshot() for zone in ZONES}
+for zone_bus in zone_sensor_buses.values():
+    zone_bus.set_window(AVG_WINDOW_S)
 
 def configure_sensor_windows():
     """Wczytuje ustawienia z configu i nakłada indywidualne okna."""
@@ -28,12 +38,22 @@ def configure_sensor_windows():
     }
     if per_windows:
         sensor_bus.set_windows(per_windows)
+    for zone in ZONES:
+        zone_windows = {
+            name: cfg.get("avg_window_s")
+            for name, cfg in zone["sensors"].items()
+            if isinstance(cfg, dict) and cfg.get("avg_window_s") is not None
+        }
+        if zone_windows:
+            zone_sensor_buses[zone["id"]].set_windows(zone_windows)
 
 configure_sensor_windows()
 
 def set_avg_window(window: int):
     """Ustaw nowe okno uśredniania dla wszystkich czujników."""
     sensor_bus.set_window(window)
+    for zone_bus in zone_sensor_buses.values():
+        zone_bus.set_window(window)
 
 # Mapowanie tematów MQTT -> pola w sensor_bus
 DEFAULT_SENSOR_TOPICS = {
@@ -55,12 +75,190 @@ for name, cfg in SENSORS.items():
         if topic:
             TOPIC_MAP[topic] = name
 
+# Czujniki stref: temat -> (strefa, dekoder) – te same dekodery co dla czujników strefy głównej
+ZONE_SENSOR_DECODERS = zone_sensor_decoders(ZONES)
+
+# Dekodery treści (JSON, skalowanie, znacznik czasu) – jeden komunikat, kilka odczytów
+SENSOR_DECODERS = build_decoders(SENSORS, SENSOR_MESSAGES, SensorSnapshot.__dataclass_fields__)
+
 # Tematy dostępności wietrzników
 VENT_AVAIL_TOPICS = [f'farmcare/vents/{v["id"]}/available' for v in VENTS]
 # Tematy błędów krańcowych z urządzeń BONEIO
-VENT_ERROR_TOPIC_MAP = {v["topics"].get("error_in"): v["id"] for v in VENTS if v["topics"].get("error_in")}
+def vent_error_topics() -> dict:
+    """Temat wejścia błędu krańcowego (``topics.error_in``) -> id wietrznika."""
+    return {v["topics"].get("error_in"): v["id"] for v in VENTS if v.get("topics", {}).get("error_in")}
+
+VENT_ERROR_TOPIC_MAP = vent_error_topics()
+
+# Filtry z dzikimi kartami – jedna subskrypcja zamiast tematu na każdy wietrznik
+VENT_AVAIL_FILTER = "farmcare/vents/+/available"
+BONEIO_INPUT_FILTER = "boneio/+/in/#"
+
+message_router: Optional[TopicRouter] = None
+_subscriber = None  # (klient, pętla) połączenia odbiorczego – subskrypcje filtrów dodanych w instalatorze
+
+def _on_sensor(topic: str, payload: bytes, captures) -> None:
+    name = TOPIC_MAP.get(topic)
+    if name is None:
+        return
+    text = payload.decode()
+    val = 1.0 if text in ("true","True","1") else float(text)
+    getattr(sensor_bus, name).add(val)
+    if SessionLocal and SensorLog:
+        # log do bazy (co przyjście), lekkie – można dodać filtr zmian
+        with SessionLocal() as s:  # type: Session
+            s.add(SensorLog(name=name, value=val))
+            s.commit()
+
+def _store_readings(bus: SensorSnapshot, values, ts, prefix: str = "") -> None:
+    for name, val in values:
+        getattr(bus, name).add(val, ts)
+    if values and SessionLocal and SensorLog:
+        # jeden zapis na komunikat zamiast na odczyt; czujniki stref jako "<strefa>.<czujnik>"
+        extra = {"ts": datetime.utcfromtimestamp(ts)} if ts is not None else {}
+        with SessionLocal() as s:  # type: Session
+            s.add_all([SensorLog(name=prefix + name, value=val, **extra) for name, val in values])
+            s.commit()
+
+def _on_zone_sensor(topic: str, payload: bytes, captures) -> None:
+    entry = ZONE_SENSOR_DECODERS.get(topic)
+    if entry is None:
+        return
+    zone_id, decoder = entry
+    _store_readings(zone_sensor_buses[zone_id], *decoder.decode(payload), prefix=f"{zone_id}.")
+
+def _on_sensor_message(topic: str, payload: bytes, captures) -> None:
+    decoder = SENSOR_DECODERS.get(topic)
+    if decoder is None:
+        return
+    _store_readings(sensor_bus, *decoder.decode(payload))
+
+def _on_vent_error(topic: str, payload: bytes, captures) -> None:
+    vid = VENT_ERROR_TOPIC_MAP.get(topic)
+    if vid is None:
+        return  # inne wejście BONEIO pod tym samym filtrem
+    state = payload.decode() not in ("0", "false", "False", "OFF")
+    controller = _vent_controller(vid)
+    if controller:
+        controller.mark_error(vid, state)
+
+def _zone_controllers() -> list:
+    """Kontroler strefy głównej i pozostałych stref – jedno połączenie MQTT obsługuje wszystkie."""
+    from backend.app import controller, zones
+    extra = zones.secondary if zones is not None else []
+    return [ctrl for ctrl in (controller, *extra) if ctrl]
+
+def _vent_controller(vid: Optional[int] = None, command_topic: Optional[str] = None):
+    """Kontroler strefy, do której należy wietrznik (id albo temat polecenia); domyślnie strefa główna."""
+    from backend.app import controller, zones
+    for ctrl in (zones.secondary if zones is not None else []):
+        if vid in ctrl.vents or any(command_topic in (v.up_topic, v.down_topic) for v in ctrl.vents.values()):
+            return ctrl
+    return controller
+
+_LINK_STATES = {"online": True, "true": True, "1": True, "on": True,
+                "offline": False, "false": False, "0": False, "off": False}
+
+def _link_state(payload: bytes):
+    return _LINK_STATES.get(payload.decode().strip().lower())
+
+def _on_vent_available(topic: str, payload: bytes, captures) -> None:
+    state = _link_state(payload)
+    try:
+        vid = int(captures[0])
+    except (IndexError, ValueError):
+        return
+    controller = _vent_controller(vid)
+    if controller and state is not None:
+        controller.set_vent_online(vid, state)
+
+def device_availability_topics() -> dict:
+    """availability_topic -> id BoneIO; domyślnie ``<base_topic>/status`` (birth/LWT ESPHome)."""
+    topics = {}
+    for device in BONEIOS:
+        topic = device.get("availability_topic") or f'{device["base_topic"]}/status'
+        topics.setdefault(topic, []).append(device["id"])
+    return topics
+
+DEVICE_AVAIL_TOPIC_MAP = device_availability_topics()
+
+def _on_device_available(topic: str, payload: bytes, captures) -> None:
+    state = _link_state(payload)
+    if state is None:
+        return
+    device_ids = DEVICE_AVAIL_TOPIC_MAP.get(topic, [])
+    for controller in _zone_controllers():  # urządzenie BoneIO może obsługiwać wietrzniki kilku stref
+        for device_id in device_ids:
+            controller.set_device_online(device_id, state)
+
+def relay_state_topics() -> dict:
+    """Temat stanu przekaźnika -> temat polecenia: ``topics.up_state``/``down_state`` wietrznika
+    albo ``<base_topic>/switch/<kanał>_up|down/state`` dla BoneIO z ``confirm_relay_state``."""
+    confirming = {d["id"]: d["base_topic"] for d in BONEIOS if d.get("confirm_relay_state")}
+    topics = {}
+    for vent in VENTS:
+        cfg = vent.get("topics", {})
+        base = confirming.get(vent.get("boneio_device", "boneio_main"))
+        channel = vent.get("channel") or channel_from_topic(cfg.get("up"))
+        for relay in ("up", "down"):
+            command = cfg.get(relay)
+            state = cfg.get(f"{relay}_state") or (f"{base}/switch/{channel}_{relay}/state" if base else None)
+            if command and state:
+                topics[state] = command
+    return topics
+
+RELAY_STATE_TOPIC_MAP = relay_state_topics()
+
+def _on_relay_state(topic: str, payload: bytes, captures) -> None:
+    command_topic = RELAY_STATE_TOPIC_MAP.get(topic)
+    if command_topic is None:
+        return
+    controller = _vent_controller(command_topic=command_topic)
+    if controller:
+        controller.confirm_relay_state(command_topic, payload.decode().strip().upper())
+
+def build_router() -> TopicRouter:
+    """Trie tematów z aktualnej konfiguracji: czujniki, dostępność i błędy wietrzników."""
+    router = TopicRouter()
+    for topic in TOPIC_MAP:
+        if topic not in SENSOR_DECODERS:
+            router.add(topic, _on_sensor, "sensor")
+    for topic in ZONE_SENSOR_DECODERS:
+        router.add(topic, _on_zone_sensor, "zone_sensor")
+    for topic in SENSOR_DECODERS:
+        router.add(topic, _on_sensor_message, "sensor_message")
+    router.add(VENT_AVAIL_FILTER, _on_vent_available, "vent_available")
+    for topic in DEVICE_AVAIL_TOPIC_MAP:
+        router.add(topic, _on_device_available, "device_available")
+    router.add(BONEIO_INPUT_FILTER, _on_vent_error, "vent_error")
+    for topic in RELAY_STATE_TOPIC_MAP:
+        router.add(topic, _on_relay_state, "relay_state")
+    for topic in VENT_ERROR_TOPIC_MAP:
+        if not filter_matches(BONEIO_INPUT_FILTER, topic):
+            router.add(topic, _on_vent_error, "vent_error")
+    return router
+
+def router_stats() -> dict:
+    return message_router.stats() if message_router is not None else {}
+
+def refresh_topic_maps() -> None:
+    """Po zmianie wietrzników/BoneIO: mapy tematów, router i subskrypcja nowych filtrów bez restartu."""
+    global VENT_ERROR_TOPIC_MAP, DEVICE_AVAIL_TOPIC_MAP, RELAY_STATE_TOPIC_MAP, message_router
+    VENT_ERROR_TOPIC_MAP = vent_error_topics()
+    DEVICE_AVAIL_TOPIC_MAP = device_availability_topics()
+    RELAY_STATE_TOPIC_MAP = relay_state_topics()
+    if message_router is None:
+        return  # brak połączenia odbiorczego – router zbuduje _handle_messages
+    subscribed = set(message_router.filters())
+    message_router = build_router()
+    added = [(t, 0) for t in message_router.filters() if t not in subscribed]
+    if added and _subscriber is not None:
+        client, loop = _subscriber
+        # wywołanie z wątku API/sterownika – SUBSCRIBE wysyła pętla połączenia
+        asyncio.run_coroutine_threadsafe(client.subscribe(added), loop)
 
 async def _handle_messages():
+    global message_router, _subscriber
     if Client is None:
         return
     async with AsyncExitStack() as stack:
@@ -68,45 +266,27 @@ async def _handle_messages():
                         username=settings.MQTT_USERNAME or None,
                         password=settings.MQTT_PASSWORD or None)
         await stack.enter_async_context(client)
-        # Subskrypcje
-        topics = list(TOPIC_MAP.keys()) + VENT_AVAIL_TOPICS + list(VENT_ERROR_TOPIC_MAP.keys())
-        for t in topics:
-            await client.subscribe(t)
-        # Pętla odbioru
-        async with client.unfiltered_messages() as messages:
-            async for msg in messages:
-                try:
-                    payload = msg.payload.decode()
-                    topic = msg.topic
-                    if topic in TOPIC_MAP:
-                        name = TOPIC_MAP[topic]
-                        val = 1.0 if payload in ("true","True","1") else float(payload)
-                        getattr(sensor_bus, name).add(val)
-                        if SessionLocal and SensorLog:
-                            # log do bazy (co przyjście), lekkie – można dodać filtr zmian
-                            with SessionLocal() as s:  # type: Session
-                                s.add(SensorLog(name=name, value=val))
-                                s.commit()
-                    elif topic in VENT_ERROR_TOPIC_MAP:
-                        vid = VENT_ERROR_TOPIC_MAP[topic]
-                        state = payload not in ("0", "false", "False", "OFF")
-                        from backend.app import controller
-                        if controller:
-                            controller.mark_error(vid, state)
-                    elif topic.startswith("farmcare/vents/") and topic.endswith("/available"):
-                        # aktualizacja dostępności wietrznika – zapisze to kontroler (event)
-                        pass
-                except Exception as e:
-                    print("MQTT parse error:", e)
+        # Subskrypcje – jeden SUBSCRIBE z filtrami zamiast tematu po temacie
+        message_router = build_router()
+        await client.subscribe([(t, 0) for t in message_router.filters()])
+        _subscriber = (client, asyncio.get_running_loop())
+        try:
+            # Pętla odbioru
+            async with client.unfiltered_messages() as messages:
+                async for msg in messages:
+                    message_router.dispatch(msg.topic, msg.payload)
+        finally:
+            _subscriber = None  # połączenie zamknięte – filtry subskrybuje następne połączenie
 
 async def mqtt_start():
     # uruchamiamy w tle
     asyncio.create_task(_handle_messages())
 
 # Publikacje sterujące do BONEIO
-async def mqtt_publish(topic: str, payload: str):
+async def mqtt_publish(topic: str, payload: str) -> bool:
+    """False, gdy polecenie nie wyszło do brokera (cień przekaźników nie może go zapamiętać)."""
     if Client is None:
-        return
+        return False
     try:
         async with Client(settings.MQTT_HOST, port=settings.MQTT_PORT,
                           username=settings.MQTT_USERNAME or None,
@@ -114,3 +294,5 @@ async def mqtt_publish(topic: str, payload: str):
             await c.publish(topic, payload, qos=1)
     except MqttError as e:
         print("MQTT publish error:", e)
+        return False
+    return True
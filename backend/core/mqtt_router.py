@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""Topic-trie dispatcher for incoming MQTT messages.
+
+Routes are MQTT filters (``+`` one level, trailing ``#`` any levels) bound to
+handlers ``handler(topic, payload, captures)``, where ``captures`` holds the
+levels matched by ``+`` and, for ``#``, the remaining suffix. Matches are
+cached per topic, so steady traffic costs one dict lookup per message.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[str, bytes, Tuple[str, ...]], None]
+
+
+class Route(NamedTuple):
+    name: str
+    pattern: str
+    handler: Handler
+
+
+class RouteStats:
+    """Per-handler counters: calls, failures and time spent."""
+
+    __slots__ = ("count", "errors", "total_s", "max_s")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_s * 1000.0, 3),
+            "avg_us": round(self.total_s / self.count * 1e6, 1) if self.count else 0.0,
+            "max_us": round(self.max_s * 1e6, 1),
+        }
+
+
+class _Node:
+    __slots__ = ("children", "routes")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _Node] = {}
+        self.routes: List[Tuple[int, Route]] = []
+
+
+def validate_filter(pattern: str) -> List[str]:
+    """Split a filter into levels; ``ValueError`` for misplaced wildcards."""
+    if not pattern:
+        raise ValueError("empty topic filter")
+    levels = pattern.split("/")
+    for index, level in enumerate(levels):
+        if "#" in level and (level != "#" or index != len(levels) - 1):
+            raise ValueError(f"'#' must be the whole last level: {pattern!r}")
+        if "+" in level and level != "+":
+            raise ValueError(f"'+' must be a whole level: {pattern!r}")
+    return levels
+
+
+def filter_matches(pattern: str, topic: str) -> bool:
+    """Whether ``topic`` (no wildcards) matches the filter ``pattern``."""
+    if pattern == topic:
+        return True
+    if topic.startswith("$") and pattern[:1] in ("+", "#"):
+        return False
+    parts = pattern.split("/")
+    levels = topic.split("/")
+    for index, part in enumerate(parts):
+        if part == "#":
+            return True
+        if index >= len(levels) or (part != "+" and part != levels[index]):
+            return False
+    return len(parts) == len(levels)
+
+
+class TopicRouter:
+    """Maps topics to handlers through a trie of filter levels."""
+
+    def __init__(self, cache_size: int = 4096) -> None:
+        self._root = _Node()
+        self._routes: List[Route] = []
+        self._stats: Dict[str, RouteStats] = {}
+        self._cache: Dict[str, Tuple[Tuple[Route, Tuple[str, ...]], ...]] = {}
+        self._cache_size = max(1, int(cache_size))
+        self.unmatched = 0
+
+    def add(self, pattern: str, handler: Handler, name: Optional[str] = None) -> Route:
+        levels = validate_filter(pattern)
+        route = Route(name or getattr(handler, "__name__", pattern), pattern, handler)
+        node = self._root
+        for level in levels:
+            node = node.children.setdefault(level, _Node())
+        node.routes.append((len(self._routes), route))
+        self._routes.append(route)
+        self._stats.setdefault(route.name, RouteStats())
+        self._cache.clear()
+        return route
+
+    @property
+    def routes(self) -> List[Route]:
+        return list(self._routes)
+
+    def filters(self) -> List[str]:
+        """Filters to subscribe: wildcard patterns plus exact topics they do not cover."""
+        patterns = list(dict.fromkeys(route.pattern for route in self._routes))
+        wildcards = [p for p in patterns if "+" in p or "#" in p]
+        return [
+            p for p in patterns
+            if p in wildcards or not any(filter_matches(w, p) for w in wildcards)
+        ]
+
+    def match(self, topic: str) -> Tuple[Tuple[Route, Tuple[str, ...]], ...]:
+        cached = self._cache.get(topic)
+        if cached is not None:
+            return cached
+        found = self._walk(topic.split("/"), topic.startswith("$"))
+        found.sort(key=lambda item: item[0])
+        result = tuple((route, captures) for _, route, captures in found)
+        if len(self._cache) >= self._cache_size:
+            self._cache.clear()
+        self._cache[topic] = result
+        return result
+
+    def _walk(self, levels: List[str], system: bool) -> List[Tuple[int, Route, Tuple[str, ...]]]:
+        found = []
+        stack = [(self._root, 0, ())]
+        while stack:
+            node, depth, captures = stack.pop()
+            # tematy $SYS/... nie pasują do filtrów zaczynających się od + lub #
+            wild = not (system and depth == 0)
+            hash_node = node.children.get("#") if wild else None
+            if hash_node is not None:
+                rest = "/".join(levels[depth:])
+                found.extend((seq, route, captures + (rest,)) for seq, route in hash_node.routes)
+            if depth == len(levels):
+                found.extend((seq, route, captures) for seq, route in node.routes)
+                continue
+            level = levels[depth]
+            child = node.children.get(level)
+            if child is not None:
+                stack.append((child, depth + 1, captures))
+            plus = node.children.get("+") if wild else None
+            if plus is not None:
+                stack.append((plus, depth + 1, captures + (level,)))
+        return found
+
+    def dispatch(self, topic: str, payload: bytes) -> int:
+        """Run every matching handler; returns how many ran. Handler errors are counted, not raised."""
+        matches = self.match(topic)
+        if not matches:
+            self.unmatched += 1
+            return 0
+        for route, captures in matches:
+            stats = self._stats[route.name]
+            started = time.perf_counter()
+            try:
+                route.handler(topic, payload, captures)
+            except Exception as exc:
+                stats.errors += 1
+                logger.warning("MQTT handler %s failed for %s: %s", route.name, topic, exc)
+            elapsed = time.perf_counter() - started
+            stats.count += 1
+            stats.total_s += elapsed
+            if elapsed > stats.max_s:
+                stats.max_s = elapsed
+        return len(matches)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "handlers": {name: stats.as_dict() for name, stats in self._stats.items()},
+            "unmatched": self.unmatched,
+            "routes": len(self._routes),
+            "filters": self.filters(),
+        }
+
+
+__all__ = [
+    "Handler",
+    "Route",
+    "RouteStats",
+    "TopicRouter",
+    "filter_matches",
+    "validate_filter",
+]
@@ -24,8 +24,12 @@ EVENT_CATEGORIES: Dict[str, str] = {
     "MANUAL_ACTION": "mode",
     "WIND_LOCK_ON": "wind",
     "WIND_LOCK_OFF": "wind",
+    "VENT_OFFLINE": "network",
+    "VENT_ONLINE": "network",
     "UPDATE_AVAILABLE": "updates",
     "UPDATE_APPLIED": "updates",
+    "UPDATE_INSTALLED": "updates",
+    "UPDATE_ROLLED_BACK": "updates",
     "UPDATE_FAILED": "updates",
     "UPDATE_UP_TO_DATE": "updates",
     "CO2_HIGH": "environment",
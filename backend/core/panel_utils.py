@@ -2,17 +2,30 @@
 """Utilities for building data structures consumed by installer panels."""
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-
-try:
-    import psutil  # type: ignore
-except Exception:  # pragma: no cover - psutil is optional at runtime
-    psutil = None
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
 from backend.core.config import CONTROL, NETWORK_INTERFACES, BONEIOS
-from backend.core.controller import Controller
+from backend.core.psychrometrics import metric_unit
 from backend.core.test_mode import get_test_state
 
+if TYPE_CHECKING:  # pragma: no cover - import only for annotations
+    from backend.core.controller import Controller
+
+_PSUTIL_UNSET = object()
+_psutil: Any = _PSUTIL_UNSET
+
+
+def _load_psutil() -> Any:
+    """Import psutil on first use; it is optional and slow to load on SD-card systems."""
+    global _psutil
+    if _psutil is _PSUTIL_UNSET:
+        try:
+            import psutil  # type: ignore
+        except Exception:  # pragma: no cover - psutil is optional at runtime
+            psutil = None
+        _psutil = psutil
+    return _psutil
+
 
 def build_sensor_overview(controller: Controller) -> Dict[str, Any]:
     env = controller.export_environment_snapshot()
@@ -29,6 +42,8 @@ def build_sensor_overview(controller: Controller) -> Dict[str, Any]:
             "unit": "deg",
             "source": env["sources"].get("wind_direction", "mqtt"),
         }
+    for name, value in env.get("derived", {}).items():
+        sensors[name] = {"value": value, "unit": metric_unit(name), "source": "derived"}
     return {
         "metrics": sensors,
         "loops": {
@@ -53,6 +68,7 @@ def build_boneio_status(controller: Controller) -> Dict[str, Any]:
                 "description": metadata.get("description"),
                 "vents": [],
                 "all_available": True,
+                "online": controller.device_online(vent.boneio_device),
             },
         )
         info["vents"].append({
@@ -103,6 +119,7 @@ def _network_status() -> List[Dict[str, Any]]:
         for role in ("lan", "wan")
     }
 
+    psutil = _load_psutil()
     if psutil is None:  # pragma: no cover - fallback when psutil is missing
         return [
             {
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""Decoders for sensor MQTT payloads: plain numbers and JSON documents.
+
+A JSON decoder extracts several readings from one message in a single
+parse – each field has a path (``"climate.temp"``, ``"values[0]"``) and an
+optional ``scale``/``offset`` – plus an optional timestamp taken from the
+payload (epoch seconds or milliseconds, or ISO 8601). orjson is used when
+installed, the standard library otherwise.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - opcjonalny szybki parser
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+_loads = orjson.loads if orjson is not None else json.loads
+_TRUE = ("true", "True", "1", "ON", "on")
+_FALSE = ("false", "False", "0", "OFF", "off")
+_PATH_TOKEN = re.compile(r"([^.\[\]]+)|\[(\d+)\]")
+# epoch w milisekundach od ~1973 wzwyż; mniejsze liczby to sekundy
+_EPOCH_MS_THRESHOLD = 1e11
+
+PathKey = Union[str, int]
+
+
+class FieldSpec(NamedTuple):
+    name: str
+    path: Tuple[PathKey, ...]
+    scale: float = 1.0
+    offset: float = 0.0
+
+
+def parse_path(path: str) -> Tuple[PathKey, ...]:
+    """``"a.b[2].c"`` -> ``("a", "b", 2, "c")``; ``ValueError`` for an empty or malformed path."""
+    text = str(path or "").strip()
+    if text.startswith("$"):
+        text = text[1:].lstrip(".")
+    keys: List[PathKey] = []
+    pos = 0
+    while pos < len(text):
+        if text[pos] == ".":
+            pos += 1
+            continue
+        match = _PATH_TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"invalid JSON path: {path!r}")
+        keys.append(match.group(1) if match.group(1) is not None else int(match.group(2)))
+        pos = match.end()
+    if not keys:
+        raise ValueError(f"empty JSON path: {path!r}")
+    return tuple(keys)
+
+
+def _lookup(doc: Any, path: Tuple[PathKey, ...]) -> Any:
+    for key in path:
+        if isinstance(key, int):
+            if not isinstance(doc, list) or key >= len(doc):
+                return None
+            doc = doc[key]
+        else:
+            if not isinstance(doc, dict):
+                return None
+            doc = doc.get(key)
+        if doc is None:
+            return None
+    return doc
+
+
+def to_number(value: Any) -> Optional[float]:
+    """Reading from a JSON value or text: numbers, booleans, numeric and ON/OFF strings."""
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text in _TRUE:
+            return 1.0
+        if text in _FALSE:
+            return 0.0
+        try:
+            return float(text)
+        except ValueError:
+            return None
+    return None
+
+
+def to_epoch(value: Any) -> Optional[float]:
+    """Payload timestamp -> epoch seconds (numbers in s or ms, ISO 8601 strings; naive = UTC)."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        number = float(value)
+        return number / 1000.0 if number > _EPOCH_MS_THRESHOLD else number
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return to_epoch(float(text))
+        except ValueError:
+            pass
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return None
+
+
+class PayloadDecoder:
+    """Turns one MQTT payload into ``[(sensor, value), ...]`` and an optional timestamp."""
+
+    __slots__ = ("fields", "timestamp_path", "fmt")
+
+    def __init__(self, fields: Iterable[FieldSpec], *, fmt: str = "json",
+                 timestamp_path: Optional[Tuple[PathKey, ...]] = None) -> None:
+        self.fields = tuple(fields)
+        self.fmt = fmt
+        self.timestamp_path = timestamp_path
+        if fmt not in ("json", "plain"):
+            raise ValueError(f"unknown payload format: {fmt!r}")
+        if fmt == "plain" and len(self.fields) != 1:
+            raise ValueError("plain payloads carry exactly one field")
+
+    @property
+    def names(self) -> List[str]:
+        return [spec.name for spec in self.fields]
+
+    def decode(self, payload: bytes) -> Tuple[List[Tuple[str, float]], Optional[float]]:
+        if self.fmt == "plain":
+            spec = self.fields[0]
+            value = to_number(payload.decode())
+            if value is None:
+                raise ValueError(f"not a number: {payload[:40]!r}")
+            return [(spec.name, value * spec.scale + spec.offset)], None
+        doc = _loads(payload)
+        values = []
+        for spec in self.fields:
+            value = to_number(_lookup(doc, spec.path))
+            if value is not None:
+                values.append((spec.name, value * spec.scale + spec.offset))
+        ts = to_epoch(_lookup(doc, self.timestamp_path)) if self.timestamp_path else None
+        return values, ts
+
+
+def _field_spec(name: str, raw: Union[str, Mapping[str, Any]]) -> FieldSpec:
+    if isinstance(raw, str):
+        return FieldSpec(name, parse_path(raw))
+    return FieldSpec(
+        name,
+        parse_path(raw.get("path") or raw.get("json_path") or name),
+        float(raw.get("scale", 1.0)),
+        float(raw.get("offset", 0.0)),
+    )
+
+
+def build_decoders(
+    sensors: Mapping[str, Any],
+    messages: Iterable[Mapping[str, Any]] = (),
+    known: Optional[Iterable[str]] = None,
+    include_plain: bool = False,
+) -> Dict[str, PayloadDecoder]:
+    """Topic -> decoder from ``sensors`` entries with ``json_path``/``scale`` and ``sensor_messages``.
+
+    Plain sensor topics without scaling are left to the fast path and are
+    not returned, unless ``include_plain`` asks for a plain decoder for them
+    too. Entries naming unknown sensors or with bad paths are skipped with a
+    warning.
+    """
+    allowed = set(known) if known is not None else None
+    decoders: Dict[str, PayloadDecoder] = {}
+
+    def usable(name: str, topic: str) -> bool:
+        if allowed is not None and name not in allowed:
+            logger.warning("Ignoring MQTT decoder for unknown sensor %s (%s)", name, topic)
+            return False
+        return True
+
+    for name, cfg in (sensors or {}).items():
+        if not isinstance(cfg, dict) or not cfg.get("topic"):
+            continue
+        plain = not any(key in cfg for key in ("json_path", "scale", "offset", "timestamp_path"))
+        if plain and not include_plain:
+            continue
+        topic = str(cfg["topic"])
+        if not usable(name, topic):
+            continue
+        try:
+            spec = _field_spec(name, cfg)
+            ts_path = parse_path(cfg["timestamp_path"]) if cfg.get("timestamp_path") else None
+            fmt = "json" if cfg.get("json_path") or ts_path else "plain"
+            decoders[topic] = PayloadDecoder([spec], fmt=fmt, timestamp_path=ts_path)
+        except (TypeError, ValueError) as exc:
+            logger.warning("Ignoring MQTT decoder for %s: %s", topic, exc)
+
+    for entry in messages or ():
+        if not isinstance(entry, dict) or not entry.get("topic") or not isinstance(entry.get("fields"), dict):
+            logger.warning("Ignoring sensor_messages entry without topic/fields: %r", entry)
+            continue
+        topic = str(entry["topic"])
+        try:
+            specs = [_field_spec(name, raw) for name, raw in entry["fields"].items() if usable(name, topic)]
+            ts_path = parse_path(entry["timestamp_path"]) if entry.get("timestamp_path") else None
+            if specs:
+                decoders[topic] = PayloadDecoder(specs, fmt=str(entry.get("format", "json")), timestamp_path=ts_path)
+        except (TypeError, ValueError, AttributeError) as exc:
+            logger.warning("Ignoring sensor_messages entry for %s: %s", topic, exc)
+    return decoders
+
+
+__all__ = [
+    "FieldSpec",
+    "PayloadDecoder",
+    "build_decoders",
+    "parse_path",
+    "to_epoch",
+    "to_number",
+]
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Psychrometric metrics derived from temperature, humidity and pressure.
+
+:func:`derive_metrics` turns one tick of merged sensor averages into dew
+point, vapour-pressure deficit (VPD), absolute humidity and specific
+enthalpy of the inside and outside air, plus the inside-minus-outside
+enthalpy difference. The controller computes them once per tick and caches
+them on the environment snapshot, so the API, WebSocket and control rules
+read the same numbers without recomputing them.
+
+Saturation vapour pressure uses the Magnus formula with the Alduchov &
+Eskridge (1996) coefficients (good to ~0.1 % between -40 and 50 °C);
+enthalpy is that of moist air per kg of dry air at the measured pressure
+(standard atmosphere when no barometer is configured).
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, Mapping, Optional
+
+STANDARD_PRESSURE_PA = 101325.0
+_MAGNUS_A = 0.61094  # kPa
+_MAGNUS_B = 17.625
+_MAGNUS_C = 243.04  # °C
+_WATER_VAPOUR_R = 461.5  # J/(kg·K)
+_EPSILON = 0.621945  # stosunek mas molowych woda/powietrze suche
+
+# (prefiks metryki, temperatura, wilgotność względna)
+SIDES = (("internal", "internal_temp", "internal_hum"), ("external", "external_temp", "external_hum"))
+METRICS = ("dew_point_c", "vpd_kpa", "abs_humidity_g_m3", "enthalpy_kj_kg")
+DERIVED_KEYS = tuple(f"{side}_{metric}" for side, _, _ in SIDES for metric in METRICS) + ("enthalpy_diff_kj_kg",)
+UNITS = {"dew_point_c": "degC", "vpd_kpa": "kPa", "abs_humidity_g_m3": "g/m3", "enthalpy_kj_kg": "kJ/kg"}
+
+
+def saturation_vapour_pressure_kpa(temp_c: float) -> float:
+    return _MAGNUS_A * math.exp(_MAGNUS_B * temp_c / (temp_c + _MAGNUS_C))
+
+
+def dew_point_c(temp_c: float, rh_pct: float) -> float:
+    gamma = math.log(max(rh_pct, 0.1) / 100.0) + _MAGNUS_B * temp_c / (temp_c + _MAGNUS_C)
+    return _MAGNUS_C * gamma / (_MAGNUS_B - gamma)
+
+
+def vpd_kpa(temp_c: float, rh_pct: float) -> float:
+    return saturation_vapour_pressure_kpa(temp_c) * (1.0 - rh_pct / 100.0)
+
+
+def absolute_humidity_g_m3(temp_c: float, rh_pct: float) -> float:
+    vapour_pa = saturation_vapour_pressure_kpa(temp_c) * rh_pct * 10.0
+    return vapour_pa / (_WATER_VAPOUR_R * (temp_c + 273.15)) * 1000.0
+
+
+def enthalpy_kj_kg(temp_c: float, rh_pct: float, pressure_pa: float = STANDARD_PRESSURE_PA) -> float:
+    """Specific enthalpy of moist air [kJ per kg of dry air]."""
+    vapour_kpa = saturation_vapour_pressure_kpa(temp_c) * rh_pct / 100.0
+    ratio = _EPSILON * vapour_kpa / max(pressure_pa / 1000.0 - vapour_kpa, 1e-3)
+    return 1.006 * temp_c + ratio * (2501.0 + 1.86 * temp_c)
+
+
+def pressure_pa(value: Optional[float]) -> float:
+    """Barometer reading in Pa; hPa and kPa readings (MQTT sensors) are recognised by magnitude."""
+    if value is None or value <= 0:
+        return STANDARD_PRESSURE_PA
+    if value < 200.0:  # kPa
+        return value * 1000.0
+    if value < 2000.0:  # hPa
+        return value * 100.0
+    return value
+
+
+def _number(value) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def derive_metrics(sensors: Mapping[str, Optional[float]]) -> Dict[str, Optional[float]]:
+    """All :data:`DERIVED_KEYS`; ``None`` where temperature or humidity is missing."""
+    pressure = pressure_pa(_number(sensors.get("external_pressure")))
+    derived: Dict[str, Optional[float]] = dict.fromkeys(DERIVED_KEYS)
+    for side, temp_key, hum_key in SIDES:
+        temp = _number(sensors.get(temp_key))
+        rh = _number(sensors.get(hum_key))
+        if temp is None or rh is None:
+            continue
+        rh = max(0.0, min(100.0, rh))
+        derived[f"{side}_dew_point_c"] = round(dew_point_c(temp, rh), 2)
+        derived[f"{side}_vpd_kpa"] = round(vpd_kpa(temp, rh), 3)
+        derived[f"{side}_abs_humidity_g_m3"] = round(absolute_humidity_g_m3(temp, rh), 2)
+        derived[f"{side}_enthalpy_kj_kg"] = round(enthalpy_kj_kg(temp, rh, pressure), 2)
+    inside, outside = derived["internal_enthalpy_kj_kg"], derived["external_enthalpy_kj_kg"]
+    if inside is not None and outside is not None:
+        derived["enthalpy_diff_kj_kg"] = round(inside - outside, 2)
+    return derived
+
+
+def metric_unit(name: str) -> Optional[str]:
+    if name == "enthalpy_diff_kj_kg":
+        return "kJ/kg"
+    for metric, unit in UNITS.items():
+        if name.endswith(metric):
+            return unit
+    return None
+
+
+__all__ = [
+    "DERIVED_KEYS",
+    "absolute_humidity_g_m3",
+    "derive_metrics",
+    "dew_point_c",
+    "enthalpy_kj_kg",
+    "metric_unit",
+    "pressure_pa",
+    "saturation_vapour_pressure_kpa",
+    "vpd_kpa",
+]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Incremental application of installer vent/group/plan changes.
+
+Saving the vents in the installer used to rebuild every :class:`Vent`
+and reload all states from the database, which dropped the position and
+``_moving`` flag of vents in motion and the wind-lock state of every
+group. The helpers below let the controller diff the new configuration
+against the live objects:
+
+* :func:`vent_settings` reduces a vent spec to the attributes a live vent
+  can take over in place, :func:`vent_changes` lists the ones that differ,
+* :func:`reuse_dispatchers` keeps BoneIO dispatchers whose settings did not
+  change (their counters and motor semaphores stay),
+* :class:`Topology` carries the complete new set of vents, groups and
+  stages; the controller swaps it in between two ticks.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from backend.core.boneio_dispatch import BoneIODispatcher, build_dispatchers, channel_from_topic
+
+# zmiana okablowania w trakcie ruchu zostawiłaby włączony przekaźnik – czeka na koniec ruchu
+WIRING_ATTRS = frozenset(("boneio_device", "up_topic", "down_topic", "err_input_topic", "channel", "_dispatcher"))
+# pola grupy liczone w ticku (blokada wiatrowa), przenoszone do nowej wersji grupy
+GROUP_RUNTIME = ("target_override", "force_close", "wind_locked", "wind_last_state")
+
+
+def vent_settings(spec: Mapping[str, Any], defaults: Mapping[str, Any]) -> Dict[str, Any]:
+    """Vent attribute -> value for one ``vents`` entry (defaults from ``vent_defaults``)."""
+    topics = spec["topics"]
+    return {
+        "name": spec["name"],
+        "travel_time": spec["travel_time_s"],
+        "boneio_device": spec.get("boneio_device", "boneio_main"),
+        "up_topic": topics["up"],
+        "down_topic": topics["down"],
+        "err_input_topic": topics.get("error_in"),
+        "reverse_pause_s": spec.get("reverse_pause_s", defaults.get("reverse_pause_s", 1.0)),
+        "min_move_s": spec.get("min_move_s", defaults.get("min_move_s", 0.5)),
+        "calibration_buffer_s": spec.get("calibration_buffer_s", defaults.get("calibration_buffer_s", 0.5)),
+        "ignore_delta_percent": spec.get("ignore_delta_percent", defaults.get("ignore_delta_percent", 0.5)),
+        "channel": spec.get("channel") or channel_from_topic(topics["up"]),
+    }
+
+
+def vent_changes(vent: Any, settings: Mapping[str, Any]) -> Dict[str, Any]:
+    """Attributes of a live vent that differ from ``settings``."""
+    return {key: value for key, value in settings.items() if getattr(vent, key, None) != value}
+
+
+def _dispatcher_key(dispatcher: BoneIODispatcher) -> tuple:
+    return (dispatcher.command_topic, dispatcher.batch_window_s, dispatcher.max_concurrent_motors)
+
+
+def reuse_dispatchers(
+    current: Mapping[str, BoneIODispatcher], devices: Iterable[Mapping[str, object]], publisher=None
+) -> Dict[str, BoneIODispatcher]:
+    """Dispatchers for ``devices``; unchanged devices keep their existing dispatcher."""
+    result: Dict[str, BoneIODispatcher] = {}
+    for dev_id, fresh in build_dispatchers(devices, publisher=publisher).items():
+        old = current.get(dev_id)
+        result[dev_id] = old if old is not None and _dispatcher_key(old) == _dispatcher_key(fresh) else fresh
+    return result
+
+
+@dataclass
+class Topology:
+    """Vents, groups and stages applied together between two ticks."""
+
+    vents: Dict[int, Any]
+    groups: "OrderedDict[str, dict]"
+    vent_to_groups: Dict[int, List[str]]
+    plan: List[dict]
+    close_strategy: str
+    dispatchers: Dict[str, BoneIODispatcher]
+    group_specs: List[dict]
+    stage_specs: List[dict]
+    # vent id -> atrybuty do ustawienia na żywym obiekcie; None = wietrzniki bez zmian
+    vent_updates: Optional[Dict[int, Dict[str, Any]]] = None
+    added: List[Any] = field(default_factory=list)
+    removed: List[Any] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, List[int]]:
+        return {
+            "added": sorted(v.id for v in self.added),
+            "removed": sorted(v.id for v in self.removed),
+            "updated": sorted(self.vent_updates or ()),
+        }
+
+
+def carry_group_state(previous: Optional[Mapping[str, dict]], groups: Mapping[str, dict]) -> None:
+    """Copy the runtime fields of groups that were replaced by a new version."""
+    if not previous:
+        return
+    for gid, group in groups.items():
+        old = previous.get(gid)
+        if old is None or old is group:
+            continue
+        for key in GROUP_RUNTIME:
+            group[key] = old.get(key, group.get(key))
+
+
+__all__ = [
+    "GROUP_RUNTIME",
+    "Topology",
+    "WIRING_ATTRS",
+    "carry_group_state",
+    "reuse_dispatchers",
+    "vent_changes",
+    "vent_settings",
+]
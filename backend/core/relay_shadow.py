@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Shadow of the last commanded state of every relay topic.
+
+Actuators ask the shadow which of their ``(topic, payload)`` publishes are
+real transitions and skip the rest – an OFF to a relay that is already off
+costs a full MQTT round trip on the BoneIO. Entries older than
+``refresh_s`` count as unknown, so a lost message is corrected by the next
+command at the latest. Retained relay state topics published by ESPHome can
+confirm (or correct) the shadow through :meth:`RelayShadow.confirm`.
+
+Only publishes that reached the broker may be recorded with
+:meth:`RelayShadow.commanded`; a failed one is forgotten instead, so the
+next stop still switches off a relay whose OFF never went out.
+
+The shadow is shared by the vents (control loop) and the heating valve
+(actuator thread), so every method holds a lock.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+Message = Tuple[str, str]
+
+
+class _Entry(NamedTuple):
+    payload: str
+    at: float
+    confirmed: bool
+
+
+class RelayShadow:
+    """Topic -> last payload published (or reported by the device)."""
+
+    def __init__(self, refresh_s: float = 300.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.refresh_s = max(0.0, float(refresh_s or 0.0))
+        self._clock = clock
+        self._state: Dict[str, _Entry] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.suppressed = 0
+        self.refreshed = 0
+        self.mismatches = 0
+
+    def state(self, topic: str) -> Optional[str]:
+        with self._lock:
+            entry = self._state.get(topic)
+        return entry.payload if entry is not None else None
+
+    def pending(self, messages: Iterable[Message]) -> List[Message]:
+        """Messages that change (or refresh) a relay; the rest are counted as suppressed."""
+        now = self._clock()
+        result = []
+        batch: Dict[str, str] = {}  # temat powtórzony w jednej sekwencji porównujemy z jej wcześniejszym stanem
+        with self._lock:
+            for topic, payload in messages:
+                if topic in batch:
+                    if batch[topic] != payload:
+                        batch[topic] = payload
+                        result.append((topic, payload))
+                    else:
+                        self.suppressed += 1
+                    continue
+                batch[topic] = payload
+                entry = self._state.get(topic)
+                if entry is None or entry.payload != payload:
+                    result.append((topic, payload))
+                elif self.refresh_s > 0 and now - entry.at >= self.refresh_s:
+                    self.refreshed += 1
+                    result.append((topic, payload))
+                else:
+                    self.suppressed += 1
+        return result
+
+    def commanded(self, messages: Iterable[Message]) -> None:
+        now = self._clock()
+        with self._lock:
+            for topic, payload in messages:
+                self._state[topic] = _Entry(payload, now, False)
+                self.published += 1
+
+    def confirm(self, topic: str, payload: str) -> bool:
+        """State reported by the device; True when it differs from what was commanded."""
+        now = self._clock()
+        with self._lock:
+            entry = self._state.get(topic)
+            differs = entry is not None and entry.payload != payload
+            if differs:
+                self.mismatches += 1
+            self._state[topic] = _Entry(payload, now, True)
+        return differs
+
+    def forget(self, topics: Optional[Iterable[str]] = None) -> None:
+        """Drop entries (all without ``topics``) – e.g. after the device reconnects or reboots."""
+        with self._lock:
+            if topics is None:
+                self._state.clear()
+                return
+            for topic in topics:
+                self._state.pop(topic, None)
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            entries = list(self._state.values())
+            counters = (self.published, self.suppressed, self.refreshed, self.mismatches)
+        return {
+            "relays": len(entries),
+            "confirmed": sum(1 for entry in entries if entry.confirmed),
+            "published": counters[0],
+            "suppressed": counters[1],
+            "refreshed": counters[2],
+            "mismatches": counters[3],
+            "refresh_s": self.refresh_s,
+        }
+
+__all__ = ["Message", "RelayShadow"]
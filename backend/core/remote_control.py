@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Controller state across processes (``process_layout.mode: split``).
+
+The control process builds one snapshot of every zone (mode, vents, sensor
+averages, control params, groups, plan, heating, site config and
+diagnostics) and :class:`SnapshotPublisher` writes it to shared memory on a
+fixed period. In an API worker :class:`RemoteController` and
+:class:`RemoteZones` stand in for the controller objects the routers use:
+reads come from the snapshot, commands go over the command queue and are
+executed by :func:`dispatch_command` in the control process. Only the
+control process changes the config globals (``VENTS``, ``BONEIOS``,
+``CONTROL``, ...); a worker keeps its import-time copies, so installer
+reads in a worker take the config from the snapshot as well.
+
+A command answers with the zone state right after it ran, so the response
+(e.g. the new mode or plan) does not wait for the next publish. The
+in-memory sensor history (``/api/history/recent``) stays in the control
+process; an API worker answers that route with 501.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from backend.core.shared_state import CommandClient, SnapshotReader, SnapshotWriter
+from backend.core.tick_scheduler import TickScheduler
+from backend.core.zones import PRIMARY_ZONE
+
+if TYPE_CHECKING:  # pragma: no cover - tylko dla typów
+    from backend.core.zones import ZoneRegistry
+
+logger = logging.getLogger("farmcare.remote_control")
+
+# polecenia przyjmowane z kolejki (metody kontrolera strefy); reszta jest odrzucana
+COMMANDS = frozenset({"set_mode", "manual_set_all", "manual_set_group", "manual_set_one", "calibrate_all", "update_config"})
+REGISTRY_COMMANDS = frozenset({"apply_site_config"})
+
+
+class SnapshotUnavailable(RuntimeError):
+    """No fresh snapshot from the control process (not started, or stalled)."""
+
+
+def zone_snapshot(controller) -> Dict[str, Any]:
+    zone = controller.zone
+    devices = {getattr(v, "boneio_device", None) for v in list(controller.vents.values())} - {None}
+    return {
+        "at": time.time(),
+        "id": zone.id,
+        "name": zone.name,
+        "primary": zone.primary,
+        "mode": controller.mode,
+        "vents": [
+            {
+                "id": v.id,
+                "name": v.name,
+                "position": v.position,
+                "available": v.available,
+                "user_target": v.user_target,
+                "boneio_device": getattr(v, "boneio_device", None),
+            }
+            for v in list(controller.vents.values())
+        ],
+        "sensors": zone.sensors.averages(),
+        "control": dict(zone.control),
+        "groups": controller.export_groups(),
+        "plan": controller.export_plan(),
+        "heating": controller.export_heating(),
+        "site": controller.export_site_config(),
+        "environment": controller.export_environment_snapshot(),
+        "wind_lock": controller.wind_lock_stats(),
+        "loops": controller.loop_stats(),
+        "rs485": controller.export_rs485_status(),
+        "boneio": {
+            "devices": controller.dispatch_stats(),
+            "relays": controller.relay_stats(),
+            "online": {device: controller.device_online(device) for device in devices},
+        },
+    }
+
+
+def build_snapshot(registry: "ZoneRegistry", scheduler=None) -> Dict[str, Any]:
+    return {
+        "zones": {controller.zone.id: zone_snapshot(controller) for controller in registry.controllers()},
+        "scheduler": scheduler.loop_stats() if scheduler is not None else None,
+    }
+
+
+def dispatch_command(registry: "ZoneRegistry", zone: Optional[str], name: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a queued command in the control process; answers with the result and fresh zone state."""
+    if name in REGISTRY_COMMANDS:
+        getattr(registry, name)(**kwargs)
+        return {"result": None, "zone": None}
+    if name not in COMMANDS:
+        raise ValueError(f"Unknown command: {name}")
+    controller = registry.get(zone)
+    if controller is None:
+        raise ValueError(f"Unknown zone: {zone}")
+    result = getattr(controller, name)(**kwargs)
+    return {"result": result, "zone": zone_snapshot(controller)}
+
+
+class SnapshotPublisher:
+    """Control-process thread writing the snapshot every ``interval_s``."""
+
+    def __init__(self, writer: SnapshotWriter, source: Callable[[], Dict[str, Any]], interval_s: float = 0.5) -> None:
+        self.writer = writer
+        self._source = source
+        self.interval_s = max(0.05, float(interval_s))
+        self._ticker = TickScheduler("snapshot")
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self.errors = 0
+
+    def publish(self) -> bool:
+        try:
+            payload = self._source()
+        except RuntimeError as exc:  # np. słownik zmieniony przez wątek sterowania w trakcie kopiowania
+            self.errors += 1
+            logger.debug("Snapshot skipped: %s", exc)
+            return False
+        payload["publisher"] = {**self.writer.stats(), "errors": self.errors, "loop": self._ticker.stats()}
+        return self.writer.write(payload)
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="snapshot-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s * 2 + 1.0)  # przed zamknięciem regionu
+            self._thread = None
+
+    def _loop(self) -> None:
+        while self._running:
+            self.publish()
+            self._ticker.wait(self.interval_s)
+
+
+class RemoteState:
+    """Snapshot of the API worker; stale when the control process stops publishing."""
+
+    def __init__(self, reader: SnapshotReader, stale_after_s: float = 10.0) -> None:
+        self.reader = reader
+        self.stale_after_s = float(stale_after_s)
+
+    def current(self) -> Dict[str, Any]:
+        snapshot = self.reader.read()
+        age = self.reader.age_s()
+        if snapshot is not None and age is not None and age > self.stale_after_s:
+            self.reader.close()  # plik mógł zostać utworzony od nowa po restarcie – mapujemy ponownie
+            snapshot = self.reader.read()
+            age = self.reader.age_s()
+        if snapshot is None or age is None or age > self.stale_after_s:
+            raise SnapshotUnavailable("Control process snapshot unavailable")
+        return snapshot
+
+
+class _SnapshotSensors:
+    def __init__(self, values: Dict[str, Optional[float]]) -> None:
+        self._values = values
+
+    def averages(self) -> Dict[str, Optional[float]]:
+        return dict(self._values)
+
+
+class RemoteController:
+    """Controller of one zone as seen from an API worker."""
+
+    history = None  # bufory historii czujników są w procesie sterowania
+
+    def __init__(self, state: RemoteState, client: CommandClient, zone_id: str = PRIMARY_ZONE) -> None:
+        self._state = state
+        self._client = client
+        self.zone_id = zone_id
+        self._fresh: Optional[Dict[str, Any]] = None  # stan strefy z odpowiedzi na ostatnie polecenie
+        self._lock = threading.Lock()
+
+    def _data(self) -> Dict[str, Any]:
+        data = self._state.current()["zones"].get(self.zone_id)
+        if data is None:
+            raise SnapshotUnavailable(f"Zone {self.zone_id} missing in snapshot")
+        fresh = self._fresh
+        if fresh is not None and fresh["at"] >= data["at"]:
+            return fresh
+        return data
+
+    def _command(self, name: str, **kwargs) -> Any:
+        reply = self._client.call(self.zone_id, name, **kwargs)
+        if reply.get("zone") is not None:
+            with self._lock:
+                self._fresh = reply["zone"]
+        return reply.get("result")
+
+    # odczyty ze snapshotu
+    @property
+    def mode(self) -> str:
+        return self._data()["mode"]
+
+    @property
+    def vents(self) -> Dict[int, SimpleNamespace]:
+        return {item["id"]: SimpleNamespace(**item) for item in self._data()["vents"]}
+
+    @property
+    def zone(self) -> SimpleNamespace:
+        data = self._data()
+        return SimpleNamespace(id=data["id"], name=data["name"], primary=data["primary"],
+                               control=data["control"], sensors=_SnapshotSensors(data["sensors"]))
+
+    def export_groups(self) -> List[dict]:
+        return self._data()["groups"]
+
+    def export_plan(self) -> dict:
+        return self._data()["plan"]
+
+    def export_heating(self) -> Optional[dict]:
+        return self._data()["heating"]
+
+    def export_site_config(self) -> dict:
+        return self._data()["site"]
+
+    def export_environment_snapshot(self) -> dict:
+        return self._data()["environment"]
+
+    def wind_lock_stats(self) -> Dict[str, object]:
+        return self._data()["wind_lock"]
+
+    def loop_stats(self) -> Dict[str, object]:
+        return self._data()["loops"]
+
+    def dispatch_stats(self) -> Dict[str, dict]:
+        return self._data()["boneio"]["devices"]
+
+    def relay_stats(self) -> Dict[str, object]:
+        return self._data()["boneio"]["relays"]
+
+    def export_rs485_status(self) -> List[dict]:
+        return self._data()["rs485"]
+
+    def device_online(self, device_id: str) -> bool:
+        return self._data()["boneio"]["online"].get(device_id, True)
+
+    # polecenia przez kolejkę
+    def set_mode(self, mode: str) -> None:
+        self._command("set_mode", mode=mode)
+
+    def manual_set_all(self, pct: float):
+        return self._command("manual_set_all", pct=pct)
+
+    def manual_set_group(self, group_id: str, pct: float) -> bool:
+        return self._command("manual_set_group", group_id=group_id, pct=pct)
+
+    def manual_set_one(self, vent_id: int, pct: float):
+        return self._command("manual_set_one", vent_id=vent_id, pct=pct)
+
+    def calibrate_all(self) -> None:
+        self._command("calibrate_all")
+
+    def update_config(self, **kwargs) -> None:
+        self._command("update_config", **kwargs)
+
+
+class RemoteZones:
+    """Zone registry as seen from an API worker."""
+
+    def __init__(self, state: RemoteState, client: CommandClient) -> None:
+        self._state = state
+        self._client = client
+        self._controllers: Dict[str, RemoteController] = {}
+        self.primary = self._controller(PRIMARY_ZONE)
+
+    def _controller(self, zone_id: str) -> RemoteController:
+        if zone_id not in self._controllers:
+            self._controllers[zone_id] = RemoteController(self._state, self._client, zone_id)
+        return self._controllers[zone_id]
+
+    def _zones(self) -> Dict[str, dict]:
+        try:
+            return self._state.current()["zones"]
+        except SnapshotUnavailable:
+            return {}
+
+    def ids(self) -> List[str]:
+        return list(self._zones()) or [PRIMARY_ZONE]
+
+    def get(self, zone_id: Optional[str]) -> Optional[RemoteController]:
+        zone_id = zone_id or PRIMARY_ZONE
+        if zone_id != PRIMARY_ZONE and zone_id not in self._zones():
+            return None
+        return self._controller(zone_id)
+
+    @property
+    def secondary(self) -> List[RemoteController]:
+        return [self._controller(zone_id) for zone_id in self._zones() if zone_id != PRIMARY_ZONE]
+
+    def describe(self) -> List[dict]:
+        return [
+            {"id": zone_id, "name": data["name"], "mode": data["mode"], "vents": sorted(v["id"] for v in data["vents"])}
+            for zone_id, data in self._zones().items()
+        ]
+
+    def apply_site_config(self, **kwargs) -> None:
+        self._client.call(None, "apply_site_config", **kwargs)
+
+
+class RemoteScheduler:
+    def __init__(self, state: RemoteState) -> None:
+        self._state = state
+
+    def loop_stats(self) -> Optional[dict]:
+        return self._state.current().get("scheduler")
+
+
+__all__ = [
+    "COMMANDS",
+    "RemoteController",
+    "RemoteScheduler",
+    "RemoteState",
+    "RemoteZones",
+    "SnapshotPublisher",
+    "SnapshotUnavailable",
+    "build_snapshot",
+    "dispatch_command",
+    "zone_snapshot",
+]
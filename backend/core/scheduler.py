@@ -3,12 +3,24 @@
 import threading, time
 from datetime import datetime
 from backend.core.config import CONTROL
+from backend.core.tick_scheduler import TickScheduler
 
 class Scheduler:
-    def __init__(self, controller):
+    def __init__(self, controller, clock=None, zones=()):
         self.controller = controller
+        # kontrolery dodatkowych stref: własne godziny z control strefy, ten sam wątek
+        self.zones = list(zones)
+        self._clock = clock  # None -> czas systemowy; symulator podaje zegar wirtualny
         self._running = False
         self._t = None
+        self._prev_flush_day = {}
+        self._prev_cal_day = {}
+        # stały okres z terminów monotonicznych zamiast sleep() po pracy
+        self._ticker = TickScheduler(
+            "scheduler",
+            clock=clock.monotonic if clock else time.monotonic,
+            sleep=clock.sleep if clock else None,
+        )
 
     def start(self):
         self._running = True
@@ -18,19 +30,28 @@ class Scheduler:
     def stop(self):
         self._running = False
 
+    def run_pending(self, now: datetime) -> None:
+        self._run_zone(self.controller, CONTROL, now)
+        for controller in self.zones:
+            self._run_zone(controller, controller.zone.control, now)
+
+    def _run_zone(self, controller, control: dict, now: datetime) -> None:
+        key = id(controller)
+        # Przewietrzanie
+        if now.hour == control.get("flush_hour", 12) and now.minute == 0:
+            if self._prev_flush_day.get(key) != now.date():
+                controller.manual_set_all(100.0)
+                self._prev_flush_day[key] = now.date()
+        # Kalibracja (zamykanie do 0%)
+        if now.hour == control.get("calibration_hour", 0) and now.minute == 0:
+            if self._prev_cal_day.get(key) != now.date():
+                controller.calibrate_all()
+                self._prev_cal_day[key] = now.date()
+
+    def loop_stats(self) -> dict:
+        return self._ticker.stats()
+
     def _loop(self):
-        prev_flush_day = None
-        prev_cal_day = None
         while self._running:
-            now = datetime.now()
-            # Przewietrzanie
-            if now.hour == CONTROL.get("flush_hour", 12) and now.minute == 0:
-                if prev_flush_day != now.date():
-                    self.controller.manual_set_all(100.0)
-                    prev_flush_day = now.date()
-            # Kalibracja (zamykanie do 0%)
-            if now.hour == CONTROL.get("calibration_hour", 0) and now.minute == 0:
-                if prev_cal_day != now.date():
-                    self.controller.calibrate_all()
-                    prev_cal_day = now.date()
-            time.sleep(CONTROL.get("scheduler_loop_s", 1.0))
+            self.run_pending(self._clock.now() if self._clock else datetime.now())
+            self._ticker.wait(CONTROL.get("scheduler_loop_s", 1.0))
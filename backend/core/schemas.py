@@ -62,5 +62,6 @@ class StateDTO(BaseModel):
     config: Dict[str, Any]
     groups: List[VentGroupDTO]
     heating: Optional[HeatingConfigDTO] = None
+    derived: Dict[str, Optional[float]] = {}
 
 
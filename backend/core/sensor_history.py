@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Fixed-memory columnar history of sensor readings (the last N hours).
+
+:class:`SensorRing` keeps two preallocated columns – timestamps (epoch)
+and values, both float64 – in a mirrored ring: every sample is written
+at slot ``i`` and ``i + capacity``, so the newest ``n`` samples are always
+one contiguous slice. Windows are therefore views, not copies: statistics
+run vectorised over them and :func:`dumps` serialises them straight from the
+buffer (orjson ``OPT_SERIALIZE_NUMPY``). Samples closer than
+``resolution_s`` are merged into one slot (mean; the last value for circular
+quantities such as wind direction), which bounds memory whatever the
+sampling rate. The newest slot (the open bucket) is still being merged into,
+so windows and statistics cover closed buckets only.
+
+NumPy is optional: without it the columns are :mod:`array` buffers, windows
+are memoryviews and the statistics run in Python with the same results.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import math
+from array import array
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - opcjonalne obliczenia wektorowe
+    np = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - opcjonalny szybki serializer
+    orjson = None
+
+HAVE_NUMPY = np is not None
+DEFAULT_PERCENTILES: Tuple[float, ...] = (10.0, 50.0, 90.0)
+# wielkości kątowe: średnia arytmetyczna 350° i 10° to 180°, więc w slocie zostaje ostatni odczyt
+CIRCULAR = frozenset({"wind_direction"})
+
+
+def _percentile(ordered: Sequence[float], pct: float) -> float:
+    # interpolacja liniowa jak domyślnie w numpy.percentile
+    pos = (len(ordered) - 1) * pct / 100.0
+    low = math.floor(pos)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (pos - low)
+
+
+class SensorRing:
+    """Ring of ``(timestamp, value)`` samples of one sensor.
+
+    Windows hold up to ``capacity`` closed buckets. Two more slots are
+    allocated – the open bucket, merged into in place, and a spare for the
+    next one – so a window handed out to a reader is not written while fewer
+    than ``capacity`` further buckets have closed (the control loop writes,
+    API threads read without a lock).
+    """
+
+    def __init__(self, capacity: int, resolution_s: float = 0.0, circular: bool = False) -> None:
+        self.capacity = max(2, int(capacity))
+        self.resolution_s = max(0.0, float(resolution_s))
+        self.circular = bool(circular)
+        self._slots = self.capacity + 2
+        if HAVE_NUMPY:
+            self._ts = np.zeros(2 * self._slots, dtype=np.float64)
+            self._values = np.zeros(2 * self._slots, dtype=np.float64)
+        else:
+            self._ts = array("d", bytes(16 * self._slots))
+            self._values = array("d", bytes(16 * self._slots))
+        self._head = -1  # slot ostatniej próbki
+        self._count = 0
+        self._bucket_n = 0  # ile odczytów uśredniono w ostatnim slocie
+        self.samples = 0
+
+    def __len__(self) -> int:
+        """Closed buckets available to :meth:`window`."""
+        return min(max(0, self._count - 1), self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return self._ts.itemsize * len(self._ts) + self._values.itemsize * len(self._values)
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        return float(self._ts[self._head]) if self._count else None
+
+    def _store(self, slot: int, ts: float, value: float) -> None:
+        self._ts[slot] = ts
+        self._values[slot] = value
+        self._ts[slot + self._slots] = ts
+        self._values[slot + self._slots] = value
+
+    def append(self, value: float, ts: float) -> None:
+        value = float(value)
+        ts = float(ts)
+        self.samples += 1
+        if self._count:
+            last = float(self._ts[self._head])
+            # ten sam przedział rozdzielczości (albo zegar cofnięty) -> scal z ostatnim slotem
+            if ts <= last or (self.resolution_s and ts // self.resolution_s == last // self.resolution_s):
+                if not self.circular:
+                    self._bucket_n += 1
+                    value = float(self._values[self._head]) + (value - float(self._values[self._head])) / self._bucket_n
+                self._store(self._head, max(ts, last), value)
+                return
+        self._head = (self._head + 1) % self._slots
+        self._store(self._head, ts, value)
+        self._count += 1
+        self._bucket_n = 1
+
+    def window(self, seconds: Optional[float] = None, now: Optional[float] = None) -> Tuple[Any, Any]:
+        """``(timestamps, values)`` of the last ``seconds`` (everything kept when ``None``), oldest first.
+
+        Closed buckets only; ``seconds`` counts back from the newest sample.
+        Views into the ring (ndarray slices or memoryviews), valid until
+        ``capacity`` further buckets close.
+        """
+        end = self._head + self._slots if self._count else 0  # bez otwartego slotu (głowy)
+        start = end - len(self)
+        if seconds is not None and self._count:
+            since = (self.last_ts if now is None else float(now)) - float(seconds)
+            if HAVE_NUMPY:
+                start += int(np.searchsorted(self._ts[start:end], since, side="left"))
+            else:
+                start = bisect.bisect_left(self._ts, since, start, end)
+        if HAVE_NUMPY:
+            return self._ts[start:end], self._values[start:end]
+        return memoryview(self._ts)[start:end], memoryview(self._values)[start:end]
+
+    def stats(
+        self,
+        seconds: Optional[float] = None,
+        now: Optional[float] = None,
+        percentiles: Iterable[float] = DEFAULT_PERCENTILES,
+    ) -> Optional[Dict[str, float]]:
+        """Mean, min/max, percentiles and least-squares slope [units/h] of a window; ``None`` when empty."""
+        ts, values = self.window(seconds, now)
+        n = len(values)
+        if not n:
+            return None
+        pcts = tuple(percentiles)
+        if HAVE_NUMPY:
+            result = {"count": n, "mean": float(values.mean()), "min": float(values.min()), "max": float(values.max())}
+            for pct, value in zip(pcts, np.percentile(values, pcts) if pcts else ()):
+                result[f"p{pct:g}"] = float(value)
+            t = ts - ts.mean()
+            denom = float(np.dot(t, t))
+            slope = float(np.dot(t, values - result["mean"])) / denom if denom > 0 else None
+        else:
+            mean = math.fsum(values) / n
+            result = {"count": n, "mean": mean, "min": min(values), "max": max(values)}
+            ordered = sorted(values)
+            for pct in pcts:
+                result[f"p{pct:g}"] = _percentile(ordered, pct)
+            t_mean = math.fsum(ts) / n
+            denom = math.fsum((t - t_mean) ** 2 for t in ts)
+            slope = math.fsum((t - t_mean) * (v - mean) for t, v in zip(ts, values)) / denom if denom > 0 else None
+        result["slope_per_h"] = slope * 3600.0 if slope is not None else None
+        result["from_ts"] = float(ts[0])
+        result["to_ts"] = float(ts[n - 1])
+        return result
+
+
+class SensorHistory:
+    """One :class:`SensorRing` per sensor name, sized for ``hours`` at ``resolution_s``."""
+
+    def __init__(self, hours: float = 6.0, resolution_s: float = 10.0, circular: Iterable[str] = CIRCULAR) -> None:
+        self.hours = max(0.01, float(hours))
+        self.resolution_s = max(0.1, float(resolution_s))
+        self.capacity = int(math.ceil(self.hours * 3600.0 / self.resolution_s)) + 1
+        self._circular = frozenset(circular)
+        self._rings: Dict[str, SensorRing] = {}
+
+    def ring(self, name: str) -> SensorRing:
+        ring = self._rings.get(name)
+        if ring is None:
+            ring = SensorRing(self.capacity, self.resolution_s, circular=name in self._circular)
+            self._rings[name] = ring
+        return ring
+
+    def get(self, name: str) -> Optional[SensorRing]:
+        return self._rings.get(name)
+
+    def names(self) -> list:
+        return sorted(self._rings)
+
+    def record(self, readings: Mapping[str, Optional[float]], ts: float) -> None:
+        """Append one reading per sensor (``None`` and non-numeric values are skipped)."""
+        for name, value in readings.items():
+            if value is None or isinstance(value, bool):
+                continue
+            try:
+                self.ring(name).append(value, ts)
+            except (TypeError, ValueError):
+                continue
+
+    def series(self, names: Optional[Iterable[str]] = None, seconds: Optional[float] = None,
+               now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Per sensor: ``ts``/``values`` views and window statistics, ready for :func:`dumps`."""
+        selected = self.names() if names is None else [name for name in names if name in self._rings]
+        result = {}
+        for name in selected:
+            ring = self._rings[name]
+            ts, values = ring.window(seconds, now)
+            result[name] = {"ts": ts, "values": values, "stats": ring.stats(seconds, now)}
+        return result
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            "backend": "numpy" if HAVE_NUMPY else "array",
+            "hours": self.hours,
+            "resolution_s": self.resolution_s,
+            "capacity": self.capacity,
+            "sensors": {name: len(ring) for name, ring in sorted(self._rings.items())},
+            "bytes": sum(ring.nbytes for ring in self._rings.values()),
+        }
+
+
+def _to_list(obj):
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    """JSON with ring windows serialised from the buffers (no intermediate Python lists with orjson+NumPy)."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY, default=_to_list)
+    return json.dumps(payload, default=_to_list, separators=(",", ":")).encode("utf-8")
+
+
+__all__ = [
+    "CIRCULAR",
+    "HAVE_NUMPY",
+    "SensorHistory",
+    "SensorRing",
+    "dumps",
+]
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Shared-memory snapshot and local command queue for the split process layout.
+
+With ``process_layout.mode: split`` the ingest+control process (``python -m
+backend.control``) owns MQTT, RS485, the controllers and the database writes,
+and uvicorn API workers only read. Two transports connect them:
+
+* :class:`SnapshotWriter` / :class:`SnapshotReader` – one writer publishes a
+  JSON document into a memory-mapped file (``/dev/shm`` by default) under a
+  sequence lock: the counter is odd while the payload is being written and
+  even once it is complete. Readers never block the writer and never take a
+  lock; a read that overlaps a write sees two different counters (or an odd
+  one) and retries. A reader parses the payload only when the counter moved.
+* :class:`CommandServer` / :class:`CommandClient` – requests from the API
+  (mode, manual moves, config changes) travel over a Unix socket with
+  ``multiprocessing.connection`` (authenticated with the admin token) and are
+  executed in the control process.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger("farmcare.shared_state")
+
+# nagłówek: licznik sekwencji, długość treści, czas publikacji (epoch)
+HEADER = struct.Struct("<QQd")
+_SEQ = struct.Struct("<Q")
+
+
+class SnapshotWriter:
+    """Single writer of the snapshot region (control process)."""
+
+    def __init__(self, path: str, size_bytes: int) -> None:
+        self.path = str(path)
+        self.size = max(HEADER.size + 1024, int(size_bytes))
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            self._mm = mmap.mmap(fd, self.size)
+        finally:
+            os.close(fd)
+        HEADER.pack_into(self._mm, 0, 0, 0, 0.0)  # 0 = nic jeszcze nie opublikowano
+        self.seq = 0
+        self.published = 0
+        self.too_large = 0
+        self.last_bytes = 0
+
+    def write(self, payload: Dict[str, Any]) -> bool:
+        data = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+        if HEADER.size + len(data) > self.size:
+            self.too_large += 1
+            logger.warning("Snapshot of %d B does not fit the %d B region", len(data), self.size)
+            return False
+        seq = self.seq + 1
+        _SEQ.pack_into(self._mm, 0, seq)  # nieparzysty: zapis w toku
+        self._mm[HEADER.size:HEADER.size + len(data)] = data
+        HEADER.pack_into(self._mm, 0, seq + 1, len(data), time.time())
+        self.seq = seq + 1
+        self.published += 1
+        self.last_bytes = len(data)
+        return True
+
+    def stats(self) -> Dict[str, object]:
+        return {"path": self.path, "size": self.size, "seq": self.seq, "published": self.published,
+                "too_large": self.too_large, "last_bytes": self.last_bytes}
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+class SnapshotReader:
+    """Lock-free reader (API workers); the parsed document is cached per sequence."""
+
+    def __init__(self, path: str, retries: int = 50) -> None:
+        self.path = str(path)
+        self.retries = max(1, int(retries))
+        self._mm: Optional[mmap.mmap] = None
+        self._seq = 0
+        self._cached: Optional[Dict[str, Any]] = None
+        self.published_at = 0.0
+        self.reads = 0
+        self.parses = 0
+        self.retried = 0
+
+    def _map(self) -> Optional[mmap.mmap]:
+        if self._mm is None:
+            try:
+                with open(self.path, "rb") as handle:
+                    self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return None  # proces sterowania jeszcze nie wystartował
+        return self._mm
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        mm = self._map()
+        if mm is None:
+            return None
+        self.reads += 1
+        for _ in range(self.retries):
+            seq, length, published_at = HEADER.unpack_from(mm, 0)
+            if seq == self._seq:
+                return self._cached
+            if seq & 1 or HEADER.size + length > len(mm):
+                self.retried += 1
+                time.sleep(0)  # pisarz w trakcie – oddaj procesor i spróbuj ponownie
+                continue
+            data = mm[HEADER.size:HEADER.size + length]
+            if _SEQ.unpack_from(mm, 0)[0] != seq:
+                self.retried += 1
+                continue  # treść nadpisana w trakcie kopiowania
+            self._cached = json.loads(data)
+            self._seq = seq
+            self.published_at = published_at
+            self.parses += 1
+            return self._cached
+        return self._cached
+
+    def age_s(self) -> Optional[float]:
+        return time.time() - self.published_at if self.published_at else None
+
+    def stats(self) -> Dict[str, object]:
+        return {"path": self.path, "seq": self._seq, "reads": self.reads, "parses": self.parses,
+                "retried": self.retried, "age_s": self.age_s()}
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class CommandError(RuntimeError):
+    """Command rejected or failed in the control process."""
+
+
+class CommandServer:
+    """Executes API commands in the control process (one thread per worker connection)."""
+
+    def __init__(self, address: str, handler: Callable[[Optional[str], str, Dict[str, Any]], Any], authkey: bytes) -> None:
+        self.address = str(address)
+        self._handler = handler
+        self._authkey = authkey
+        self._listener: Optional[Listener] = None
+        self._running = False
+        self.handled = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        Path(self.address).parent.mkdir(parents=True, exist_ok=True)
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # gniazdo po poprzednim procesie
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self._authkey)
+        self._running = True
+        threading.Thread(target=self._accept, name="command-server", daemon=True).start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def _accept(self) -> None:
+        while self._running:
+            try:
+                conn = self._listener.accept()
+            except Exception as exc:
+                if self._running:
+                    logger.warning("Command connection rejected: %s", exc)
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn) -> None:
+        with conn:
+            while self._running:
+                try:
+                    zone, name, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    result = ("ok", self._handler(zone, name, kwargs))
+                    self.handled += 1
+                except Exception as exc:
+                    self.failed += 1
+                    result = ("error", str(exc))
+                try:
+                    conn.send(result)
+                except OSError as exc:  # klient zamknął połączenie (np. po przekroczeniu czasu)
+                    logger.debug("Command reply not delivered: %s", exc)
+                    return
+
+
+class CommandClient:
+    """Command queue end in an API worker; one connection, calls serialised."""
+
+    def __init__(self, address: str, authkey: bytes, timeout_s: float = 5.0) -> None:
+        self.address = str(address)
+        self._authkey = authkey
+        self.timeout_s = float(timeout_s)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def call(self, zone: Optional[str], name: str, **kwargs) -> Any:
+        with self._lock:
+            for attempt in (0, 1):
+                try:
+                    if self._conn is None:
+                        self._conn = Client(self.address, family="AF_UNIX", authkey=self._authkey)
+                    self._conn.send((zone, name, kwargs))
+                    if not self._conn.poll(self.timeout_s):
+                        raise TimeoutError(f"Command {name} timed out")
+                    status, result = self._conn.recv()
+                    break
+                except TimeoutError as exc:
+                    # TimeoutError to OSError – przed ogólną gałęzią: polecenie mogło się wykonać, nie ponawiamy
+                    self.close_connection()  # odpowiedź mogłaby przyjść do następnego wywołania
+                    raise CommandError(str(exc)) from exc
+                except (OSError, EOFError) as exc:
+                    self.close_connection()
+                    if attempt:
+                        raise CommandError(f"Control process unavailable: {exc}") from exc
+        if status != "ok":
+            raise CommandError(result)
+        return result
+
+    def close_connection(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
+
+
+__all__ = [
+    "CommandClient",
+    "CommandError",
+    "CommandServer",
+    "HEADER",
+    "SnapshotReader",
+    "SnapshotWriter",
+]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Fixed-rate loop cadence from monotonic deadlines.
+
+The control and scheduler threads used to ``sleep(period)`` after their
+work, so the real period was work + sleep and drifted with DB and MQTT
+latency. :class:`TickScheduler` sleeps until the next deadline on a fixed
+grid instead. A tick whose work runs past the next deadline is an overrun;
+the deadlines it missed are skipped (counted, not replayed in a burst).
+Wake-up lateness against the deadline goes into a histogram, exposed with
+the other counters through ``/api/diagnostics/loops``.
+
+The grid is anchored at the end of the first tick, so start-up work (DB
+warm-up, first MQTT averages) is not reported as an overrun.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+# górne granice przedziałów histogramu opóźnienia wybudzenia (ms); ostatni przedział bez granicy
+JITTER_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class TickScheduler:
+    """Deadline keeper for one periodic loop (``wait`` after every tick)."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Optional[Callable[[float], None]] = None,
+        bounds_ms: Sequence[float] = JITTER_BOUNDS_MS,
+    ) -> None:
+        self.name = name
+        self._clock = clock
+        self._sleep = sleep  # None -> time.sleep w chwili wywołania (testy podmieniają time.sleep)
+        self.bounds_ms = tuple(bounds_ms)
+        self.histogram: List[int] = [0] * (len(self.bounds_ms) + 1)
+        self.period_s: Optional[float] = None
+        self._deadline: Optional[float] = None
+        self._last_lateness_s = 0.0
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.max_lateness_s = 0.0
+        self._lateness_total_s = 0.0
+        self.last_work_s = 0.0
+        self.max_work_s = 0.0
+
+    def _do_sleep(self, seconds: float) -> None:
+        if self._sleep is not None:
+            self._sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def wait(self, period_s: float) -> None:
+        """Sleep until the next deadline of a ``period_s`` grid."""
+        self._do_sleep(self._schedule(period_s))
+        self._record(max(0.0, self._clock() - self._deadline))
+
+    async def wait_async(self, period_s: float) -> None:
+        """:meth:`wait` for a loop running as a task (zones sharing one event loop)."""
+        await asyncio.sleep(self._schedule(period_s))
+        self._record(max(0.0, self._clock() - self._deadline))
+
+    def _schedule(self, period_s: float) -> float:
+        period = max(1e-3, float(period_s))
+        now = self._clock()
+        deadline = self._deadline
+        self.ticks += 1
+        delay = period
+        if deadline is None or period != self.period_s:
+            # start lub zmiana okresu: nowa siatka od teraz
+            self.period_s = period
+            deadline = now + period
+        else:
+            # tick zaczął się po wybudzeniu: poprzedni termin + spóźnienie
+            self.last_work_s = max(0.0, now - deadline - self._last_lateness_s)
+            self.max_work_s = max(self.max_work_s, self.last_work_s)
+            deadline += period
+            if now > deadline:
+                missed = int(math.floor((now - deadline) / period)) + 1
+                self.overruns += 1
+                self.skipped += missed
+                deadline += missed * period
+            delay = max(0.0, deadline - now)
+        self._deadline = deadline
+        return delay
+
+    def _record(self, lateness_s: float) -> None:
+        self._last_lateness_s = lateness_s
+        self._lateness_total_s += lateness_s
+        self.max_lateness_s = max(self.max_lateness_s, lateness_s)
+        lateness_ms = lateness_s * 1000.0
+        for idx, bound in enumerate(self.bounds_ms):
+            if lateness_ms <= bound:
+                self.histogram[idx] += 1
+                return
+        self.histogram[-1] += 1
+
+    def stats(self) -> Dict[str, object]:
+        labels = [f"<={bound}ms" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]}ms"]
+        return {
+            "name": self.name,
+            "period_s": self.period_s,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "last_work_ms": round(self.last_work_s * 1000.0, 3),
+            "max_work_ms": round(self.max_work_s * 1000.0, 3),
+            "lateness_ms": {
+                "avg": round(self._lateness_total_s / self.ticks * 1000.0, 3) if self.ticks else 0.0,
+                "max": round(self.max_lateness_s * 1000.0, 3),
+                "histogram": dict(zip(labels, self.histogram)),
+            },
+        }
+
+
+__all__ = ["JITTER_BOUNDS_MS", "TickScheduler"]
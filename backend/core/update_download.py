@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""Chunked, resumable and checksum-verified download of update packages."""
+from __future__ import annotations
+
+import hashlib
+import http.client
+import json
+import os
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+USER_AGENT = "FarmCare-Updater"
+DEFAULT_CHUNK_SIZE = 64 * 1024
+PROGRESS_INTERVAL_S = 0.5
+
+_CONTENT_RANGE_RE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+class ChecksumMismatch(ValueError):
+    """Downloaded artifact does not match the manifest checksum."""
+
+
+@dataclass
+class DownloadProgress:
+    url: str
+    downloaded: int = 0
+    total: Optional[int] = None
+    resumed_from: int = 0
+    attempts: int = 0
+    rate_bps: float = 0.0
+    finished: bool = False
+
+    def as_dict(self) -> Dict[str, object]:
+        percent = None
+        if self.total:
+            percent = round(min(100.0, self.downloaded * 100.0 / self.total), 1)
+        return {
+            "url": self.url,
+            "downloaded_bytes": self.downloaded,
+            "total_bytes": self.total,
+            "percent": percent,
+            "resumed_from": self.resumed_from,
+            "attempts": self.attempts,
+            "rate_bps": round(self.rate_bps, 1),
+            "finished": self.finished,
+        }
+
+
+def parse_checksum(value: Optional[str]) -> Optional[tuple[str, str]]:
+    """``"sha256:<hex>"`` or a bare hex digest (SHA-256) -> ``(algorithm, hexdigest)``."""
+    if not value:
+        return None
+    text = str(value).strip()
+    algorithm, sep, digest = text.partition(":")
+    if not sep:
+        algorithm, digest = "sha256", text
+    algorithm = algorithm.strip().lower().replace("-", "")
+    digest = digest.strip().lower()
+    if algorithm not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported checksum algorithm: {algorithm}")
+    return algorithm, digest
+
+
+class RateLimiter:
+    """Sleeps just enough to keep the average throughput under ``rate_bps``."""
+
+    def __init__(self, rate_bps: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep) -> None:
+        self.rate_bps = float(rate_bps or 0)
+        self._clock = clock
+        self._sleep = sleep
+        self._started = clock()
+        self._bytes = 0
+
+    def consume(self, amount: int) -> None:
+        if self.rate_bps <= 0:
+            return
+        self._bytes += amount
+        ahead = self._bytes / self.rate_bps - (self._clock() - self._started)
+        if ahead > 0:
+            self._sleep(ahead)
+
+
+class PackageDownloader:
+    """Streams ``url`` to ``target`` through a ``.part`` file that survives interrupted transfers.
+
+    A later attempt (or a later ``run_update``) sends ``Range`` for the bytes
+    already on disk. The digest is updated chunk by chunk, so memory use does
+    not depend on package size.
+
+    ``<name>.part.json`` records where the part came from (URL, expected
+    checksum, ``ETag``/``Last-Modified``). A part is resumed only for the same
+    URL and checksum, with ``If-Range`` so a changed file on the server comes
+    back whole (200); without a checksum or a validator it is not resumed.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        rate_limit_bps: float = 0,
+        retries: int = 3,
+        retry_delay_s: float = 2.0,
+        timeout: float = 10,
+        progress: Optional[Callable[[DownloadProgress], None]] = None,
+        opener: Callable = urlopen,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.chunk_size = max(4096, int(chunk_size))
+        self.rate_limit_bps = float(rate_limit_bps or 0)
+        self.retries = max(0, int(retries))
+        self.retry_delay_s = max(0.0, float(retry_delay_s))
+        self.timeout = timeout
+        self._progress_cb = progress
+        self._opener = opener
+        self._sleep = sleep
+        self._last_report = 0.0
+
+    def download(self, url: str, target: Path, checksum: Optional[str] = None) -> Path:
+        expected = parse_checksum(checksum)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        part = target.with_name(target.name + ".part")
+        source = {"url": url, "checksum": checksum or None}
+        self._check_part(part, source)
+        progress = DownloadProgress(url=url)
+        limiter = RateLimiter(self.rate_limit_bps, sleep=self._sleep)
+        algorithm = expected[0] if expected else "sha256"
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(self.retries + 1):
+            progress.attempts = attempt + 1
+            try:
+                hasher = self._transfer(url, part, progress, limiter, algorithm, source)
+                break
+            except HTTPError:
+                raise
+            except (URLError, OSError, http.client.HTTPException) as exc:
+                last_error = exc
+                if attempt >= self.retries:
+                    raise
+                # Dalsza część pobierania ruszy od bajtów już zapisanych w .part
+                self._sleep(self.retry_delay_s * (2 ** attempt))
+        else:  # pragma: no cover - pętla kończy się break albo wyjątkiem
+            raise last_error or RuntimeError("download failed")
+
+        if expected is not None:
+            digest = expected[1]
+            actual = hasher.hexdigest()
+            if actual != digest:
+                self._drop_part(part)
+                raise ChecksumMismatch(f"{algorithm} mismatch: expected {digest}, got {actual}")
+        os.replace(part, target)
+        self._meta_path(part).unlink(missing_ok=True)
+        progress.finished = True
+        self._report(progress, force=True)
+        return target
+
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _meta_path(part: Path) -> Path:
+        return part.with_name(part.name + ".json")
+
+    def _read_meta(self, part: Path) -> Optional[Dict[str, object]]:
+        try:
+            meta = json.loads(self._meta_path(part).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return meta if isinstance(meta, dict) else None
+
+    def _drop_part(self, part: Path) -> None:
+        part.unlink(missing_ok=True)
+        self._meta_path(part).unlink(missing_ok=True)
+
+    def _check_part(self, part: Path, source: Dict[str, object]) -> None:
+        """Drop a leftover ``.part`` of another URL/checksum, or one that cannot be validated."""
+        if not part.exists():
+            self._meta_path(part).unlink(missing_ok=True)
+            return
+        meta = self._read_meta(part)
+        if (
+            meta is None
+            or any(meta.get(key) != value for key, value in source.items())
+            or not (source["checksum"] or meta.get("etag") or meta.get("last_modified"))
+        ):
+            # Doklejenie do cudzego pliku dałoby paczkę z dwóch wersji
+            self._drop_part(part)
+
+    def _write_meta(self, part: Path, source: Dict[str, object], headers) -> None:
+        meta = {**source, "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+        self._meta_path(part).write_text(json.dumps(meta), encoding="utf-8")
+
+    def _transfer(self, url: str, part: Path, progress: DownloadProgress, limiter: RateLimiter, algorithm: str, source: Dict[str, object]):
+        """One HTTP attempt; returns a hasher fed with every byte now in ``part``."""
+        offset = part.stat().st_size if part.exists() else 0
+        headers = {"User-Agent": USER_AGENT}
+        meta = (self._read_meta(part) or {}) if offset else {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                headers["If-Range"] = str(validator)
+        try:
+            response = self._opener(Request(url, headers=headers), timeout=self.timeout)
+        except HTTPError as exc:
+            if exc.code == 416 and offset:
+                # Serwer nie ma nic więcej – .part jest kompletny (weryfikuje suma kontrolna)
+                progress.downloaded = progress.total = offset
+                return self._prefix_hasher(part, algorithm, offset)
+            raise
+        with response:
+            status = getattr(response, "status", 200)
+            if status == 206 and offset:
+                etag = response.headers.get("ETag")
+                try:
+                    start, total = self._content_range(response.headers.get("Content-Range"))
+                except ValueError as exc:
+                    start, total = None, None
+                    reason = str(exc)
+                else:
+                    reason = f"Unexpected Content-Range start {start}, expected {offset}"
+                if start != offset or (etag and meta.get("etag") and etag != meta.get("etag")):
+                    # Nie wiadomo, do czego pasuje ta odpowiedź – kolejna próba od zera
+                    self._drop_part(part)
+                    raise ConnectionError(reason if start != offset else "Package changed on the server")
+                mode = "ab"
+                hasher = self._prefix_hasher(part, algorithm, offset)
+            elif status == 200:
+                # Pełna odpowiedź (także na If-Range po zmianie pliku) – .part od nowa
+                offset, mode = 0, "wb"
+                self._write_meta(part, source, response.headers)
+                hasher = hashlib.new(algorithm)
+                length = response.headers.get("Content-Length")
+                total = int(length) if length and length.isdigit() else None
+            else:
+                raise HTTPError(url, status, "Unexpected download response", response.headers, None)
+
+            progress.resumed_from = offset
+            progress.downloaded = offset
+            progress.total = total
+            started = time.monotonic()
+            with part.open(mode) as handle:
+                while True:
+                    chunk = response.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    handle.write(chunk)
+                    hasher.update(chunk)
+                    progress.downloaded += len(chunk)
+                    elapsed = time.monotonic() - started
+                    if elapsed > 0:
+                        progress.rate_bps = (progress.downloaded - offset) / elapsed
+                    self._report(progress)
+                    limiter.consume(len(chunk))
+                handle.flush()
+                os.fsync(handle.fileno())
+        if total is not None and progress.downloaded < total:
+            raise ConnectionError(f"Transfer interrupted at {progress.downloaded}/{total} bytes")
+        return hasher
+
+    @staticmethod
+    def _content_range(value: Optional[str]) -> tuple[int, Optional[int]]:
+        match = _CONTENT_RANGE_RE.match(value or "")
+        if not match:
+            raise ValueError(f"Invalid Content-Range: {value!r}")
+        total = match.group(3)
+        return int(match.group(1)), (int(total) if total.isdigit() else None)
+
+    def _prefix_hasher(self, path: Path, algorithm: str, length: int):
+        """Hash of the first ``length`` bytes already on disk, read in chunks."""
+        hasher = hashlib.new(algorithm)
+        with path.open("rb") as handle:
+            remaining = length
+            while remaining > 0:
+                block = handle.read(min(self.chunk_size, remaining))
+                if not block:
+                    break
+                hasher.update(block)
+                remaining -= len(block)
+        return hasher
+
+    def _report(self, progress: DownloadProgress, force: bool = False) -> None:
+        if not self._progress_cb:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_report < PROGRESS_INTERVAL_S:
+            return
+        self._last_report = now
+        self._progress_cb(progress)
+
+
+__all__ = ["PackageDownloader", "DownloadProgress", "ChecksumMismatch", "RateLimiter", "parse_checksum"]
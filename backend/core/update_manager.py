@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import json
 import os
+import random
 import subprocess
 import threading
 import time
@@ -18,9 +19,13 @@ from sqlalchemy.exc import OperationalError
 from backend.core.config import BASE_DIR, UPDATES
 from backend.core.db import SessionLocal, Setting
 from backend.core.notifications import log_event
+from backend.core.update_download import DownloadProgress, PackageDownloader
+from backend.core.update_slots import ReleaseSlots, handoff_command
 
 
 DEFAULT_TIMEOUT = 10
+# Znacznik zwracany przez fetcher, gdy serwer odpowiedział 304 Not Modified
+NOT_MODIFIED = object()
 
 
 class UpdateManager:
@@ -36,9 +41,18 @@ class UpdateManager:
         self.channel = UPDATES.get("channel") or "stable"
         interval_hours = int(UPDATES.get("check_interval_hours") or 24)
         self._interval = max(1, interval_hours) * 3600
+        self._jitter = min(0.5, max(0.0, float(UPDATES.get("check_jitter_fraction", 0.1))))
+        self._startup_jitter_s = max(0.0, float(UPDATES.get("startup_jitter_s", 600)))
+        self._backoff_base_s = max(1.0, float(UPDATES.get("retry_backoff_s", 300)))
+        self._random = random.Random()
         self._fetch_manifest = fetcher or self._default_fetcher
         self._download_dir = Path(UPDATES.get("download_dir") or (BASE_DIR / "updates"))
         self._apply_script = UPDATES.get("apply_script") or ""
+        self._download_rate_bps = max(0.0, float(UPDATES.get("download_rate_limit_kbps") or 0)) * 1024
+        self._download_retries = int(UPDATES.get("download_retries", 3))
+        self._download_progress: Optional[Dict[str, Any]] = None
+        self._install_mode = str(UPDATES.get("install_mode") or "script").lower()
+        self._slots = ReleaseSlots(Path(UPDATES.get("slots_root") or "/opt/farmcare-releases"), source_dir=BASE_DIR)
 
         self._lock = threading.Lock()
         self._stop_event = threading.Event()
@@ -55,6 +69,11 @@ class UpdateManager:
             "checksum": None,
             "channel": self.channel,
             "last_applied": None,
+            "manifest_etag": None,
+            "manifest_last_modified": None,
+            "consecutive_failures": 0,
+            "next_check_at": None,
+            "pending_version": None,
         }
         self._connectivity_state: Optional[str] = None
         self._last_server_issue: Optional[tuple[Optional[int], Optional[str]]] = None
@@ -65,6 +84,8 @@ class UpdateManager:
             self._notified_available_version = self._state.get("latest_version")
         if self._state.get("error"):
             self._last_error_message = self._state.get("error")
+        if self._install_mode == "slots":
+            self._check_handoff_result()
 
     # ------------------------------------------------------------------
     # Lifecycle management
@@ -84,15 +105,38 @@ class UpdateManager:
             self._thread.join(timeout=2.0)
 
     def _run(self) -> None:
-        try:
-            self.check_for_updates()
-        except Exception:
-            pass
-        while not self._stop_event.wait(self._interval):
+        delay = self._initial_delay()
+        while not self._stop_event.wait(delay):
             try:
                 self.check_for_updates()
             except Exception:
                 pass
+            delay = self._next_check_delay()
+            self._schedule_next_check(delay)
+
+    def _initial_delay(self, now: Optional[float] = None) -> float:
+        """Honour a persisted ``next_check_at``; otherwise spread fleet reboots over ``startup_jitter_s``."""
+        current = time.time() if now is None else now
+        with self._lock:
+            next_at = self._state.get("next_check_at")
+        if isinstance(next_at, (int, float)) and next_at > current:
+            return min(float(next_at) - current, float(self._interval))
+        return self._random.uniform(0.0, self._startup_jitter_s)
+
+    def _next_check_delay(self) -> float:
+        with self._lock:
+            failures = int(self._state.get("consecutive_failures") or 0)
+        if failures:
+            # Wykładniczy backoff z losową połową ("equal jitter"), nie dłużej niż zwykły interwał
+            ceiling = min(float(self._interval), self._backoff_base_s * (2 ** (failures - 1)))
+            return max(1.0, self._random.uniform(ceiling / 2, ceiling))
+        spread = self._interval * self._jitter
+        return max(1.0, self._interval + self._random.uniform(-spread, spread))
+
+    def _schedule_next_check(self, delay: float) -> None:
+        with self._lock:
+            self._state["next_check_at"] = time.time() + delay
+        self._save_state()
 
     # ------------------------------------------------------------------
     # Public API
@@ -102,6 +146,14 @@ class UpdateManager:
             snapshot = dict(self._state)
         snapshot["enabled"] = self.enabled
         snapshot["check_interval_hours"] = self._interval / 3600
+        snapshot["download"] = self._download_progress
+        snapshot["install_mode"] = self._install_mode
+        if self._install_mode == "slots":
+            if snapshot.get("pending_version"):
+                self._check_handoff_result()
+                with self._lock:
+                    snapshot.update(self._state)
+            snapshot["slots"] = {"active": self._slots.active_slot(), "last_handoff": self._slots.read_handoff()}
         return snapshot
 
     def check_for_updates(self, manual: bool = False) -> Dict[str, Any]:
@@ -116,20 +168,36 @@ class UpdateManager:
             status_val = int(status_code) if isinstance(status_code, int) else None
             detail = str(reason) if reason else None
             self._record_server_issue(status_val, detail)
+            self._count_check_failure()
             self._set_error(f"Manifest HTTP error: {exc}")
             return self.status()
         except URLError as exc:  # pragma: no cover - network failure path
             reason = getattr(exc, "reason", exc)
             self._signal_connectivity(False, detail=str(reason))
+            self._count_check_failure()
             self._set_error(f"Manifest network error: {exc}")
             return self.status()
         except Exception as exc:
+            self._count_check_failure()
             self._set_error(f"Manifest error: {exc}")
             return self.status()
 
         self._signal_connectivity(True)
         self._last_server_issue = None
 
+        if manifest is NOT_MODIFIED:
+            # 304: manifest bez zmian – przeliczamy tylko dostępność względem bieżącej wersji
+            with self._lock:
+                self._state["available"] = self._is_newer(
+                    str(self._state.get("latest_version") or ""), str(self._state.get("current_version") or "")
+                )
+                self._state.update(
+                    {"consecutive_failures": 0, "error": None, "last_checked": datetime.now(timezone.utc).isoformat()}
+                )
+            self._last_error_message = None
+            self._save_state()
+            return self.status()
+
         latest_version = str(
             manifest.get("version")
             or manifest.get("latest_version")
@@ -137,6 +205,8 @@ class UpdateManager:
             or ""
         ).strip()
         if not latest_version:
+            # Błędny manifest liczy się jak nieudane sprawdzenie, żeby zadziałał backoff
+            self._count_check_failure()
             self._set_error("Manifest does not define 'version'")
             return self.status()
 
@@ -159,6 +229,7 @@ class UpdateManager:
                     "channel": channel,
                     "available": available,
                     "error": None,
+                    "consecutive_failures": 0,
                     "last_checked": datetime.now(timezone.utc).isoformat(),
                 }
             )
@@ -192,11 +263,12 @@ class UpdateManager:
                 return {"ok": False, "detail": "No update available"}
             latest_version = self._state["latest_version"]
             download_url = self._state.get("download_url")
+            checksum = self._state.get("checksum")
 
         artifact_path: Optional[Path] = None
         if download_url:
             try:
-                artifact_path = self._download_package(download_url)
+                artifact_path = self._download_package(download_url, checksum)
             except HTTPError as exc:  # pragma: no cover - remote server issues
                 status_code = getattr(exc, "code", None)
                 reason = getattr(exc, "reason", None)
@@ -222,6 +294,14 @@ class UpdateManager:
             self._set_error(f"Install failed: {exc}")
             return {"ok": False, "detail": f"Install failed: {exc}"}
 
+        if self._install_mode == "slots":
+            # Wersja jest zastosowana dopiero, gdy pomocnik potwierdzi zdrowie nowego slotu
+            with self._lock:
+                self._state.update({"available": False, "error": None, "pending_version": latest_version})
+            self._save_state()
+            log_event("UPDATE_INSTALLED", meta={"version": latest_version, "artifact": str(artifact_path)}, category="updates")
+            return {"ok": True, "pending": True, "status": self.status(), "artifact": str(artifact_path)}
+
         with self._lock:
             self.current_version = latest_version
             self._state.update(
@@ -274,6 +354,10 @@ class UpdateManager:
             meta["detail"] = detail
         log_event("SERVER_UNREACHABLE", meta=meta, category="network")
 
+    def _count_check_failure(self) -> None:
+        with self._lock:
+            self._state["consecutive_failures"] = int(self._state.get("consecutive_failures") or 0) + 1
+
     def _set_error(self, message: str) -> None:
         with self._lock:
             self._state["error"] = message
@@ -316,12 +400,36 @@ class UpdateManager:
         manifest_url = UPDATES.get("manifest_url")
         if not manifest_url:
             raise RuntimeError("updates.manifest_url is not configured")
-        req = Request(manifest_url, headers={"User-Agent": "FarmCare-Updater"})
-        with urlopen(req, timeout=DEFAULT_TIMEOUT) as response:
+        headers = {"User-Agent": "FarmCare-Updater"}
+        with self._lock:
+            etag = self._state.get("manifest_etag")
+            last_modified = self._state.get("manifest_last_modified")
+            have_manifest = bool(self._state.get("last_checked")) and not self._state.get("error")
+        # Nagłówki warunkowe tylko gdy mamy poprawnie przetworzony poprzedni manifest
+        if have_manifest and etag:
+            headers["If-None-Match"] = etag
+        if have_manifest and last_modified:
+            headers["If-Modified-Since"] = last_modified
+        req = Request(manifest_url, headers=headers)
+        try:
+            response = urlopen(req, timeout=DEFAULT_TIMEOUT)
+        except HTTPError as exc:
+            if exc.code == 304:
+                return NOT_MODIFIED
+            raise
+        with response:
+            if response.status == 304:
+                return NOT_MODIFIED
             if response.status != 200:
                 raise HTTPError(manifest_url, response.status, "Unexpected response", response.headers, None)
             data = response.read()
-        return json.loads(data.decode("utf-8"))
+            new_etag = response.headers.get("ETag")
+            new_last_modified = response.headers.get("Last-Modified")
+        manifest = json.loads(data.decode("utf-8"))
+        with self._lock:
+            self._state["manifest_etag"] = new_etag
+            self._state["manifest_last_modified"] = new_last_modified
+        return manifest
 
     @staticmethod
     def _is_newer(candidate: str, current: str) -> bool:
@@ -336,20 +444,23 @@ class UpdateManager:
 
         return normalize(candidate) > normalize(current)
 
-    def _download_package(self, url: str) -> Path:
-        self._download_dir.mkdir(parents=True, exist_ok=True)
-        filename = url.split('/')[-1] or f"update-{int(time.time())}.pkg"
-        target = self._download_dir / filename
-        req = Request(url, headers={"User-Agent": "FarmCare-Updater"})
-        with urlopen(req, timeout=DEFAULT_TIMEOUT) as response:
-            if response.status != 200:
-                raise HTTPError(url, response.status, "Unexpected download response", response.headers, None)
-            data = response.read()
-        with target.open("wb") as handle:
-            handle.write(data)
-        return target
+    def _on_download_progress(self, progress: DownloadProgress) -> None:
+        self._download_progress = progress.as_dict()
+
+    def _download_package(self, url: str, checksum: Optional[str] = None) -> Path:
+        filename = url.split('?')[0].split('/')[-1] or f"update-{int(time.time())}.pkg"
+        downloader = PackageDownloader(
+            rate_limit_bps=self._download_rate_bps,
+            retries=self._download_retries,
+            timeout=DEFAULT_TIMEOUT,
+            progress=self._on_download_progress,
+        )
+        return downloader.download(url, self._download_dir / filename, checksum)
 
     def _execute_install(self, artifact: Optional[Path]) -> None:
+        if self._install_mode == "slots":
+            self._install_into_slot(artifact)
+            return
         script = self._apply_script
         if not script:
             return
@@ -375,6 +486,61 @@ class UpdateManager:
 
         subprocess.run(cmd, check=True, env=env)
 
+    def _install_into_slot(self, artifact: Optional[Path]) -> None:
+        """Prepare the idle A/B slot, switch ``current`` and hand the restart to a detached helper."""
+        if artifact is None:
+            raise RuntimeError("Slot install requires a downloaded package")
+        slot_dir = self._slots.prepare(artifact)
+        helper = self._slots.install_helper()  # przed przełączeniem: kod bieżącego wydania
+        previous = self._slots.activate(slot_dir.name)
+        self._slots.write_handoff(
+            {"slot": slot_dir.name, "previous": previous, "result": "pending",
+             "version": self._state.get("latest_version"), "started": datetime.now(timezone.utc).isoformat()}
+        )
+        cmd = handoff_command(
+            self._slots.root,
+            slot_dir.name,
+            previous,
+            UPDATES.get("restart_command") or "systemctl restart farmcare.service",
+            UPDATES.get("health_url") or "http://127.0.0.1:8000/",
+            float(UPDATES.get("health_timeout_s") or 90),
+            helper=helper,
+        )
+        # Pomocnik w osobnej sesji: restartuje usługę, sprawdza zdrowie, w razie błędu cofa slot
+        subprocess.Popen(cmd, cwd=str(slot_dir), start_new_session=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _check_handoff_result(self) -> None:
+        handoff = self._slots.read_handoff()
+        if not handoff or handoff.get("reported"):
+            return
+        result = handoff.get("result")
+        if result not in ("ok", "rolled_back", "unhealthy"):
+            return
+        version = handoff.get("version") or self._state.get("pending_version")
+        with self._lock:
+            self._state["pending_version"] = None
+        if result == "ok":
+            with self._lock:
+                if version:
+                    self.current_version = str(version)
+                    self._state["current_version"] = self.current_version
+                self._state.update({"error": None, "last_applied": handoff.get("finished") or datetime.now(timezone.utc).isoformat()})
+            self._save_state()
+            self._last_error_message = None
+            self._notified_available_version = None
+            log_event("UPDATE_APPLIED", meta={"version": version, "slot": handoff.get("slot")}, category="updates")
+        elif result == "rolled_back":
+            self._set_error(f"Update health check failed; rolled back to {handoff.get('previous')}")
+            log_event("UPDATE_ROLLED_BACK", meta={"slot": handoff.get("slot"), "previous": handoff.get("previous")}, category="updates")
+        else:
+            self._set_error(f"Update health check failed for {handoff.get('slot')}; no previous release to roll back to")
+        handoff["reported"] = True
+        try:
+            self._slots.write_handoff(handoff)
+        except OSError:
+            pass
+
 
 __all__ = ["UpdateManager"]
 
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""A/B release slots: install into the idle slot, switch a symlink, verify, roll back.
+
+Layout under ``slots_root``::
+
+    current -> slot_a          # WorkingDirectory of farmcare.service
+    slot_a/, slot_b/           # complete releases, bytecode precompiled
+    legacy -> /opt/farmcare    # tree the first A/B install ran from (rollback target)
+    handoff_helper.py          # copy of this file taken before the switch (runs the handoff)
+    shared/                    # data, logs, updates and local config kept across releases
+    handoff.json               # result of the last switch (read by UpdateManager)
+
+The running process is never modified in place: a release is unpacked and
+compiled in the inactive slot, ``current`` is swapped with a single
+``rename`` and the service is restarted once. A detached helper (a copy of
+this file taken from the running release before the switch, run with the
+``handoff`` command) polls the health URL and, if the new release does not
+come up, points ``current`` back and restarts again. Before the first A/B install ``current`` points at
+``legacy``, so even that install has a release to roll back to.
+"""
+from __future__ import annotations
+
+import argparse
+import compileall
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from urllib.error import URLError
+from urllib.request import urlopen
+
+SLOT_NAMES = ("slot_a", "slot_b")
+LEGACY_SLOT = "legacy"
+_TARGETS = SLOT_NAMES + (LEGACY_SLOT,)
+SHARED_PATHS = ("data", "logs", "updates", "config/settings.yaml", "config/.env")
+RELEASE_MARKER = "backend/app.py"
+HANDOFF_FILE = "handoff.json"
+HELPER_FILE = "handoff_helper.py"
+
+
+class SlotError(RuntimeError):
+    """Release could not be prepared or activated."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ReleaseSlots:
+    """File-system side of the A/B scheme; no process management here."""
+
+    def __init__(self, root: Path, source_dir: Optional[Path] = None, shared_paths: Iterable[str] = SHARED_PATHS) -> None:
+        self.root = Path(root)
+        self.source_dir = Path(source_dir) if source_dir else None
+        self.shared_paths = tuple(shared_paths)
+        self.current_link = self.root / "current"
+        self.shared_dir = self.root / "shared"
+
+    # ---------- stan ----------
+    def active_slot(self) -> Optional[str]:
+        try:
+            name = os.readlink(self.current_link)
+        except OSError:
+            return None
+        name = Path(name).name
+        return name if name in _TARGETS else None
+
+    def inactive_slot(self) -> str:
+        active = self.active_slot()
+        return SLOT_NAMES[1] if active == SLOT_NAMES[0] else SLOT_NAMES[0]
+
+    def read_handoff(self) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads((self.root / HANDOFF_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def write_handoff(self, payload: Dict[str, Any]) -> None:
+        path = self.root / HANDOFF_FILE
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, path)
+
+    # ---------- przygotowanie ----------
+    def bootstrap(self) -> Optional[str]:
+        """Point ``current`` at the running tree (``legacy``) when no slot is active yet."""
+        if self.active_slot() is not None or self.current_link.is_symlink():
+            return self.active_slot()
+        if self.source_dir is None or not (self.source_dir / RELEASE_MARKER).exists():
+            return None
+        self.root.mkdir(parents=True, exist_ok=True)
+        legacy = self.root / LEGACY_SLOT
+        if legacy.is_symlink():
+            legacy.unlink()
+        os.symlink(self.source_dir.resolve(), legacy)
+        return self._switch(LEGACY_SLOT)
+
+    def prepare(self, artifact: Path) -> Path:
+        """Unpack ``artifact`` into the inactive slot, link shared state and precompile it."""
+        self.bootstrap()
+        slot_dir = self.root / self.inactive_slot()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._seed_shared()
+        if slot_dir.exists():
+            shutil.rmtree(slot_dir)
+        staging = self.root / (slot_dir.name + ".staging")
+        if staging.exists():
+            shutil.rmtree(staging)
+        try:
+            self._extract(Path(artifact), staging)
+            release_dir = self._release_dir(staging)
+            if not (release_dir / RELEASE_MARKER).exists():
+                raise SlotError(f"Package does not contain {RELEASE_MARKER}")
+            os.replace(release_dir, slot_dir)
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging)
+        self._link_shared(slot_dir)
+        # Błąd składni = uszkodzona paczka; nie przełączamy na nią
+        if not compileall.compile_dir(str(slot_dir), quiet=1, workers=0):
+            shutil.rmtree(slot_dir, ignore_errors=True)
+            raise SlotError("Bytecode compilation failed; release rejected")
+        return slot_dir
+
+    def install_helper(self, source: Optional[Path] = None) -> Path:
+        """Copy the running ``update_slots.py`` next to the slots; call it before :meth:`activate`.
+
+        ``__file__`` goes through ``current`` (``PYTHONPATH`` of the service),
+        so after the switch it would name the untested release.
+        """
+        source = Path(source) if source else Path(__file__).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        helper = self.root / HELPER_FILE
+        tmp = helper.with_name(helper.name + ".tmp")
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, helper)
+        return helper
+
+    def activate(self, slot: str) -> Optional[str]:
+        """Point ``current`` at ``slot`` atomically; returns the previously active slot."""
+        if slot not in _TARGETS or not (self.root / slot / RELEASE_MARKER).exists():
+            raise SlotError(f"Slot {slot} does not hold a release")
+        return self._switch(slot)
+
+    def _switch(self, slot: str) -> Optional[str]:
+        previous = self.active_slot()
+        tmp_link = self.root / "current.tmp"
+        if tmp_link.is_symlink() or tmp_link.exists():
+            tmp_link.unlink()
+        os.symlink(slot, tmp_link)
+        os.replace(tmp_link, self.current_link)
+        return previous
+
+    def _extract(self, artifact: Path, destination: Path) -> None:
+        try:
+            archive = zipfile.ZipFile(artifact)
+        except zipfile.BadZipFile as exc:
+            raise SlotError(f"Invalid update package: {exc}") from exc
+        with archive:
+            if archive.testzip() is not None:
+                raise SlotError("Corrupt member in update package")
+            for member in archive.namelist():
+                path = PurePosixPath(member)
+                if path.is_absolute() or ".." in path.parts:
+                    raise SlotError(f"Unsafe path in update package: {member}")
+            archive.extractall(destination)
+
+    @staticmethod
+    def _release_dir(staging: Path) -> Path:
+        # Archiwa typu "farmcare-2.1.0/backend/..." mają jeden katalog nadrzędny
+        entries = [entry for entry in staging.iterdir() if entry.name != "__MACOSX"]
+        if len(entries) == 1 and entries[0].is_dir() and not (staging / RELEASE_MARKER).exists():
+            return entries[0]
+        return staging
+
+    def _seed_shared(self) -> None:
+        """First A/B install: copy state from the running tree into ``shared/``."""
+        for rel in self.shared_paths:
+            target = self.shared_dir / rel
+            if target.exists() or self.source_dir is None:
+                continue
+            source = (self.source_dir / rel).resolve()
+            if not source.exists():
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if source.is_dir():
+                shutil.copytree(source, target, symlinks=True)
+            else:
+                shutil.copy2(source, target)
+
+    def _link_shared(self, slot_dir: Path) -> None:
+        for rel in self.shared_paths:
+            shared = self.shared_dir / rel
+            if not shared.exists():
+                continue
+            link = slot_dir / rel
+            if link.is_symlink() or link.is_file():
+                link.unlink()
+            elif link.is_dir():
+                shutil.rmtree(link)
+            link.parent.mkdir(parents=True, exist_ok=True)
+            os.symlink(shared, link)
+
+    # ---------- przełączenie ----------
+    def handoff(
+        self,
+        slot: str,
+        previous: Optional[str],
+        restart: Callable[[], None],
+        health_check: Callable[[], bool],
+        timeout_s: float = 90.0,
+        poll_s: float = 2.0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> bool:
+        """Restart into ``slot`` and wait for health; on failure switch back to ``previous``."""
+        started = _now()
+        restart()
+        deadline = clock() + timeout_s
+        healthy = False
+        while True:
+            try:
+                healthy = bool(health_check())
+            except Exception:
+                healthy = False
+            if healthy or clock() >= deadline:
+                break
+            sleep(poll_s)
+        result: Dict[str, Any] = {"slot": slot, "previous": previous, "started": started, "finished": _now()}
+        pending = self.read_handoff() or {}
+        if pending.get("slot") == slot and pending.get("version"):
+            result["version"] = pending["version"]
+        if healthy:
+            result["result"] = "ok"
+        elif previous:
+            self.activate(previous)
+            restart()
+            result["result"] = "rolled_back"
+        else:
+            result["result"] = "unhealthy"
+        self.write_handoff(result)
+        return healthy
+
+
+def http_health_check(url: str, timeout: float = 3.0) -> Callable[[], bool]:
+    def check() -> bool:
+        try:
+            with urlopen(url, timeout=timeout) as response:
+                return 200 <= getattr(response, "status", 200) < 300
+        except (URLError, OSError):
+            return False
+
+    return check
+
+
+def command_runner(command: str) -> Callable[[], None]:
+    def run() -> None:
+        subprocess.run(shlex.split(command), check=False)
+
+    return run
+
+
+def handoff_command(
+    root: Path,
+    slot: str,
+    previous: Optional[str],
+    restart_command: str,
+    health_url: str,
+    timeout_s: float,
+    helper: Optional[Path] = None,
+) -> List[str]:
+    """Command line for the detached helper; survives the restart of the service cgroup.
+
+    The helper is a script run by its path: it needs only the standard
+    library, so it works without the service's working directory or
+    ``PYTHONPATH`` (a ``systemd-run`` unit gets neither). Pass the copy from
+    :meth:`ReleaseSlots.install_helper` so it is the code of the release that
+    ran the install, not of the one being tried.
+    """
+    cmd = [
+        sys.executable, str(helper or Path(__file__).resolve()), "handoff",
+        "--root", str(root), "--slot", slot,
+        "--restart", restart_command, "--health-url", health_url, "--timeout", str(timeout_s),
+    ]
+    if previous:
+        cmd += ["--previous", previous]
+    launcher = shutil.which("systemd-run")
+    if launcher:
+        # Osobna jednostka: systemctl restart farmcare nie zabije pomocnika
+        cmd = [launcher, "--collect", "--quiet", f"--unit=farmcare-handoff-{int(time.time())}"] + cmd
+    return cmd
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="update_slots.py")
+    sub = parser.add_subparsers(dest="command", required=True)
+    handoff = sub.add_parser("handoff", help="restart into a slot, health-check it and roll back on failure")
+    handoff.add_argument("--root", required=True)
+    handoff.add_argument("--slot", required=True, choices=SLOT_NAMES)
+    handoff.add_argument("--previous", choices=_TARGETS)
+    handoff.add_argument("--restart", required=True)
+    handoff.add_argument("--health-url", required=True)
+    handoff.add_argument("--timeout", type=float, default=90.0)
+    bootstrap = sub.add_parser("bootstrap", help="point <root>/current at the running tree before the first A/B install")
+    bootstrap.add_argument("--root", required=True)
+    bootstrap.add_argument("--source", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "bootstrap":
+        active = ReleaseSlots(Path(args.root), source_dir=Path(args.source)).bootstrap()
+        print(active or "no release in --source")
+        return 0 if active else 1
+    slots = ReleaseSlots(Path(args.root))
+    ok = slots.handoff(
+        args.slot,
+        args.previous,
+        restart=command_runner(args.restart),
+        health_check=http_health_check(args.health_url),
+        timeout_s=args.timeout,
+    )
+    return 0 if ok else 1
+
+
+__all__ = [
+    "HELPER_FILE",
+    "LEGACY_SLOT",
+    "ReleaseSlots",
+    "SlotError",
+    "SLOT_NAMES",
+    "handoff_command",
+    "http_health_check",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Precomputed per-vent target limits from group overrides (wind lock).
+
+Every group may carry a ``target_override`` (optionally ``force_close``).
+Applied in group order, the overrides of one vent always reduce to either
+a forced position or an upper cap, so the controller keeps both in flat
+arrays indexed by a vent slot and recomputes them only for the vents of
+groups whose override actually changed. :meth:`VentCaps.targets` turns a
+requested position into the effective target of every vent in one pass;
+the vector is cached until the target or the overrides change, so the
+stepping loop of a plan does not repeat the enforcement on every step.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+NO_FORCE = float("nan")
+NO_CAP = 100.0
+
+
+def _clamp(value: float) -> float:
+    return max(0.0, min(100.0, value))
+
+
+class VentCaps:
+    """Vent slot -> forced position (NaN = none) and cap (100 = none)."""
+
+    def __init__(self) -> None:
+        self.slots: Dict[int, int] = {}
+        self.vents: List[object] = []
+        self.forced = array("d")
+        self.cap = array("d")
+        self.group_members: Dict[str, List[Tuple[int, object]]] = {}
+        self.grouped: List[int] = []  # sloty wietrzników należących do jakiejkolwiek grupy
+        self._groups: Mapping[str, dict] = {}
+        self._vent_to_groups: Mapping[int, Sequence[str]] = {}
+        self._limited = 0  # liczba wietrzników z aktywnym ograniczeniem
+        self._version = 0
+        self._cache: Optional[Tuple[float, int, List[float]]] = None
+        self.rebuilds = 0
+        self.refreshes = 0
+
+    def rebuild(self, vents: Mapping[int, object], groups: Mapping[str, dict],
+                vent_to_groups: Mapping[int, Sequence[str]]) -> None:
+        """Full recomputation after the vents or groups were replaced."""
+        self.slots = {vid: slot for slot, vid in enumerate(vents)}
+        self.vents = list(vents.values())
+        self._groups = groups
+        self._vent_to_groups = vent_to_groups
+        self.forced = array("d", [NO_FORCE]) * len(self.vents)
+        self.cap = array("d", [NO_CAP]) * len(self.vents)
+        self.group_members = {
+            gid: [(self.slots[vid], vents[vid]) for vid in group.get("vents", []) if vid in self.slots]
+            for gid, group in groups.items()
+        }
+        self.grouped = sorted({slot for members in self.group_members.values() for slot, _ in members})
+        self._limited = 0
+        for vid in vent_to_groups:
+            self._update_slot(vid)
+        self._version += 1
+        self.rebuilds += 1
+
+    def refresh_groups(self, group_ids: Iterable[str]) -> None:
+        """Recompute only the vents of groups whose override or force flag changed."""
+        touched = {slot for gid in group_ids for slot, _ in self.group_members.get(gid, ())}
+        if not touched:
+            return
+        for slot in touched:
+            self._update_slot(self.vents[slot].id)
+        self._version += 1
+        self.refreshes += 1
+
+    def _update_slot(self, vid: int) -> None:
+        slot = self.slots.get(vid)
+        if slot is None:
+            return
+        forced = NO_FORCE
+        cap = NO_CAP
+        # kolejność grup jak dawniej: wymuszenie ustawia pozycję, zwykłe nadpisanie tylko ją ogranicza
+        for gid in self._vent_to_groups.get(vid, ()):
+            group = self._groups.get(gid)
+            if not group or group.get("target_override") is None:
+                continue
+            override = _clamp(float(group["target_override"]))
+            if group.get("force_close", False):
+                forced, cap = override, NO_CAP
+            elif forced == forced:
+                forced = min(forced, override)
+            else:
+                cap = min(cap, override)
+        was_limited = self.forced[slot] == self.forced[slot] or self.cap[slot] < NO_CAP
+        self.forced[slot] = forced
+        self.cap[slot] = cap
+        self._limited += int(forced == forced or cap < NO_CAP) - int(was_limited)
+
+    def effective(self, vid: int, target: float) -> float:
+        slot = self.slots.get(vid)
+        if slot is None:
+            return target
+        forced = self.forced[slot]
+        if forced == forced:
+            return forced
+        cap = self.cap[slot]
+        return cap if target > cap else target
+
+    def targets(self, target: float) -> List[float]:
+        """Effective target of every slot for ``target`` (already clamped to 0–100)."""
+        cache = self._cache
+        if cache is not None and cache[0] == target and cache[1] == self._version:
+            return cache[2]
+        if not self._limited:
+            values = [target] * len(self.vents)
+        else:
+            values = [
+                forced if forced == forced else (cap if target > cap else target)
+                for forced, cap in zip(self.forced, self.cap)
+            ]
+        self._cache = (target, self._version, values)
+        return values
+
+    def needs_adjustment(self, target: float, tolerance: float) -> bool:
+        """Any available grouped vent further than ``tolerance`` from its effective target."""
+        values = self.targets(target)
+        vents = self.vents
+        for slot in self.grouped:
+            vent = vents[slot]
+            if vent.available and abs(values[slot] - vent.position) > tolerance:
+                return True
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "vents": len(self.vents),
+            "limited": self._limited,
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+        }
+
+
+__all__ = ["NO_CAP", "NO_FORCE", "VentCaps"]
@@ -2,6 +2,7 @@
 # backend/core/vents.py – klasa pojedynczego wietrznika sterowanego czasowo
 import asyncio, time
 from backend.core.mqtt_client import mqtt_publish
+from backend.core.boneio_dispatch import NO_LIMIT, channel_from_topic, relay_messages
 
 class Vent:
     """
@@ -11,7 +12,8 @@ class Vent:
                  boneio_device: str, up_topic: str, down_topic: str,
                  err_input_topic: str | None,
                  reverse_pause_s: float, min_move_s: float,
-                 calibration_buffer_s: float, ignore_delta_percent: float):
+                 calibration_buffer_s: float, ignore_delta_percent: float,
+                 publisher=None, dispatcher=None, channel: str | None = None, shadow=None):
         self.id = vid
         self.name = name
         self.travel_time = travel_time_s
@@ -25,19 +27,97 @@ class Vent:
         self.ignore_delta_percent = ignore_delta_percent
         self.position = 0.0
         self.user_target = 0.0
-        self.available = True
+        self.fault = False        # błąd krańcówki (error_in) – zapisywany w bazie jako available
+        self.online = True        # łącze z BoneIO (availability/LWT) – tylko w pamięci
+        self.needs_resync = False  # pozycja niepewna po utracie łącza w trakcie ruchu
+        self._link_waiters = []   # (pętla, future) ruchów czekających na koniec czasu przejazdu
         self._moving = False
         self._last_dir = 0  # -1 close, +1 open
-
-    async def stop(self):
-        # BoneIO: oba przekaźniki OFF
-        await mqtt_publish(self.up_topic, "OFF")
-        await mqtt_publish(self.down_topic, "OFF")
+        self._publisher = publisher  # None -> mqtt_publish (symulator podstawia własny)
+        self._dispatcher = dispatcher  # BoneIODispatcher urządzenia: paczki poleceń i limit silników
+        self.channel = channel or channel_from_topic(up_topic)
+        self._shadow = shadow  # RelayShadow: publikujemy tylko rzeczywiste przełączenia
+
+    @property
+    def available(self) -> bool:
+        """Można sterować: bez błędu krańcówki i z urządzeniem online."""
+        return self.online and not self.fault
+
+    @available.setter
+    def available(self, value: bool) -> None:
+        self.fault = not value
+
+    def set_online(self, online: bool) -> None:
+        """Stan łącza urządzenia; utrata przerywa trwające odliczanie ruchu (wywołanie z dowolnego wątku)."""
+        self.online = bool(online)
+        if not self.online:
+            for loop, waiter in list(self._link_waiters):
+                loop.call_soon_threadsafe(_wake, waiter)
+
+    async def _travel(self, seconds: float) -> bool:
+        """Czas załączenia przekaźnika; False, gdy urządzenie zniknęło w trakcie."""
+        if not self.online:
+            return False
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        entry = (loop, waiter)
+        self._link_waiters.append(entry)
+        try:
+            await asyncio.wait_for(waiter, seconds)
+        except asyncio.TimeoutError:
+            return True
+        finally:
+            self._link_waiters.remove(entry)
+        return False
+
+    def _interrupted(self, start_position: float, direction: int, elapsed: float) -> None:
+        # przekaźniki mogły zostać w dowolnym stanie – szacunek z czasu, kalibracja po powrocie
+        moved = min(1.0, max(0.0, elapsed) / max(self.travel_time, 1e-6)) * 100.0
+        self.position = max(0.0, min(100.0, start_position + direction * moved))
+        self._moving = False
+        self._last_dir = 0
+        self.needs_resync = True
+
+    async def _publish(self, topic: str, payload: str):
+        return await (self._publisher or mqtt_publish)(topic, payload)
+
+    async def _drive(self, action: str):
+        # "up" | "down" | "stop" – przez dyspozytor BoneIO albo bezpośrednio tematami przekaźników
+        messages = relay_messages(action, self.up_topic, self.down_topic)
+        if self._shadow is not None:
+            messages = self._shadow.pending(messages)
+            if not messages:
+                return
+        failed = []
+        try:
+            if self._dispatcher is not None:
+                if await self._dispatcher.send(self.channel, action, messages) is False:
+                    failed = [topic for topic, _ in messages]
+            else:
+                for topic, payload in messages:
+                    if await self._publish(topic, payload) is False:
+                        failed.append(topic)
+        except Exception:
+            if self._shadow is not None:
+                self._shadow.forget(topic for topic, _ in messages)  # stan nieznany
+            raise
+        if self._shadow is not None:
+            # zapamiętujemy tylko polecenia, które dotarły do brokera
+            self._shadow.commanded((topic, payload) for topic, payload in messages if topic not in failed)
+            self._shadow.forget(failed)
+
+    def _motor_slot(self):
+        return self._dispatcher.motor_slot() if self._dispatcher is not None else NO_LIMIT
+
+    async def stop(self):
+        # BoneIO: oba przekaźniki OFF
+        await self._drive("stop")
         self._moving = False
         self._last_dir = 0
 
     async def move_to(self, target_percent: float):
         if not self.available: return
+        if self.needs_resync: return  # najpierw kalibracja po powrocie łącza
         target = max(0.0, min(100.0, float(target_percent)))
         if abs(target - self.position) < self.ignore_delta_percent:
             return
@@ -50,18 +130,19 @@ class Vent:
         # Czas ruchu
         delta = abs(target - self.position) / 100.0
         move_time = max(self.min_move_s, delta * self.travel_time)
-        # Publikacja MQTT
-        if direction > 0:
-            await mqtt_publish(self.down_topic, "OFF")
-            await mqtt_publish(self.up_topic, "ON")
-        else:
-            await mqtt_publish(self.up_topic, "OFF")
-            await mqtt_publish(self.down_topic, "ON")
-        self._moving = True
-        self._last_dir = direction
-        await asyncio.sleep(move_time)
-        # zatrzymaj i zaktualizuj pozycję
-        await self.stop()
+        async with self._motor_slot():  # limit równocześnie pracujących silników na urządzeniu
+            if not self.available:
+                return
+            # Publikacja MQTT
+            await self._drive("up" if direction > 0 else "down")
+            self._moving = True
+            self._last_dir = direction
+            start = asyncio.get_running_loop().time()
+            if not await self._travel(move_time):
+                self._interrupted(self.position, direction, asyncio.get_running_loop().time() - start)
+                return
+            # zatrzymaj i zaktualizuj pozycję
+            await self.stop()
         self.position = target
 
     async def calibrate_close(self):
@@ -69,8 +150,18 @@ class Vent:
         if not self.available: return
         if self._last_dir == 1:
             await self.stop(); await asyncio.sleep(self.reverse_pause_s)
-        await mqtt_publish(self.up_topic, "OFF")
-        await mqtt_publish(self.down_topic, "ON")
-        await asyncio.sleep(self.travel_time + self.calibration_buffer_s)
-        await self.stop()
+        async with self._motor_slot():
+            await self._drive("down")
+            self._moving = True
+            self._last_dir = -1
+            if not await self._travel(self.travel_time + self.calibration_buffer_s):
+                self._interrupted(self.position, -1, 0.0)
+                return
+            await self.stop()
         self.position = 0.0
+        self.needs_resync = False
+
+
+def _wake(waiter) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
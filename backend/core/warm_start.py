@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Periodic checkpoint of sensor averaging windows for warm restarts."""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+from backend.core.config import WARM_START
+from backend.core.models import SensorSnapshot
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_VERSION = 1
+
+
+def save_checkpoint(path: Path, snapshots: Mapping[str, SensorSnapshot], now: Optional[float] = None) -> None:
+    """Write all snapshot windows to ``path`` atomically (temp file + rename)."""
+    payload = {
+        "version": CHECKPOINT_VERSION,
+        "saved_at": time.time() if now is None else now,
+        "sources": {name: snap.export_state() for name, snap in snapshots.items()},
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(payload, handle, separators=(",", ":"))
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(
+    path: Path,
+    snapshots: Mapping[str, SensorSnapshot],
+    max_age_s: float,
+    now: Optional[float] = None,
+) -> Dict[str, List[str]]:
+    """Restore windows younger than ``max_age_s``; returns restored sensor names per source."""
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            payload = json.load(handle)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as exc:
+        logger.warning("Ignoring unreadable sensor checkpoint %s: %s", path, exc)
+        return {}
+    if not isinstance(payload, dict) or payload.get("version") != CHECKPOINT_VERSION:
+        return {}
+    sources = payload.get("sources")
+    if not isinstance(sources, dict):
+        return {}
+    current = time.time() if now is None else now
+    restored: Dict[str, List[str]] = {}
+    for name, snap in snapshots.items():
+        data = sources.get(name)
+        if isinstance(data, dict):
+            names = snap.restore_state(data, max_age_s, current)
+            if names:
+                restored[name] = names
+    return restored
+
+
+class SensorWindowCheckpointer:
+    """Background thread that saves sensor windows every ``checkpoint_interval_s`` seconds."""
+
+    def __init__(
+        self,
+        snapshots: Mapping[str, SensorSnapshot],
+        path: Optional[str] = None,
+        interval_s: Optional[float] = None,
+        max_age_s: Optional[float] = None,
+    ) -> None:
+        self.snapshots = dict(snapshots)
+        self.path = Path(path or WARM_START.get("path"))
+        self.interval_s = max(1.0, float(interval_s if interval_s is not None else WARM_START.get("checkpoint_interval_s", 30)))
+        self.max_age_s = float(max_age_s if max_age_s is not None else WARM_START.get("max_age_s", 300))
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def restore(self) -> Dict[str, List[str]]:
+        restored = load_checkpoint(self.path, self.snapshots, self.max_age_s)
+        if restored:
+            logger.info("Warm start: restored sensor windows %s", restored)
+        return restored
+
+    def checkpoint(self) -> None:
+        try:
+            save_checkpoint(self.path, self.snapshots)
+        except OSError as exc:
+            logger.warning("Sensor checkpoint failed: %s", exc)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="sensor-checkpoint", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2.0)
+        self.checkpoint()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval_s):
+            self.checkpoint()
+
+
+__all__ = ["SensorWindowCheckpointer", "save_checkpoint", "load_checkpoint"]
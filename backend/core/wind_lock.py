@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""Wind-lock evaluation from a 360-bin direction table with hysteresis.
+
+Every group with ``wind_upwind_deg`` ranges gets one bit. Two tables map
+the wind direction (1° bins) to a bitmask of groups:
+
+* ``lock`` – the configured ranges; entering one locks the group,
+* ``hold`` – the ranges widened by ``hysteresis_deg`` on both sides; a
+  locked group stays locked while the wind is still inside them.
+
+On top of the angular band, a group leaves the lock only after the wind
+has stayed outside for ``release_s`` (temporal hysteresis). Locking is
+never delayed – it protects the vents. A tick is a table lookup plus work
+proportional to the groups that actually change, and every avoided
+unlock/lock pair saves a vent move and two EventLog writes.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+BINS = 360
+# ponowna blokada w tym czasie po zwolnieniu liczy się jako "trzepotanie"
+FLAP_WINDOW_S = 600.0
+
+
+def direction_bin(direction: float) -> int:
+    return int(float(direction) % 360.0 + 0.5) % BINS
+
+
+def _in_range(direction: float, start: float, end: float) -> bool:
+    if start == end:
+        return True  # jak dotąd: zakres o zerowej szerokości oznacza pełne koło
+    if start <= end:
+        return start <= direction <= end
+    return direction >= start or direction <= end
+
+
+def _widened(start: float, end: float, margin: float) -> Optional[Tuple[float, float]]:
+    """Range grown by ``margin`` on both sides; None when it covers the full circle."""
+    width = (end - start) % 360.0
+    if start == end or width + 2.0 * margin >= 360.0:
+        return None
+    return ((start - margin) % 360.0, (end + margin) % 360.0)
+
+
+def _bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def compile_tables(
+    ranges: Sequence[Sequence[Tuple[float, float]]], hysteresis_deg: float
+) -> Tuple[List[int], List[int]]:
+    """``(lock, hold)`` bitmask tables for the group ranges (index = group bit)."""
+    lock = [0] * BINS
+    hold = [0] * BINS
+    margin = max(0.0, float(hysteresis_deg))
+    for idx, group_ranges in enumerate(ranges):
+        bit = 1 << idx
+        for start, end in group_ranges:
+            wide = _widened(start, end, margin)
+            for deg in range(BINS):
+                if _in_range(deg, start, end):
+                    lock[deg] |= bit
+                if wide is None or _in_range(deg, *wide):
+                    hold[deg] |= bit
+    return lock, hold
+
+
+class _GroupStats:
+    __slots__ = ("locks", "unlocks", "flaps", "held_by_angle", "held_by_delay", "release_cancelled", "last_unlock")
+
+    def __init__(self) -> None:
+        self.locks = 0
+        self.unlocks = 0
+        self.flaps = 0              # blokada w FLAP_WINDOW_S po zwolnieniu
+        self.held_by_angle = 0      # wyjście z zakresu, które zatrzymał pas histerezy kątowej
+        self.held_by_delay = 0      # zwolnienia odłożone o release_s
+        self.release_cancelled = 0  # ... z których wiatr wrócił przed czasem (uniknięty ruch)
+        self.last_unlock: Optional[float] = None
+
+    def as_dict(self) -> Dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__ if name != "last_unlock"}
+
+
+class WindLock:
+    """Locked-group bitmask of the vent groups, updated once per tick."""
+
+    def __init__(self, hysteresis_deg: float = 0.0, release_s: float = 0.0) -> None:
+        self.hysteresis_deg = max(0.0, float(hysteresis_deg))
+        self.release_s = max(0.0, float(release_s))
+        self.group_ids: List[str] = []
+        self._index: Dict[str, int] = {}
+        self.lockable = 0
+        self.locked = 0
+        self.lock_table: List[int] = [0] * BINS
+        self.hold_table: List[int] = [0] * BINS
+        self._ranges: List[List[Tuple[float, float]]] = []
+        self._raw = 0
+        self._release_since: Dict[int, float] = {}
+        self._stats: Dict[str, _GroupStats] = {}
+        self.compiles = 0
+
+    def rebuild(self, groups: Mapping[str, dict]) -> None:
+        """New group set; the current lock state is read back from the groups."""
+        self.group_ids = list(groups)
+        self._index = {gid: idx for idx, gid in enumerate(self.group_ids)}
+        self._ranges = [list(group.get("_wind_ranges") or []) for group in groups.values()]
+        self.lockable = 0
+        self.locked = 0
+        for idx, group in enumerate(groups.values()):
+            if self._ranges[idx] and group.get("wind_lock_enabled", True):
+                self.lockable |= 1 << idx
+            if group.get("wind_locked"):
+                self.locked |= 1 << idx
+        self._raw = self.locked
+        self._release_since = {}
+        self._stats = {gid: self._stats.get(gid) or _GroupStats() for gid in self.group_ids}
+        self._compile()
+
+    def configure(self, hysteresis_deg: float, release_s: float) -> None:
+        hysteresis_deg = max(0.0, float(hysteresis_deg))
+        self.release_s = max(0.0, float(release_s))
+        if hysteresis_deg != self.hysteresis_deg:
+            self.hysteresis_deg = hysteresis_deg
+            self._compile()
+
+    def _compile(self) -> None:
+        self.lock_table, self.hold_table = compile_tables(self._ranges, self.hysteresis_deg)
+        self.compiles += 1
+
+    def update(self, direction: Optional[float], enabled: bool, now: float) -> int:
+        """New locked mask; groups without ranges, or with the lock disabled, unlock at once."""
+        active = self.lockable if enabled else 0
+        previous = self.locked
+        if direction is None:
+            raw = held = 0
+        else:
+            deg = direction_bin(direction)
+            raw = self.lock_table[deg] & active
+            held = self.hold_table[deg] & previous & active
+        wanted = raw | held
+        for idx in _bits(held & ~raw & self._raw):
+            self._stats[self.group_ids[idx]].held_by_angle += 1
+        releasing = previous & active & ~wanted
+        for idx in list(self._release_since):
+            if not (releasing >> idx) & 1:
+                # wiatr wrócił w zakres (albo blokada wyłączona) zanim minęło release_s
+                del self._release_since[idx]
+                if (wanted >> idx) & 1:
+                    self._stats[self.group_ids[idx]].release_cancelled += 1
+        if self.release_s > 0:
+            for idx in _bits(releasing):
+                since = self._release_since.get(idx)
+                if since is None:
+                    self._release_since[idx] = since = now
+                    self._stats[self.group_ids[idx]].held_by_delay += 1
+                if now - since < self.release_s:
+                    wanted |= 1 << idx
+                else:
+                    del self._release_since[idx]
+        for idx in _bits(wanted ^ previous):
+            stats = self._stats[self.group_ids[idx]]
+            if (wanted >> idx) & 1:
+                stats.locks += 1
+                if stats.last_unlock is not None and now - stats.last_unlock < FLAP_WINDOW_S:
+                    stats.flaps += 1
+            else:
+                stats.unlocks += 1
+                stats.last_unlock = now
+        self._raw = raw
+        self.locked = wanted
+        return wanted
+
+    @property
+    def release_pending(self) -> bool:
+        """Some group is out of its range but still waiting out ``release_s``."""
+        return bool(self._release_since)
+
+    def is_locked(self, group_id: str) -> bool:
+        idx = self._index.get(group_id)
+        return idx is not None and bool((self.locked >> idx) & 1)
+
+    def changed(self, previous: int) -> List[str]:
+        return [self.group_ids[idx] for idx in _bits(previous ^ self.locked)]
+
+    def stats(self) -> Dict[str, object]:
+        groups = {
+            gid: {**self._stats[gid].as_dict(), "locked": bool((self.locked >> idx) & 1)}
+            for idx, gid in enumerate(self.group_ids)
+        }
+        totals = {key: sum(item[key] for item in groups.values()) for key in _GroupStats().as_dict()}
+        return {
+            "hysteresis_deg": self.hysteresis_deg,
+            "release_s": self.release_s,
+            "flap_window_s": FLAP_WINDOW_S,
+            "totals": totals,
+            "groups": groups,
+        }
+
+
+__all__ = ["BINS", "FLAP_WINDOW_S", "WindLock", "compile_tables", "direction_bin"]
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""Several greenhouses/tunnels (zones) controlled by one process.
+
+Each zone has its own vents, groups, plan, control params and sensors, and
+its own :class:`~backend.core.controller.Controller`. The zones share the
+rest of the stack: one asyncio loop and thread (:class:`ZoneRegistry`), one
+MQTT connection, one RS485 manager and one database.
+
+The primary zone (``main``) is the configuration the app always had: the
+top-level ``control``, ``vent_groups``, ``vent_plan`` and ``sensors``
+sections and every vent not claimed by another zone. Additional zones come
+from the ``zones`` section of ``settings.yaml``. A zone's own sensors (e.g.
+``internal_temp`` on its own topic) are read from its own sensor bus; the
+remaining readings (weather station: wind, rain, outside temperature) are
+shared with the primary zone. Heating stays with the primary zone.
+
+A zone's ``control`` is layered over the top-level ``control`` section: keys
+the zone sets are its own, every other key follows the live ``CONTROL``
+(changes through ``POST /api/control`` included). With more than one zone,
+every zone ticks as its own task on the shared loop, so a long vent move in
+one zone does not hold up a critical close in another.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import ChainMap
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable, List, MutableMapping, Optional, Tuple
+
+from backend.core import config as core_config
+from backend.core.models import SensorSnapshot
+from backend.core.payload_decoders import PayloadDecoder, build_decoders
+
+if TYPE_CHECKING:  # pragma: no cover - tylko dla typów (controller importuje ten moduł)
+    from backend.core.controller import Controller
+
+PRIMARY_ZONE = "main"
+
+
+class ZoneSensors:
+    """Averages of one zone: own sensors from the zone bus, the rest shared."""
+
+    def __init__(self, own: SensorSnapshot, names: Iterable[str], shared: SensorSnapshot) -> None:
+        self.own = own
+        self.names = frozenset(name for name in names if name in SensorSnapshot.__dataclass_fields__)
+        self.shared = shared
+
+    def averages(self) -> Dict[str, Optional[float]]:
+        values = self.shared.averages()
+        for name in self.names:
+            # brak odczytu własnego czujnika to None – nie wartość z sąsiedniego tunelu
+            values[name] = getattr(self.own, name).avg()
+        return values
+
+
+@dataclass
+class Zone:
+    id: str
+    name: str
+    control: MutableMapping[str, Any]
+    vent_groups: List[dict]
+    vent_plan_stages: List[dict]
+    close_strategy: str
+    sensors: object  # averages() -> dict
+    own_sensors: FrozenSet[str] = frozenset()
+    vent_ids: Optional[FrozenSet[int]] = None  # None: wszystkie wietrzniki poza ``claimed``
+    claimed: FrozenSet[int] = frozenset()
+
+    @property
+    def primary(self) -> bool:
+        return self.id == PRIMARY_ZONE
+
+    def owns(self, vent_id: int) -> bool:
+        if self.vent_ids is not None:
+            return vent_id in self.vent_ids
+        return vent_id not in self.claimed
+
+    def vent_specs(self, specs: Iterable[dict]) -> List[dict]:
+        """Wietrzniki strefy z pełnej listy ``VENTS`` (instalator edytuje ją dla całego obiektu)."""
+        return [spec for spec in specs if self.owns(int(spec["id"]))]
+
+    def setting_key(self, key: str) -> str:
+        """Klucz ``Setting``/``RuntimeState``; strefa główna zachowuje dotychczasowe klucze."""
+        return key if self.primary else f"zone.{self.id}.{key}"
+
+
+def zone_sensor_decoders(zones: Iterable[dict]) -> Dict[str, Tuple[str, PayloadDecoder]]:
+    """Temat MQTT -> (strefa, dekoder) dla własnych czujników stref (``json_path``/``scale`` jak w ``sensors``)."""
+    topics: Dict[str, Tuple[str, PayloadDecoder]] = {}
+    for zone in zones:
+        decoders = build_decoders(zone.get("sensors", {}), known=SensorSnapshot.__dataclass_fields__, include_plain=True)
+        for topic, decoder in decoders.items():
+            topics[topic] = (zone["id"], decoder)
+    return topics
+
+
+def primary_zone() -> Zone:
+    from backend.core.mqtt_client import sensor_bus
+
+    claimed = frozenset(vid for zone in core_config.ZONES for vid in zone["vents"])
+    return Zone(
+        id=PRIMARY_ZONE,
+        name="main",
+        control=core_config.CONTROL,
+        vent_groups=core_config.VENT_GROUPS,
+        vent_plan_stages=core_config.VENT_PLAN_STAGES,
+        close_strategy=core_config.VENT_PLAN_CLOSE_STRATEGY,
+        sensors=sensor_bus,
+        claimed=claimed,
+    )
+
+
+def build_zone(cfg: dict, own_bus: Optional[SensorSnapshot] = None) -> Zone:
+    """Strefa dodatkowa z wpisu ``zones``; progi strefy nad bieżącym ``control`` (nie kopią z chwili startu)."""
+    from backend.core.mqtt_client import sensor_bus
+
+    sensors = dict(cfg.get("sensors") or {})
+    view = ZoneSensors(own_bus if own_bus is not None else SensorSnapshot(), sensors, sensor_bus)
+    return Zone(
+        id=cfg["id"],
+        name=cfg.get("name") or cfg["id"],
+        # zapisy (update_config strefy) trafiają do pierwszej warstwy, reszta czytana z CONTROL
+        control=ChainMap(dict(cfg.get("control", {})), core_config.CONTROL),
+        vent_groups=list(cfg.get("vent_groups", [])),
+        vent_plan_stages=list(cfg.get("vent_plan_stages", [])),
+        close_strategy=cfg.get("close_strategy", "fifo"),
+        sensors=view,
+        own_sensors=view.names,
+        vent_ids=frozenset(cfg.get("vents", [])),
+    )
+
+
+def extra_zones() -> List[Zone]:
+    from backend.core.mqtt_client import zone_sensor_buses
+
+    return [build_zone(cfg, zone_sensor_buses.get(cfg["id"])) for cfg in core_config.ZONES]
+
+
+class ZoneRegistry:
+    """Controllers of all zones driven by one thread and one asyncio loop."""
+
+    def __init__(self, primary: "Controller", secondary: Optional[List["Controller"]] = None) -> None:
+        self.primary = primary
+        self.secondary: List["Controller"] = list(secondary or [])
+        self._by_id: Dict[str, "Controller"] = {PRIMARY_ZONE: primary}
+        for controller in self.secondary:
+            self._by_id[controller.zone.id] = controller
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def build(cls, primary: "Controller", factory: Callable[[Zone], "Controller"], zones: Optional[List[Zone]] = None) -> "ZoneRegistry":
+        return cls(primary, [factory(zone) for zone in (extra_zones() if zones is None else zones)])
+
+    def ids(self) -> List[str]:
+        return list(self._by_id)
+
+    def get(self, zone_id: Optional[str]) -> Optional["Controller"]:
+        return self._by_id.get(zone_id or PRIMARY_ZONE)
+
+    def controllers(self) -> List["Controller"]:
+        return [self.primary, *self.secondary]
+
+    def for_vent(self, vent_id: int) -> Optional["Controller"]:
+        for controller in self.controllers():
+            if vent_id in controller.vents:
+                return controller
+        return None
+
+    def describe(self) -> List[dict]:
+        return [
+            {
+                "id": zone_id,
+                "name": getattr(getattr(controller, "zone", None), "name", zone_id),
+                "mode": getattr(controller, "mode", None),
+                "vents": sorted(getattr(controller, "vents", {})),
+            }
+            for zone_id, controller in self._by_id.items()
+        ]
+
+    def apply_site_config(
+        self,
+        vents: Optional[List[dict]] = None,
+        boneio_devices: Optional[List[dict]] = None,
+        control: Optional[dict] = None,
+    ) -> None:
+        """Wietrzniki, BoneIO i wspólne ``control`` dotyczą obiektu: po zmianie w strefie głównej pozostałe strefy nadążają."""
+        for controller in self.secondary:
+            if vents is not None or boneio_devices is not None:
+                controller._reconfigure(vents=vents, devices=boneio_devices)
+            if control:
+                controller._refresh_schedules()  # klucze bez nadpisania strefy czytane z CONTROL
+
+    def start(self) -> None:
+        if not self.secondary:
+            self.primary.start()  # jedna strefa: jak dotąd, własny wątek kontrolera
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="zones", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        for controller in self.controllers():
+            controller.stop()
+
+    def attach_event_loop(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> asyncio.AbstractEventLoop:
+        """Jedna pętla asyncio dla ruchów wietrzników wszystkich stref."""
+        loop = loop or asyncio.new_event_loop()
+        for controller in self.controllers():
+            controller.attach_event_loop(loop)
+        return loop
+
+    def step_all(self):
+        """Jeden tick każdej strefy, strefy równolegle na wspólnej pętli; zwraca parametry strefy głównej."""
+
+        async def ticks():
+            return await asyncio.gather(*(controller.step_async() for controller in self.controllers()))
+
+        return self.primary._async_loop.run_until_complete(ticks())[0]
+
+    async def _zone_loop(self, controller: "Controller") -> None:
+        # każda strefa we własnym rytmie: długi ruch jednej nie opóźnia ticku (np. zamknięcia przy wichurze) innej
+        while self._running:
+            params = await controller.step_async()
+            await controller._ticker.wait_async(params.controller_loop_s)
+
+    async def _run_zones(self) -> None:
+        await asyncio.gather(*(self._zone_loop(controller) for controller in self.controllers()))
+
+    def _loop(self) -> None:
+        loop = self.attach_event_loop()
+        self.primary._heating_actuator.start_thread()  # grzanie tylko w strefie głównej
+        loop.run_until_complete(self._run_zones())
+
+
+__all__ = [
+    "PRIMARY_ZONE",
+    "Zone",
+    "ZoneRegistry",
+    "ZoneSensors",
+    "build_zone",
+    "extra_zones",
+    "primary_zone",
+    "zone_sensor_decoders",
+]
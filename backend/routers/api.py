@@ -1,18 +1,21 @@
 ﻿# -*- coding: utf-8 -*-
 # backend/routers/api.py - REST API for dashboard
+import os
 from typing import Dict, List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
 
 from backend.core.config import CONTROL
 from backend.core.db import SessionLocal, SensorLog, Setting
+from backend.core.remote_control import RemoteController, SnapshotUnavailable
+from backend.core.sensor_history import dumps as dump_history
 from backend.core.notifications import (
     DEFAULT_PREFERENCES,
     get_notification_preferences,
     list_notifications,
     set_notification_preferences,
 )
-from backend.core.mqtt_client import sensor_bus
+from backend.core.mqtt_client import router_stats
 from backend.core.schemas import (
     HeatingConfigDTO,
     SensorHistoryDTO,
@@ -21,13 +24,19 @@ from backend.core.schemas import (
     VentGroupDTO,
 )
 from backend.core.security import require_admin
+from backend.core.zones import PRIMARY_ZONE
 
 
-def _controller():
-    """Lazy reference to the controller instance from FastAPI app."""
-    from backend.app import controller  # lazy import to avoid circular deps
+def _controller(zone: Optional[str] = None):
+    """Lazy reference to the controller of ``zone`` (primary zone by default)."""
+    from backend.app import controller, zones  # lazy import to avoid circular deps
 
-    return controller
+    if zone is None or zone == PRIMARY_ZONE:
+        return controller
+    found = zones.get(zone) if zones is not None else None
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown zone: {zone}")
+    return found
 
 
 def _update_manager():
@@ -40,9 +49,18 @@ def _update_manager():
 router = APIRouter()
 
 
+@router.get("/zones")
+def get_zones():
+    from backend.app import zones  # lazy import to avoid circular deps
+
+    if zones is None:
+        raise HTTPException(status_code=503, detail="Controller not ready")
+    return {"zones": zones.describe()}
+
+
 @router.get("/state", response_model=StateDTO)
-def get_state():
-    controller = _controller()
+def get_state(zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
     if controller is None:
         raise HTTPException(status_code=503, detail="Controller not ready")
 
@@ -57,16 +75,17 @@ def get_state():
         )
         for v in controller.vents.values()
     ]
-    sensors: Dict[str, float | None] = sensor_bus.averages()
+    sensors: Dict[str, float | None] = controller.zone.sensors.averages()
     groups = controller.export_groups() if controller else []
     heating_cfg = controller.export_heating() if controller else None
     return StateDTO(
         mode=controller.mode,
         vents=vent_models,
         sensors=sensors,
-        config=dict(CONTROL),
+        config=dict(controller.zone.control),
         groups=[VentGroupDTO(**g) for g in groups],
         heating=HeatingConfigDTO(**heating_cfg) if heating_cfg else None,
+        derived=controller.export_environment_snapshot().get("derived", {}),
     )
 
 
@@ -99,11 +118,75 @@ def manual_update_run(_: None = Depends(require_admin)):
     return result
 
 
+@router.get("/diagnostics/startup")
+def get_startup_diagnostics():
+    from backend.app import STARTUP_TIMINGS  # lazy import to avoid circular deps
+
+    return {"phases_ms": dict(STARTUP_TIMINGS), "updater_ready": _update_manager() is not None}
+
+
+@router.get("/diagnostics/mqtt")
+def get_mqtt_diagnostics():
+    return router_stats()
+
+
+@router.get("/diagnostics/boneio")
+def get_boneio_diagnostics(zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
+    if controller is None:
+        raise HTTPException(status_code=503, detail="Controller not ready")
+    return {"devices": controller.dispatch_stats(), "relays": controller.relay_stats()}
+
+
+@router.get("/diagnostics/loops")
+def get_loop_diagnostics():
+    from backend.app import scheduler  # lazy import to avoid circular deps
+
+    controller = _controller()
+    if controller is None:
+        raise HTTPException(status_code=503, detail="Controller not ready")
+    return {
+        "controller": controller.loop_stats(),
+        "scheduler": scheduler.loop_stats() if scheduler is not None else None,
+    }
+
+
+@router.get("/diagnostics/process")
+def get_process_diagnostics():
+    from backend.app import PROCESS_LAYOUT, remote_state  # lazy import to avoid circular deps
+
+    if remote_state is None:
+        return {"mode": PROCESS_LAYOUT.get("mode"), "pid": os.getpid(), "snapshot": None}
+    try:
+        publisher = remote_state.current().get("publisher")
+    except SnapshotUnavailable:
+        publisher = None
+    return {
+        "mode": PROCESS_LAYOUT.get("mode"),
+        "pid": os.getpid(),
+        "snapshot": remote_state.reader.stats(),
+        "publisher": publisher,
+    }
+
+
+@router.get("/diagnostics/wind-lock")
+def get_wind_lock_diagnostics(zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
+    if controller is None:
+        raise HTTPException(status_code=503, detail="Controller not ready")
+    return controller.wind_lock_stats()
+
+
 @router.get("/history", response_model=List[SensorHistoryDTO])
-def get_history(limit: int = Query(200, ge=10, le=2000)):
+def get_history(limit: int = Query(200, ge=10, le=2000), zone: Optional[str] = Query(None)):
     with SessionLocal() as session:
+        query = session.query(SensorLog)
+        if zone and zone != PRIMARY_ZONE:
+            query = query.filter(SensorLog.name.like(f"{zone}.%"))  # własne czujniki strefy
+        else:
+            query = query.filter(~SensorLog.name.contains("."))  # bez wierszy "<strefa>.<czujnik>"
         rows = (
-            session.query(SensorLog)
+            query
             .order_by(SensorLog.ts.desc())
             .limit(limit)
             .all()
@@ -111,6 +194,30 @@ def get_history(limit: int = Query(200, ge=10, le=2000)):
     return [SensorHistoryDTO(ts=row.ts, name=row.name, value=row.value) for row in rows]
 
 
+@router.get("/history/recent")
+def get_recent_history(
+    minutes: float = Query(60.0, gt=0, le=7 * 24 * 60),
+    names: Optional[List[str]] = Query(None),
+    zone: Optional[str] = Query(None),
+):
+    """Readings of the last ``minutes`` (up to the newest sample) from memory, with window statistics."""
+    controller = _controller(zone)
+    if isinstance(controller, RemoteController):
+        # process_layout.mode: split – bufory są w procesie sterowania, nie w workerze API
+        raise HTTPException(status_code=501, detail="Recent sensor history is not served by API workers in split mode")
+    history = getattr(controller, "history", None)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Sensor history not available")
+    payload = {
+        "zone": controller.zone.id,
+        "minutes": minutes,
+        "resolution_s": history.resolution_s,
+        "sensors": history.series(names, minutes * 60.0),
+    }
+    # okna to widoki na bufory – serializowane bez pośrednich list Pythona
+    return Response(content=dump_history(payload), media_type="application/json")
+
+
 @router.get("/notifications")
 def get_notifications(
     limit: int = Query(50, ge=1, le=200),
@@ -140,21 +247,35 @@ def update_notification_preferences_handler(payload: Dict[str, bool]):
 
 
 @router.post("/control")
-def update_control(payload: Dict[str, float | int | bool]):
-    controller = _controller()
+def update_control(payload: Dict[str, float | int | bool], zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
+    if controller is not None:
+        # kontroler zmienia i zapisuje progi (strefa główna: CONTROL, pozostałe: zone.<id>.control.*);
+        # w trybie split robi to proces sterowania – CONTROL workera zostaje nietknięty
+        controller.update_config(control=payload)
+        if controller.zone.primary:
+            _propagate_control(payload)
+        return {"ok": True, "control": dict(controller.zone.control)}
     CONTROL.update(payload)
     with SessionLocal() as session:
         for key, value in payload.items():
             session.merge(Setting(key=f"control.{key}", value=str(value)))
         session.commit()
-    if controller:
-        controller.update_config(control=payload)
+    _propagate_control(payload)
     return {"ok": True, "control": CONTROL}
 
 
+def _propagate_control(payload: Dict[str, object]) -> None:
+    """Pozostałe strefy czytają nienadpisane progi z ``CONTROL`` – odświeżają harmonogramy."""
+    from backend.app import zones  # lazy import to avoid circular deps
+
+    if zones is not None and payload:
+        zones.apply_site_config(control=payload)
+
+
 @router.post("/mode")
-def set_mode(payload=Body(...)):
-    controller = _controller()
+def set_mode(payload=Body(...), zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
     if controller is None:
         raise HTTPException(status_code=503, detail="Controller not ready")
     mode = payload.get("mode", "auto")
@@ -163,8 +284,8 @@ def set_mode(payload=Body(...)):
 
 
 @router.post("/vents/all")
-def set_all(p=Body(...)):
-    controller = _controller()
+def set_all(p=Body(...), zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
     if controller is None:
         raise HTTPException(status_code=503, detail="Controller not ready")
     pct = float(p.get("position", 0))
@@ -173,8 +294,8 @@ def set_all(p=Body(...)):
 
 
 @router.post("/vents/group/{group_id}")
-def set_group(group_id: str, p=Body(...)):
-    controller = _controller()
+def set_group(group_id: str, p=Body(...), zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
     if controller is None:
         raise HTTPException(status_code=503, detail="Controller not ready")
     pct = float(p.get("position", 0))
@@ -183,8 +304,8 @@ def set_group(group_id: str, p=Body(...)):
 
 
 @router.post("/vents/{vent_id}")
-def set_one(vent_id: int, p=Body(...)):
-    controller = _controller()
+def set_one(vent_id: int, p=Body(...), zone: Optional[str] = Query(None)):
+    controller = _controller(zone)
     if controller is None:
         raise HTTPException(status_code=503, detail="Controller not ready")
     pct = float(p.get("position", 0))
@@ -2,13 +2,15 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import socket
 import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Set
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
 from backend.core.config import (
     CONTROL,
@@ -65,8 +67,8 @@ from backend.core.installer_schemas import (
     TestPingResponse,
     TestPingResult,
 )
-from backend.core.panel_utils import build_sensor_overview, build_test_overview
 from backend.core import test_mode
+from backend.core.log_tail import LineFilter, log_tail_reader
 from backend.core.security import require_admin
 
 
@@ -81,17 +83,41 @@ def _controller():
     return controller
 
 
+def _reconfigure_zones(**kwargs) -> None:
+    """Wietrzniki i BoneIO są wspólne dla wszystkich stref – pozostałe strefy biorą swój podzbiór."""
+    from backend.app import zones
+
+    if zones is not None:
+        zones.apply_site_config(**kwargs)
+
+
 def _persist_setting(key: str, value: object) -> None:
     with SessionLocal() as session:
         session.merge(Setting(key=key, value=json.dumps(value)))
         session.commit()
 
 
+def _site_config(ctrl) -> dict:
+    """Wietrzniki, BoneIO i połączenie zewnętrzne z kontrolera; w trybie split globalne listy workera są nieaktualne."""
+    if ctrl:
+        return ctrl.export_site_config()
+    return {
+        "vents": export_vent_configuration(),
+        "boneio": export_boneio_configuration(),
+        "external": export_external_configuration(),
+    }
+
+
+def _control_values(ctrl) -> dict:
+    return dict(ctrl.zone.control) if ctrl else dict(CONTROL)
+
+
 def _current_snapshot() -> InstallerConfigSnapshot:
     ctrl = _controller()
-    boneio_models = boneio_payload_to_models(export_boneio_configuration())
+    site = _site_config(ctrl)
+    boneio_models = boneio_payload_to_models(site["boneio"])
     boneio_ids = [device.id for device in boneio_models]
-    vent_models = vents_payload_to_models(export_vent_configuration(), boneio_ids)
+    vent_models = vents_payload_to_models(site["vents"], boneio_ids)
     vent_ids = [vent.id for vent in vent_models]
 
     if ctrl:
@@ -106,10 +132,10 @@ def _current_snapshot() -> InstallerConfigSnapshot:
     group_models = groups_payload_to_models(group_dicts, vent_ids)
     plan_model = plan_payload_to_model(plan_dict, [group.id for group in group_models])
     heating_model = heating_payload_to_model(heating_dict)
-    external_model = external_payload_to_model(export_external_configuration())
+    external_model = external_payload_to_model(site["external"])
 
     return InstallerConfigSnapshot(
-        control=dict(CONTROL),
+        control=_control_values(ctrl),
         heating=heating_model,
         boneio=boneio_models,
         vents=vent_models,
@@ -123,6 +149,8 @@ LOG_KIND_PATHS = {
     "system": LOG_DIR / "system.log",
     "mqtt": LOG_DIR / "mqtt.log",
 }
+LOG_FOLLOW_POLL_S = 0.5
+LOG_FOLLOW_KEEPALIVE_S = 15.0
 
 DEFAULT_PING_TARGETS = ("api", "internet", "external")
 PING_TIMEOUT = 1.0
@@ -158,6 +186,8 @@ def _state_to_model(state: Dict[str, Any]) -> TestModeState:
 
 
 def _build_test_status(ctrl) -> TestStatusResponse:
+    from backend.core.panel_utils import build_sensor_overview, build_test_overview
+
     overview = build_test_overview(ctrl)
     sensor_overview = build_sensor_overview(ctrl)
 
@@ -171,6 +201,7 @@ def _build_test_status(ctrl) -> TestStatusResponse:
                 device=device.get("device", "unknown"),
                 vents=vents,
                 all_available=bool(device.get("all_available", True)),
+                online=bool(device.get("online", True)),
             )
         )
 
@@ -191,36 +222,64 @@ def _build_test_status(ctrl) -> TestStatusResponse:
     )
 
 
-def _read_log_lines(path: Path) -> List[str]:
-    if not path.exists():
-        return []
-    try:
-        with path.open("r", encoding="utf-8") as handle:
-            lines = handle.readlines()
-    except UnicodeDecodeError:
-        with path.open("r", encoding="latin-1", errors="replace") as handle:
-            lines = handle.readlines()
-    return [line.rstrip("\r\n") for line in lines]
-
-
-def _get_logs(kind: str, limit: int, offset: int) -> TestLogsResponse:
+def _log_path(kind: str) -> Tuple[str, Path]:
     key = kind.lower()
     if key not in LOG_KIND_PATHS:
         raise HTTPException(status_code=400, detail="Unsupported log kind")
+    return key, LOG_KIND_PATHS[key]
+
+
+def _log_filter(level: Optional[str], contains: Optional[str]) -> LineFilter:
+    try:
+        return LineFilter.build(level, contains)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _get_logs(
+    kind: str,
+    limit: int,
+    offset: int,
+    level: Optional[str] = None,
+    contains: Optional[str] = None,
+) -> TestLogsResponse:
+    key, path = _log_path(kind)
     limit = max(1, min(limit, 500))
     offset = max(0, offset)
-    lines = list(reversed(_read_log_lines(LOG_KIND_PATHS[key])))
-    total = len(lines)
-    entries = lines[offset : offset + limit]
+    page = log_tail_reader.page(path, offset=offset, limit=limit, line_filter=_log_filter(level, contains))
     return TestLogsResponse(
         kind=key,
-        entries=entries,
-        total=total,
+        entries=page.entries,
+        total=page.total,
         offset=offset,
         limit=limit,
+        has_more=page.has_more,
     )
 
 
+async def _follow_log(path: Path, line_filter: LineFilter, backlog: int, request: Request):
+    """Strumień SSE: najpierw ``backlog`` ostatnich linii, potem nowe linie w miarę dopisywania."""
+    _, position = log_tail_reader.read_from(path, None)
+    if backlog > 0:
+        page = log_tail_reader.page(path, limit=backlog, line_filter=line_filter)
+        for line in reversed(page.entries):
+            yield f"data: {line}\n\n"
+    idle = 0.0
+    while not await request.is_disconnected():
+        lines, position = log_tail_reader.read_from(path, position)
+        for line in lines:
+            if line_filter.matches(line):
+                yield f"data: {line}\n\n"
+        if lines:
+            idle = 0.0
+        else:
+            idle += LOG_FOLLOW_POLL_S
+            if idle >= LOG_FOLLOW_KEEPALIVE_S:
+                idle = 0.0
+                yield ": keepalive\n\n"
+        await asyncio.sleep(LOG_FOLLOW_POLL_S)
+
+
 def _ping_target(name: str, host: str, port: int) -> TestPingResult:
     start = time.perf_counter()
     try:
@@ -315,9 +374,30 @@ def get_test_logs(
     kind: str = "system",
     limit: int = 100,
     offset: int = 0,
+    level: Optional[str] = None,
+    q: Optional[str] = None,
+    _: None = Depends(require_admin),
+):
+    return _get_logs(kind, limit, offset, level, q)
+
+
+@test_router.get("/logs/stream")
+async def stream_test_logs(
+    request: Request,
+    kind: str = "system",
+    level: Optional[str] = None,
+    q: Optional[str] = None,
+    backlog: int = 0,
     _: None = Depends(require_admin),
 ):
-    return _get_logs(kind, limit, offset)
+    _, path = _log_path(kind)
+    line_filter = _log_filter(level, q)
+    backlog = max(0, min(backlog, 500))
+    return StreamingResponse(
+        _follow_log(path, line_filter, backlog, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @test_router.post("/ping", response_model=TestPingResponse)
@@ -352,7 +432,7 @@ def get_full_config(_: None = Depends(require_admin)):
 
 @config_router.get("/control", response_model=ControlSettingsResponse)
 def get_control_config(_: None = Depends(require_admin)):
-    sections = build_control_fields()
+    sections = build_control_fields(_control_values(_controller()))
     return ControlSettingsResponse(
         dashboard=sections.get("dashboard", []),
         advanced=sections.get("advanced", []),
@@ -376,7 +456,7 @@ def update_control_config(payload: ControlSettingsPayload, _: None = Depends(req
     else:
         CONTROL.update(sanitized)
 
-    sections = build_control_fields()
+    sections = build_control_fields(_control_values(ctrl))
     return ControlSettingsResponse(
         dashboard=sections.get("dashboard", []),
         advanced=sections.get("advanced", []),
@@ -411,7 +491,7 @@ def update_heating_config(payload: HeatingConfigPayload, _: None = Depends(requi
 
 @config_router.get("/boneio", response_model=List[BoneIODeviceConfigPayload])
 def get_boneio_config(_: None = Depends(require_admin)):
-    return boneio_payload_to_models(export_boneio_configuration())
+    return boneio_payload_to_models(_site_config(_controller())["boneio"])
 
 
 @config_router.post("/boneio", response_model=List[BoneIODeviceConfigPayload])
@@ -422,14 +502,15 @@ def update_boneio_config(
     raw_devices = [item.dict(exclude_unset=True) for item in payload]
     sanitized_models = boneio_payload_to_models(raw_devices)
     sanitized = [model.dict() for model in sanitized_models]
-    current_vent_devices = {str(vent.get("boneio_device") or "boneio_main").strip() for vent in export_vent_configuration()}
+    ctrl = _controller()
+    current_vent_devices = {str(vent.get("boneio_device") or "boneio_main").strip() for vent in _site_config(ctrl)["vents"]}
     sanitized_ids = {model.id for model in sanitized_models}
     missing = sorted(device for device in current_vent_devices if device and device not in sanitized_ids)
     if missing:
         raise HTTPException(status_code=400, detail=f"Nie można usunąć urządzenia BoneIO przypisanego do wietrzników: {', '.join(missing)}")
-    ctrl = _controller()
     if ctrl:
         ctrl.update_config(boneio_devices=sanitized)
+        _reconfigure_zones(boneio_devices=sanitized)
     else:
         BONEIOS.clear()
         BONEIOS.extend(sanitized)
@@ -439,8 +520,9 @@ def update_boneio_config(
 
 @config_router.get("/vents", response_model=List[VentConfigPayload])
 def get_vents_config(_: None = Depends(require_admin)):
-    boneio_ids = [device.id for device in boneio_payload_to_models(export_boneio_configuration())]
-    return vents_payload_to_models(export_vent_configuration(), boneio_ids)
+    site = _site_config(_controller())
+    boneio_ids = [device.id for device in boneio_payload_to_models(site["boneio"])]
+    return vents_payload_to_models(site["vents"], boneio_ids)
 
 
 
@@ -449,13 +531,14 @@ def update_vents_config(
     payload: List[VentConfigPayload] = Body(...),
     _: None = Depends(require_admin),
 ):
-    boneio_ids = [device.id for device in boneio_payload_to_models(export_boneio_configuration())]
+    ctrl = _controller()
+    boneio_ids = [device.id for device in boneio_payload_to_models(_site_config(ctrl)["boneio"])]
     raw_payload = [item.dict(exclude_unset=True) for item in payload]
     sanitized_models = vents_payload_to_models(raw_payload, boneio_ids)
     sanitized = [model.dict() for model in sanitized_models]
-    ctrl = _controller()
     if ctrl:
         ctrl.update_config(vents=sanitized)
+        _reconfigure_zones(vents=sanitized)
     else:
         VENTS.clear()
         VENTS.extend(sanitized)
@@ -465,7 +548,7 @@ def update_vents_config(
 @config_router.get("/groups", response_model=List[VentGroupPayload])
 def get_groups_config(_: None = Depends(require_admin)):
     ctrl = _controller()
-    vent_models = vents_payload_to_models(export_vent_configuration())
+    vent_models = vents_payload_to_models(_site_config(ctrl)["vents"])
     vent_ids = [vent.id for vent in vent_models]
     groups_raw = ctrl.export_groups() if ctrl else export_groups_configuration()
     return groups_payload_to_models(groups_raw, vent_ids)
@@ -476,12 +559,12 @@ def update_groups_config(
     payload: List[VentGroupPayload] = Body(...),
     _: None = Depends(require_admin),
 ):
-    vent_models = vents_payload_to_models(export_vent_configuration())
+    ctrl = _controller()
+    vent_models = vents_payload_to_models(_site_config(ctrl)["vents"])
     vent_ids = [vent.id for vent in vent_models]
     raw_groups = [item.dict(exclude_unset=True) for item in payload]
     sanitized_models = groups_payload_to_models(raw_groups, vent_ids)
     sanitized = [model.dict() for model in sanitized_models]
-    ctrl = _controller()
     if ctrl:
         ctrl.update_config(vent_groups=sanitized)
     else:
@@ -524,7 +607,7 @@ def update_plan_config(payload: VentPlanPayload, _: None = Depends(require_admin
 
 @config_router.get("/external", response_model=ExternalConnectionPayload)
 def get_external_config(_: None = Depends(require_admin)):
-    model = external_payload_to_model(export_external_configuration())
+    model = external_payload_to_model(_site_config(_controller())["external"])
     return ExternalConnectionPayload(**model.dict())
 
 
@@ -546,6 +629,8 @@ def get_sensor_status(_: None = Depends(require_admin)):
     ctrl = _controller()
     if not ctrl:
         raise HTTPException(status_code=503, detail="Controller is not ready yet")
+    from backend.core.panel_utils import build_sensor_overview
+
     overview = build_sensor_overview(ctrl)
     metrics = {name: SensorMetricSchema(**data) for name, data in overview.get("metrics", {}).items()}
     network = [NetworkInterfaceSchema(**item) for item in overview.get("network", [])]
@@ -1,21 +1,30 @@
 # -*- coding: utf-8 -*-
 # backend/routers/ws.py – WebSocket (push aktualizacji)
+from typing import Optional
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from backend.core.mqtt_client import sensor_bus
 import asyncio
 
 router = APIRouter()
 
 @router.websocket("/ws")
-async def ws_endpoint(ws: WebSocket):
-    from backend.app import controller
+async def ws_endpoint(ws: WebSocket, zone: Optional[str] = None):
+    from backend.app import controller, zones
 
+    # /ws?zone=<id> – stan jednej strefy; bez parametru strefa główna
+    if zone is not None and zones is not None and zones.get(zone) is not None:
+        controller = zones.get(zone)
+    elif zone is not None:
+        await ws.close(code=1008)
+        return
     await ws.accept()
     try:
         while True:
             payload = {
+                "zone": controller.zone.id,
                 "mode": controller.mode,
-                "sensors": sensor_bus.averages(),
+                "sensors": controller.zone.sensors.averages(),
+                "derived": controller.export_environment_snapshot().get("derived", {}),
                 "vents": {vid: v.position for vid, v in controller.vents.items()},
             }
             await ws.send_json(payload)
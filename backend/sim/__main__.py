@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""CLI: ``python -m backend.sim --hours 24 --set control.temp_diff_percent=8``."""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+from backend.sim.runner import GreenhouseSimulation, load_plan_file, parse_override
+from backend.sim.weather import SyntheticWeather, TraceWeather
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.sim", description="Greenhouse digital twin on a virtual clock")
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=None, help="ISO start time (default 2024-06-21T00:00)")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="SECTION.KEY=VALUE", help="override control.* or heating.* for this run")
+    parser.add_argument("--plan", default=None, help="YAML with vent_groups/vent_plan to use instead of settings.yaml")
+    parser.add_argument("--weather-csv", default=None, help="weather trace with a timestamp column")
+    parser.add_argument("--t-min", type=float, default=12.0)
+    parser.add_argument("--t-max", type=float, default=27.0)
+    parser.add_argument("--no-scheduler", action="store_true", help="skip daily flush and calibration")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    vent_groups, vent_plan = load_plan_file(args.plan) if args.plan else (None, None)
+    weather = TraceWeather.from_csv(args.weather_csv) if args.weather_csv else SyntheticWeather(t_min=args.t_min, t_max=args.t_max)
+    sim = GreenhouseSimulation(
+        weather=weather,
+        start=args.start,
+        overrides=dict(args.overrides),
+        use_scheduler=not args.no_scheduler,
+        vent_groups=vent_groups,
+        vent_plan=vent_plan,
+    )
+    report = sim.run(args.hours * 3600.0)
+    data = report.as_dict()
+    if args.json:
+        print(json.dumps(data, indent=2))
+        return 0
+    print(f"simulated {report.duration_s / 3600.0:.1f} h in {report.wall_time_s:.2f} s ({report.speedup:.0f}x)")
+    for key, value in data["metrics"].items():
+        print(f"  {key:<24} {value}")
+    print(f"  {'relay_switches_total':<24} {data['relay_switches_total']}")
+    print(f"  {'publishes':<24} {data['publishes']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
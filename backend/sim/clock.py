@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Virtual time shared by the simulated controller loop, actuators and scheduler."""
+from __future__ import annotations
+
+import asyncio
+import heapq
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+class VirtualClock:
+    """Clock that only moves when told to; ``sleep`` advances it instantly."""
+
+    def __init__(self, start: Optional[datetime] = None) -> None:
+        self.start = start or datetime(2024, 6, 21, 0, 0, 0)
+        self._epoch0 = self.start.timestamp()
+        self._elapsed = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return self._elapsed
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def time(self) -> float:
+        return self._epoch0 + self._elapsed
+
+    def now(self) -> datetime:
+        return self.start + timedelta(seconds=self._elapsed)
+
+    def advance(self, seconds: float) -> None:
+        if seconds > 0:
+            self._elapsed += float(seconds)
+
+    def advance_to(self, elapsed: float) -> None:
+        if elapsed > self._elapsed:
+            self._elapsed = float(elapsed)
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def new_event_loop(self) -> "VirtualTimeEventLoop":
+        return VirtualTimeEventLoop(self)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """Event loop whose timers run on a :class:`VirtualClock`.
+
+    When nothing is ready to run, the clock jumps straight to the earliest
+    scheduled timer, so ``asyncio.sleep(travel_time)`` in vents and valves
+    costs no wall time. Only in-process work may be awaited: real I/O would
+    block the loop because time never passes on its own.
+    """
+
+    def __init__(self, clock: VirtualClock) -> None:
+        super().__init__()
+        self._virtual_clock = clock
+
+    def time(self) -> float:
+        return self._virtual_clock.monotonic()
+
+    def _run_once(self) -> None:
+        scheduled = self._scheduled
+        # anulowane timery na czele kopca nie mogą przesuwać zegara
+        while scheduled and scheduled[0]._cancelled:
+            handle = heapq.heappop(scheduled)
+            handle._scheduled = False
+            self._timer_cancelled_count -= 1
+        if not self._ready and scheduled:
+            self._virtual_clock.advance_to(scheduled[0]._when)
+        super()._run_once()
+
+
+__all__ = ["VirtualClock", "VirtualTimeEventLoop"]
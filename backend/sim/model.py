@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Lumped thermal/humidity model of a single-span greenhouse.
+
+One air node with an effective heat capacity (air, crop, top soil layer) and
+one water-vapour balance. Heat flows: solar gain, conduction through the
+cover, ventilation exchange (wind- and buoyancy-driven, scaled by the mean
+vent opening) and heating. Vapour: crop transpiration driven by radiation
+and exchange with outside air; anything above saturation condenses.
+Good enough to compare control strategies, not to size a heating plant.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from backend.core.psychrometrics import absolute_humidity_g_m3, saturation_vapour_pressure_kpa
+from backend.sim.weather import WeatherSample
+
+AIR_DENSITY = 1.2          # kg/m3
+AIR_CP = 1005.0            # J/(kg K)
+LATENT_HEAT = 2450.0       # J/g
+
+
+def saturation_vapour_pressure(temp_c: float) -> float:
+    """Magnus formula, Pa (the same coefficients the controller uses)."""
+    return saturation_vapour_pressure_kpa(temp_c) * 1000.0
+
+
+def absolute_humidity(temp_c: float, rh_percent: float) -> float:
+    """g/m3 of water vapour for a temperature and relative humidity."""
+    return absolute_humidity_g_m3(temp_c, max(0.0, rh_percent))
+
+
+def relative_humidity(temp_c: float, abs_humidity_g_m3: float) -> float:
+    saturated = absolute_humidity(temp_c, 100.0)
+    return max(0.0, min(100.0, abs_humidity_g_m3 / saturated * 100.0))
+
+
+@dataclass
+class GreenhouseParams:
+    floor_area_m2: float = 500.0
+    volume_m3: float = 2000.0
+    cover_area_m2: float = 750.0
+    cover_u_w_m2k: float = 6.0
+    heat_capacity_j_k: float = 2.5e7       # powietrze + rośliny + wierzchnia warstwa gleby
+    solar_transmission: float = 0.7
+    solar_sensible_fraction: float = 0.45  # reszta idzie w transpirację i glebę
+    transpiration_fraction: float = 0.35   # część promieniowania zamieniona na parowanie
+    infiltration_ach: float = 0.5          # wymiany/h przy zamkniętych wietrznikach
+    vent_ach_full: float = 20.0            # wymiany/h przy 100% otwarcia bez wiatru
+    vent_ach_per_ms: float = 6.0           # dodatkowe wymiany/h na 1 m/s wiatru
+    vent_ach_max: float = 80.0
+    heating_power_w: float = 60000.0
+    max_substep_s: float = 30.0
+
+
+@dataclass
+class GreenhouseState:
+    internal_temp: float = 18.0
+    abs_humidity: float = absolute_humidity(18.0, 75.0)
+
+    @property
+    def internal_hum(self) -> float:
+        return relative_humidity(self.internal_temp, self.abs_humidity)
+
+
+class GreenhouseModel:
+    def __init__(self, params: GreenhouseParams | None = None, state: GreenhouseState | None = None) -> None:
+        self.params = params or GreenhouseParams()
+        self.state = state or GreenhouseState()
+
+    def air_changes_per_hour(self, vent_fraction: float, weather: WeatherSample) -> float:
+        p = self.params
+        opening = max(0.0, min(1.0, vent_fraction))
+        driven = opening * (p.vent_ach_full + p.vent_ach_per_ms * max(0.0, weather.wind_speed))
+        return p.infiltration_ach + min(p.vent_ach_max, driven)
+
+    def step(self, dt: float, weather: WeatherSample, vent_fraction: float, heating_fraction: float) -> GreenhouseState:
+        """Integrate ``dt`` seconds with explicit Euler sub-steps."""
+        p = self.params
+        remaining = max(0.0, dt)
+        ach = self.air_changes_per_hour(vent_fraction, weather)
+        flow_m3_s = ach * p.volume_m3 / 3600.0
+        outside_abs = absolute_humidity(weather.external_temp, weather.external_hum)
+        solar_in = p.solar_transmission * max(0.0, weather.solar_w_m2) * p.floor_area_m2
+        q_solar = p.solar_sensible_fraction * solar_in
+        vapour_g_s = p.transpiration_fraction * solar_in / LATENT_HEAT
+        q_heat = max(0.0, min(1.0, heating_fraction)) * p.heating_power_w
+        state = self.state
+        while remaining > 0:
+            h = min(remaining, p.max_substep_s)
+            remaining -= h
+            delta_t = weather.external_temp - state.internal_temp
+            q_cover = p.cover_u_w_m2k * p.cover_area_m2 * delta_t
+            q_vent = flow_m3_s * AIR_DENSITY * AIR_CP * delta_t
+            state.internal_temp += h * (q_solar + q_cover + q_vent + q_heat) / p.heat_capacity_j_k
+            exchange = flow_m3_s * (outside_abs - state.abs_humidity)
+            state.abs_humidity += h * (vapour_g_s + exchange) / p.volume_m3
+            saturated = absolute_humidity(state.internal_temp, 100.0)
+            if state.abs_humidity > saturated:
+                state.abs_humidity = saturated
+            if state.abs_humidity < 0.0:
+                state.abs_humidity = 0.0
+        return state
+
+    def sensors(self) -> dict:
+        return {"internal_temp": self.state.internal_temp, "internal_hum": self.state.internal_hum}
+
+
+__all__ = [
+    "GreenhouseModel",
+    "GreenhouseParams",
+    "GreenhouseState",
+    "absolute_humidity",
+    "relative_humidity",
+    "saturation_vapour_pressure",
+]
@@ -0,0 +1,550 @@
+# -*- coding: utf-8 -*-
+"""Minimal in-process MQTT 3.1.1 broker and client for tests and load runs.
+
+:class:`FakeBroker` listens on localhost (port 0 picks a free one) and speaks
+enough MQTT 3.1.1 for the backend and for paho-based clients: CONNECT with
+will and credentials (accepted, not checked), SUBSCRIBE/UNSUBSCRIBE with
+``+``/``#`` filters, PUBLISH at QoS 0/1/2 (delivered at most at QoS 1),
+retained messages and PING. There is no persistence, no session state and
+no keep-alive enforcement – it stands in for Mosquitto, not replaces it.
+
+:class:`MiniClient` mirrors the part of the asyncio-mqtt ``Client`` API the
+backend uses (async context manager, ``subscribe``, ``publish``,
+``unfiltered_messages``), so it can replace it where the library is missing
+or when a load run needs a client with negligible overhead.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import struct
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from backend.core.mqtt_router import filter_matches as topic_matches
+
+CONNECT, CONNACK, PUBLISH, PUBACK, PUBREC, PUBREL, PUBCOMP = 1, 2, 3, 4, 5, 6, 7
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 10, 11, 12, 13, 14
+
+Payload = Union[None, bytes, bytearray, str, int, float]
+
+
+class MqttProtocolError(Exception):
+    """Malformed packet, refused connection or lost link."""
+
+
+class Message(NamedTuple):
+    topic: str
+    payload: bytes
+    qos: int = 0
+    retain: bool = False
+
+
+class Will(NamedTuple):
+    topic: str
+    payload: Payload = None
+    qos: int = 0
+    retain: bool = False
+
+
+# ---------- kodowanie pakietów ----------
+def _encode_length(length: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def _packet(kind: int, flags: int, body: bytes = b"") -> bytes:
+    return bytes(((kind << 4) | flags,)) + _encode_length(len(body)) + body
+
+
+def _field(data: Union[str, bytes]) -> bytes:
+    raw = data.encode("utf-8") if isinstance(data, str) else bytes(data)
+    return struct.pack("!H", len(raw)) + raw
+
+
+def _read_field(body: bytes, pos: int) -> Tuple[bytes, int]:
+    if pos + 2 > len(body):
+        raise MqttProtocolError("truncated field")
+    (size,) = struct.unpack_from("!H", body, pos)
+    end = pos + 2 + size
+    if end > len(body):
+        raise MqttProtocolError("truncated field")
+    return body[pos + 2:end], end
+
+
+def _payload_bytes(payload: Payload) -> bytes:
+    if payload is None:
+        return b""
+    if isinstance(payload, (bytes, bytearray)):
+        return bytes(payload)
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    return str(payload).encode("ascii")
+
+
+def _publish_packet(topic: str, payload: bytes, qos: int, retain: bool, pid: int = 0) -> bytes:
+    body = _field(topic)
+    if qos:
+        body += struct.pack("!H", pid)
+    return _packet(PUBLISH, (qos << 1) | int(retain), body + payload)
+
+
+def _parse_publish(flags: int, body: bytes) -> Tuple[str, bytes, int, bool, int]:
+    qos = (flags >> 1) & 0x03
+    if qos == 3:
+        raise MqttProtocolError("invalid QoS 3")
+    raw_topic, pos = _read_field(body, 0)
+    pid = 0
+    if qos:
+        (pid,) = struct.unpack_from("!H", body, pos)
+        pos += 2
+    return raw_topic.decode("utf-8"), body[pos:], qos, bool(flags & 0x01), pid
+
+
+class _Framer:
+    """Splits a byte stream into ``(type, flags, body)`` packets."""
+
+    __slots__ = ("_buf",)
+
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[Tuple[int, int, bytes]]:
+        buf = self._buf
+        buf += data
+        packets = []
+        pos, size = 0, len(buf)
+        while size - pos >= 2:
+            length, shift, i = 0, 0, pos + 1
+            complete = False
+            while i < size:
+                byte = buf[i]
+                i += 1
+                length |= (byte & 0x7F) << shift
+                if not byte & 0x80:
+                    complete = True
+                    break
+                shift += 7
+                if shift > 21:
+                    raise MqttProtocolError("remaining length over 4 bytes")
+            # niepełny nagłówek długości albo treść jeszcze w drodze
+            if not complete or i + length > size:
+                break
+            head = buf[pos]
+            packets.append((head >> 4, head & 0x0F, bytes(buf[i:i + length])))
+            pos = i + length
+        if pos:
+            del buf[:pos]
+        return packets
+
+
+# ---------- broker ----------
+class _BrokerSession(asyncio.Protocol):
+    def __init__(self, broker: "FakeBroker") -> None:
+        self.broker = broker
+        self.transport: Optional[asyncio.Transport] = None
+        self.client_id = ""
+        self.subscriptions: Dict[str, int] = {}
+        self._wildcards: List[str] = []
+        self.will: Optional[Tuple[str, bytes, int, bool]] = None
+        self.connected = False
+        self._framer = _Framer()
+        self._pids = itertools.cycle(range(1, 65536))
+
+    def connection_made(self, transport) -> None:  # type: ignore[override]
+        self.transport = transport
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            for kind, flags, body in self._framer.feed(data):
+                self._handle(kind, flags, body)
+        except (MqttProtocolError, struct.error, UnicodeDecodeError):
+            # naruszenie protokołu też kończy się testamentem (MQTT-3.1.2-8)
+            self.transport.close()
+
+    def connection_lost(self, exc) -> None:
+        self.broker._drop(self)
+        if self.will is not None:
+            # zerwane połączenie bez DISCONNECT – broker publikuje testament (LWT)
+            topic, payload, qos, retain = self.will
+            self.will = None
+            self.broker.publish(topic, payload, qos=qos, retain=retain)
+
+    def send(self, data: bytes) -> None:
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.write(data)
+
+    def deliver(self, topic: str, payload: bytes, qos: int, retain: bool = False) -> None:
+        self.send(_publish_packet(topic, payload, qos, retain, next(self._pids) if qos else 0))
+
+    def granted_qos(self, topic: str) -> Optional[int]:
+        granted = self.subscriptions.get(topic)
+        for pattern in self._wildcards:
+            qos = self.subscriptions[pattern]
+            if (granted is None or qos > granted) and topic_matches(pattern, topic):
+                granted = qos
+        return granted
+
+    def _refresh_wildcards(self) -> None:
+        # filtry dokładne sprawdza słownik, dopasowanie tylko dla filtrów z + i #
+        self._wildcards = [p for p in self.subscriptions if "+" in p or "#" in p]
+
+    def _handle(self, kind: int, flags: int, body: bytes) -> None:
+        if not self.connected and kind != CONNECT:
+            raise MqttProtocolError("first packet must be CONNECT")
+        if kind == PUBLISH:
+            topic, payload, qos, retain, pid = _parse_publish(flags, body)
+            if qos == 1:
+                self.send(_packet(PUBACK, 0, struct.pack("!H", pid)))
+            elif qos == 2:
+                self.send(_packet(PUBREC, 0, struct.pack("!H", pid)))
+            self.broker.publish(topic, payload, qos=qos, retain=retain)
+        elif kind == PUBREL:
+            self.send(_packet(PUBCOMP, 0, body[:2]))
+        elif kind in (PUBACK, PUBCOMP):
+            pass  # brak ponowień – potwierdzenia od klienta nie są potrzebne
+        elif kind == PUBREC:
+            self.send(_packet(PUBREL, 0x02, body[:2]))
+        elif kind == SUBSCRIBE:
+            self._subscribe(body)
+        elif kind == UNSUBSCRIBE:
+            pos = 2
+            while pos < len(body):
+                raw, pos = _read_field(body, pos)
+                self.subscriptions.pop(raw.decode("utf-8"), None)
+            self._refresh_wildcards()
+            self.send(_packet(UNSUBACK, 0, body[:2]))
+        elif kind == PINGREQ:
+            self.send(_packet(PINGRESP, 0))
+        elif kind == DISCONNECT:
+            self.will = None
+            self.transport.close()
+        elif kind == CONNECT:
+            self._connect(body)
+        else:
+            raise MqttProtocolError(f"unexpected packet type {kind}")
+
+    def _connect(self, body: bytes) -> None:
+        if self.connected:
+            raise MqttProtocolError("second CONNECT")
+        name, pos = _read_field(body, 0)
+        level, flags = body[pos], body[pos + 1]
+        pos += 4  # poziom, flagi, keep-alive
+        if (name, level) not in ((b"MQTT", 4), (b"MQIsdp", 3)):
+            self.send(_packet(CONNACK, 0, b"\x00\x01"))
+            self.transport.close()
+            return
+        raw_id, pos = _read_field(body, pos)
+        if flags & 0x04:
+            will_topic, pos = _read_field(body, pos)
+            will_payload, pos = _read_field(body, pos)
+            self.will = (will_topic.decode("utf-8"), will_payload, (flags >> 3) & 0x03, bool(flags & 0x20))
+        self.connected = True
+        self.client_id = raw_id.decode("utf-8") or f"anon-{id(self):x}"
+        self.broker._register(self)
+        self.send(_packet(CONNACK, 0, b"\x00\x00"))
+
+    def _subscribe(self, body: bytes) -> None:
+        pid, pos = body[:2], 2
+        filters = []
+        while pos < len(body):
+            raw, pos = _read_field(body, pos)
+            filters.append((raw.decode("utf-8"), min(body[pos] & 0x03, 1)))
+            pos += 1
+        for pattern, qos in filters:
+            self.subscriptions[pattern] = qos
+        self._refresh_wildcards()
+        self.send(_packet(SUBACK, 0, pid + bytes(qos for _, qos in filters)))
+        for pattern, qos in filters:
+            for topic, (payload, retained_qos) in list(self.broker.retained.items()):
+                if topic_matches(pattern, topic):
+                    self.deliver(topic, payload, min(qos, retained_qos), retain=True)
+
+
+class FakeBroker:
+    """Local MQTT 3.1.1 broker: ``async with FakeBroker() as broker: ... broker.port``."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.host = host
+        self.port = port
+        self.retained: Dict[str, Tuple[bytes, int]] = {}
+        self.stats = {"connects": 0, "received": 0, "delivered": 0}
+        self._sessions: Dict[str, _BrokerSession] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "FakeBroker":
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: _BrokerSession(self), self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for session in list(self._sessions.values()):
+            session.will = None
+            session.transport.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def __aenter__(self) -> "FakeBroker":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @property
+    def clients(self) -> List[str]:
+        return list(self._sessions)
+
+    def publish(self, topic: str, payload: Payload, qos: int = 0, retain: bool = False) -> int:
+        """Route a message to matching subscribers; returns the number of deliveries."""
+        data = _payload_bytes(payload)
+        self.stats["received"] += 1
+        if retain:
+            if data:
+                self.retained[topic] = (data, qos)
+            else:
+                self.retained.pop(topic, None)
+        delivered = 0
+        for session in list(self._sessions.values()):
+            granted = session.granted_qos(topic)
+            if granted is not None:
+                session.deliver(topic, data, min(qos, granted))
+                delivered += 1
+        self.stats["delivered"] += delivered
+        return delivered
+
+    def is_subscribed(self, topic: str) -> bool:
+        return any(session.granted_qos(topic) is not None for session in self._sessions.values())
+
+    async def wait_subscribed(self, topic: str, timeout: float = 5.0) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not self.is_subscribed(topic):
+            if loop.time() > deadline:
+                raise asyncio.TimeoutError(f"no subscriber for {topic}")
+            await asyncio.sleep(0.005)
+
+    def _register(self, session: _BrokerSession) -> None:
+        previous = self._sessions.get(session.client_id)
+        if previous is not None and previous is not session:
+            # ten sam client id – poprzednie połączenie jest zamykane (MQTT-3.1.4-2)
+            previous.transport.close()
+        self._sessions[session.client_id] = session
+        self.stats["connects"] += 1
+
+    def _drop(self, session: _BrokerSession) -> None:
+        if self._sessions.get(session.client_id) is session:
+            del self._sessions[session.client_id]
+
+
+# ---------- klient ----------
+class _ClientProtocol(asyncio.Protocol):
+    def __init__(self, client: "MiniClient") -> None:
+        self.client = client
+        self._framer = _Framer()
+
+    def data_received(self, data: bytes) -> None:
+        try:
+            for kind, flags, body in self._framer.feed(data):
+                self.client._handle(kind, flags, body)
+        except (MqttProtocolError, struct.error, UnicodeDecodeError) as exc:
+            self.client._lost(exc)
+
+    def connection_lost(self, exc) -> None:
+        self.client._lost(exc)
+
+
+class MiniClient:
+    """Small asyncio MQTT 3.1.1 client with the asyncio-mqtt call shapes."""
+
+    def __init__(
+        self,
+        hostname: str = "127.0.0.1",
+        port: int = 1883,
+        *,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        client_id: Optional[str] = None,
+        keepalive: int = 60,
+        will: Optional[Will] = None,
+    ) -> None:
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.id = client_id or ""
+        self.keepalive = int(keepalive)
+        self.will = will
+        self._transport: Optional[asyncio.Transport] = None
+        self._pending: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._pids = itertools.cycle(range(1, 65536))
+        self._messages: Optional[asyncio.Queue] = None
+        self._ping: Optional[asyncio.Task] = None
+        self._closing = False
+
+    # -- połączenie --
+    async def connect(self, *, timeout: float = 10.0) -> None:
+        loop = asyncio.get_running_loop()
+        self._messages = asyncio.Queue()
+        self._closing = False
+        self._transport, _ = await loop.create_connection(lambda: _ClientProtocol(self), self.hostname, self.port)
+        flags = 0x02  # clean session
+        payload = _field(self.id)
+        if self.will is not None:
+            flags |= 0x04 | (self.will.qos << 3) | (0x20 if self.will.retain else 0)
+            payload += _field(self.will.topic) + _field(_payload_bytes(self.will.payload))
+        if self.username:
+            flags |= 0x80
+            payload += _field(self.username)
+            if self.password:
+                flags |= 0x40
+                payload += _field(self.password)
+        body = _field("MQTT") + bytes((4, flags)) + struct.pack("!H", self.keepalive) + payload
+        code = await self._request((CONNACK, 0), _packet(CONNECT, 0, body), timeout)
+        if code[1] != 0:
+            self._transport.close()
+            raise MqttProtocolError(f"connection refused, code {code[1]}")
+        if self.keepalive:
+            self._ping = loop.create_task(self._keepalive())
+
+    async def disconnect(self, *, timeout: float = 10.0) -> None:
+        self._closing = True
+        if self._ping is not None:
+            self._ping.cancel()
+            self._ping = None
+        if self._transport is not None and not self._transport.is_closing():
+            self._transport.write(_packet(DISCONNECT, 0))
+            self._transport.close()
+
+    async def force_disconnect(self) -> None:
+        """Drop the link without DISCONNECT, so the broker publishes the will."""
+        self._closing = True
+        if self._ping is not None:
+            self._ping.cancel()
+            self._ping = None
+        if self._transport is not None:
+            self._transport.abort()
+
+    async def __aenter__(self) -> "MiniClient":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.disconnect()
+
+    # -- operacje --
+    async def subscribe(self, topic: Union[str, List[Tuple[str, int]]], qos: int = 0, *, timeout: float = 10.0):
+        """One SUBSCRIBE; ``topic`` may be a list of ``(filter, qos)`` like in paho."""
+        filters = [(topic, qos)] if isinstance(topic, str) else list(topic)
+        pid = next(self._pids)
+        body = struct.pack("!H", pid) + b"".join(_field(name) + bytes((level,)) for name, level in filters)
+        granted = await self._request((SUBACK, pid), _packet(SUBSCRIBE, 0x02, body), timeout)
+        return granted[0] if isinstance(topic, str) else list(granted)
+
+    async def unsubscribe(self, topic: str, *, timeout: float = 10.0) -> None:
+        pid = next(self._pids)
+        await self._request((UNSUBACK, pid), _packet(UNSUBSCRIBE, 0x02, struct.pack("!H", pid) + _field(topic)), timeout)
+
+    async def publish(self, topic: str, payload: Payload = None, qos: int = 0, retain: bool = False,
+                      *, timeout: float = 10.0) -> None:
+        if not qos:
+            self.publish_nowait(topic, payload, retain=retain)
+            return
+        pid = next(self._pids)
+        packet = _publish_packet(topic, _payload_bytes(payload), qos, retain, pid)
+        await self._request((PUBACK if qos == 1 else PUBCOMP, pid), packet, timeout)
+
+    def publish_nowait(self, topic: str, payload: Payload = None, retain: bool = False) -> None:
+        """QoS 0 publish without awaiting – for floods."""
+        self._write(_publish_packet(topic, _payload_bytes(payload), 0, retain))
+
+    @asynccontextmanager
+    async def unfiltered_messages(self) -> AsyncIterator[AsyncIterator[Message]]:
+        yield self._iter_messages()
+
+    messages = unfiltered_messages
+
+    async def _iter_messages(self) -> AsyncIterator[Message]:
+        while True:
+            item = await self._messages.get()
+            if isinstance(item, Exception):
+                if self._closing:
+                    return
+                raise item
+            yield item
+
+    # -- wewnętrzne --
+    def _write(self, data: bytes) -> None:
+        if self._transport is None or self._transport.is_closing():
+            raise MqttProtocolError("not connected")
+        self._transport.write(data)
+
+    async def _request(self, key: Tuple[int, int], packet: bytes, timeout: float):
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            self._write(packet)
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise MqttProtocolError(f"no reply for packet type {key[0]}") from None
+        finally:
+            self._pending.pop(key, None)
+
+    def _resolve(self, key: Tuple[int, int], value) -> None:
+        future = self._pending.get(key)
+        if future is not None and not future.done():
+            future.set_result(value)
+
+    def _handle(self, kind: int, flags: int, body: bytes) -> None:
+        if kind == PUBLISH:
+            topic, payload, qos, retain, pid = _parse_publish(flags, body)
+            if qos == 1:
+                self._write(_packet(PUBACK, 0, struct.pack("!H", pid)))
+            elif qos == 2:
+                self._write(_packet(PUBREC, 0, struct.pack("!H", pid)))
+            self._messages.put_nowait(Message(topic, payload, qos, retain))
+        elif kind == CONNACK:
+            self._resolve((CONNACK, 0), body[:2])
+        elif kind in (PUBACK, PUBCOMP, UNSUBACK):
+            self._resolve((kind, struct.unpack_from("!H", body)[0]), None)
+        elif kind == PUBREC:
+            self._write(_packet(PUBREL, 0x02, body[:2]))
+        elif kind == PUBREL:
+            self._write(_packet(PUBCOMP, 0, body[:2]))
+        elif kind == SUBACK:
+            self._resolve((SUBACK, struct.unpack_from("!H", body)[0]), body[2:])
+
+    def _lost(self, exc: Optional[BaseException]) -> None:
+        error = MqttProtocolError(f"connection lost: {exc}" if exc else "connection closed")
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        if self._messages is not None:
+            self._messages.put_nowait(error)
+        if self._ping is not None:
+            self._ping.cancel()
+            self._ping = None
+        if self._transport is not None:
+            self._transport.close()
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive / 2.0)
+            self._write(_packet(PINGREQ, 0))
+
+
+__all__ = [
+    "FakeBroker",
+    "Message",
+    "MiniClient",
+    "MqttProtocolError",
+    "Will",
+    "topic_matches",
+]
@@ -0,0 +1,338 @@
+# -*- coding: utf-8 -*-
+"""Sensor-flood load test for the MQTT ingest and publish paths.
+
+:func:`run_sensor_flood` starts a :class:`~backend.sim.mqtt_broker.FakeBroker`,
+runs the real ``mqtt_client._handle_messages`` against it (``MiniClient``
+stands in for asyncio-mqtt unless another client class is given) and floods
+sensor topics at a fixed rate from one or more publisher connections. It
+measures:
+
+* ingest throughput – messages handled per second of the run,
+* message → averager latency – publish write to ``SensorAverager.add``,
+* DB logging lag – publish write to the ``sensor_log`` commit,
+* publish round trip – ``mqtt_publish`` call to delivery at a subscriber.
+
+Latencies are matched per sensor in FIFO order, which holds because all
+topics of one sensor go through the same publisher connection.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import tempfile
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from backend.core import mqtt_client
+from backend.core.config import settings
+from backend.core.db import Base, SensorLog
+from backend.core.models import SensorAverager, SensorSnapshot
+from backend.sim.mqtt_broker import FakeBroker, MiniClient, MqttProtocolError
+
+PROBE_TOPIC = "farmcare/load/probe"
+_TICK_S = 0.005
+
+
+# ---------- pomiary ----------
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max in milliseconds (empty dict without samples)."""
+    if not samples_ms:
+        return {}
+    ordered = sorted(samples_ms)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(math.ceil(q * len(ordered))) - 1)], 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+
+class _Probe:
+    """Send timestamps per sensor, popped when the averager or the DB sees the value."""
+
+    def __init__(self, log_to_db: bool) -> None:
+        self.log_to_db = log_to_db
+        self.sent = 0
+        self.ingested = 0
+        self.db_rows = 0
+        self.first_sent: Optional[float] = None
+        self.last_ingested: Optional[float] = None
+        self.averager_ms: List[float] = []
+        self.db_ms: List[float] = []
+        self._to_averager: Dict[str, Deque[float]] = defaultdict(deque)
+        self._to_db: Dict[str, Deque[float]] = defaultdict(deque)
+
+    def mark_sent(self, name: str) -> None:
+        now = time.perf_counter()
+        if self.first_sent is None:
+            self.first_sent = now
+        self.sent += 1
+        self._to_averager[name].append(now)
+        if self.log_to_db:
+            self._to_db[name].append(now)
+
+    def on_add(self, name: str) -> None:
+        now = time.perf_counter()
+        pending = self._to_averager.get(name)
+        if pending:
+            self.averager_ms.append((now - pending.popleft()) * 1000.0)
+            self.ingested += 1
+            self.last_ingested = now
+
+    def on_commit(self, names: List[str]) -> None:
+        now = time.perf_counter()
+        for name in names:
+            pending = self._to_db.get(name)
+            if pending:
+                self.db_ms.append((now - pending.popleft()) * 1000.0)
+                self.db_rows += 1
+
+    def settled(self) -> bool:
+        return self.ingested >= self.sent and (not self.log_to_db or self.db_rows >= self.sent)
+
+
+class _TimedAverager(SensorAverager):
+    def add(self, v: float, ts: Optional[float] = None):
+        super().add(v, ts)
+        self._probe.on_add(self._name)
+
+
+def _timed_snapshot(template: SensorSnapshot, probe: _Probe) -> SensorSnapshot:
+    bus = SensorSnapshot()
+    for name in bus.__dataclass_fields__:
+        averager = _TimedAverager()
+        averager.set_window(getattr(template, name).window)
+        averager._probe = probe
+        averager._name = name
+        setattr(bus, name, averager)
+    return bus
+
+
+def _timed_sessions(engine, probe: _Probe) -> sessionmaker:
+    class _TimedSession(Session):
+        def commit(self) -> None:
+            names = [obj.name for obj in self.new if isinstance(obj, SensorLog)]
+            super().commit()
+            probe.on_commit(names)
+
+    return sessionmaker(bind=engine, class_=_TimedSession)
+
+
+@contextmanager
+def patched_mqtt_client(broker: FakeBroker, *, sensor_bus=None, session_factory=None, client_cls=MiniClient,
+                        topics: Optional[Mapping[str, str]] = None) -> Iterator[None]:
+    """Point ``mqtt_client`` at ``broker`` for the duration of the block; restores everything."""
+    saved = {name: getattr(mqtt_client, name) for name in ("Client", "MqttError", "sensor_bus", "SessionLocal")}
+    saved_settings = (settings.MQTT_HOST, settings.MQTT_PORT, settings.MQTT_USERNAME, settings.MQTT_PASSWORD)
+    saved_topics = dict(mqtt_client.TOPIC_MAP)
+    try:
+        mqtt_client.Client = client_cls
+        if client_cls is MiniClient:
+            mqtt_client.MqttError = MqttProtocolError
+        if sensor_bus is not None:
+            mqtt_client.sensor_bus = sensor_bus
+        mqtt_client.SessionLocal = session_factory
+        mqtt_client.TOPIC_MAP.update(topics or {})
+        settings.MQTT_HOST, settings.MQTT_PORT = broker.host, broker.port
+        settings.MQTT_USERNAME = settings.MQTT_PASSWORD = ""
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(mqtt_client, name, value)
+        settings.MQTT_HOST, settings.MQTT_PORT, settings.MQTT_USERNAME, settings.MQTT_PASSWORD = saved_settings
+        mqtt_client.TOPIC_MAP.clear()
+        mqtt_client.TOPIC_MAP.update(saved_topics)
+
+
+def flood_topics(count: Optional[int] = None) -> Dict[str, str]:
+    """Topic → sensor map: the configured topics, or ``count`` synthetic ones spread over all sensors."""
+    if not count:
+        return dict(mqtt_client.TOPIC_MAP)
+    names = list(SensorSnapshot.__dataclass_fields__)
+    return {f"farmcare/load/{names[i % len(names)]}/{i}": names[i % len(names)] for i in range(count)}
+
+
+# ---------- raport ----------
+@dataclass
+class FloodReport:
+    rate: float
+    duration_s: float
+    clients: int
+    topics: int
+    sent: int
+    ingested: int
+    db_rows: int
+    wall_time_s: float
+    averager_latency_ms: Dict[str, float] = field(default_factory=dict)
+    db_lag_ms: Dict[str, float] = field(default_factory=dict)
+    publish_rtt_ms: Dict[str, float] = field(default_factory=dict)
+    publish_lost: int = 0
+
+    @property
+    def ingest_rate(self) -> float:
+        """Messages reaching the averagers per second, first send to last ingest."""
+        return self.ingested / self.wall_time_s if self.wall_time_s > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "duration_s": self.duration_s,
+            "clients": self.clients,
+            "topics": self.topics,
+            "sent": self.sent,
+            "ingested": self.ingested,
+            "db_rows": self.db_rows,
+            "ingest_rate": round(self.ingest_rate, 1),
+            "averager_latency_ms": self.averager_latency_ms,
+            "db_lag_ms": self.db_lag_ms,
+            "publish_rtt_ms": self.publish_rtt_ms,
+            "publish_lost": self.publish_lost,
+        }
+
+
+# ---------- generator ----------
+async def _flood(client: MiniClient, plan: List[Tuple[str, str]], rate: float, total: int, probe: _Probe) -> None:
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    sent = 0
+    while sent < total:
+        due = min(total, int((loop.time() - start) * rate) + 1)
+        while sent < due:
+            topic, name = plan[sent % len(plan)]
+            probe.mark_sent(name)
+            client.publish_nowait(topic, f"{20.0 + (sent % 100) / 10.0:.1f}")
+            sent += 1
+        await asyncio.sleep(_TICK_S)
+
+
+async def _publish_probes(count: int, spacing_s: float, listener: MiniClient) -> Tuple[List[float], int]:
+    loop = asyncio.get_running_loop()
+    arrivals: Dict[str, asyncio.Future] = {}
+
+    async def collect() -> None:
+        async with listener.unfiltered_messages() as messages:
+            async for message in messages:
+                future = arrivals.get(message.topic)
+                if future is not None and not future.done():
+                    future.set_result(time.perf_counter())
+
+    collector = loop.create_task(collect())
+    rtt_ms: List[float] = []
+    lost = 0
+    try:
+        for index in range(count):
+            topic = f"{PROBE_TOPIC}/{index}"
+            arrivals[topic] = loop.create_future()
+            started = time.perf_counter()
+            await mqtt_client.mqtt_publish(topic, "1")
+            try:
+                arrived = await asyncio.wait_for(arrivals[topic], 5.0)
+                rtt_ms.append((arrived - started) * 1000.0)
+            except asyncio.TimeoutError:
+                lost += 1
+            await asyncio.sleep(spacing_s)
+    finally:
+        collector.cancel()
+        await asyncio.gather(collector, return_exceptions=True)
+    return rtt_ms, lost
+
+
+async def run_sensor_flood(
+    rate: float = 1000.0,
+    duration_s: float = 5.0,
+    *,
+    clients: int = 1,
+    topic_count: Optional[int] = None,
+    log_to_db: bool = True,
+    publish_probes: int = 20,
+    settle_s: float = 30.0,
+    client_cls=MiniClient,
+) -> FloodReport:
+    """Flood sensor topics at ``rate`` msg/s for ``duration_s`` through the real ingest loop.
+
+    ``topic_count`` replaces the configured topics with that many synthetic
+    ones (for "hundreds of sensors" runs); ``log_to_db`` writes ``sensor_log``
+    to a throw-away SQLite file, as the live backend does per message.
+    """
+    topics = flood_topics(topic_count)
+    clients = max(1, min(int(clients), len(set(topics.values()))))
+    probe = _Probe(log_to_db)
+    bus = _timed_snapshot(mqtt_client.sensor_bus, probe)
+    total = int(rate * duration_s)
+    # wszystkie tematy jednego czujnika przez to samo połączenie – zachowana kolejność FIFO
+    plans: List[List[Tuple[str, str]]] = [[] for _ in range(clients)]
+    names = sorted(set(topics.values()))
+    for topic, name in topics.items():
+        plans[names.index(name) % clients].append((topic, name))
+    plans = [plan for plan in plans if plan]
+    shares = [total * (i + 1) // len(plans) - total * i // len(plans) for i in range(len(plans))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'load.sqlite3'}") if log_to_db else None
+        if engine is not None:
+            Base.metadata.create_all(engine)
+        sessions = _timed_sessions(engine, probe) if engine is not None else None
+        try:
+            async with FakeBroker() as broker:
+                with patched_mqtt_client(broker, sensor_bus=bus, session_factory=sessions,
+                                         client_cls=client_cls, topics=topics):
+                    ingest = asyncio.create_task(mqtt_client._handle_messages())
+                    publishers = [MiniClient(broker.host, broker.port, client_id=f"flood-{i}") for i in range(len(plans))]
+                    listener = MiniClient(broker.host, broker.port, client_id="probe-listener")
+                    try:
+                        for topic in topics:
+                            await broker.wait_subscribed(topic)
+                        for client in publishers:
+                            await client.connect()
+                        await listener.connect()
+                        await listener.subscribe(f"{PROBE_TOPIC}/#")
+                        jobs = [_flood(client, plan, rate * share / max(1, total), share, probe)
+                                for client, plan, share in zip(publishers, plans, shares)]
+                        results = await asyncio.gather(
+                            _publish_probes(publish_probes, duration_s / max(1, publish_probes), listener), *jobs
+                        )
+                        rtt_ms, lost = results[0]
+                        loop = asyncio.get_running_loop()
+                        deadline = loop.time() + settle_s
+                        while not probe.settled() and loop.time() < deadline and not ingest.done():
+                            await asyncio.sleep(0.01)
+                    finally:
+                        ingest.cancel()
+                        await asyncio.gather(ingest, return_exceptions=True)
+                        for client in publishers + [listener]:
+                            await client.disconnect()
+        finally:
+            if engine is not None:
+                engine.dispose()
+
+    elapsed = (probe.last_ingested or 0.0) - (probe.first_sent or 0.0)
+    return FloodReport(
+        rate=rate,
+        duration_s=duration_s,
+        clients=len(plans),
+        topics=len(topics),
+        sent=probe.sent,
+        ingested=probe.ingested,
+        db_rows=probe.db_rows,
+        wall_time_s=max(0.0, elapsed),
+        averager_latency_ms=latency_summary(probe.averager_ms),
+        db_lag_ms=latency_summary(probe.db_ms),
+        publish_rtt_ms=latency_summary(rtt_ms),
+        publish_lost=lost,
+    )
+
+
+__all__ = [
+    "FloodReport",
+    "PROBE_TOPIC",
+    "flood_topics",
+    "latency_summary",
+    "patched_mqtt_client",
+    "run_sensor_flood",
+]
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""Offline replay of ``sensor_log`` through the controller decision path.
+
+Recorded readings are streamed from the database in ``ts`` order, fed into a
+:class:`~backend.core.models.SensorSnapshot` with the live averaging windows,
+and every controller tick runs ``Controller.step(sensors)`` – wind locks,
+auto target, safety limits, stage plan and heating – against the stubbed
+actuators of :class:`~backend.sim.runner.SimulatedPlant`. Vent travel still
+takes (virtual) time, so a long move delays the next tick like it does live.
+
+Averages only change when a reading arrives, so ticks where no average
+changed, no follow-up move is pending and no day/night boundary passed are
+skipped instead of evaluated. That is exact only while no decision depends
+on elapsed time: while the heating PID is running (integral, dwell and rate
+limit grow with time) or a wind lock is waiting out ``wind_lock_release_s``,
+every tick is evaluated. Times in ``sensor_log`` are UTC; they are shown in
+local time with the offset of the first reading (a DST switch inside the
+range shifts the day/night boundaries by an hour).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from backend.core.config import AVG_WINDOW_S, SENSORS
+from backend.core.models import SensorSnapshot
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import (
+    SimulatedController,
+    SimulatedPlant,
+    SimulatedSensors,
+    load_plan_file,
+    parse_override,
+    patched_config,
+)
+
+_JULIAN_EPOCH = 2440587.5  # julianday('1970-01-01')
+
+Row = Tuple[float, str, float]  # (sekundy UTC od epoki, nazwa czujnika, wartość)
+
+
+def iter_sensor_log(
+    session_factory: Optional[Callable[[], Any]] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    names: Optional[Iterable[str]] = None,
+    chunk_size: int = 20000,
+) -> Iterator[List[Row]]:
+    """Yield ``sensor_log`` rows in chunks, ordered by time (and id for equal timestamps)."""
+    from backend.core.db import SensorLog
+
+    if session_factory is None:
+        from backend.core.db import SessionLocal as session_factory
+    # julianday() zamiast kolumny DateTime: parsowanie napisu daty w Pythonie
+    # kosztowało więcej niż całe zapytanie
+    stmt = (
+        select(func.julianday(SensorLog.ts), SensorLog.name, SensorLog.value)
+        .order_by(SensorLog.ts, SensorLog.id)
+    )
+    if since is not None:
+        stmt = stmt.where(SensorLog.ts >= since)
+    if until is not None:
+        stmt = stmt.where(SensorLog.ts < until)
+    if names:
+        stmt = stmt.where(SensorLog.name.in_(list(names)))
+    with session_factory() as session:
+        result = session.execute(stmt.execution_options(yield_per=max(1, int(chunk_size))))
+        for partition in result.partitions():
+            yield [
+                (round((jd - _JULIAN_EPOCH) * 86400.0, 3), name, value)
+                for jd, name, value in partition
+                if jd is not None and value is not None
+            ]
+
+
+def live_snapshot() -> SensorSnapshot:
+    """Empty snapshot with the same averaging windows as ``mqtt_client.sensor_bus``."""
+    snapshot = SensorSnapshot()
+    snapshot.set_window(AVG_WINDOW_S)
+    snapshot.set_windows({
+        name: cfg.get("avg_window_s")
+        for name, cfg in SENSORS.items()
+        if isinstance(cfg, dict) and cfg.get("avg_window_s") is not None
+    })
+    return snapshot
+
+
+@dataclass
+class ReplayReport:
+    start: Optional[datetime]
+    end: Optional[datetime]
+    rows: int
+    evaluations: int
+    wall_time_s: float
+    relay_switches: Dict[str, int]
+    publishes: int
+    time_over_target_s: float
+    time_under_target_s: float
+    time_with_temp_s: float
+    trajectories: Dict[int, List[Tuple[datetime, float]]] = field(default_factory=dict)
+    events: List[Tuple[datetime, str, Dict[str, Any]]] = field(default_factory=list)
+    ignored_rows: int = 0
+
+    @property
+    def duration_s(self) -> float:
+        if self.start is None or self.end is None:
+            return 0.0
+        return (self.end - self.start).total_seconds()
+
+    def as_dict(self, include_trajectories: bool = False) -> Dict[str, Any]:
+        covered = self.time_with_temp_s or 0.0
+        data: Dict[str, Any] = {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "rows": self.rows,
+            "ignored_rows": self.ignored_rows,
+            "evaluations": self.evaluations,
+            "wall_time_s": round(self.wall_time_s, 3),
+            "relay_switches": dict(sorted(self.relay_switches.items())),
+            "relay_switches_total": sum(self.relay_switches.values()),
+            "publishes": self.publishes,
+            "vent_moves": {vid: max(0, len(points) - 1) for vid, points in self.trajectories.items()},
+            "time_over_target_s": round(self.time_over_target_s, 1),
+            "time_under_target_s": round(self.time_under_target_s, 1),
+            "time_over_target_percent": round(100.0 * self.time_over_target_s / covered, 2) if covered else None,
+            "events": _count_events(self.events),
+        }
+        if include_trajectories:
+            data["trajectories"] = {
+                vid: [(ts.isoformat(), round(pos, 2)) for ts, pos in points]
+                for vid, points in self.trajectories.items()
+            }
+        return data
+
+
+def _count_events(events: List[Tuple[datetime, str, Dict[str, Any]]]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for _, name, _ in events:
+        counts[name] = counts.get(name, 0) + 1
+    return dict(sorted(counts.items()))
+
+
+class SensorLogReplay:
+    """Replays a ``sensor_log`` range against one configuration; one instance per run."""
+
+    def __init__(
+        self,
+        rows: Optional[Iterable[List[Row]]] = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        overrides: Optional[Mapping[str, Any]] = None,
+        chunk_size: int = 20000,
+        target_margin_c: float = 1.0,
+        vent_groups: Optional[List[dict]] = None,
+        vent_plan: Optional[dict] = None,
+    ) -> None:
+        self._rows = rows
+        self.session_factory = session_factory
+        self.since = since
+        self.until = until
+        self.overrides = dict(overrides or {})
+        self.chunk_size = chunk_size
+        self.target_margin_c = float(target_margin_c)
+        self.vent_groups = vent_groups
+        self.vent_plan = vent_plan
+
+    def _chunks(self) -> Iterable[List[Row]]:
+        if self._rows is not None:
+            return self._rows
+        return iter_sensor_log(self.session_factory, self.since, self.until, chunk_size=self.chunk_size)
+
+    def run(self) -> ReplayReport:
+        wall_start = time.perf_counter()
+        chunks = iter(self._chunks())
+        first = next((chunk for chunk in chunks if chunk), None)
+        if first is None:
+            return ReplayReport(None, None, 0, 0, time.perf_counter() - wall_start, {}, 0, 0.0, 0.0, 0.0)
+        with patched_config(self.overrides):
+            return _ReplayRun(self, first[0][0]).run(itertools.chain([first], chunks), wall_start)
+
+
+class _ReplayRun:
+    def __init__(self, replay: SensorLogReplay, epoch0: float) -> None:
+        self.margin = replay.target_margin_c
+        self.epoch0 = epoch0
+        self.clock = VirtualClock(datetime.fromtimestamp(epoch0))
+        self.plant = SimulatedPlant(self.clock)
+        self.controller = SimulatedController(
+            SimulatedSensors(), clock=self.clock, publisher=self.plant,
+            vent_groups=replay.vent_groups, vent_plan=replay.vent_plan,
+        )
+        self.plant.attach(self.controller)
+        self.snapshot = live_snapshot()
+        self.averagers = {name: getattr(self.snapshot, name) for name in self.snapshot.__dataclass_fields__}
+        # bieżące średnie aktualizowane przy próbce, nie liczone od nowa w każdym ticku
+        self.current: Dict[str, Optional[float]] = self.snapshot.averages()
+        self.trajectories: Dict[int, List[Tuple[datetime, float]]] = {
+            vid: [(self.clock.now(), vent.position)] for vid, vent in self.controller.vents.items()
+        }
+        self.evaluations = 0
+        self.dirty = False
+        self.next_tick = 0.0
+        self.next_boundary = self._next_boundary(self.clock.now())
+        # całkowanie czasu ponad/poniżej celu między kolejnymi tickami
+        self.last_t = 0.0
+        self.state: Optional[int] = None  # 1 ponad, -1 poniżej, 0 w paśmie, None brak temperatury
+        self.over_s = 0.0
+        self.under_s = 0.0
+        self.with_temp_s = 0.0
+
+    def _next_boundary(self, now: datetime) -> float:
+        """Seconds (virtual) of the next day/night switch; decisions may change there without new data."""
+        params = self.controller._control_params()
+        best = math.inf
+        for tod in (params.day_start, params.night_start,
+                    self.controller._heating_day_start, self.controller._heating_night_start):
+            if tod is None:
+                continue
+            candidate = datetime.combine(now.date(), tod)
+            if candidate <= now:
+                candidate += timedelta(days=1)
+            best = min(best, (candidate - self.clock.start).total_seconds())
+        return best
+
+    def _integrate(self, t: float) -> None:
+        span = t - self.last_t
+        if span > 0 and self.state is not None:
+            self.with_temp_s += span
+            if self.state > 0:
+                self.over_s += span
+            elif self.state < 0:
+                self.under_s += span
+        self.last_t = max(self.last_t, t)
+
+    def _evaluate(self, t: float) -> None:
+        clock = self.clock
+        clock.advance_to(t)
+        self._integrate(clock.monotonic())
+        sensors = self.current
+        published = self.plant.publishes
+        params = self.controller.step(sensors)
+        # grzanie działa w tle na pętli sterownika – dajemy mu przebieg do bieżącej chwili
+        self.controller._async_loop.run_until_complete(asyncio.sleep(0))
+        self.evaluations += 1
+        now = clock.now()
+        moved = self.plant.publishes != published
+        if moved:
+            self._integrate(clock.monotonic())
+            for vid, vent in self.controller.vents.items():
+                points = self.trajectories[vid]
+                if points[-1][1] != vent.position:
+                    points.append((now, vent.position))
+        internal = sensors.get("internal_temp")
+        if internal is None:
+            self.state = None
+        else:
+            diff = internal - self.controller._resolve_environment_target(now)
+            self.state = 1 if diff > self.margin else -1 if diff < -self.margin else 0
+        # po ruchu sprawdzamy jeszcze raz – plan etapów może wymagać kolejnego kroku
+        self.dirty = moved
+        self.next_tick = clock.monotonic() + params.controller_loop_s
+        if self.next_tick >= self.next_boundary:
+            self.next_boundary = self._next_boundary(now + timedelta(seconds=params.controller_loop_s))
+
+    def _time_driven(self) -> bool:
+        """Would an idle tick still change something just because time passed?"""
+        pid = self.controller._heating_pid
+        if pid is not None and pid.state.last_update is not None:
+            return True
+        return self.controller._wind_lock.release_pending
+
+    def _advance(self, t: float) -> None:
+        loop_s = self.controller._control_params().controller_loop_s or 1.0
+        while self.next_tick < t:
+            if self.dirty or self.next_tick >= self.next_boundary or self._time_driven():
+                self._evaluate(self.next_tick)
+                continue
+            # nic się nie zmieniło – przeskocz do ticka przy następnej próbce lub granicy dnia
+            horizon = min(t, self.next_boundary)
+            self.next_tick += max(1, math.ceil((horizon - self.next_tick) / loop_s)) * loop_s
+
+    def run(self, chunks: Iterable[List[Row]], wall_start: float) -> ReplayReport:
+        loop = self.controller.attach_event_loop(self.clock.new_event_loop())
+        averagers = self.averagers
+        current = self.current
+        epoch0 = self.epoch0
+        rows = ignored = 0
+        last_t = 0.0
+        try:
+            for chunk in chunks:
+                for epoch, name, value in chunk:
+                    t = epoch - epoch0
+                    if t > self.next_tick:
+                        self._advance(t)
+                    averager = averagers.get(name)
+                    if averager is None:
+                        ignored += 1
+                        continue
+                    averager.add(value)
+                    average = averager.avg()
+                    # ta sama średnia = ta sama decyzja; ponowna ocena nic by nie zmieniła
+                    if average != current[name]:
+                        current[name] = average
+                        self.dirty = True
+                    last_t = t
+                rows += len(chunk)
+            if self.dirty:
+                self._evaluate(max(self.next_tick, last_t))
+            self._integrate(max(last_t, self.clock.monotonic()))
+        finally:
+            for task in asyncio.all_tasks(loop):
+                task.cancel()
+            loop.close()
+            asyncio.set_event_loop(None)
+        return ReplayReport(
+            start=self.clock.start,
+            end=self.clock.start + timedelta(seconds=max(last_t, self.clock.monotonic())),
+            rows=rows,
+            evaluations=self.evaluations,
+            wall_time_s=time.perf_counter() - wall_start,
+            relay_switches=dict(self.plant.relay_switches),
+            publishes=self.plant.publishes,
+            time_over_target_s=self.over_s,
+            time_under_target_s=self.under_s,
+            time_with_temp_s=self.with_temp_s,
+            trajectories=self.trajectories,
+            events=list(self.controller.events),
+            ignored_rows=ignored,
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m backend.sim.replay", description="Replay sensor_log through the controller")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="UTC, ISO format")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=None, help="UTC, ISO format (exclusive)")
+    parser.add_argument("--set", dest="overrides", type=parse_override, action="append", default=[],
+                        metavar="SECTION.KEY=VALUE", help="override control.* or heating.* for this run")
+    parser.add_argument("--plan", default=None, help="YAML with vent_groups/vent_plan to use instead of settings.yaml")
+    parser.add_argument("--margin", type=float, default=1.0, help="tolerance around the target temperature, degC")
+    parser.add_argument("--trajectories", action="store_true", help="include vent trajectories in the JSON output")
+    args = parser.parse_args(argv)
+
+    vent_groups, vent_plan = load_plan_file(args.plan) if args.plan else (None, None)
+    report = SensorLogReplay(
+        since=args.since,
+        until=args.until,
+        overrides=dict(args.overrides),
+        target_margin_c=args.margin,
+        vent_groups=vent_groups,
+        vent_plan=vent_plan,
+    ).run()
+    print(json.dumps(report.as_dict(include_trajectories=args.trajectories), indent=2, default=str))
+    return 0
+
+
+__all__ = ["ReplayReport", "SensorLogReplay", "iter_sensor_log", "live_snapshot"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
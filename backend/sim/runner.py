@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""Closed-loop simulation: the real Controller and Scheduler against a greenhouse model.
+
+Everything runs on one :class:`~backend.sim.clock.VirtualTimeEventLoop`:
+controller ticks, vent/valve travel sleeps, the scheduler and the physics
+integration. Relay publishes go to :class:`SimulatedPlant`, which moves the
+"physical" vents from relay on-times, so the model sees what the hardware
+would do rather than what the controller believes.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+import yaml
+
+from backend.core import config as core_config
+from backend.core.controller import Controller
+from backend.core.heating_pid import PidState
+from backend.core.scheduler import Scheduler
+from backend.core.zones import Zone
+from backend.sim.clock import VirtualClock
+from backend.sim.model import GreenhouseModel
+from backend.sim.weather import SyntheticWeather
+
+_CONFIG_SECTIONS = ("control", "heating")
+
+
+# ---------- strona sprzętowa ----------
+class _Actuator:
+    """Position integrated from relay on-time, like a timed cover motor."""
+
+    __slots__ = ("travel_time", "position", "direction", "since")
+
+    def __init__(self, travel_time_s: float) -> None:
+        self.travel_time = max(1e-6, float(travel_time_s or 0.0))
+        self.position = 0.0
+        self.direction = 0
+        self.since = 0.0
+
+    def position_at(self, t: float) -> float:
+        if not self.direction:
+            return self.position
+        moved = self.direction * (t - self.since) / self.travel_time * 100.0
+        return max(0.0, min(100.0, self.position + moved))
+
+    def drive(self, direction: int, t: float) -> None:
+        self.position = self.position_at(t)
+        self.since = t
+        self.direction = direction
+
+
+class SimulatedPlant:
+    """MQTT publisher stand-in: relay states, switch counts and actuator positions."""
+
+    def __init__(self, clock: VirtualClock) -> None:
+        self.clock = clock
+        self.vents: Dict[int, _Actuator] = {}
+        self.valve: Optional[_Actuator] = None
+        self.publishes = 0
+        self.relay_state: Dict[str, bool] = {}
+        self.relay_switches: Dict[str, int] = {}
+        self.heating_on_s = 0.0
+        # topic -> (aktuator, kierunek, payload "włączony"); kierunek 0 = przekaźnik grzania
+        self._relays: Dict[str, Tuple[Optional[_Actuator], int, str]] = {}
+        self._pairs: Dict[int, Tuple[str, str]] = {}
+        self._heating_topic: Optional[str] = None
+        self._heating_since: Optional[float] = None
+
+    def attach(self, controller: Controller) -> None:
+        for vent in controller.vents.values():
+            actuator = _Actuator(vent.travel_time)
+            self.vents[vent.id] = actuator
+            self._relays[vent.up_topic] = (actuator, 1, "ON")
+            self._relays[vent.down_topic] = (actuator, -1, "ON")
+            self._pairs[id(actuator)] = (vent.up_topic, vent.down_topic)
+        heating = core_config.HEATING if isinstance(core_config.HEATING, dict) else {}
+        valve = controller._heating_valve
+        if valve is not None:
+            self.valve = _Actuator(valve.travel_time)
+            self._relays[valve.open_topic] = (self.valve, 1, valve.open_payload)
+            self._relays[valve.close_topic] = (self.valve, -1, valve.close_payload)
+            self._pairs[id(self.valve)] = (valve.open_topic, valve.close_topic)
+        elif heating.get("topic"):
+            self._heating_topic = str(heating["topic"]).strip()
+            self._relays[self._heating_topic] = (None, 0, str(heating.get("payload_on") or "ON"))
+
+    async def __call__(self, topic: str, payload: str) -> None:
+        self.publishes += 1
+        relay = self._relays.get(topic)
+        if relay is None:
+            return
+        actuator, _, on_payload = relay
+        state = str(payload) == on_payload
+        if self.relay_state.get(topic, False) != state:
+            self.relay_switches[topic] = self.relay_switches.get(topic, 0) + 1
+        self.relay_state[topic] = state
+        now = self.clock.monotonic()
+        if actuator is None:
+            if state and self._heating_since is None:
+                self._heating_since = now
+            elif not state and self._heating_since is not None:
+                self.heating_on_s += now - self._heating_since
+                self._heating_since = None
+            return
+        up_topic, down_topic = self._pairs[id(actuator)]
+        up = self.relay_state.get(up_topic, False)
+        down = self.relay_state.get(down_topic, False)
+        # oba przekaźniki naraz = brak ruchu (BoneIO i tak blokuje taki stan)
+        actuator.drive(1 if up and not down else -1 if down and not up else 0, now)
+
+    def vent_fraction(self, t: float) -> float:
+        if not self.vents:
+            return 0.0
+        return sum(a.position_at(t) for a in self.vents.values()) / (100.0 * len(self.vents))
+
+    def heating_fraction(self, t: float) -> float:
+        if self.valve is not None:
+            return self.valve.position_at(t) / 100.0
+        if self._heating_topic:
+            return 1.0 if self.relay_state.get(self._heating_topic) else 0.0
+        return 0.0
+
+    def finish(self, t: float) -> None:
+        if self._heating_since is not None:
+            self.heating_on_s += t - self._heating_since
+            self._heating_since = t
+
+
+class SimulatedSensors:
+    """Takes the place of RS485Manager; readings come straight from the model."""
+
+    def __init__(self) -> None:
+        self.readings: Dict[str, Optional[float]] = {}
+
+    def averages(self) -> Dict[str, Optional[float]]:
+        return dict(self.readings)
+
+    def status(self) -> List[dict]:
+        return []
+
+
+class SimulatedController(Controller):
+    """Controller without the database: state starts clean, events are kept in memory.
+
+    ``vent_groups``/``vent_plan`` take the place of the groups and plan stored
+    through the API (same format as ``settings.yaml``), e.g. wind ranges.
+    """
+
+    def __init__(
+        self,
+        sensors,
+        clock,
+        publisher,
+        vent_groups: Optional[List[dict]] = None,
+        vent_plan: Optional[dict] = None,
+        zone: Optional[Zone] = None,
+    ) -> None:
+        self.events: List[Tuple[datetime, str, Dict[str, Any]]] = []
+        self._sim_groups = vent_groups
+        self._sim_plan = vent_plan
+        self._sim_pid_state: Optional[str] = None
+        super().__init__(sensors, clock=clock, publisher=publisher, zone=zone)
+
+    def _log_event(self, event: str, *, level: str = "INFO", meta: Optional[dict] = None, category: Optional[str] = None) -> None:
+        self.events.append((self._now(), event, dict(meta or {})))
+
+    def _load_state_from_db(self):
+        pass
+
+    def _load_vent_states(self, vents) -> None:
+        pass
+
+    def _save_vent_state(self, vid: int):
+        pass
+
+    def _save_mode(self) -> None:
+        pass
+
+    def _apply_control_overrides(self) -> None:
+        pass
+
+    def _apply_heating_overrides(self) -> None:
+        pass
+
+    def _apply_plan_overrides(self) -> None:
+        self._apply_plan_config(self._sim_groups, self._sim_plan)
+
+    def _persist_control_overrides(self, control: Dict[str, object]) -> None:
+        pass
+
+    def _persist_heating_overrides(self, payload: Dict[str, object]) -> None:
+        pass
+
+    def _persist_setting(self, key: str, value: dict) -> None:
+        pass
+
+    def _load_heating_pid(self) -> PidState:
+        return PidState.from_json(self._sim_pid_state)
+
+    def _store_heating_pid(self, value: str) -> None:
+        self._sim_pid_state = value
+
+
+def parse_override(raw: str) -> Tuple[str, Any]:
+    """``control.temp_diff_percent=8`` -> ``("control.temp_diff_percent", 8)`` (value parsed as YAML)."""
+    key, sep, value = str(raw).partition("=")
+    if not sep or not key.strip():
+        raise ValueError(f"expected SECTION.KEY=VALUE, got {raw!r}")
+    return key.strip(), yaml.safe_load(value)
+
+
+def load_plan_file(path) -> Tuple[Optional[List[dict]], Optional[dict]]:
+    """``vent_groups``/``vent_plan`` sections from a YAML file laid out like ``settings.yaml``."""
+    with open(path, "r", encoding="utf-8-sig") as handle:
+        data = yaml.safe_load(handle) or {}
+    return data.get("vent_groups"), data.get("vent_plan")
+
+
+@contextmanager
+def patched_config(overrides: Optional[Mapping[str, Any]] = None) -> Iterator[None]:
+    """Apply ``{"control.temp_diff_percent": 8, "heating.enabled": True}`` in place, restore on exit.
+
+    The controller imports the config dicts by reference, so they are mutated
+    rather than rebound.
+    """
+    sections = {"control": core_config.CONTROL, "heating": core_config.HEATING}
+    saved = {name: dict(section) for name, section in sections.items() if isinstance(section, dict)}
+    try:
+        for key, value in (overrides or {}).items():
+            section_name, _, option = str(key).partition(".")
+            section = sections.get(section_name)
+            if not option or not isinstance(section, dict):
+                raise KeyError(f"Unknown simulation override {key!r}; use one of {_CONFIG_SECTIONS} with a dotted key")
+            section[option] = value
+        yield
+    finally:
+        for name, snapshot in saved.items():
+            sections[name].clear()
+            sections[name].update(snapshot)
+
+
+# ---------- wyniki ----------
+class SimulationSample(NamedTuple):
+    t_s: float
+    internal_temp: float
+    internal_hum: float
+    external_temp: float
+    target_temp: float
+    vent_percent: float
+    heating_percent: float
+
+
+@dataclass
+class SimulationReport:
+    duration_s: float
+    wall_time_s: float
+    step_s: float
+    samples: List[SimulationSample]
+    metrics: Dict[str, float]
+    relay_switches: Dict[str, int]
+    publishes: int
+    events: List[Tuple[datetime, str, Dict[str, Any]]] = field(default_factory=list)
+
+    @property
+    def speedup(self) -> float:
+        return self.duration_s / self.wall_time_s if self.wall_time_s > 0 else math.inf
+
+    def as_dict(self, include_samples: bool = False) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "duration_s": self.duration_s,
+            "wall_time_s": round(self.wall_time_s, 3),
+            "speedup": round(self.speedup, 1),
+            "metrics": {key: round(value, 3) for key, value in self.metrics.items()},
+            "relay_switches": dict(sorted(self.relay_switches.items())),
+            "relay_switches_total": sum(self.relay_switches.values()),
+            "publishes": self.publishes,
+            "events": len(self.events),
+        }
+        if include_samples:
+            data["samples"] = [sample._asdict() for sample in self.samples]
+        return data
+
+
+def control_metrics(samples: List[SimulationSample], step_s: float, margin_c: float) -> Dict[str, float]:
+    if not samples:
+        return {}
+    errors = [s.internal_temp - s.target_temp for s in samples]
+    temps = [s.internal_temp for s in samples]
+    return {
+        "temp_mae_c": sum(abs(e) for e in errors) / len(errors),
+        "temp_rmse_c": math.sqrt(sum(e * e for e in errors) / len(errors)),
+        "time_over_target_s": step_s * sum(1 for e in errors if e > margin_c),
+        "time_under_target_s": step_s * sum(1 for e in errors if e < -margin_c),
+        "temp_min_c": min(temps),
+        "temp_max_c": max(temps),
+        "hum_max_percent": max(s.internal_hum for s in samples),
+        "vent_mean_percent": sum(s.vent_percent for s in samples) / len(samples),
+    }
+
+
+# ---------- symulacja ----------
+class GreenhouseSimulation:
+    """One closed-loop run; construct a new instance per scenario."""
+
+    def __init__(
+        self,
+        weather=None,
+        model: Optional[GreenhouseModel] = None,
+        start: Optional[datetime] = None,
+        overrides: Optional[Mapping[str, Any]] = None,
+        model_step_s: float = 10.0,
+        target_margin_c: float = 1.0,
+        use_scheduler: bool = True,
+        vent_groups: Optional[List[dict]] = None,
+        vent_plan: Optional[dict] = None,
+    ) -> None:
+        self.clock = VirtualClock(start)
+        self.weather = weather or SyntheticWeather()
+        self.model = model or GreenhouseModel()
+        self.overrides = dict(overrides or {})
+        self.model_step_s = max(0.1, float(model_step_s))
+        self.target_margin_c = float(target_margin_c)
+        self.use_scheduler = use_scheduler
+        self.vent_groups = vent_groups
+        self.vent_plan = vent_plan
+        self.plant = SimulatedPlant(self.clock)
+        self.sensors = SimulatedSensors()
+        self.samples: List[SimulationSample] = []
+        self.controller: Optional[SimulatedController] = None
+
+    def _read_sensors(self) -> None:
+        readings: Dict[str, Optional[float]] = dict(self.weather.at(self.clock.now()).sensors())
+        readings.update(self.model.sensors())
+        self.sensors.readings = readings
+
+    async def _physics(self) -> None:
+        dt = self.model_step_s
+        controller = self.controller
+        while True:
+            now = self.clock.now()
+            weather = self.weather.at(now)
+            await asyncio.sleep(dt)
+            t = self.clock.monotonic()
+            heating = self.plant.heating_fraction(t)
+            vents = self.plant.vent_fraction(t)
+            state = self.model.step(dt, weather, vents, heating)
+            self._read_sensors()
+            self.samples.append(SimulationSample(
+                t,
+                state.internal_temp,
+                state.internal_hum,
+                weather.external_temp,
+                controller._resolve_environment_target(now),
+                vents * 100.0,
+                heating * 100.0,
+            ))
+
+    async def _scheduler(self, scheduler: Scheduler) -> None:
+        # osobny wątek w aplikacji -> osobne zadanie tutaj, żeby długie ruchy go nie blokowały
+        while True:
+            scheduler.run_pending(self.clock.now())
+            await asyncio.sleep(float(core_config.CONTROL.get("scheduler_loop_s", 1.0) or 1.0))
+
+    def run(self, duration_s: float) -> SimulationReport:
+        wall_start = time.perf_counter()
+        with patched_config(self.overrides):
+            self._read_sensors()
+            controller = SimulatedController(
+                self.sensors, clock=self.clock, publisher=self.plant,
+                vent_groups=self.vent_groups, vent_plan=self.vent_plan,
+            )
+            self.controller = controller
+            self.plant.attach(controller)
+            loop = controller.attach_event_loop(self.clock.new_event_loop())
+            tasks = [loop.create_task(self._physics())]
+            if self.use_scheduler:
+                tasks.append(loop.create_task(self._scheduler(Scheduler(controller, clock=self.clock))))
+            end = self.clock.monotonic() + float(duration_s)
+            try:
+                while self.clock.monotonic() < end:
+                    params = controller.step()
+                    loop.run_until_complete(asyncio.sleep(params.controller_loop_s))
+            finally:
+                for task in asyncio.all_tasks(loop):
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+                loop.close()
+                asyncio.set_event_loop(None)
+        elapsed = self.clock.monotonic()
+        self.plant.finish(elapsed)
+        metrics = control_metrics(self.samples, self.model_step_s, self.target_margin_c)
+        metrics["heating_on_s"] = self.plant.heating_on_s
+        # rozjazd między pozycją "w głowie" sterownika a fizyczną – to koryguje kalibracja
+        metrics["vent_drift_max_percent"] = max(
+            (abs(vent.position - self.plant.vents[vid].position_at(elapsed)) for vid, vent in controller.vents.items()),
+            default=0.0,
+        )
+        return SimulationReport(
+            duration_s=elapsed,
+            wall_time_s=time.perf_counter() - wall_start,
+            step_s=self.model_step_s,
+            samples=self.samples,
+            metrics=metrics,
+            relay_switches=dict(self.plant.relay_switches),
+            publishes=self.plant.publishes,
+            events=list(controller.events),
+        )
+
+
+__all__ = [
+    "GreenhouseSimulation",
+    "SimulatedController",
+    "SimulatedPlant",
+    "SimulatedSensors",
+    "SimulationReport",
+    "SimulationSample",
+    "control_metrics",
+    "load_plan_file",
+    "parse_override",
+    "patched_config",
+]
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Weather traces for the greenhouse simulator."""
+from __future__ import annotations
+
+import bisect
+import csv
+import math
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+WEATHER_FIELDS = ("external_temp", "external_hum", "wind_speed", "wind_direction", "rain", "solar_w_m2")
+
+
+@dataclass(frozen=True)
+class WeatherSample:
+    external_temp: float
+    external_hum: float
+    wind_speed: float
+    wind_direction: float
+    rain: float
+    solar_w_m2: float
+
+    def sensors(self) -> Dict[str, float]:
+        """Readings as the controller sees them (radiation is model-only)."""
+        return {
+            "external_temp": self.external_temp,
+            "external_hum": self.external_hum,
+            "wind_speed": self.wind_speed,
+            "wind_direction": self.wind_direction,
+            "rain": self.rain,
+        }
+
+
+@dataclass(frozen=True)
+class WeatherEvent:
+    """Overrides applied between two hours of the day, e.g. a storm front."""
+
+    start_hour: float
+    end_hour: float
+    overrides: Tuple[Tuple[str, float], ...]
+
+    @classmethod
+    def build(cls, start_hour: float, end_hour: float, **overrides: float) -> "WeatherEvent":
+        return cls(float(start_hour), float(end_hour), tuple(sorted(overrides.items())))
+
+    def active(self, hour: float) -> bool:
+        return self.start_hour <= hour < self.end_hour
+
+
+class SyntheticWeather:
+    """Deterministic clear-sky day: sinusoidal temperature, humidity in anti-phase, solar bell."""
+
+    def __init__(
+        self,
+        t_min: float = 12.0,
+        t_max: float = 27.0,
+        hum_min: float = 45.0,
+        hum_max: float = 90.0,
+        wind_mean: float = 3.0,
+        wind_amplitude: float = 2.0,
+        wind_direction: float = 270.0,
+        solar_peak_w_m2: float = 800.0,
+        sunrise_hour: float = 5.0,
+        sunset_hour: float = 21.0,
+        events: Iterable[WeatherEvent] = (),
+    ) -> None:
+        self.t_min = t_min
+        self.t_max = t_max
+        self.hum_min = hum_min
+        self.hum_max = hum_max
+        self.wind_mean = wind_mean
+        self.wind_amplitude = wind_amplitude
+        self.wind_direction = wind_direction
+        self.solar_peak = solar_peak_w_m2
+        self.sunrise = sunrise_hour
+        self.sunset = sunset_hour
+        self.events = tuple(events)
+
+    def at(self, when: datetime) -> WeatherSample:
+        hour = when.hour + when.minute / 60.0 + when.second / 3600.0
+        # minimum temperatury o świcie, maksimum ok. 15:00
+        phase = math.cos((hour - 15.0) / 24.0 * 2.0 * math.pi)
+        temp = self.t_min + (self.t_max - self.t_min) * (phase + 1.0) / 2.0
+        hum = self.hum_max - (self.hum_max - self.hum_min) * (phase + 1.0) / 2.0
+        wind = max(0.0, self.wind_mean + self.wind_amplitude * math.sin((hour - 9.0) / 24.0 * 2.0 * math.pi))
+        solar = 0.0
+        if self.sunrise < hour < self.sunset:
+            solar = self.solar_peak * math.sin(math.pi * (hour - self.sunrise) / (self.sunset - self.sunrise))
+        sample = WeatherSample(temp, hum, wind, self.wind_direction, 0.0, max(0.0, solar))
+        for event in self.events:
+            if event.active(hour):
+                sample = replace(sample, **dict(event.overrides))
+        return sample
+
+
+class TraceWeather:
+    """Piecewise-linear interpolation of recorded weather points."""
+
+    def __init__(self, points: Sequence[Tuple[datetime, Dict[str, float]]], defaults: Optional[Dict[str, float]] = None) -> None:
+        if not points:
+            raise ValueError("TraceWeather needs at least one point")
+        ordered = sorted(points, key=lambda item: item[0])
+        self._times: List[float] = [ts.timestamp() for ts, _ in ordered]
+        base = {"external_temp": 15.0, "external_hum": 70.0, "wind_speed": 0.0,
+                "wind_direction": 0.0, "rain": 0.0, "solar_w_m2": 0.0}
+        base.update(defaults or {})
+        rows: List[Dict[str, float]] = []
+        last = dict(base)
+        for _, values in ordered:
+            row = dict(last)
+            row.update({k: float(v) for k, v in values.items() if k in WEATHER_FIELDS and v is not None})
+            rows.append(row)
+            last = row
+        self._rows = rows
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "TraceWeather":
+        """CSV with a ``timestamp`` column (ISO 8601) and any of :data:`WEATHER_FIELDS`."""
+        points = []
+        with Path(path).open("r", encoding="utf-8", newline="") as handle:
+            for row in csv.DictReader(handle):
+                ts = datetime.fromisoformat(row["timestamp"])
+                values = {k: float(row[k]) for k in WEATHER_FIELDS if row.get(k) not in (None, "")}
+                points.append((ts, values))
+        return cls(points)
+
+    def at(self, when: datetime) -> WeatherSample:
+        t = when.timestamp()
+        idx = bisect.bisect_right(self._times, t)
+        if idx <= 0:
+            row = self._rows[0]
+        elif idx >= len(self._times):
+            row = self._rows[-1]
+        else:
+            t0, t1 = self._times[idx - 1], self._times[idx]
+            a, b = self._rows[idx - 1], self._rows[idx]
+            ratio = (t - t0) / (t1 - t0) if t1 > t0 else 0.0
+            row = {}
+            for key in WEATHER_FIELDS:
+                if key == "wind_direction":
+                    # interpolacja po krótszym łuku
+                    delta = ((b[key] - a[key] + 180.0) % 360.0) - 180.0
+                    row[key] = (a[key] + delta * ratio) % 360.0
+                else:
+                    row[key] = a[key] + (b[key] - a[key]) * ratio
+        return WeatherSample(**{key: row[key] for key in WEATHER_FIELDS})
+
+
+__all__ = ["WeatherSample", "WeatherEvent", "SyntheticWeather", "TraceWeather", "WEATHER_FIELDS"]
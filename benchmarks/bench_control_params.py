@@ -0,0 +1,109 @@
+"""Mikrobenchmark decyzji sterującej: słownik CONTROL vs skompilowane ControlParams.
+
+Uruchomienie: ``python benchmarks/bench_control_params.py``. Porównuje koszt
+wyliczenia celu i ograniczeń bezpieczeństwa, gdy każdy tick parsuje
+``CONTROL.get(...)`` (dawna ścieżka), z odczytem gotowego ``ControlParams``.
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.control_params import compile_control_params  # noqa: E402
+
+CONTROL = {
+    "target_temp_c": 25,
+    "day_target_temp_c": 25,
+    "night_target_temp_c": 20,
+    "humidity_thr": 70,
+    "temp_diff_percent": 5,
+    "min_open_hum_percent": 20,
+    "co2_thr_ppm": 1200,
+    "min_open_co2_percent": 25,
+    "wind_risk_ms": 10,
+    "wind_crit_ms": 20,
+    "risk_open_limit_percent": 50,
+    "rain_threshold": 0.5,
+    "allow_humidity_override": False,
+    "crit_hum_crack_percent": 10,
+}
+SENSORS = {
+    "internal_temp": 27.5,
+    "external_temp": 18.0,
+    "internal_hum": 74.0,
+    "internal_co2": 900.0,
+    "wind_speed": 12.0,
+    "rain": 0.0,
+}
+
+
+def legacy_tick(control=CONTROL, s=SENSORS):
+    base = control.get("target_temp_c", 25.0)
+    try:
+        base_val = float(base)
+    except (TypeError, ValueError):
+        base_val = 25.0
+    day_raw = control.get("day_target_temp_c")
+    try:
+        target = float(day_raw) if day_raw is not None else base_val
+    except (TypeError, ValueError):
+        target = base_val
+    diff = s["internal_temp"] - target
+    pct = 0.0
+    if diff > 0 and s["external_temp"] < s["internal_temp"]:
+        pct = min(100.0, diff * control.get("temp_diff_percent", 5.0))
+    if s["internal_hum"] > control.get("humidity_thr", 70.0) and pct < control.get("min_open_hum_percent", 20.0):
+        pct = control.get("min_open_hum_percent", 20.0)
+    co2_thr = control.get("co2_thr_ppm")
+    try:
+        co2_thr_val = float(co2_thr) if co2_thr is not None else None
+    except (TypeError, ValueError):
+        co2_thr_val = None
+    if co2_thr_val is not None and s["internal_co2"] > co2_thr_val:
+        co2_open = float(control.get("min_open_co2_percent", control.get("min_open_hum_percent", 20.0)))
+        pct = max(pct, max(0.0, min(100.0, co2_open)))
+    rain = s["rain"] > control.get("rain_threshold", 0.5)
+    if s["wind_speed"] >= control.get("wind_crit_ms", 20.0) or rain:
+        if control.get("allow_humidity_override", False) and s["internal_hum"] > control.get("humidity_thr", 70.0):
+            return control.get("crit_hum_crack_percent", 10.0)
+        return 0.0
+    lim = control.get("risk_open_limit_percent", 50.0)
+    if s["wind_speed"] >= control.get("wind_risk_ms", 10.0) and pct > lim:
+        return lim
+    return pct
+
+
+def compiled_tick(p, s=SENSORS):
+    diff = s["internal_temp"] - p.day_target_temp_c
+    pct = 0.0
+    if diff > 0 and s["external_temp"] < s["internal_temp"]:
+        pct = min(100.0, diff * p.temp_diff_percent)
+    if s["internal_hum"] > p.humidity_thr and pct < p.min_open_hum_percent:
+        pct = p.min_open_hum_percent
+    if p.co2_thr_ppm is not None and s["internal_co2"] > p.co2_thr_ppm:
+        pct = max(pct, p.min_open_co2_percent)
+    if s["wind_speed"] >= p.wind_crit_ms or s["rain"] > p.rain_threshold:
+        if p.allow_humidity_override and s["internal_hum"] > p.humidity_thr:
+            return p.crit_hum_crack_percent
+        return 0.0
+    if s["wind_speed"] >= p.wind_risk_ms and pct > p.risk_open_limit_percent:
+        return p.risk_open_limit_percent
+    return pct
+
+
+def main(number: int = 200_000) -> None:
+    params = compile_control_params(CONTROL)
+    assert legacy_tick() == compiled_tick(params)
+    legacy = min(timeit.repeat(legacy_tick, number=number, repeat=5))
+    compiled = min(timeit.repeat(lambda: compiled_tick(params), number=number, repeat=5))
+    compile_cost = min(timeit.repeat(lambda: compile_control_params(CONTROL), number=1000, repeat=3)) / 1000
+    print(f"legacy   : {legacy / number * 1e6:.3f} us/tick")
+    print(f"compiled : {compiled / number * 1e6:.3f} us/tick")
+    print(f"speedup  : {legacy / compiled:.2f}x")
+    print(f"compile  : {compile_cost * 1e6:.1f} us per config change")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark odczytu logów dla podglądu instalatora.
+
+Uruchomienie: ``python benchmarks/bench_log_tail.py [--mb 100]``. Generuje
+tymczasowy plik logu i porównuje dawne wczytanie całego pliku z
+``LogTailReader``: pierwsze zapytanie (budowa indeksu), kolejne zapytanie po
+dopisaniu linii oraz zapytanie z filtrem poziomu.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.log_tail import LineFilter, LogTailReader  # noqa: E402
+
+
+def legacy_page(path: Path, offset: int, limit: int):
+    with path.open("r", encoding="utf-8") as handle:
+        lines = [line.rstrip("\r\n") for line in handle.readlines()]
+    lines = list(reversed(lines))
+    return lines[offset : offset + limit]
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, (time.perf_counter() - started) * 1000.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "system.log"
+        line = "2024-05-01 12:00:00,000 INFO farmcare.controller tick ok vent=3 target=45.0\n"
+        block = line * 10_000
+        with path.open("w", encoding="utf-8") as handle:
+            while handle.tell() < args.mb * 1024 * 1024:
+                handle.write(block)
+            handle.write("2024-05-01 12:00:01,000 ERROR farmcare.mqtt broker lost\n")
+
+        reader = LogTailReader()
+        legacy, legacy_ms = _timed(lambda: legacy_page(path, 0, 200))
+        first, first_ms = _timed(lambda: reader.page(path, 0, 200))
+        assert first.entries == legacy
+        with path.open("a", encoding="utf-8") as handle:
+            handle.write(line * 100)
+        _, warm_ms = _timed(lambda: reader.page(path, 0, 200))
+        _, deep_ms = _timed(lambda: reader.page(path, first.total // 2, 200))
+        _, filt_ms = _timed(lambda: reader.page(path, 0, 1, LineFilter.build("error")))
+
+    print(f"file size        : {args.mb} MB, {first.total} lines")
+    print(f"legacy read      : {legacy_ms:9.1f} ms")
+    print(f"tail (cold index): {first_ms:9.1f} ms")
+    print(f"tail (appended)  : {warm_ms:9.1f} ms")
+    print(f"tail (mid-file)  : {deep_ms:9.1f} ms")
+    print(f"filter level>=ERR: {filt_ms:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
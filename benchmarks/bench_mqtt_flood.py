@@ -0,0 +1,61 @@
+"""Test obciążeniowy MQTT: zalew tematów czujników przez lokalny broker.
+
+Uruchomienie: ``python benchmarks/bench_mqtt_flood.py [--rate 1000] [--seconds 5]
+[--clients 1] [--topics N] [--no-db] [--json]``. Uruchamia ``FakeBroker`` i
+prawdziwą pętlę ``_handle_messages``, zalewa tematy czujników z zadaną
+częstotliwością i podaje przepustowość odbioru, opóźnienie do uśredniacza,
+opóźnienie zapisu do ``sensor_log`` oraz czas obiegu ``mqtt_publish``.
+``--topics N`` zastępuje skonfigurowane tematy N syntetycznymi czujnikami.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.sim.mqtt_load import run_sensor_flood  # noqa: E402
+
+
+def _fmt(summary: dict) -> str:
+    if not summary:
+        return "-"
+    return " ".join(f"{key}={value:.2f}" for key, value in summary.items())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=1000.0, help="wiadomości na sekundę (łącznie)")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--clients", type=int, default=1, help="liczba połączeń wysyłających")
+    parser.add_argument("--topics", type=int, default=None, help="liczba syntetycznych tematów czujników")
+    parser.add_argument("--no-db", action="store_true", help="bez zapisu do sensor_log")
+    parser.add_argument("--probes", type=int, default=20, help="liczba pomiarów obiegu mqtt_publish")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_sensor_flood(
+        args.rate,
+        args.seconds,
+        clients=args.clients,
+        topic_count=args.topics,
+        log_to_db=not args.no_db,
+        publish_probes=args.probes,
+    ))
+    data = report.as_dict()
+    if args.json:
+        print(json.dumps(data, indent=2))
+        return 0
+    print(f"wysłano {data['sent']} ({data['topics']} tematów, {data['clients']} połączeń), "
+          f"odebrano {data['ingested']}, zapisano w bazie {data['db_rows']}")
+    print(f"przepustowość odbioru: {data['ingest_rate']:,.0f} wiad./s (cel {args.rate:,.0f})")
+    print(f"wiadomość -> uśredniacz [ms]: {_fmt(data['averager_latency_ms'])}")
+    print(f"opóźnienie zapisu sensor_log [ms]: {_fmt(data['db_lag_ms'])}")
+    print(f"obieg mqtt_publish [ms]: {_fmt(data['publish_rtt_ms'])}, utracone: {data['publish_lost']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""Benchmark odtwarzania sensor_log: miesiąc danych przez ścieżkę decyzyjną sterownika.
+
+Uruchomienie: ``python benchmarks/bench_replay.py [dni] [okres_s]``. Tworzy
+tymczasową bazę SQLite z syntetycznymi odczytami (6 czujników, każdy co
+``okres_s`` z przesunięciem fazy i rozdzielczością prawdziwych czujników) i
+mierzy czas pełnego odtworzenia ``SensorLogReplay``.
+"""
+
+import math
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from backend.core.db import Base, SensorLog  # noqa: E402
+from backend.sim.replay import SensorLogReplay  # noqa: E402
+
+SENSORS = ("internal_temp", "internal_hum", "external_temp", "external_hum", "wind_speed", "wind_direction")
+
+
+RESOLUTION = {"internal_temp": 0.1, "external_temp": 0.1, "internal_hum": 1.0, "external_hum": 1.0,
+              "wind_speed": 0.1, "wind_direction": 1.0}
+
+
+def _value(name: str, t: float) -> float:
+    day = 2.0 * math.pi * (t / 86400.0)
+    if name == "internal_temp":
+        raw = 22.0 + 6.0 * math.sin(day - 2.0) + 0.3 * math.sin(t / 97.0)
+    elif name == "external_temp":
+        raw = 16.0 + 8.0 * math.sin(day - 2.2)
+    elif name.endswith("_hum"):
+        raw = 65.0 - 20.0 * math.sin(day - 2.0)
+    elif name == "wind_speed":
+        raw = max(0.0, 4.0 + 3.0 * math.sin(t / 5400.0))
+    else:
+        raw = (250.0 + 80.0 * math.sin(t / 20000.0)) % 360.0
+    # rozdzielczość jak w rzeczywistych czujnikach
+    step = RESOLUTION[name]
+    return round(raw / step) * step
+
+
+def build_db(path: Path, days: int, period_s: float):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 5, 1)
+    total = int(days * 86400 / period_s)
+    with engine.begin() as conn:
+        batch = []
+        for i in range(total):
+            base = i * period_s
+            for k, name in enumerate(SENSORS):
+                t = base + k * period_s / len(SENSORS)
+                batch.append({"ts": start + timedelta(seconds=t), "name": name, "value": _value(name, t)})
+            if len(batch) >= 60000:
+                conn.execute(insert(SensorLog), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(SensorLog), batch)
+    return sessionmaker(bind=engine)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    period_s = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        factory = build_db(Path(tmp) / "replay.sqlite3", days, period_s)
+        print(f"baza testowa: {time.perf_counter() - t0:.1f} s")
+        report = SensorLogReplay(session_factory=factory).run()
+        data = report.as_dict()
+        print(f"{data['rows']} odczytów, {days} dni, {data['evaluations']} ticków ocenionych")
+        print(f"czas odtworzenia: {report.wall_time_s:.2f} s ({data['rows'] / report.wall_time_s:,.0f} odczytów/s)")
+        print(f"przełączenia przekaźników: {data['relay_switches_total']}, ponad celem: {data['time_over_target_percent']}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Ostatnie godziny odczytów: bufor pierścieniowy w pamięci vs zapytanie do SQLite.
+
+Uruchomienie: ``python benchmarks/bench_sensor_history.py [godziny] [czujniki]``.
+Wypełnia historię (domyślnie 6 h, 10 czujników, rozdzielczość 10 s) i mierzy
+statystyki okna (średnia, min/max, percentyle, nachylenie) z serializacją
+JSON dla jednego czujnika, a dla porównania to samo okno pobrane z tabeli
+``sensor_logs`` w SQLite w pamięci (zapytanie + statystyki w Pythonie).
+Wynik zależy od tego, czy zainstalowane są NumPy i orjson.
+"""
+
+import sqlite3
+import statistics
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.sensor_history import HAVE_NUMPY, SensorHistory, dumps  # noqa: E402
+
+RESOLUTION_S = 10.0
+START = 1_700_000_000.0
+
+
+def main(hours: float = 6.0, sensor_count: int = 10) -> None:
+    names = [f"sensor_{idx}" for idx in range(sensor_count)]
+    history = SensorHistory(hours, RESOLUTION_S)
+    samples = int(hours * 3600 / RESOLUTION_S)
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE sensor_logs (id INTEGER PRIMARY KEY, ts REAL, name TEXT, value REAL)")
+    db.execute("CREATE INDEX ix_name_ts ON sensor_logs (name, ts)")
+    rows = []
+    for i in range(samples):
+        ts = START + i * RESOLUTION_S
+        readings = {name: 20.0 + (i % 360) * 0.01 + idx for idx, name in enumerate(names)}
+        history.record(readings, ts)
+        rows.extend((ts, name, value) for name, value in readings.items())
+    db.executemany("INSERT INTO sensor_logs (ts, name, value) VALUES (?, ?, ?)", rows)
+    db.commit()
+    window_s = hours * 3600
+    since = START + (samples - 1) * RESOLUTION_S - window_s
+
+    def from_ring() -> bytes:
+        return dumps(history.series(["sensor_0"], window_s))
+
+    def from_sqlite() -> bytes:
+        data = db.execute(
+            "SELECT ts, value FROM sensor_logs WHERE name = ? AND ts >= ? ORDER BY ts", ("sensor_0", since)
+        ).fetchall()
+        ts = [row[0] for row in data]
+        values = [row[1] for row in data]
+        q = statistics.quantiles(values, n=10, method="inclusive")
+        slope = statistics.linear_regression(ts, values).slope * 3600.0
+        stats = {"mean": statistics.fmean(values), "min": min(values), "max": max(values),
+                 "p10": q[0], "p50": q[4], "p90": q[8], "slope_per_h": slope}
+        return dumps({"sensor_0": {"ts": ts, "values": values, "stats": stats}})
+
+    number = 20
+    ring_ms = min(timeit.repeat(from_ring, number=number, repeat=3)) / number * 1000
+    sqlite_ms = min(timeit.repeat(from_sqlite, number=number, repeat=3)) / number * 1000
+    info = history.describe()
+    print(f"backend      : {info['backend']} (numpy={'yes' if HAVE_NUMPY else 'no'})")
+    print(f"history      : {hours:g} h x {sensor_count} sensors, {samples} samples each, {info['bytes'] / 1024:.0f} KiB")
+    print(f"ring window  : {ring_ms:.2f} ms (stats + JSON, {samples} points)")
+    print(f"sqlite window: {sqlite_ms:.2f} ms (query + stats + JSON)")
+
+
+if __name__ == "__main__":
+    args = [float(arg) for arg in sys.argv[1:2]] + [int(arg) for arg in sys.argv[2:3]]
+    main(*args)
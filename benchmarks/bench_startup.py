@@ -0,0 +1,82 @@
+"""Benchmark zimnego startu backendu.
+
+Uruchomienie: ``python benchmarks/bench_startup.py [--runs 5] [--max-import-ms X] [--max-ready-ms Y]``.
+Mierzy w osobnych procesach czas ``import backend.app`` oraz czasy faz
+``on_startup`` (baza w katalogu tymczasowym, bez brokera MQTT). Z progami
+``--max-*`` skrypt kończy się kodem 1 przy regresji, więc nadaje się do CI.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+_CHILD = r"""
+import asyncio, json, time
+t0 = time.perf_counter()
+import backend.app as app_module
+import_ms = (time.perf_counter() - t0) * 1000.0
+
+async def _no_mqtt():
+    return None
+
+app_module.mqtt_start = _no_mqtt
+app_module.DEFERRED_START_DELAY_S = 3600.0
+
+async def main():
+    await app_module.on_startup()
+    await app_module.on_shutdown()
+
+asyncio.run(main())
+print(json.dumps({"import_ms": import_ms, "phases": app_module.STARTUP_TIMINGS}))
+"""
+
+
+def run_once(db_dir: str) -> dict:
+    env = os.environ.copy()
+    env["DB_PATH"] = str(Path(db_dir) / "bench.sqlite3")
+    env["PYTHONPATH"] = str(ROOT)
+    result = subprocess.run(
+        [sys.executable, "-c", _CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-ready-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(max(1, args.runs)):
+            samples.append(run_once(tmp))
+
+    import_ms = statistics.median(s["import_ms"] for s in samples)
+    phases = sorted({name for s in samples for name in s["phases"]})
+    print(f"import backend.app : {import_ms:8.1f} ms (median of {len(samples)})")
+    for name in phases:
+        values = [s["phases"][name] for s in samples if name in s["phases"]]
+        print(f"{name:<19}: {statistics.median(values):8.1f} ms")
+
+    ready_ms = statistics.median(s["phases"].get("control_ready", 0.0) for s in samples)
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"REGRESSION: import {import_ms:.1f} ms > {args.max_import_ms} ms")
+        failed = True
+    if args.max_ready_ms is not None and ready_ms > args.max_ready_ms:
+        print(f"REGRESSION: control_ready {ready_ms:.1f} ms > {args.max_ready_ms} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Benchmark wymuszania celów wietrzników: przejście po grupach vs tablica limitów VentCaps.
+
+Uruchomienie: ``python benchmarks/bench_vent_caps.py [wietrzniki] [grupy]``.
+Buduje obiekt z 500 wietrznikami (domyślnie) w 50 grupach, co piąta grupa
+z blokadą wiatrową, i mierzy koszt jednego ticku: sprawdzenie, czy ruch jest
+potrzebny, wybór kierunku oraz cztery kroki planu po wszystkich grupach.
+"""
+
+import sys
+import timeit
+from collections import OrderedDict
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.vent_caps import VentCaps  # noqa: E402
+from backend.core.vents import Vent  # noqa: E402
+
+TOLERANCE = 0.5
+STEPS = 4
+
+
+def build(vent_count: int, group_count: int):
+    vents = {}
+    for vid in range(1, vent_count + 1):
+        vent = Vent(vid, f"V{vid}", 60.0, "boneio_main", f"b/vent{vid}/up", f"b/vent{vid}/down",
+                    None, 1.0, 0.5, 0.5, 0.5)
+        vent.position = float(vid % 40)
+        vents[vid] = vent
+    groups: "OrderedDict[str, dict]" = OrderedDict()
+    vent_to_groups = {}
+    per_group = max(1, vent_count // group_count)
+    for idx in range(group_count):
+        gid = f"group_{idx + 1}"
+        members = list(range(idx * per_group + 1, min(vent_count, (idx + 1) * per_group) + 1))
+        locked = idx % 5 == 0
+        groups[gid] = {"id": gid, "vents": members, "target_override": 10.0 if locked else None,
+                       "force_close": locked}
+        for vid in members:
+            vent_to_groups.setdefault(vid, []).append(gid)
+    return vents, groups, vent_to_groups
+
+
+# ---- dawna ścieżka (kopie metod Controller sprzed VentCaps) ----
+def legacy_enforce(vent_id, requested_pct, groups, vent_to_groups):
+    target = max(0.0, min(100.0, float(requested_pct)))
+    for gid in vent_to_groups.get(vent_id, []):
+        group = groups.get(gid)
+        if not group:
+            continue
+        override = group.get("target_override")
+        force_close = group.get("force_close", False)
+        if override is None:
+            continue
+        if force_close or target > override:
+            target = override
+    return max(0.0, min(100.0, target))
+
+
+def legacy_tick(target, vents, groups, vent_to_groups):
+    needed = False
+    for group in groups.values():
+        for vid in group.get("vents", []):
+            vent = vents.get(vid)
+            if vent and vent.available and abs(legacy_enforce(vid, target, groups, vent_to_groups) - vent.position) > TOLERANCE:
+                needed = True
+                break
+        if needed:
+            break
+    closers = sum(1 for v in vents.values() if v.position - target > TOLERANCE)
+    openers = sum(1 for v in vents.values() if target - v.position > TOLERANCE)
+    moves = 0
+    for _ in range(STEPS):
+        for gid, group in groups.items():
+            for vid in group.get("vents", []):
+                vent = vents.get(vid)
+                if not vent or not vent.available:
+                    continue
+                if abs(legacy_enforce(vid, target, groups, vent_to_groups) - vent.position) > TOLERANCE:
+                    moves += 1
+    return needed, closers > openers, moves
+
+
+def caps_tick(target, vents, caps):
+    needed = caps.needs_adjustment(target, TOLERANCE)
+    closers = openers = 0
+    for v in vents.values():
+        diff = v.position - target
+        if diff > TOLERANCE:
+            closers += 1
+        elif diff < -TOLERANCE:
+            openers += 1
+    moves = 0
+    for _ in range(STEPS):
+        targets = caps.targets(target)
+        for members in caps.group_members.values():
+            for slot, vent in members:
+                if vent.available and abs(targets[slot] - vent.position) > TOLERANCE:
+                    moves += 1
+    return needed, closers > openers, moves
+
+
+def main(vent_count: int = 500, group_count: int = 50, number: int = 200) -> None:
+    vents, groups, vent_to_groups = build(vent_count, group_count)
+    caps = VentCaps()
+    caps.rebuild(vents, groups, vent_to_groups)
+    assert legacy_tick(35.0, vents, groups, vent_to_groups) == caps_tick(35.0, vents, caps)
+    legacy = min(timeit.repeat(lambda: legacy_tick(35.0, vents, groups, vent_to_groups), number=number, repeat=5))
+    fast = min(timeit.repeat(lambda: caps_tick(35.0, vents, caps), number=number, repeat=5))
+    rebuild = min(timeit.repeat(lambda: caps.rebuild(vents, groups, vent_to_groups), number=20, repeat=3)) / 20
+    refresh = min(timeit.repeat(lambda: caps.refresh_groups(["group_1"]), number=1000, repeat=3)) / 1000
+    print(f"vents/groups : {vent_count}/{group_count}, {STEPS} plan steps per tick")
+    print(f"legacy       : {legacy / number * 1e3:.3f} ms/tick")
+    print(f"vent caps    : {fast / number * 1e3:.3f} ms/tick")
+    print(f"speedup      : {legacy / fast:.2f}x")
+    print(f"rebuild      : {rebuild * 1e3:.3f} ms per topology change")
+    print(f"refresh      : {refresh * 1e6:.1f} us per wind-lock change of one group")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
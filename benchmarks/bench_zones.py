@@ -0,0 +1,101 @@
+"""Pamięć na dodatkową strefę (tunel) w jednym procesie vs osobny stos na tunel.
+
+Uruchomienie: ``python benchmarks/bench_zones.py [strefy] [wietrzniki_na_strefę]``.
+Buduje strefę główną i N dodatkowych (domyślnie 8 stref po 8 wietrzników,
+w każdej grupa na wietrznik i plan z jednym etapem) i mierzy tracemalloc
+przyrost pamięci na każdą kolejną strefę: kontroler, wietrzniki, grupy,
+plan, tablice blokady wiatrowej i własna magistrala czujników. Dla porównania
+podaje maksymalny RSS procesu, który tylko importuje ``backend.app`` – tyle
+kosztuje co najmniej każdy dodatkowy stos (uvicorn, MQTT, SQLite) na tunel.
+"""
+
+import asyncio
+import resource
+import subprocess
+import sys
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(ROOT))
+
+from backend.core import config as core_config  # noqa: E402
+from backend.core.models import SensorSnapshot  # noqa: E402
+from backend.core.zones import ZoneRegistry, build_zone  # noqa: E402
+from backend.sim.clock import VirtualClock  # noqa: E402
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors  # noqa: E402
+
+
+def vent_spec(vid: int) -> dict:
+    return {
+        "id": vid,
+        "name": f"V{vid}",
+        "boneio_device": "boneio_main",
+        "travel_time_s": 30,
+        "topics": {"up": f"boneio/1/cover/vent{vid}/up", "down": f"boneio/1/cover/vent{vid}/down"},
+    }
+
+
+def zone_cfg(idx: int, vents: list) -> dict:
+    groups = [{"id": f"z{idx}_g{vid}", "name": f"G{vid}", "vents": [vid], "wind_upwind_deg": [[300, 60]]} for vid in vents]
+    return {
+        "id": f"z{idx}",
+        "name": f"Tunel {idx}",
+        "vents": vents,
+        "sensors": {"internal_temp": {"topic": f"farmcare/z{idx}/internalTemp"},
+                    "internal_hum": {"topic": f"farmcare/z{idx}/internalHumidity"}},
+        "control": {"target_temp_c": 20 + idx % 5},
+        "vent_groups": groups,
+        "vent_plan_stages": [{"id": "s1", "mode": "parallel", "step_percent": 25, "groups": [g["id"] for g in groups]}],
+        "close_strategy": "fifo",
+    }
+
+
+def stack_rss_kb() -> int:
+    code = "import resource, backend.app; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return int(result.stdout.strip().splitlines()[-1])
+
+
+def main(zone_count: int = 8, vents_per_zone: int = 8) -> None:
+    total = vents_per_zone * (zone_count + 1)
+    core_config.VENTS[:] = [vent_spec(vid) for vid in range(1, total + 1)]
+    configs = [zone_cfg(idx, list(range(idx * vents_per_zone + 1, (idx + 1) * vents_per_zone + 1)))
+               for idx in range(1, zone_count + 1)]
+    core_config.ZONES = configs
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    plant = SimulatedPlant(clock)
+    rs485 = SimulatedSensors()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    primary = SimulatedController(rs485, clock=clock, publisher=plant)
+    primary_bytes = tracemalloc.get_traced_memory()[0] - before
+    per_zone = []
+    controllers = []
+    for cfg in configs:
+        before = tracemalloc.get_traced_memory()[0]
+        controllers.append(SimulatedController(rs485, clock=clock, publisher=plant, zone=build_zone(cfg, SensorSnapshot())))
+        per_zone.append(tracemalloc.get_traced_memory()[0] - before)
+    registry = ZoneRegistry(primary, controllers)
+    loop = registry.attach_event_loop(clock.new_event_loop())
+    before = tracemalloc.get_traced_memory()[0]
+    registry.step_all()
+    tick_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    loop.close()
+    asyncio.set_event_loop(None)
+
+    avg = sum(per_zone) / len(per_zone)
+    print(f"zones        : 1 + {zone_count}, {vents_per_zone} vents/groups each")
+    print(f"primary zone : {primary_bytes / 1024:.1f} KiB")
+    print(f"extra zone   : {avg / 1024:.1f} KiB avg (min {min(per_zone) / 1024:.1f}, max {max(per_zone) / 1024:.1f})")
+    print(f"first tick   : {tick_bytes / 1024:.1f} KiB retained for all zones")
+    print(f"this process : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB max RSS")
+    print(f"stack/tunnel : {stack_rss_kb() / 1024:.1f} MiB max RSS of a process importing backend.app")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
@@ -70,6 +70,14 @@ const SENSOR_META = {
   rain: { label: "Rainfall", unit: "mm", digits: 1 },
 };
 
+// metryki pochodne liczone przez kontroler raz na tick (/api/state -> derived)
+const DERIVED_META = {
+  internal_dew_point_c: { label: "Dew point", unit: "C", digits: 1 },
+  internal_vpd_kpa: { label: "VPD", unit: "kPa", digits: 2 },
+  internal_abs_humidity_g_m3: { label: "Absolute humidity", unit: "g/m3", digits: 1 },
+  enthalpy_diff_kj_kg: { label: "Enthalpy in - out", unit: "kJ/kg", digits: 1 },
+};
+
 const CONTROL_FIELDS = [
   { key: "target_temp_c", label: "Target temperature (C)", step: "0.5", parser: parseFloat, decimals: 1, unit: "C" },
   { key: "humidity_thr", label: "Maximum humidity (%)", step: "1", parser: parseFloat, decimals: 0, unit: "%" },
@@ -353,7 +361,7 @@ async function requestRunUpdate() {
   }
 }
 
-function renderSensors(sensors) {
+function renderSensors(sensors, derived) {
   if (!sensorCards) return;
   sensorCards.innerHTML = "";
   const seen = new Set();
@@ -368,6 +376,17 @@ function renderSensors(sensors) {
     sensorCards.appendChild(card);
     seen.add(key);
   });
+  Object.entries(DERIVED_META).forEach(([key, meta]) => {
+    const val = derived?.[key];
+    if (val === undefined) return;
+    const card = document.createElement("div");
+    card.className = "card";
+    card.innerHTML = `
+      <h3>${meta.label}</h3>
+      <p>${formatWithUnit(val, meta.unit, meta.digits)}</p>
+    `;
+    sensorCards.appendChild(card);
+  });
   Object.entries(sensors || {}).forEach(([key, value]) => {
     if (seen.has(key)) return;
     const card = document.createElement("div");
@@ -556,7 +575,7 @@ async function fetchState() {
 
     updateModeUI();
 
-    renderSensors(data.sensors || {});
+    renderSensors(data.sensors || {}, data.derived || {});
     renderConfigSummary(currentConfig);
     renderVentSliders();
     renderGroupSliders();
@@ -947,6 +966,17 @@ function describeNotificationEntry(entry) {
       }
       break;
     }
+    case "UPDATE_INSTALLED": {
+      const version = meta.version ? String(meta.version) : null;
+      result.title = version ? `Przelaczono na ${version} - trwa sprawdzanie` : "Przelaczono slot - trwa sprawdzanie";
+      break;
+    }
+    case "UPDATE_ROLLED_BACK":
+      result.title = "Aktualizacja wycofana";
+      if (meta.previous) {
+        result.description = `Przywrocono: ${meta.previous}`;
+      }
+      break;
     case "UPDATE_FAILED":
       result.title = "Blad aktualizacji";
       if (meta.detail) {
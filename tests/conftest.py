@@ -0,0 +1,44 @@
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(datetime(2024, 6, 21, 12, 0))
+
+
+@pytest.fixture
+def run(clock):
+    """Runs ``factory()`` to completion on an event loop driven by ``clock``."""
+    loop = clock.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        yield lambda factory: loop.run_until_complete(factory())
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+@pytest.fixture
+def sim(clock):
+    """Simulated controller and plant on a virtual-time loop; pending moves finish before the loop closes."""
+    plant = SimulatedPlant(clock)
+    controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=plant)
+    plant.attach(controller)
+    loop = controller.attach_event_loop(clock.new_event_loop())
+    try:
+        yield SimpleNamespace(clock=clock, plant=plant, controller=controller, loop=loop)
+    finally:
+        loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+        loop.close()
+        asyncio.set_event_loop(None)
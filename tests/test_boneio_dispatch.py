@@ -0,0 +1,81 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.boneio_dispatch import BoneIODispatcher, build_dispatchers
+from backend.core.vents import Vent
+
+
+class _Recorder:
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+
+    async def __call__(self, topic, payload):
+        self.messages.append((self.clock.monotonic(), topic, payload))
+
+
+def _vents(dispatcher, count=4, travel=10.0):
+    return [
+        Vent(i, f"V{i}", travel, "boneio_main", f"boneio/1/cover/vent{i}/up", f"boneio/1/cover/vent{i}/down",
+             None, 1.0, 0.5, 0.5, 0.5, dispatcher=dispatcher)
+        for i in range(1, count + 1)
+    ]
+
+
+def test_group_move_is_batched_into_json_commands(clock, run):
+    publish = _Recorder(clock)
+    dispatcher = BoneIODispatcher("boneio_main", command_topic="boneio/1/cmd", publisher=publish, batch_window_s=0.02)
+    vents = _vents(dispatcher)
+
+    run(lambda: asyncio.gather(*(v.move_to(50.0) for v in vents)))
+
+    # 4 wietrzniki x (ruch + stop) -> dwie wiadomości zamiast 16
+    assert [topic for _, topic, _ in publish.messages] == ["boneio/1/cmd", "boneio/1/cmd"]
+    assert json.loads(publish.messages[0][2]) == {f"vent{i}": "up" for i in range(1, 5)}
+    assert json.loads(publish.messages[1][2]) == {f"vent{i}": "stop" for i in range(1, 5)}
+    assert all(v.position == 50.0 for v in vents)
+    stats = dispatcher.stats()
+    assert stats["commands"] == 8 and stats["messages"] == 2
+    assert stats["latency_ms"]["max"] == 20.0
+
+
+def test_same_vent_twice_in_window_starts_new_batch(clock, run):
+    publish = _Recorder(clock)
+    dispatcher = BoneIODispatcher("boneio_main", command_topic="boneio/1/cmd", publisher=publish, batch_window_s=0.05)
+
+    async def scenario():
+        await asyncio.gather(
+            dispatcher.send("vent1", "up", []),
+            dispatcher.send("vent1", "stop", []),
+            dispatcher.send("vent2", "down", []),
+        )
+
+    run(scenario)
+    assert [json.loads(p) for _, _, p in publish.messages] == [
+        {"vent1": "up", "vent2": "down"},
+        {"vent1": "stop"},
+    ]
+
+
+def test_motor_cap_serialises_moves_and_keeps_per_topic_fallback(clock, run):
+    publish = _Recorder(clock)
+    dispatcher = build_dispatchers(
+        [{"id": "boneio_main", "base_topic": "boneio/1", "max_concurrent_motors": 2}], publisher=publish
+    )["boneio_main"]
+    vents = _vents(dispatcher)
+
+    run(lambda: asyncio.gather(*(v.move_to(100.0) for v in vents)))
+
+    # dwa silniki naraz: dwie tury po 10 s
+    assert clock.monotonic() == 20.0
+    stats = dispatcher.stats()["motors"]
+    assert stats["peak"] == 2 and stats["waits"] == 2 and stats["max_wait_s"] == 10.0
+    assert stats["active"] == 0
+    # bez command_topic – dotychczasowe tematy przekaźników
+    first = [(topic, payload) for _, topic, payload in publish.messages[:2]]
+    assert first == [("boneio/1/cover/vent1/down", "OFF"), ("boneio/1/cover/vent1/up", "ON")]
+    assert len(publish.messages) == 16
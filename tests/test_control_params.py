@@ -0,0 +1,60 @@
+import dataclasses
+import sys
+from datetime import time
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.control_params import ControlParams, compile_control_params  # noqa: E402
+
+
+def test_compile_applies_fallbacks_and_coercions():
+    params = compile_control_params({
+        "target_temp_c": "23",
+        "night_target_temp_c": None,
+        "humidity_thr": "bad",
+        "co2_thr_ppm": None,
+        "min_open_hum_percent": 15,
+        "allow_humidity_override": "yes",
+        "day_start": "7:30",
+        "ignore_delta_percent": 0,
+    })
+    assert params.day_target_temp_c == pytest.approx(23.0)
+    assert params.night_target_temp_c == pytest.approx(23.0)
+    assert params.humidity_thr == pytest.approx(70.0)
+    assert params.co2_thr_ppm is None
+    assert params.min_open_co2_percent == pytest.approx(15.0)
+    assert params.allow_humidity_override is True
+    assert params.day_start == time(7, 30)
+    assert params.night_start is None
+    assert params.ignore_delta_percent == pytest.approx(0.5)
+
+
+def test_params_are_frozen_and_versioned():
+    first = compile_control_params({})
+    second = compile_control_params({})
+    assert isinstance(first, ControlParams)
+    assert second.version > first.version
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        first.wind_crit_ms = 1.0
+    assert not hasattr(first, "__dict__")
+
+
+def test_tick_keeps_pinned_params_when_config_changes(monkeypatch):
+    from backend.core import controller as controller_module
+
+    class DummyRS485:
+        def averages(self):
+            return {}
+
+    monkeypatch.setattr(controller_module.Controller, "__init__", lambda self, rs485: None)
+    ctrl = controller_module.Controller(DummyRS485())
+    ctrl._params = compile_control_params({"wind_crit_ms": 20.0, "rain_threshold": 0.5})
+    ctrl._tick_params = ctrl._params
+    ctrl._params = compile_control_params({"wind_crit_ms": 5.0, "rain_threshold": 0.5})
+    sensors = {"wind_speed": 8.0, "rain": 0.0, "internal_hum": 50.0}
+    assert ctrl._apply_safety(30.0, sensors, manual=True) == pytest.approx(30.0)
+    ctrl._tick_params = None
+    assert ctrl._apply_safety(30.0, sensors, manual=True) == pytest.approx(0.0)
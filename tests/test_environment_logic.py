@@ -7,6 +7,7 @@ import pytest
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from backend.core import controller as controller_module  # noqa: E402
+from backend.core.config import CONTROL  # noqa: E402
 
 
 class DummyRS485:
@@ -50,12 +51,12 @@ def patched_controller(monkeypatch):
     monkeypatch.setattr(controller_module.Controller, "_apply_plan_overrides", lambda self: None)
     monkeypatch.setattr(controller_module.Controller, "_apply_heating_overrides", lambda self: None)
     monkeypatch.setattr(controller_module, "SessionLocal", lambda: NoopSession())
-    monkeypatch.setitem(controller_module.CONTROL, "target_temp_c", 22.0)
-    monkeypatch.setitem(controller_module.CONTROL, "day_target_temp_c", 22.0)
-    monkeypatch.setitem(controller_module.CONTROL, "night_target_temp_c", 22.0)
-    monkeypatch.setitem(controller_module.CONTROL, "day_start", "06:00")
-    monkeypatch.setitem(controller_module.CONTROL, "night_start", "20:00")
-    monkeypatch.setitem(controller_module.CONTROL, "night_max_open_percent", 40.0)
+    monkeypatch.setitem(CONTROL, "target_temp_c", 22.0)
+    monkeypatch.setitem(CONTROL, "day_target_temp_c", 22.0)
+    monkeypatch.setitem(CONTROL, "night_target_temp_c", 22.0)
+    monkeypatch.setitem(CONTROL, "day_start", "06:00")
+    monkeypatch.setitem(CONTROL, "night_start", "20:00")
+    monkeypatch.setitem(CONTROL, "night_max_open_percent", 40.0)
     monkeypatch.setitem(controller_module.HEATING, "enabled", False)
     monkeypatch.setitem(controller_module.HEATING, "day_start", "06:00")
     monkeypatch.setitem(controller_module.HEATING, "night_start", "20:00")
@@ -65,8 +66,8 @@ def patched_controller(monkeypatch):
 
 def test_environment_day_night_target(monkeypatch, patched_controller):
     ctrl = patched_controller
-    monkeypatch.setitem(controller_module.CONTROL, "day_target_temp_c", 24.0)
-    monkeypatch.setitem(controller_module.CONTROL, "night_target_temp_c", 18.0)
+    monkeypatch.setitem(CONTROL, "day_target_temp_c", 24.0)
+    monkeypatch.setitem(CONTROL, "night_target_temp_c", 18.0)
     ctrl._refresh_schedules()
     day_now = datetime.combine(datetime.today(), time(10, 0))
     night_now = datetime.combine(datetime.today(), time(23, 0))
@@ -76,7 +77,7 @@ def test_environment_day_night_target(monkeypatch, patched_controller):
 
 def test_night_cap_when_heating_disabled(monkeypatch, patched_controller):
     ctrl = patched_controller
-    monkeypatch.setitem(controller_module.CONTROL, "night_max_open_percent", 35.0)
+    monkeypatch.setitem(CONTROL, "night_max_open_percent", 35.0)
 
     class NightDatetime:
         @staticmethod
@@ -110,14 +111,14 @@ def test_co2_logging(monkeypatch):
     monkeypatch.setattr(controller_module.Controller, "_apply_heating_overrides", lambda self: None)
     monkeypatch.setattr(controller_module, "SessionLocal", lambda: EventSession())
 
-    monkeypatch.setitem(controller_module.CONTROL, "target_temp_c", 22.0)
-    monkeypatch.setitem(controller_module.CONTROL, "day_target_temp_c", 22.0)
-    monkeypatch.setitem(controller_module.CONTROL, "night_target_temp_c", 22.0)
-    monkeypatch.setitem(controller_module.CONTROL, "day_start", "06:00")
-    monkeypatch.setitem(controller_module.CONTROL, "night_start", "20:00")
-    monkeypatch.setitem(controller_module.CONTROL, "night_max_open_percent", 40.0)
-    monkeypatch.setitem(controller_module.CONTROL, "co2_thr_ppm", 800.0)
-    monkeypatch.setitem(controller_module.CONTROL, "min_open_co2_percent", 50.0)
+    monkeypatch.setitem(CONTROL, "target_temp_c", 22.0)
+    monkeypatch.setitem(CONTROL, "day_target_temp_c", 22.0)
+    monkeypatch.setitem(CONTROL, "night_target_temp_c", 22.0)
+    monkeypatch.setitem(CONTROL, "day_start", "06:00")
+    monkeypatch.setitem(CONTROL, "night_start", "20:00")
+    monkeypatch.setitem(CONTROL, "night_max_open_percent", 40.0)
+    monkeypatch.setitem(CONTROL, "co2_thr_ppm", 800.0)
+    monkeypatch.setitem(CONTROL, "min_open_co2_percent", 50.0)
     monkeypatch.setitem(controller_module.HEATING, "enabled", True)
     monkeypatch.setitem(controller_module.HEATING, "day_start", "06:00")
     monkeypatch.setitem(controller_module.HEATING, "night_start", "20:00")
@@ -138,7 +139,7 @@ def test_co2_logging(monkeypatch):
     pct_high = ctrl._compute_auto_target(sensors_high)
     pct_low = ctrl._compute_auto_target(sensors_low)
 
-    assert pct_high >= controller_module.CONTROL["min_open_co2_percent"]
+    assert pct_high >= CONTROL["min_open_co2_percent"]
     assert pct_low < pct_high
     assert ("CO2_HIGH", "WARN") in events
     assert ("CO2_NORMAL", "INFO") in events
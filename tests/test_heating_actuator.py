@@ -0,0 +1,143 @@
+import asyncio
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.heating_valve import SetpointActuator
+from backend.core.relay_shadow import RelayShadow
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors, patched_config
+
+VALVE_CONFIG = {
+    "heating.enabled": True,
+    "heating.mode": "three_way_valve",
+    "heating.day_target_c": 22.0,
+    "heating.night_target_c": 22.0,
+    "heating.hysteresis_c": 4.0,
+    "heating.valve": {
+        "open_topic": "heat/open",
+        "close_topic": "heat/close",
+        "stop_topic": None,
+        "open_payload": "ON",
+        "close_payload": "ON",
+        "stop_payload": "OFF",
+        "travel_time_s": 40.0,
+        "reverse_pause_s": 1.0,
+        "min_move_s": 0.5,
+        "ignore_delta_percent": 1.0,
+    },
+}
+
+SENSORS = {"internal_temp": 17.0, "external_temp": 5.0, "internal_hum": 60.0, "wind_speed": 1.0, "rain": 0.0}
+
+
+def test_newest_setpoint_wins_while_busy():
+    clock = VirtualClock(datetime(2024, 1, 10, 12, 0))
+    loop = clock.new_event_loop()
+    asyncio.set_event_loop(loop)
+    applied = []
+
+    async def apply(value):
+        await asyncio.sleep(10.0)
+        return value
+
+    actuator = SetpointActuator(apply, on_applied=lambda value, result: applied.append((clock.monotonic(), result)))
+    actuator.bind(loop)
+    try:
+        assert actuator.submit(10)
+        loop.run_until_complete(asyncio.sleep(1.0))
+        # 20 i 30 czekają na koniec ruchu do 10 – zostaje tylko najnowsza
+        actuator.submit(20)
+        actuator.submit(30)
+        loop.run_until_complete(asyncio.sleep(30.0))
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+    assert applied == [(10.0, 10), (20.0, 30)]
+    assert actuator.stats()["superseded"] == 1 and actuator.idle
+
+
+def test_valve_swing_does_not_block_control_tick():
+    clock = VirtualClock(datetime(2024, 1, 10, 12, 0))
+    with patched_config(VALVE_CONFIG):
+        plant = SimulatedPlant(clock)
+        controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=plant)
+        plant.attach(controller)
+        loop = controller.attach_event_loop(clock.new_event_loop())
+        try:
+            controller.step(dict(SENSORS))
+            # tick wrócił od razu, zawór dopiero rusza
+            assert clock.monotonic() == 0.0
+            assert controller._heating_state == 100.0
+            loop.run_until_complete(asyncio.sleep(1.0))
+            assert plant.relay_state.get("heat/open") is True
+
+            # kolejne ticki w trakcie przejazdu nie czekają i nie dublują nastawy
+            for _ in range(5):
+                controller.step(dict(SENSORS))
+                loop.run_until_complete(asyncio.sleep(1.0))
+            assert controller._heating_actuator.stats()["submitted"] == 1
+
+            loop.run_until_complete(asyncio.sleep(40.0))
+        finally:
+            loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+            loop.close()
+            asyncio.set_event_loop(None)
+    assert controller._heating_valve.position == 100.0
+    assert plant.relay_state.get("heat/open") is False
+    assert [e for _, e, _ in controller.events].count("HEATING_VALVE_TARGET") == 1
+
+
+def test_actuator_thread_publishes_to_shared_shadow_and_stops():
+    shadow = RelayShadow()
+    applied = threading.Event()
+
+    async def apply(value):
+        # zawór publikuje z wątku aktuatora do wspólnego cienia
+        shadow.commanded([(f"heat/{i}", "OFF") for i in range(value)])
+        applied.set()
+
+    actuator = SetpointActuator(apply, name="heating-test")
+    loop = actuator.start_thread()
+    assert actuator.submit(500)
+    assert applied.wait(2.0)
+    assert shadow.stats()["relays"] == 500
+
+    thread = actuator._thread
+    actuator.stop_thread()
+    assert not thread.is_alive() and loop.is_closed()
+    assert actuator.submit(1) is False
+
+
+def test_undelivered_binary_heating_command_is_retried():
+    clock = VirtualClock(datetime(2024, 1, 10, 12, 0))
+    with patched_config({"heating.enabled": True, "heating.mode": "binary", "heating.topic": "heat/relay",
+                         "heating.day_target_c": 22.0, "heating.night_target_c": 22.0, "heating.hysteresis_c": 4.0}):
+        plant = SimulatedPlant(clock)
+        controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=plant)
+        delivered = []
+
+        async def flaky(topic, payload):
+            delivered.append(topic)
+            return len(delivered) > 1  # pierwsze polecenie przepada (MqttError w mqtt_publish)
+
+        controller._publisher = flaky
+        loop = controller.attach_event_loop(clock.new_event_loop())
+        try:
+            controller.step(dict(SENSORS))
+            loop.run_until_complete(asyncio.sleep(1.0))
+            assert controller._heating_state is None
+            assert "HEATING_ON" not in [e for _, e, _ in controller.events]
+
+            controller.step(dict(SENSORS))
+            loop.run_until_complete(asyncio.sleep(1.0))
+        finally:
+            loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(loop), return_exceptions=True))
+            loop.close()
+            asyncio.set_event_loop(None)
+    assert delivered == ["heat/relay", "heat/relay"]
+    assert controller._heating_state is True
+    assert [e for _, e, _ in controller.events].count("HEATING_ON") == 1
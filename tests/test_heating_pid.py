@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.heating_pid import HeatingPid, PidSettings, PidState
+
+
+def _pid(**overrides):
+    cfg = {"algorithm": "pi", "kp": 20.0, "ti_s": 600.0, "min_dwell_s": 0.0, "rate_limit_percent_per_min": 0.0}
+    cfg.update(overrides)
+    return HeatingPid(PidSettings.from_config(cfg, deadband_percent=1.0))
+
+
+def test_settings_from_heating_section():
+    assert PidSettings.from_config(None) is None
+    assert PidSettings.from_config({"algorithm": "proportional"}) is None
+    assert PidSettings.from_config({"algorithm": "bang-bang"}) is None
+    settings = PidSettings.from_config({"algorithm": "PID", "kp": "15", "td_s": 30, "min_dwell_s": "x"},
+                                       deadband_percent=2.0)
+    assert settings.algorithm == "pid" and settings.kp == 15.0 and settings.td_s == 30.0
+    assert settings.min_dwell_s == PidSettings.min_dwell_s and settings.deadband_percent == 2.0
+
+
+def test_integral_does_not_wind_up_while_saturated():
+    pid = _pid()
+    # godzina z dużym uchybem: zawór otwarty na 100 %, całka nie rośnie
+    for t in range(0, 3600, 10):
+        assert pid.update(20.0, 14.0, float(t)) == 100.0
+    assert pid.state.integral == 0.0
+    # po dojściu do nastawy zawór od razu się przymyka zamiast trzymać 100 % przez "rozładowanie" całki
+    assert pid.update(20.0, 20.2, 3600.0) == 0.0
+
+    # umiarkowany uchyb: całka przejmuje pracę i wraca po restarcie ze stanu JSON
+    pid = _pid()
+    for t in range(0, 1800, 10):
+        pid.update(20.0, 19.5, float(t))
+    assert 0.0 < pid.state.integral < 100.0
+    restored = HeatingPid(pid.settings, PidState.from_json(pid.state.to_json()))
+    assert restored.update(20.0, 19.5, 1800.0) == pid.update(20.0, 19.5, 1800.0)
+    assert PidState.from_json("not json") == PidState()
+
+
+def test_dwell_and_rate_limit_reduce_valve_moves():
+    pid = _pid(min_dwell_s=120.0, rate_limit_percent_per_min=10.0)
+    outputs = [pid.update(20.0, 19.0 + (0.3 if t % 20 else -0.3), float(t)) for t in range(0, 600, 10)]
+    moves = sum(1 for a, b in zip(outputs, outputs[1:]) if a != b)
+    # szum co tick, ruch najwyżej co 120 s
+    assert moves <= 600 // 120
+
+    pid = _pid(min_dwell_s=60.0, rate_limit_percent_per_min=10.0)
+    assert pid.update(20.0, 20.0, 0.0) == 0.0
+    assert pid.update(20.0, 15.0, 30.0) == 0.0        # jeszcze w czasie postoju
+    assert pid.update(20.0, 15.0, 60.0) == 10.0       # 10 %/min po minucie
+    assert pid.update(20.0, 15.0, 180.0) == 30.0
@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from backend.core.log_tail import LineFilter, LogTailReader
+
+
+def _write(path, lines, mode="w"):
+    with path.open(mode, encoding="utf-8", newline="") as handle:
+        for line in lines:
+            handle.write(line + "\n")
+
+
+def test_page_matches_full_read_across_chunks(tmp_path):
+    path = tmp_path / "system.log"
+    lines = [f"2024-01-01 INFO line {i} " + "x" * (i % 50) for i in range(2000)]
+    _write(path, lines)
+    reader = LogTailReader(stride=16, chunk_size=1024)
+    newest_first = list(reversed(lines))
+
+    for offset, limit in ((0, 100), (17, 33), (1990, 100), (1999, 5)):
+        page = reader.page(path, offset=offset, limit=limit)
+        assert page.entries == newest_first[offset : offset + limit]
+        assert page.total == 2000
+        assert page.has_more == (offset + limit < 2000)
+
+    expected = [line for line in newest_first if "line 7" in line]
+    page = reader.page(path, offset=3, limit=20, line_filter=LineFilter.build(None, "LINE 7"))
+    assert page.entries == expected[3:23]
+
+
+def test_index_grows_incrementally_and_resets_on_rotation(tmp_path):
+    path = tmp_path / "mqtt.log"
+    _write(path, [f"msg {i}" for i in range(10)])
+    reader = LogTailReader(stride=4)
+    assert reader.line_count(path) == 10
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("msg 10\npartial")
+    page = reader.page(path, limit=3)
+    assert page.entries == ["partial", "msg 10", "msg 9"]
+    assert page.total == 12
+
+    _write(path, ["fresh"])  # rotacja/obcięcie pliku
+    assert reader.page(path, limit=5).entries == ["fresh"]
+
+
+def test_level_and_substring_filter(tmp_path):
+    path = tmp_path / "system.log"
+    _write(
+        path,
+        [
+            "t1 INFO boot",
+            "t2 WARNING vent 3 slow",
+            "t3 ERROR vent 4 offline",
+            "t4 INFO vent 4 online",
+            "t5 CRITICAL power loss",
+        ],
+    )
+    reader = LogTailReader(chunk_size=1024)
+
+    page = reader.page(path, limit=10, line_filter=LineFilter.build("warning"))
+    assert page.entries == ["t5 CRITICAL power loss", "t3 ERROR vent 4 offline", "t2 WARNING vent 3 slow"]
+    assert page.total == 3 and not page.has_more
+
+    page = reader.page(path, offset=1, limit=1, line_filter=LineFilter.build(None, "VENT 4"))
+    assert page.entries == ["t3 ERROR vent 4 offline"]
+    assert page.has_more is False
+
+    page = reader.page(path, limit=1, line_filter=LineFilter.build("error"))
+    assert page.entries == ["t5 CRITICAL power loss"]
+    assert page.has_more is True
+
+    with pytest.raises(ValueError):
+        LineFilter.build("loud")
+
+
+def test_read_from_returns_only_complete_new_lines(tmp_path):
+    path = tmp_path / "system.log"
+    _write(path, ["old"])
+    reader = LogTailReader()
+    lines, pos = reader.read_from(path, None)
+    assert lines == []
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write("new 1\nnew 2\nhalf")
+    lines, pos = reader.read_from(path, pos)
+    assert lines == ["new 1", "new 2"]
+
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(" done\n")
+    lines, pos = reader.read_from(path, pos)
+    assert lines == ["half done"]
+
+
+def test_missing_file_is_empty(tmp_path):
+    reader = LogTailReader()
+    page = reader.page(tmp_path / "none.log")
+    assert page.entries == [] and page.total == 0
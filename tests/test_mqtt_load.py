@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core import mqtt_client
+from backend.core.config import settings
+from backend.sim.mqtt_broker import FakeBroker, MiniClient, Will, topic_matches
+from backend.sim.mqtt_load import run_sensor_flood
+
+
+def test_topic_filters():
+    assert topic_matches("boneio/+/in/#", "boneio/boneio1/in/3")
+    assert topic_matches("boneio/+/in/#", "boneio/boneio1/in")
+    assert not topic_matches("boneio/+/in/#", "boneio/boneio1/out/3")
+    assert topic_matches("farmcare/vents/+/available", "farmcare/vents/7/available")
+    assert not topic_matches("farmcare/vents/+/available", "farmcare/vents/7/x/available")
+    assert not topic_matches("#", "$SYS/broker/uptime")
+
+
+def test_broker_routes_retains_and_publishes_will():
+    async def scenario():
+        async with FakeBroker() as broker:
+            async with MiniClient(broker.host, broker.port, client_id="sub") as sub:
+                pub = MiniClient(broker.host, broker.port, client_id="dev",
+                                 will=Will("farmcare/vents/1/available", "offline", retain=True))
+                await pub.connect()
+                await pub.publish("farmcare/vents/1/available", "online", qos=1, retain=True)
+                await sub.subscribe("farmcare/vents/+/available", qos=1)
+                await pub.publish("farmcare/sensors/other", "1", qos=1)
+                await pub.force_disconnect()
+
+                received = []
+                async with sub.unfiltered_messages() as messages:
+                    async for message in messages:
+                        received.append((message.topic, message.payload, message.retain))
+                        if len(received) == 2:
+                            break
+                return received, broker.retained
+
+    received, retained = asyncio.run(scenario())
+    assert received == [
+        ("farmcare/vents/1/available", b"online", True),
+        ("farmcare/vents/1/available", b"offline", False),
+    ]
+    assert retained["farmcare/vents/1/available"][0] == b"offline"
+
+
+def test_sensor_flood_reaches_averagers_and_db_and_restores_client():
+    bus = mqtt_client.sensor_bus
+    host, port = settings.MQTT_HOST, settings.MQTT_PORT
+
+    report = asyncio.run(run_sensor_flood(rate=400, duration_s=0.5, clients=2, publish_probes=3))
+
+    assert report.sent == 200
+    assert report.ingested == report.sent
+    assert report.db_rows == report.sent
+    assert set(report.averager_latency_ms) == {"p50", "p95", "p99", "max"}
+    assert report.db_lag_ms["p50"] >= report.averager_latency_ms["p50"]
+    assert len(report.publish_rtt_ms) == 4 and report.publish_lost == 0
+    assert mqtt_client.sensor_bus is bus
+    assert (settings.MQTT_HOST, settings.MQTT_PORT) == (host, port)
+    assert mqtt_client.Client is not MiniClient
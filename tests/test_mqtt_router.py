@@ -0,0 +1,85 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core import mqtt_client
+from backend.core.mqtt_router import TopicRouter
+from backend.sim.mqtt_broker import FakeBroker, MiniClient
+from backend.sim.mqtt_load import patched_mqtt_client
+
+
+def test_trie_matches_wildcards_in_registration_order():
+    router = TopicRouter()
+    seen = []
+    router.add("boneio/+/in/#", lambda t, p, c: seen.append(("input", c)), "input")
+    router.add("boneio/1/in/vent1_error", lambda t, p, c: seen.append(("exact", c)), "exact")
+    router.add("#", lambda t, p, c: seen.append(("all", c)), "all")
+
+    assert router.dispatch("boneio/1/in/vent1_error", b"1") == 3
+    assert seen == [("input", ("1", "vent1_error")), ("exact", ()), ("all", ("boneio/1/in/vent1_error",))]
+    assert [r.name for r, _ in router.match("boneio/2/in")] == ["input", "all"]
+    assert router.match("$SYS/uptime") == ()
+    assert router.filters() == ["boneio/+/in/#", "#"]
+
+    with pytest.raises(ValueError):
+        router.add("boneio/#/in", lambda *a: None)
+    with pytest.raises(ValueError):
+        router.add("boneio/x+/in", lambda *a: None)
+
+
+def test_handler_counters_include_failures():
+    router = TopicRouter()
+    router.add("a/+", lambda t, p, c: float(p), "number")
+    router.dispatch("a/1", b"1.5")
+    router.dispatch("a/2", b"oops")
+    router.dispatch("b", b"1")
+
+    stats = router.stats()
+    assert stats["handlers"]["number"]["count"] == 2
+    assert stats["handlers"]["number"]["errors"] == 1
+    assert stats["unmatched"] == 1
+
+
+def test_ingest_subscribes_with_wildcards_and_routes_vent_errors(monkeypatch):
+    import backend.app as app_module
+
+    marked = []
+
+    class FakeController:
+        def mark_error(self, vid, state):
+            marked.append((vid, state))
+
+    monkeypatch.setattr(app_module, "controller", FakeController())
+    topic = next(iter(mqtt_client.VENT_ERROR_TOPIC_MAP))
+    vid = mqtt_client.VENT_ERROR_TOPIC_MAP[topic]
+
+    async def scenario():
+        async with FakeBroker() as broker:
+            with patched_mqtt_client(broker):
+                ingest = asyncio.create_task(mqtt_client._handle_messages())
+                try:
+                    await broker.wait_subscribed(topic)
+                    async with MiniClient(broker.host, broker.port) as device:
+                        await device.publish("boneio/1/in/unrelated", "1", qos=1)
+                        await device.publish(topic, "ON", qos=1)
+                        await device.publish("farmcare/vents/1/available", "online", qos=1)
+                    for _ in range(200):
+                        if marked:
+                            break
+                        await asyncio.sleep(0.005)
+                    session = next(iter(broker._sessions.values()))
+                    return sorted(session.subscriptions), mqtt_client.router_stats()
+                finally:
+                    ingest.cancel()
+                    await asyncio.gather(ingest, return_exceptions=True)
+
+    filters, stats = asyncio.run(scenario())
+    assert marked == [(vid, True)]
+    assert "boneio/+/in/#" in filters and "farmcare/vents/+/available" in filters
+    assert topic not in filters
+    assert stats["handlers"]["vent_error"]["count"] == 2
+    assert stats["handlers"]["vent_available"]["count"] == 1
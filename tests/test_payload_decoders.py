@@ -0,0 +1,68 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.core import mqtt_client
+from backend.core.db import Base, SensorLog
+from backend.core.models import SensorSnapshot
+from backend.core.payload_decoders import build_decoders, parse_path, to_epoch
+
+KNOWN = SensorSnapshot.__dataclass_fields__
+
+
+def test_paths_and_timestamps():
+    assert parse_path("$.wind.values[1].kmh") == ("wind", "values", 1, "kmh")
+    assert to_epoch(1718960000) == 1718960000.0
+    assert to_epoch(1718960000123) == 1718960000.123
+    assert to_epoch("2024-06-21T09:33:20Z") == to_epoch("2024-06-21T09:33:20") == 1718962400.0
+    assert to_epoch("yesterday") is None
+
+
+def test_one_message_fans_out_to_several_sensors():
+    decoders = build_decoders(
+        {"internal_temp": {"topic": "farmcare/sensors/internalTemp"},
+         "external_pressure": {"topic": "p", "json_path": "pressure", "scale": 0.01}},
+        [{"topic": "weather", "timestamp_path": "ts",
+          "fields": {"external_temp": "air.temp", "wind_speed": {"path": "wind[0]", "scale": 0.5},
+                     "rain": "rain", "bogus_sensor": "x"}}],
+        KNOWN,
+    )
+    # zwykły temat bez skalowania zostaje na szybkiej ścieżce
+    assert set(decoders) == {"p", "weather"}
+
+    values, ts = decoders["weather"].decode(b'{"ts": 1718962400000, "air": {"temp": 21.5}, "wind": [8, 3], "rain": false}')
+    assert values == [("external_temp", 21.5), ("wind_speed", 4.0), ("rain", 0.0)]
+    assert ts == 1718962400.0
+
+    values, ts = decoders["weather"].decode(b'{"air": {}}')
+    assert values == [] and ts is None
+    assert decoders["p"].decode(b'{"pressure": 101325}') == ([("external_pressure", 1013.25)], None)
+
+
+def test_handler_updates_averagers_and_logs_one_commit(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'log.sqlite3'}")
+    Base.metadata.create_all(engine)
+    bus = SensorSnapshot()
+    monkeypatch.setattr(mqtt_client, "sensor_bus", bus)
+    monkeypatch.setattr(mqtt_client, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(mqtt_client, "SENSOR_DECODERS", build_decoders(
+        {}, [{"topic": "esp/state", "timestamp_path": "time",
+              "fields": {"internal_temp": "temperature", "internal_hum": "humidity"}}], KNOWN))
+    router = mqtt_client.build_router()
+
+    assert router.dispatch("esp/state", b'{"temperature": 23.4, "humidity": 61, "time": "2024-06-21T09:33:20Z"}') == 1
+
+    assert bus.internal_temp.avg() == 23.4 and bus.internal_hum.avg() == 61.0
+    assert bus.internal_temp.updated_at == 1718962400.0
+    with sessionmaker(bind=engine)() as session:
+        rows = session.query(SensorLog).order_by(SensorLog.name).all()
+    assert [(r.name, r.value, r.ts) for r in rows] == [
+        ("internal_hum", 61.0, datetime(2024, 6, 21, 9, 33, 20)),
+        ("internal_temp", 23.4, datetime(2024, 6, 21, 9, 33, 20)),
+    ]
+    assert router.stats()["handlers"]["sensor_message"]["count"] == 1
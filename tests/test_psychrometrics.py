@@ -0,0 +1,90 @@
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from backend.core.psychrometrics import (
+    DERIVED_KEYS,
+    absolute_humidity_g_m3,
+    derive_metrics,
+    pressure_pa,
+    saturation_vapour_pressure_kpa,
+)
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors
+
+
+def test_derived_metrics_match_reference_values():
+    derived = derive_metrics({"internal_temp": 25.0, "internal_hum": 50.0, "external_temp": 10.0,
+                              "external_hum": 80.0, "external_pressure": 1013.25})
+    assert derived["internal_dew_point_c"] == pytest.approx(13.86, abs=0.05)
+    assert derived["internal_vpd_kpa"] == pytest.approx(1.584, abs=0.005)
+    assert derived["internal_abs_humidity_g_m3"] == pytest.approx(11.5, abs=0.1)
+    assert derived["internal_enthalpy_kj_kg"] == pytest.approx(50.3, abs=0.3)
+    assert derived["external_dew_point_c"] == pytest.approx(6.7, abs=0.05)
+    assert derived["enthalpy_diff_kj_kg"] == pytest.approx(derived["internal_enthalpy_kj_kg"] - derived["external_enthalpy_kj_kg"], abs=0.01)
+    assert pressure_pa(101.3) == pytest.approx(101300.0) and pressure_pa(None) == 101325.0
+
+    partial = derive_metrics({"internal_temp": 25.0, "internal_hum": None, "external_temp": 10.0, "external_hum": 80.0})
+    assert set(partial) == set(DERIVED_KEYS) and partial["internal_vpd_kpa"] is None
+    assert partial["external_vpd_kpa"] is not None and partial["enthalpy_diff_kj_kg"] is None
+
+
+def test_simulator_uses_controller_formulas():
+    from backend.sim.model import absolute_humidity, relative_humidity, saturation_vapour_pressure
+
+    # model szklarni i metryki sterownika liczą tym samym wzorem Magnusa
+    assert absolute_humidity(25.0, 50.0) == absolute_humidity_g_m3(25.0, 50.0)
+    assert saturation_vapour_pressure(10.0) == pytest.approx(saturation_vapour_pressure_kpa(10.0) * 1000.0)
+    assert relative_humidity(25.0, absolute_humidity(25.0, 50.0)) == pytest.approx(50.0)
+
+
+@pytest.fixture
+def sim_controller():
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=SimulatedPlant(clock))
+    loop = controller.attach_event_loop(clock.new_event_loop())
+    try:
+        yield controller
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def test_tick_caches_derived_metrics_for_export_and_history(sim_controller):
+    controller = sim_controller
+    readings = {"internal_temp": 25.0, "internal_hum": 50.0, "external_temp": 30.0, "external_hum": 40.0, "wind_speed": 1.0}
+    controller.step(readings)
+    derived = controller.export_environment_snapshot()["derived"]
+    controller._clock.advance(controller.history.resolution_s)
+    controller.step(readings)  # zamyka przedział historii z pierwszym tickiem
+    assert derived["internal_vpd_kpa"] == pytest.approx(1.584, abs=0.005)
+    assert derived["enthalpy_diff_kj_kg"] < 0  # na zewnątrz cieplej i więcej energii
+    assert controller.history.get("internal_vpd_kpa").stats()["mean"] == derived["internal_vpd_kpa"]
+
+
+def test_vpd_and_dew_point_rules_force_ventilation_only_with_drier_outside_air(sim_controller, monkeypatch):
+    controller = sim_controller
+    # 20 °C / 65 %: poniżej humidity_thr, VPD ~0.82 kPa, punkt rosy ~13.2 °C; temperatura nie wymaga wietrzenia
+    dry_outside = {"internal_temp": 20.0, "internal_hum": 65.0, "external_temp": 10.0, "external_hum": 60.0,
+                   "wind_speed": 1.0, "rain": 0.0}
+    humid_outside = dict(dry_outside, external_temp=19.0, external_hum=100.0)
+    min_open = controller._control_params().min_open_hum_percent
+
+    def target(sensors):
+        s = dict(sensors)
+        s.update(derive_metrics(s))
+        return controller._compute_auto_target(s)
+
+    assert target(dry_outside) == 0.0  # bez progów VPD / punktu rosy – jak dotąd tylko humidity_thr
+    monkeypatch.setitem(controller._control, "vpd_min_kpa", 0.9)
+    controller._swap_control_params()
+    assert target(dry_outside) == min_open and target(humid_outside) == 0.0
+    monkeypatch.delitem(controller._control, "vpd_min_kpa")
+    monkeypatch.setitem(controller._control, "dew_point_margin_c", 8.0)
+    controller._swap_control_params()
+    assert target(dry_outside) == min_open
@@ -0,0 +1,83 @@
+import asyncio
+import copy
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core import config as core_config
+
+SENSORS = {"internal_temp": 30.0, "external_temp": 20.0, "internal_hum": 60.0, "wind_speed": 1.0, "rain": 0.0}
+
+
+@pytest.fixture(autouse=True)
+def _restore_config():
+    saved = {name: copy.deepcopy(getattr(core_config, name)) for name in ("VENTS", "VENT_GROUPS", "VENT_PLAN_STAGES")}
+    yield
+    for name, value in saved.items():
+        target = getattr(core_config, name)
+        target.clear()
+        target.extend(value)
+
+
+def test_vent_edit_keeps_live_objects_and_defers_wiring_of_moving_vent(sim):
+    controller, loop = sim.controller, sim.loop
+    before = dict(controller.vents)
+    groups = controller._groups
+    specs = copy.deepcopy(core_config.VENTS)
+    specs[0]["travel_time_s"] = 40
+    specs[1]["topics"]["up"] = "boneio/1/cover/vent2b/up"
+    moving = controller.vents[2]
+    task = loop.create_task(moving.move_to(60.0))
+    loop.run_until_complete(asyncio.sleep(5.0))
+    controller.update_config(vents=specs)
+
+    assert controller.vents == before and all(controller.vents[vid] is before[vid] for vid in before)
+    assert controller._groups is groups  # zbiór wietrzników bez zmian – grupy i etapy nietknięte
+    assert controller.vents[1].travel_time == 40
+    # wietrznik w ruchu: przekaźnik "up" zostaje do końca przejazdu
+    assert moving._moving and moving.up_topic == "boneio/1/cover/vent2/up"
+    loop.run_until_complete(task)
+    assert moving.position == 60.0
+    controller.step(dict(SENSORS))
+    assert moving.up_topic == "boneio/1/cover/vent2b/up" and moving.channel == "vent2b"
+    meta = [m for _, e, m in controller.events if e == "VENTS_RECONFIGURED"]
+    assert meta == [{"added": [], "removed": [], "updated": [1, 2]}]
+
+
+def test_removed_and_added_vents_update_groups_and_keep_wind_state(sim):
+    controller = sim.controller
+    controller.step(dict(SENSORS, wind_direction=90.0))
+    controller._groups["group_2"]["wind_locked"] = True
+    kept = controller._groups["group_2"]
+    original = copy.deepcopy(core_config.VENTS)
+    specs = [spec for spec in original if spec["id"] != 2]
+    controller.update_config(vents=specs)
+    assert 2 not in controller.vents
+    assert controller._groups["group_1"]["vents"] == [1]
+    assert controller._groups["group_2"] is kept and kept["wind_locked"]
+
+    # ponowne dodanie wraca do grupy z konfiguracji instalatora
+    controller.update_config(vents=original)
+    assert controller._groups["group_1"]["vents"] == [1, 2]
+    assert controller.vents[2].position == 0.0
+
+
+def test_change_during_tick_applies_after_tick(sim):
+    controller, loop = sim.controller, sim.loop
+    seen = {}
+    new_groups = [{"id": "all", "name": "Wszystkie", "vents": [1, 2, 3, 4]}]
+
+    def _installer_save():
+        controller.update_config(vent_groups=new_groups, vent_plan={"stages": [{"id": "s", "groups": ["all"]}]})
+        seen["live"] = list(controller._groups)
+        seen["exported"] = [g["id"] for g in controller.export_groups()]
+        seen["plan"] = [stage["id"] for stage in controller.export_plan()["stages"]]
+
+    loop.call_later(1.0, _installer_save)
+    controller.step(dict(SENSORS))  # tick z ruchem wietrzników – zapis trafia w jego środek
+    assert seen == {"live": ["group_1", "group_2", "group_3"], "exported": ["all"], "plan": ["s"]}
+    assert list(controller._groups) == ["all"] and [stage["id"] for stage in controller._plan] == ["s"]
+    assert controller._vent_to_groups[3] == ["all"]
@@ -0,0 +1,104 @@
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.heating_valve import ThreeWayValve
+from backend.core.relay_shadow import RelayShadow
+from backend.core.vents import Vent
+
+
+class _Recorder:
+    def __init__(self):
+        self.messages = []
+
+    async def __call__(self, topic, payload):
+        self.messages.append((topic, payload))
+
+
+def _setup(clock, refresh_s=300.0):
+    publish = _Recorder()
+    shadow = RelayShadow(refresh_s, clock=clock.monotonic)
+    vent = Vent(1, "V1", 10.0, "boneio_main", "b/vent1/up", "b/vent1/down", None, 1.0, 0.5, 0.5, 0.5,
+                publisher=publish, shadow=shadow)
+    return publish, shadow, vent
+
+
+def test_vent_publishes_only_relay_transitions(clock, run):
+    publish, shadow, vent = _setup(clock)
+
+    async def moves():
+        await vent.move_to(30.0)
+        await vent.move_to(60.0)
+        await vent.stop()
+
+    run(moves)
+    # pierwszy ruch: stan nieznany (OFF/ON), stop bez OFF dla wyłączonego "down";
+    # drugi ruch tylko ON/OFF "up"; końcowy stop nic nie wysyła
+    assert publish.messages == [
+        ("b/vent1/down", "OFF"), ("b/vent1/up", "ON"), ("b/vent1/up", "OFF"),
+        ("b/vent1/up", "ON"), ("b/vent1/up", "OFF"),
+    ]
+    stats = shadow.stats()
+    assert stats["published"] == 5 and stats["suppressed"] == 5
+
+
+def test_stale_or_contradicted_state_is_published_again(clock, run):
+    publish, shadow, vent = _setup(clock, refresh_s=60.0)
+    run(vent.stop)
+    assert len(publish.messages) == 2
+
+    # BoneIO zgłasza włączony przekaźnik (zgubione OFF) -> stop idzie ponownie
+    assert shadow.confirm("b/vent1/up", "ON") is True
+    run(vent.stop)
+    assert publish.messages[2:] == [("b/vent1/up", "OFF")]
+
+    clock.advance(61.0)
+    run(vent.stop)
+    assert publish.messages[3:] == [("b/vent1/up", "OFF"), ("b/vent1/down", "OFF")]
+    assert shadow.stats()["refreshed"] == 2
+
+    shadow.forget(["b/vent1/up"])
+    run(vent.stop)
+    assert publish.messages[5:] == [("b/vent1/up", "OFF")]
+
+
+def test_valve_skips_redundant_stop_publishes(clock, run):
+    publish = _Recorder()
+    shadow = RelayShadow(clock=clock.monotonic)
+    valve = ThreeWayValve(open_topic="v/open", close_topic="v/close", stop_topic="v/stop",
+                          travel_time_s=10.0, publisher=publish, shadow=shadow)
+
+    async def moves():
+        await valve.move_to(50.0)
+        await valve.move_to(80.0)
+        await valve.move_to(20.0)
+
+    run(moves)
+    assert publish.messages == [
+        ("v/close", "OFF"), ("v/stop", "OFF"), ("v/open", "ON"), ("v/open", "OFF"),
+        ("v/open", "ON"), ("v/open", "OFF"),
+        ("v/close", "ON"), ("v/close", "OFF"),
+    ]
+    assert valve.position == 20.0
+
+
+def test_undelivered_stop_is_not_recorded(clock, run):
+    publish, shadow, vent = _setup(clock)
+    failing = {("b/vent1/up", "OFF")}
+
+    async def flaky(topic, payload):
+        publish.messages.append((topic, payload))
+        return (topic, payload) not in failing  # mqtt_publish: False przy MqttError
+
+    vent._publisher = flaky
+
+    async def moves():
+        await vent.move_to(30.0)
+        failing.clear()
+        await vent.stop()
+
+    run(moves)
+    # OFF nie doszło do brokera – kolejny stop wysyła je jeszcze raz zamiast tłumić przez 300 s
+    assert publish.messages[-2:] == [("b/vent1/up", "OFF"), ("b/vent1/up", "OFF")]
+    assert shadow.state("b/vent1/up") == "OFF"
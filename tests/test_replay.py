@@ -0,0 +1,126 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.core.config import CONTROL
+from backend.core.db import Base, SensorLog
+from backend.sim.replay import SensorLogReplay, iter_sensor_log
+
+CALM = {"internal_hum": 50.0, "external_hum": 50.0, "wind_speed": 2.0, "wind_direction": 90.0}
+
+
+def _utc(local: datetime) -> datetime:
+    # sensor_log trzyma czas UTC (datetime.utcnow), replay pokazuje czas lokalny
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _rows(start: datetime, minutes: int, period_s: int = 60, **values):
+    readings = {**CALM, **values}
+    rows = []
+    for i in range(0, minutes * 60, period_s):
+        ts = _utc(start + timedelta(seconds=i))
+        for name, value in readings.items():
+            rows.append(SensorLog(ts=ts, name=name, value=value))
+    return rows
+
+
+def _db(tmp_path, rows):
+    engine = create_engine(f"sqlite:///{tmp_path / 'replay.sqlite3'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        session.add_all(rows)
+        session.commit()
+    return factory
+
+
+def test_replay_opens_vents_and_counts_time_over_target(tmp_path):
+    start = datetime(2024, 6, 3, 10, 0)
+    factory = _db(tmp_path, _rows(start, 120, internal_temp=30.0, external_temp=20.0)
+                  + [SensorLog(ts=_utc(start), name="soil_moisture", value=1.0)])
+
+    chunks = list(iter_sensor_log(factory, chunk_size=100))
+    assert len(chunks) > 1
+    epochs = [row[0] for chunk in chunks for row in chunk]
+    assert epochs == sorted(epochs)
+
+    report = SensorLogReplay(session_factory=factory, chunk_size=100).run()
+    data = report.as_dict(include_trajectories=True)
+
+    assert data["rows"] == len(epochs)
+    assert data["ignored_rows"] == 1
+    assert report.start == start
+    # 30 °C przy celu 25 °C i 5 %/°C -> 25 %
+    assert all(points[-1][1] == 25.0 for points in data["trajectories"].values())
+    assert data["relay_switches_total"] > 0
+    assert data["time_over_target_percent"] == 100.0
+    assert report.time_over_target_s > 7000
+
+
+def test_replay_compares_configurations_without_touching_config(tmp_path):
+    start = datetime(2024, 6, 3, 10, 0)
+    factory = _db(tmp_path, _rows(start, 30, internal_temp=30.0, external_temp=20.0))
+    before = dict(CONTROL)
+
+    default = SensorLogReplay(session_factory=factory).run()
+    aggressive = SensorLogReplay(session_factory=factory, overrides={"control.temp_diff_percent": 12}).run()
+
+    assert CONTROL == before
+    assert {points[-1][1] for points in default.trajectories.values()} == {25.0}
+    assert {points[-1][1] for points in aggressive.trajectories.values()} == {60.0}
+
+
+def test_replay_applies_wind_lock_and_night_cap_between_readings():
+    start = datetime(2024, 6, 3, 19, 0)
+    rows = [
+        (_utc(start + timedelta(seconds=i)), name, value)
+        for i, (name, value) in enumerate({**CALM, "wind_direction": 320.0, "internal_temp": 35.0, "external_temp": 20.0}.items())
+    ]
+    # jeden odczyt po 21:00 – granica dnia (20:00) musi zadziałać bez nowych danych
+    rows.append((_utc(start + timedelta(hours=2)), "external_hum", 51.0))
+    chunks = [[((ts - datetime(1970, 1, 1)).total_seconds(), name, value) for ts, name, value in rows]]
+
+    groups = [
+        {"id": "roof", "vents": [1, 2], "wind_upwind_deg": [[300, 60]]},
+        {"id": "side", "vents": [3, 4]},
+    ]
+    plan = {"stages": [{"id": "all", "mode": "parallel", "step_percent": 100, "groups": ["roof", "side"]}]}
+
+    report = SensorLogReplay(rows=chunks, vent_groups=groups, vent_plan=plan).run()
+
+    assert report.as_dict()["events"]["WIND_LOCK_ON"] == 1
+    # dach (wietrzniki 1 i 2) zamknięty wiatrem z 320°, boki: 50 % w dzień, 40 % nocą
+    assert [pos for _, pos in report.trajectories[1]] == [0.0]
+    opened = [points for vid, points in report.trajectories.items() if vid not in (1, 2)]
+    assert all(max(pos for _, pos in points) == 50.0 for points in opened)
+    assert all(points[-1][1] == 40.0 for points in opened)
+    assert all(points[-1][0].hour == 20 for points in opened)
+
+
+def test_replay_releases_wind_lock_after_delay_without_new_readings():
+    start = datetime(2024, 6, 3, 12, 0)
+    rows = [
+        (_utc(start + timedelta(seconds=i)), name, value)
+        for i, (name, value) in enumerate({**CALM, "wind_direction": 320.0, "internal_temp": 35.0, "external_temp": 20.0}.items())
+    ]
+    rows += [(_utc(start + timedelta(seconds=60 + i)), "wind_direction", 90.0) for i in range(0, 20, 2)]
+    # następny odczyt dopiero po godzinie – zwolnienie po wind_lock_release_s nie może na niego czekać
+    rows.append((_utc(start + timedelta(hours=1)), "external_hum", 51.0))
+    chunks = [[((ts - datetime(1970, 1, 1)).total_seconds(), name, value) for ts, name, value in rows]]
+    groups = [
+        {"id": "roof", "vents": [1, 2], "wind_upwind_deg": [[300, 60]]},
+        {"id": "side", "vents": [3, 4]},
+    ]
+    plan = {"stages": [{"id": "all", "mode": "parallel", "step_percent": 100, "groups": ["roof", "side"]}]}
+
+    report = SensorLogReplay(rows=chunks, vent_groups=groups, vent_plan=plan).run()
+
+    assert report.as_dict()["events"]["WIND_LOCK_OFF"] == 1
+    opened_at, position = report.trajectories[1][-1]
+    assert position == 50.0
+    assert opened_at < start + timedelta(minutes=5)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+import backend.app as app_module
+from backend.core.sensor_history import HAVE_NUMPY, SensorHistory, SensorRing, dumps
+from backend.routers import api
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors
+
+
+def test_ring_keeps_fixed_memory_and_contiguous_windows():
+    ring = SensorRing(4, resolution_s=10.0)
+    size = ring.nbytes
+    for i in range(7):
+        ring.append(float(i), 100.0 + 10.0 * i)
+    # ostatni przedział (160 s) jest jeszcze otwarty – okna obejmują zamknięte
+    ts, values = ring.window()
+    assert list(values) == [2.0, 3.0, 4.0, 5.0] and list(ts) == [120.0, 130.0, 140.0, 150.0]
+    assert ring.nbytes == size and len(ring) == 4 and ring.samples == 7
+
+    # odczyty w tym samym przedziale 10 s -> jeden slot ze średnią; wydane okno się nie zmienia
+    ring.append(8.0, 165.0)
+    assert list(values) == [2.0, 3.0, 4.0, 5.0] and ring.last_ts == 165.0
+    ring.append(9.0, 170.0)
+    assert list(values) == [2.0, 3.0, 4.0, 5.0] and list(ts) == [120.0, 130.0, 140.0, 150.0]
+    assert list(ring.window()[1]) == [3.0, 4.0, 5.0, 7.0]
+    assert list(ring.window(20.0)[1]) == [5.0, 7.0]  # okno liczone od najnowszej próbki
+    assert len(ring.window(5.0, now=500.0)[1]) == 0
+
+    direction = SensorRing(4, resolution_s=10.0, circular=True)
+    direction.append(350.0, 100.0)
+    direction.append(10.0, 105.0)
+    direction.append(20.0, 110.0)
+    assert list(direction.window()[1]) == [10.0]
+
+
+def test_window_statistics_and_slope():
+    history = SensorHistory(hours=1, resolution_s=60.0)
+    for minute in range(11):
+        history.record({"internal_temp": 20.0 + 0.1 * minute, "rain": None, "wind_speed": 2.0}, 1000.0 + 60.0 * minute)
+    assert history.names() == ["internal_temp", "wind_speed"] and history.capacity == 61
+    stats = history.get("internal_temp").stats()
+    # minuta 10 to otwarty przedział – statystyki z minut 0–9
+    assert stats["count"] == 10 and stats["min"] == pytest.approx(20.0) and stats["max"] == pytest.approx(20.9)
+    assert stats["mean"] == pytest.approx(20.45) and stats["p50"] == pytest.approx(20.45)
+    assert stats["p10"] == pytest.approx(20.09) and stats["slope_per_h"] == pytest.approx(6.0, rel=1e-4)
+    assert history.get("wind_speed").stats(seconds=120)["slope_per_h"] == pytest.approx(0.0, abs=1e-9)
+    assert SensorRing(4).stats() is None
+
+
+def test_controller_ticks_feed_recent_history_endpoint(monkeypatch):
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    rs485 = SimulatedSensors()
+    controller = SimulatedController(rs485, clock=clock, publisher=SimulatedPlant(clock))
+    loop = controller.attach_event_loop(clock.new_event_loop())
+    monkeypatch.setattr(app_module, "controller", controller)
+    try:
+        for i in range(30):
+            rs485.readings = {"internal_temp": 20.0 + i * 0.1, "external_temp": 15.0, "internal_hum": 60.0, "wind_speed": 1.0}
+            controller.step()
+            clock.advance(10.0)
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+    response = api.get_recent_history(minutes=2.0, names=["internal_temp", "unknown"], zone=None)
+    payload = json.loads(response.body)
+    series = payload["sensors"]["internal_temp"]
+    assert list(payload["sensors"]) == ["internal_temp"] and payload["zone"] == "main"
+    assert len(series["values"]) == len(series["ts"]) == 12
+    assert series["values"][-1] == pytest.approx(22.8, abs=1e-4)
+    assert series["stats"]["slope_per_h"] == pytest.approx(36.0, rel=1e-3)
+
+
+@pytest.mark.skipif(not HAVE_NUMPY, reason="numpy not installed")
+def test_numpy_windows_are_views_serialised_from_buffers():
+    import numpy as np
+
+    ring = SensorRing(8, resolution_s=10.0)
+    for i in range(6):
+        ring.append(20.0 + i, 100.0 + 10.0 * i)
+    ts, values = ring.window()
+    assert isinstance(values, np.ndarray) and np.shares_memory(values, ring._values)
+    assert np.shares_memory(ts, ring._ts)
+    stats = ring.stats()
+    assert stats["count"] == 5 and stats["mean"] == pytest.approx(22.0) and stats["p50"] == pytest.approx(22.0)
+    assert stats["slope_per_h"] == pytest.approx(360.0)
+    assert json.loads(dumps({"ts": ts, "values": values})) == {
+        "ts": [100.0, 110.0, 120.0, 130.0, 140.0], "values": [20.0, 21.0, 22.0, 23.0, 24.0],
+    }
@@ -0,0 +1,191 @@
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+from fastapi import HTTPException
+
+from backend.core.remote_control import (
+    RemoteState,
+    RemoteZones,
+    SnapshotPublisher,
+    SnapshotUnavailable,
+    build_snapshot,
+    dispatch_command,
+)
+from backend.core.shared_state import _SEQ, CommandClient, CommandError, CommandServer, SnapshotReader, SnapshotWriter
+from backend.core.zones import ZoneRegistry
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors
+
+
+def test_reader_sees_whole_snapshots_and_parses_once_per_publish(tmp_path):
+    path = tmp_path / "snapshot"
+    reader = SnapshotReader(str(path), retries=3)
+    assert reader.read() is None  # proces sterowania jeszcze nie działa
+    writer = SnapshotWriter(str(path), 4096)
+    assert reader.read() is None  # region utworzony, nic nie opublikowano
+    assert writer.write({"mode": "auto", "n": 1})
+    assert reader.read() == {"mode": "auto", "n": 1} and reader.read() == {"mode": "auto", "n": 1}
+    assert reader.parses == 1 and reader.age_s() < 5
+
+    # zapis w toku (nieparzysty licznik): czytelnik nie czeka, oddaje ostatni pełny snapshot
+    _SEQ.pack_into(writer._mm, 0, writer.seq + 1)
+    writer._mm[24:30] = b"xxxxxx"
+    assert reader.read() == {"mode": "auto", "n": 1} and reader.retried == 3
+    assert writer.write({"mode": "manual", "n": 2})
+    assert reader.read() == {"mode": "manual", "n": 2} and reader.parses == 2
+    assert not writer.write({"blob": "x" * 5000}) and writer.too_large == 1
+    reader.close()
+    writer.close()
+
+
+@pytest.fixture
+def control_process(tmp_path):
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=SimulatedPlant(clock))
+    registry = ZoneRegistry(controller)
+    writer = SnapshotWriter(str(tmp_path / "snapshot"), 256 * 1024)
+    publisher = SnapshotPublisher(writer, lambda: build_snapshot(registry))
+    server = CommandServer(str(tmp_path / "control.sock"),
+                           lambda zone, name, kwargs: dispatch_command(registry, zone, name, kwargs), b"secret")
+    server.start()
+    try:
+        yield registry, writer, publisher, server
+    finally:
+        server.stop()
+        writer.close()
+
+
+def test_api_worker_reads_snapshot_and_queues_commands(control_process, tmp_path):
+    registry, writer, publisher, server = control_process
+    state = RemoteState(SnapshotReader(writer.path), stale_after_s=5.0)
+    client = CommandClient(server.address, b"secret", timeout_s=2.0)
+    zones = RemoteZones(state, client)
+    remote = zones.primary
+    with pytest.raises(SnapshotUnavailable):
+        remote.mode
+    assert publisher.publish()
+    assert remote.mode == "auto" and sorted(remote.vents) == sorted(registry.primary.vents)
+    assert remote.zone.control["target_temp_c"] == registry.primary.zone.control["target_temp_c"]
+    assert [g["id"] for g in remote.export_groups()] == [g["id"] for g in registry.primary.export_groups()]
+    assert zones.describe()[0]["id"] == "main" and zones.get("nope") is None
+
+    # polecenie wykonuje proces sterowania; odpowiedź niesie stan strefy bez czekania na publikację
+    remote.set_mode("manual")
+    assert registry.primary.mode == "manual" and remote.mode == "manual"
+    assert remote.manual_set_group("missing", 10.0) is False
+    with pytest.raises(CommandError):
+        client.call(None, "stop")  # spoza listy poleceń
+    assert server.handled == 2 and server.failed == 1
+
+    # proces sterowania przestał publikować
+    state.reader.published_at = time.time() - 60.0
+    with pytest.raises(SnapshotUnavailable):
+        state.current()
+    client.close_connection()
+
+
+def test_timed_out_command_is_not_sent_again(tmp_path):
+    calls = []
+
+    def slow(zone, name, kwargs):
+        calls.append(name)
+        time.sleep(0.6)
+        return len(calls)
+
+    server = CommandServer(str(tmp_path / "control.sock"), slow, b"secret")
+    server.start()
+    client = CommandClient(server.address, b"secret", timeout_s=0.3)
+    try:
+        with pytest.raises(CommandError, match="timed out"):
+            client.call(None, "manual_set_all", pct=50.0)
+        time.sleep(0.8)
+        # jedno wykonanie mimo przekroczenia czasu; wątek serwera przeżył odpowiedź do zamkniętego klienta
+        assert calls == ["manual_set_all"]
+        client.timeout_s = 2.0
+        assert client.call(None, "set_mode", mode="auto") == 2
+    finally:
+        client.close_connection()
+        server.stop()
+
+
+def test_remote_controller_serves_panel_status(control_process, monkeypatch):
+    import backend.app as app_module
+    from backend.core.panel_utils import build_boneio_status, build_sensor_overview
+    from backend.routers import api
+
+    registry, writer, publisher, server = control_process
+    state = RemoteState(SnapshotReader(writer.path), stale_after_s=5.0)
+    client = CommandClient(server.address, b"secret")
+    remote = RemoteZones(state, client).primary
+    device = next(iter(registry.primary.vents.values())).boneio_device
+    registry.primary.set_device_online(device, False)
+    assert publisher.publish()
+
+    # status instalatora i przegląd czujników w workerze API – ze snapshotu, nie AttributeError
+    assert build_sensor_overview(remote)["rs485"] == registry.primary.export_rs485_status()
+    assert build_boneio_status(remote) == build_boneio_status(registry.primary)
+    assert remote.device_online(device) is False
+
+    monkeypatch.setattr(app_module, "controller", remote)
+    with pytest.raises(HTTPException) as err:
+        api.get_recent_history(minutes=5.0, names=None, zone=None)
+    assert err.value.status_code == 501
+    client.close_connection()
+
+
+def test_api_worker_serves_site_config_of_control_process(control_process, monkeypatch):
+    import copy
+
+    import backend.app as app_module
+    from backend.core import config as core_config
+    from backend.core import config_helpers
+    from backend.core import controller as controller_module
+    from backend.core.installer_schemas import VentConfigPayload
+    from backend.routers import api, installer
+
+    registry, writer, publisher, server = control_process
+    state = RemoteState(SnapshotReader(writer.path), stale_after_s=5.0)
+    client = CommandClient(server.address, b"secret", timeout_s=2.0)
+    zones = RemoteZones(state, client)
+    # worker API: globalne listy z chwili importu, zmienia je tylko proces sterowania
+    stale = {name: copy.deepcopy(getattr(core_config, name)) for name in ("VENTS", "BONEIOS", "CONTROL")}
+    monkeypatch.setattr(config_helpers, "VENTS", stale["VENTS"])
+    monkeypatch.setattr(config_helpers, "BONEIOS", stale["BONEIOS"])
+    monkeypatch.setattr(installer, "CONTROL", stale["CONTROL"])
+    monkeypatch.setattr(api, "CONTROL", stale["CONTROL"])
+    monkeypatch.setattr(app_module, "controller", zones.primary)
+    monkeypatch.setattr(app_module, "zones", zones)
+    monkeypatch.setattr(installer, "_persist_setting", lambda key, value: None)
+    monkeypatch.setattr(controller_module, "SessionLocal", None)  # zapis ustawień pomijany (wyjątek łapany)
+    saved = {name: copy.deepcopy(getattr(core_config, name)) for name in ("VENTS", "BONEIOS")}
+    monkeypatch.setitem(core_config.CONTROL, "target_temp_c", core_config.CONTROL["target_temp_c"])
+    try:
+        # BoneIO dodany przez inny worker – ten widzi go w GET i przy walidacji wietrzników
+        devices = saved["BONEIOS"] + [{"id": "boneio_2", "base_topic": "boneio/2"}]
+        registry.primary.update_config(boneio_devices=devices)
+        assert publisher.publish()
+        assert [device.id for device in installer.get_boneio_config(None)][-1] == "boneio_2"
+        vents = installer.get_vents_config(None)
+        new_vent = VentConfigPayload(**{**vents[0].dict(), "id": 9, "name": "Bok 9", "boneio_device": "boneio_2"})
+        saved_vents = installer.update_vents_config(vents + [new_vent], None)
+        assert saved_vents[-1].boneio_device == "boneio_2"
+        assert registry.primary.vents[9].boneio_device == "boneio_2"
+        assert [vent.id for vent in installer.get_vents_config(None)][-1] == 9
+
+        # POST /api/control wykonuje proces sterowania, CONTROL workera bez zmian
+        target = stale["CONTROL"]["target_temp_c"] + 3.0
+        reply = api.update_control({"target_temp_c": target}, zone=None)
+        assert reply["control"]["target_temp_c"] == target
+        assert registry.primary.zone.control["target_temp_c"] == target
+        assert installer.get_control_config(None).fields["target_temp_c"] == target
+        assert stale["VENTS"] == saved["VENTS"] and stale["BONEIOS"] == saved["BONEIOS"]
+        assert stale["CONTROL"]["target_temp_c"] == target - 3.0
+    finally:
+        client.close_connection()
+        for name, value in saved.items():
+            getattr(core_config, name)[:] = value
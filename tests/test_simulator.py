@@ -0,0 +1,61 @@
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.config import CONTROL, HEATING
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import GreenhouseSimulation
+from backend.sim.weather import SyntheticWeather
+
+
+def test_virtual_loop_jumps_to_next_timer():
+    clock = VirtualClock(datetime(2024, 1, 1, 12, 0))
+    loop = clock.new_event_loop()
+    try:
+        async def scenario():
+            cancelled = asyncio.get_running_loop().call_later(5.0, lambda: None)
+            cancelled.cancel()
+            await asyncio.sleep(30.0)
+            await asyncio.gather(asyncio.sleep(10.0), asyncio.sleep(3600.0))
+
+        loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+    assert clock.monotonic() == 3630.0
+    assert clock.now() == datetime(2024, 1, 1, 13, 0, 30)
+
+
+def test_full_day_runs_fast_and_opens_vents_on_hot_day():
+    before = dict(CONTROL)
+    sim = GreenhouseSimulation(weather=SyntheticWeather(t_min=18.0, t_max=32.0), overrides={"control.temp_diff_percent": 8})
+    report = sim.run(24 * 3600)
+
+    assert report.duration_s >= 24 * 3600
+    assert report.wall_time_s < 30.0
+    assert CONTROL == before
+    midday = [s for s in report.samples if 11 * 3600 <= s.t_s <= 15 * 3600]
+    assert min(s.vent_percent for s in midday) > 30.0
+    assert report.metrics["temp_max_c"] < 45.0
+    # codzienne przewietrzanie o 12:00 przełącza sterownik w tryb ręczny
+    assert any(event == "MANUAL_ACTION" for _, event, _ in report.events)
+    assert 0 < sum(report.relay_switches.values()) < 2000
+
+
+def test_binary_heating_keeps_greenhouse_warm_at_night():
+    night = {"control.day_start": "23:59", "control.night_start": "00:00"}
+    cold = SyntheticWeather(t_min=0.0, t_max=4.0, solar_peak_w_m2=0.0)
+    baseline = GreenhouseSimulation(weather=cold, overrides=night, use_scheduler=False).run(6 * 3600)
+    heated = GreenhouseSimulation(
+        weather=cold,
+        overrides={**night, "heating.enabled": True, "heating.night_target_c": 16, "heating.hysteresis_c": 2},
+        use_scheduler=False,
+    ).run(6 * 3600)
+
+    assert HEATING.get("enabled") is False
+    assert heated.metrics["heating_on_s"] > 0
+    assert heated.samples[-1].internal_temp > baseline.samples[-1].internal_temp + 5.0
+    assert heated.relay_switches[HEATING["topic"]] >= 1
+    assert any(event == "HEATING_ON" for _, event, _ in heated.events)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+DEFERRED_MODULES = (
+    "psutil",
+    "minimalmodbus",
+    "backend.core.controller",
+    "backend.core.rs485",
+    "backend.core.update_manager",
+    "backend.core.panel_utils",
+)
+
+
+def test_app_import_defers_non_critical_modules():
+    code = (
+        "import json, sys; import backend.app; "
+        f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    assert loaded == []
+
+
+def test_startup_records_phases_and_defers_updater(monkeypatch):
+    import backend.app as app_module
+
+    class DummyRS485:
+        started = False
+
+        async def start(self):
+            self.started = True
+
+        async def stop(self):
+            pass
+
+    class DummyController:
+        def __init__(self, manager):
+            self.manager = manager
+            self.running = False
+
+        def start(self):
+            self.running = True
+
+        def stop(self):
+            self.running = False
+
+    class DummyScheduler:
+        def __init__(self, controller, zones=()):
+            pass
+
+        def start(self):
+            pass
+
+        def stop(self):
+            pass
+
+    calls = []
+
+    async def noop_mqtt():
+        calls.append("mqtt")
+
+    monkeypatch.setattr(app_module, "ensure_dirs", lambda: None)
+    monkeypatch.setattr(app_module, "init_db", lambda: calls.append("db"))
+    monkeypatch.setattr(app_module, "mqtt_start", noop_mqtt)
+    monkeypatch.setattr(app_module, "_build_rs485", DummyRS485)
+    monkeypatch.setattr(app_module, "_build_controller", DummyController)
+    monkeypatch.setattr(app_module, "_warm_start", lambda manager: None)
+    monkeypatch.setattr("backend.core.scheduler.Scheduler", DummyScheduler)
+    monkeypatch.setattr(app_module, "DEFERRED_START_DELAY_S", 60.0)
+
+    async def run():
+        await app_module.on_startup()
+        assert app_module.update_manager is None
+        await app_module.on_shutdown()
+
+    asyncio.run(run())
+    assert app_module.controller.running is False
+    assert app_module.rs485.started is True
+    for phase in ("db_init", "rs485_init", "mqtt_start", "controller_init", "control_ready"):
+        assert phase in app_module.STARTUP_TIMINGS
+    assert "updater" not in app_module.STARTUP_TIMINGS
+    assert calls == ["db", "mqtt"]  # tabele istnieją zanim MQTT zapisze pierwszy odczyt
+    monkeypatch.setattr(app_module, "controller", None)
+    monkeypatch.setattr(app_module, "zones", None)
+    monkeypatch.setattr(app_module, "rs485", None)
+    monkeypatch.setattr(app_module, "scheduler", None)
@@ -0,0 +1,45 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.tick_scheduler import TickScheduler
+from backend.sim.clock import VirtualClock
+
+
+def _ticker(clock, late_s=0.0):
+    def sleep(seconds):
+        clock.sleep(seconds + late_s)  # wybudzenie spóźnione o late_s
+    return TickScheduler("test", clock=clock.monotonic, sleep=sleep)
+
+
+def test_fixed_rate_does_not_drift_with_work_time():
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    ticker = _ticker(clock)
+    starts = []
+    for work in (0.5, 0.3, 0.7, 0.1, 0.4, 0.9):
+        starts.append(clock.monotonic())
+        clock.advance(work)
+        ticker.wait(1.0)
+    # siatka od końca pierwszego ticku (0.5 s), bez sumowania czasu pracy
+    assert starts == [0.0, 1.5, 2.5, 3.5, 4.5, 5.5]
+    stats = ticker.stats()
+    assert (stats["overruns"], stats["skipped"], stats["max_work_ms"]) == (0, 0, 900.0)
+    assert stats["lateness_ms"]["histogram"]["<=1ms"] == 6
+
+
+def test_overrun_skips_missed_deadlines_and_records_lateness():
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    ticker = _ticker(clock, late_s=0.03)
+    ticker.wait(1.0)                 # siatka: 1.03 (spóźnione wybudzenie), terminy co 1 s od 1.0
+    clock.advance(2.5)               # tick ponad dwa okresy
+    ticker.wait(1.0)
+    assert (ticker.overruns, ticker.skipped) == (1, 2)
+    assert round(clock.monotonic(), 6) == 4.03  # następny termin na siatce (4.0) + spóźnienie
+    clock.advance(0.2)
+    ticker.wait(2.0)                 # zmiana okresu zaczyna nową siatkę
+    assert round(clock.monotonic(), 6) == 6.26
+    stats = ticker.stats()
+    assert stats["lateness_ms"]["histogram"]["<=50ms"] == 3 and stats["lateness_ms"]["max"] == 30.0
+    assert stats["period_s"] == 2.0 and stats["ticks"] == 3
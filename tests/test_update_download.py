@@ -0,0 +1,159 @@
+import hashlib
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from backend.core.update_download import ChecksumMismatch, PackageDownloader, RateLimiter
+
+PAYLOAD = bytes(range(256)) * 2048  # 512 KiB
+
+
+class _PackageServer:
+    """Local stand-in for the update server: supports Range and can drop the link once."""
+
+    def __init__(self, payload: bytes, drop_after: int | None = None, etag: str | None = None, bad_range: bool = False):
+        self.payload = payload
+        self.drop_after = drop_after
+        self.etag = etag
+        self.bad_range = bad_range
+        self.requests = []
+        self.if_range = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                range_header = self.headers.get("Range")
+                server.requests.append(range_header)
+                server.if_range.append(self.headers.get("If-Range"))
+                if range_header and self.headers.get("If-Range") not in (None, server.etag):
+                    range_header = None  # plik zmieniony: cała treść (200)
+                start = 0
+                if range_header:
+                    start = int(range_header.split("=")[1].split("-")[0])
+                    if start >= len(server.payload):
+                        self.send_response(416)
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    content_range = f"bytes {start}-{len(server.payload) - 1}/{len(server.payload)}"
+                    if server.bad_range:
+                        content_range, server.bad_range = "bytes */garbage", False
+                    self.send_header("Content-Range", content_range)
+                else:
+                    self.send_response(200)
+                if server.etag:
+                    self.send_header("ETag", server.etag)
+                body = server.payload[start:]
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if server.drop_after is not None:
+                    cut, server.drop_after = server.drop_after, None
+                    self.wfile.write(body[:cut])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/farmcare-2.1.0.zip"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_download_resumes_after_dropped_connection(tmp_path):
+    updates = []
+    with _PackageServer(PAYLOAD, drop_after=100_000) as server:
+        downloader = PackageDownloader(chunk_size=8192, retry_delay_s=0, progress=lambda p: updates.append(p.as_dict()))
+        target = downloader.download(server.url, tmp_path / "farmcare-2.1.0.zip", f"sha256:{_sha256(PAYLOAD)}")
+
+    assert target.read_bytes() == PAYLOAD
+    assert not (tmp_path / "farmcare-2.1.0.zip.part").exists()
+    assert server.requests[0] is None
+    assert server.requests[1].startswith("bytes=")
+    assert updates[-1]["finished"] is True
+    assert updates[-1]["percent"] == 100.0
+    assert updates[-1]["resumed_from"] > 0
+
+
+def _leftover_part(tmp_path, url, data, checksum=None, etag=None):
+    (tmp_path / "farmcare-2.1.0.zip.part").write_bytes(data)
+    meta = {"url": url, "checksum": checksum, "etag": etag, "last_modified": None}
+    (tmp_path / "farmcare-2.1.0.zip.part.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def test_partial_file_from_previous_run_is_resumed(tmp_path):
+    with _PackageServer(PAYLOAD, etag='"v1"') as server:
+        _leftover_part(tmp_path, server.url, PAYLOAD[:300_000], etag='"v1"')
+        PackageDownloader().download(server.url, tmp_path / "farmcare-2.1.0.zip")
+    assert server.requests == ["bytes=300000-"] and server.if_range == ['"v1"']
+    assert (tmp_path / "farmcare-2.1.0.zip").read_bytes() == PAYLOAD
+    assert not (tmp_path / "farmcare-2.1.0.zip.part.json").exists()
+
+
+def test_partial_file_of_other_origin_is_not_spliced(tmp_path):
+    new_payload = PAYLOAD[::-1]
+    with _PackageServer(new_payload, etag='"v2"') as server:
+        # ta sama nazwa, inny adres albo bez metadanych: od zera
+        _leftover_part(tmp_path, server.url + "?old", PAYLOAD[:300_000], etag='"v2"')
+        PackageDownloader().download(server.url, tmp_path / "farmcare-2.1.0.zip")
+        assert server.requests == [None]
+        (tmp_path / "farmcare-2.1.0.zip.part").write_bytes(PAYLOAD[:300_000])
+        PackageDownloader().download(server.url, tmp_path / "farmcare-2.1.0.zip")
+        assert server.requests == [None, None]
+
+        # plik na serwerze się zmienił: If-Range nie pasuje, serwer oddaje całość (200)
+        _leftover_part(tmp_path, server.url, PAYLOAD[:300_000], etag='"v1"')
+        PackageDownloader().download(server.url, tmp_path / "farmcare-2.1.0.zip")
+        assert server.requests[-1] == "bytes=300000-" and server.if_range[-1] == '"v1"'
+    assert (tmp_path / "farmcare-2.1.0.zip").read_bytes() == new_payload
+
+
+def test_invalid_content_range_restarts_download(tmp_path):
+    with _PackageServer(PAYLOAD, bad_range=True) as server:
+        _leftover_part(tmp_path, server.url, PAYLOAD[:300_000], checksum=_sha256(PAYLOAD))
+        PackageDownloader(retry_delay_s=0).download(server.url, tmp_path / "farmcare-2.1.0.zip", _sha256(PAYLOAD))
+    assert server.requests == ["bytes=300000-", None]
+    assert (tmp_path / "farmcare-2.1.0.zip").read_bytes() == PAYLOAD
+
+
+def test_checksum_mismatch_discards_partial(tmp_path):
+    with _PackageServer(PAYLOAD) as server:
+        with pytest.raises(ChecksumMismatch):
+            PackageDownloader().download(server.url, tmp_path / "pkg.zip", "sha256:" + "0" * 64)
+    assert not (tmp_path / "pkg.zip").exists()
+    assert not (tmp_path / "pkg.zip.part").exists()
+
+
+def test_rate_limiter_sleeps_to_cap_throughput():
+    now = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(1000, clock=lambda: now[0], sleep=sleep)
+    for _ in range(5):
+        limiter.consume(500)
+    assert now[0] == pytest.approx(2.5)
+    assert RateLimiter(0, sleep=sleep).consume(10_000) is None
@@ -1,5 +1,3 @@
-import pytest
-
 from backend.core.update_manager import UpdateManager, UPDATES
 
 
@@ -30,3 +28,81 @@ def test_update_manager_run_update(monkeypatch, tmp_path):
     assert status["current_version"] == "2.1.0"
     assert status["available"] is False
     manager.stop()
+
+
+def test_manifest_fetch_uses_etag_and_handles_not_modified(monkeypatch):
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            seen.append(self.headers.get("If-None-Match"))
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = json.dumps({"version": "3.1.0"}).encode()
+            self.send_response(200)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        monkeypatch.setitem(UPDATES, "enabled", True)
+        monkeypatch.setitem(UPDATES, "manifest_url", f"http://127.0.0.1:{server.server_address[1]}/manifest.json")
+        manager = UpdateManager("3.0.0")
+        manager._state.update({"manifest_etag": None, "error": None})
+        first = manager.check_for_updates(manual=True)
+        second = manager.check_for_updates(manual=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert seen == [None, '"v1"']
+    assert first["manifest_etag"] == '"v1"'
+    assert second["available"] is True
+    assert second["latest_version"] == "3.1.0"
+    assert second["consecutive_failures"] == 0
+
+
+def test_check_schedule_backs_off_and_jitters(monkeypatch):
+    monkeypatch.setitem(UPDATES, "check_interval_hours", 24)
+    monkeypatch.setitem(UPDATES, "retry_backoff_s", 100)
+    monkeypatch.setitem(UPDATES, "check_jitter_fraction", 0.1)
+
+    def failing():
+        raise RuntimeError("offline")
+
+    manager = UpdateManager("1.0.0", fetcher=failing)
+    manager._state["consecutive_failures"] = 0
+    delays = []
+    for _ in range(4):
+        manager.check_for_updates(manual=True)
+        delays.append(manager._next_check_delay())
+    assert manager.status()["consecutive_failures"] == 4
+    for failures, delay in enumerate(delays, start=1):
+        ceiling = 100 * 2 ** (failures - 1)
+        assert ceiling / 2 <= delay <= ceiling
+
+    # manifest bez wersji to też nieudane sprawdzenie
+    manager._fetch_manifest = lambda: {"notes": "broken"}
+    manager.check_for_updates(manual=True)
+    assert manager.status()["consecutive_failures"] == 5
+    assert 800 <= manager._next_check_delay() <= 1600
+
+    manager._fetch_manifest = lambda: {"version": "1.0.0"}
+    manager.check_for_updates(manual=True)
+    delay = manager._next_check_delay()
+    assert 24 * 3600 * 0.9 <= delay <= 24 * 3600 * 1.1
+
+    manager._state["next_check_at"] = 1_000_500.0
+    assert manager._initial_delay(now=1_000_000.0) == 500.0
@@ -0,0 +1,189 @@
+import os
+import sys
+import zipfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+
+from backend.core.update_slots import HELPER_FILE, LEGACY_SLOT, ReleaseSlots, SlotError, handoff_command
+
+
+def _release(path: Path, version: str, app_source: str = "VERSION = {version!r}\n", prefix: str = "") -> Path:
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(f"{prefix}backend/__init__.py", "")
+        archive.writestr(f"{prefix}backend/core/update_slots.py", f"HELPER = {version!r}\n")
+        archive.writestr(f"{prefix}backend/app.py", app_source.format(version=version))
+        archive.writestr(f"{prefix}config/settings.yaml", "shipped: true\n")
+    return path
+
+
+@pytest.fixture
+def running_tree(tmp_path):
+    tree = tmp_path / "farmcare"
+    (tree / "data").mkdir(parents=True)
+    (tree / "data" / "farmcare.sqlite3").write_text("db", encoding="utf-8")
+    (tree / "config").mkdir()
+    (tree / "config" / "settings.yaml").write_text("local: true\n", encoding="utf-8")
+    return tree
+
+
+def test_prepare_and_activate_alternate_slots(tmp_path, running_tree):
+    slots = ReleaseSlots(tmp_path / "releases", source_dir=running_tree)
+
+    first = slots.prepare(_release(tmp_path / "a.zip", "2.1.0", prefix="farmcare-2.1.0/"))
+    assert first.name == "slot_a"
+    assert list((first / "backend" / "__pycache__").glob("app.*.pyc"))
+    assert slots.activate("slot_a") is None
+    assert slots.active_slot() == "slot_a"
+
+    # Stan lokalny trafia do shared/ i jest wspólny dla obu slotów
+    assert (first / "data").is_symlink()
+    assert (first / "data" / "farmcare.sqlite3").read_text(encoding="utf-8") == "db"
+    assert (first / "config" / "settings.yaml").read_text(encoding="utf-8") == "local: true\n"
+
+    second = slots.prepare(_release(tmp_path / "b.zip", "2.2.0"))
+    assert second.name == "slot_b"
+    assert slots.active_slot() == "slot_a"
+    assert slots.activate("slot_b") == "slot_a"
+    assert os.readlink(slots.current_link) == "slot_b"
+    assert "2.2.0" in (slots.current_link / "backend" / "app.py").read_text(encoding="utf-8")
+
+
+def test_corrupt_release_is_rejected_without_switching(tmp_path, running_tree):
+    slots = ReleaseSlots(tmp_path / "releases", source_dir=running_tree)
+    slots.prepare(_release(tmp_path / "a.zip", "2.1.0"))
+    slots.activate("slot_a")
+
+    with pytest.raises(SlotError):
+        slots.prepare(_release(tmp_path / "bad.zip", "2.2.0", app_source="def broken(:\n"))
+    with pytest.raises(SlotError):
+        (tmp_path / "junk.zip").write_bytes(b"not a zip")
+        slots.prepare(tmp_path / "junk.zip")
+    with zipfile.ZipFile(tmp_path / "evil.zip", "w") as archive:
+        archive.writestr("../escape.py", "")
+    with pytest.raises(SlotError):
+        slots.prepare(tmp_path / "evil.zip")
+
+    assert slots.active_slot() == "slot_a"
+    assert not (tmp_path / "escape.py").exists()
+
+
+def test_handoff_rolls_back_when_health_check_fails(tmp_path, running_tree):
+    slots = ReleaseSlots(tmp_path / "releases", source_dir=running_tree)
+    slots.prepare(_release(tmp_path / "a.zip", "2.1.0"))
+    slots.activate("slot_a")
+    slots.prepare(_release(tmp_path / "b.zip", "2.2.0"))
+    previous = slots.activate("slot_b")
+
+    restarts = []
+    now = [0.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    ok = slots.handoff(
+        "slot_b",
+        previous,
+        restart=lambda: restarts.append(slots.active_slot()),
+        health_check=lambda: False,
+        timeout_s=10,
+        sleep=sleep,
+        clock=lambda: now[0],
+    )
+    assert ok is False
+    assert restarts == ["slot_b", "slot_a"]
+    assert slots.active_slot() == "slot_a"
+    assert slots.read_handoff()["result"] == "rolled_back"
+
+    checks = iter([False, True])
+    assert slots.handoff("slot_a", None, restart=lambda: None, health_check=lambda: next(checks), poll_s=0, sleep=sleep)
+    assert slots.read_handoff()["result"] == "ok"
+
+
+def test_first_install_can_roll_back_to_running_tree(tmp_path, running_tree):
+    (running_tree / "backend").mkdir()
+    (running_tree / "backend" / "app.py").write_text("VERSION = '2.0.0'\n", encoding="utf-8")
+    slots = ReleaseSlots(tmp_path / "releases", source_dir=running_tree)
+
+    slots.prepare(_release(tmp_path / "a.zip", "2.1.0"))
+    assert slots.active_slot() == LEGACY_SLOT
+    previous = slots.activate("slot_a")
+    assert previous == LEGACY_SLOT
+
+    assert slots.handoff("slot_a", previous, restart=lambda: None, health_check=lambda: False,
+                         timeout_s=0, sleep=lambda s: None) is False
+    assert slots.read_handoff()["result"] == "rolled_back"
+    assert "2.0.0" in (slots.current_link / "backend" / "app.py").read_text(encoding="utf-8")
+
+
+def test_update_manager_installs_into_slot(monkeypatch, tmp_path, running_tree):
+    from backend.core import update_manager as update_module
+
+    monkeypatch.setitem(update_module.UPDATES, "enabled", True)
+    monkeypatch.setitem(update_module.UPDATES, "install_mode", "slots")
+    monkeypatch.setitem(update_module.UPDATES, "slots_root", str(tmp_path / "releases"))
+    monkeypatch.setattr(update_module, "BASE_DIR", running_tree)
+    spawned = []
+    monkeypatch.setattr(update_module.subprocess, "Popen", lambda cmd, **kwargs: spawned.append((cmd, kwargs)))
+
+    manager = update_module.UpdateManager("2.0.0", fetcher=lambda: {"version": "2.1.0"})
+    manager._execute_install(_release(tmp_path / "pkg.zip", "2.1.0"))
+
+    status = manager.status()
+    assert status["slots"]["active"] == "slot_a"
+    assert status["slots"]["last_handoff"]["result"] == "pending"
+    cmd, kwargs = spawned[0]
+    assert "handoff" in cmd and "slot_a" in cmd
+    # pomocnik uruchamiany po ścieżce pliku - nie potrzebuje cwd ani PYTHONPATH usługi
+    helper = tmp_path / "releases" / HELPER_FILE
+    assert "-m" not in cmd and str(helper) in cmd
+    assert helper.read_bytes() == Path(update_module.__file__).with_name("update_slots.py").read_bytes()
+    assert kwargs["start_new_session"] is True
+
+
+def test_update_applied_only_after_healthy_handoff(monkeypatch, tmp_path, running_tree):
+    from backend.core import update_manager as update_module
+
+    monkeypatch.setitem(update_module.UPDATES, "enabled", True)
+    monkeypatch.setitem(update_module.UPDATES, "install_mode", "slots")
+    monkeypatch.setitem(update_module.UPDATES, "slots_root", str(tmp_path / "releases"))
+    monkeypatch.setattr(update_module, "BASE_DIR", running_tree)
+    monkeypatch.setattr(update_module.subprocess, "Popen", lambda cmd, **kwargs: None)
+    monkeypatch.setattr(update_module.UpdateManager, "_save_state", lambda self: None)
+    events = []
+    monkeypatch.setattr(update_module, "log_event", lambda event, **kwargs: events.append((event, kwargs.get("meta"))))
+    package = _release(tmp_path / "pkg.zip", "2.1.0")
+
+    manager = update_module.UpdateManager("2.0.0", fetcher=lambda: {"version": "2.1.0"})
+    monkeypatch.setattr(manager, "_download_package", lambda url, checksum=None: package)
+    manager._state.update({"available": True, "latest_version": "2.1.0", "download_url": "http://updates/pkg.zip"})
+
+    result = manager.run_update()
+    assert result["ok"] and result["pending"]
+    assert manager.status()["current_version"] == "2.0.0"
+    assert manager.status()["pending_version"] == "2.1.0"
+    assert "UPDATE_APPLIED" not in [event for event, _ in events]
+
+    manager._slots.handoff("slot_a", None, restart=lambda: None, health_check=lambda: True, sleep=lambda s: None)
+    status = manager.status()
+    assert status["current_version"] == "2.1.0" and status["pending_version"] is None
+    assert ("UPDATE_APPLIED", {"version": "2.1.0", "slot": "slot_a"}) in events
+
+
+def test_handoff_helper_stays_with_old_release_after_activate(tmp_path, running_tree):
+    slots = ReleaseSlots(tmp_path / "releases", source_dir=running_tree)
+    slots.prepare(_release(tmp_path / "a.zip", "2.1.0"))
+    slots.activate("slot_a")
+    slots.prepare(_release(tmp_path / "b.zip", "2.2.0"))
+
+    # usługa importuje przez current/ – po przełączeniu ta ścieżka wskazuje nowe wydanie
+    running = slots.current_link / "backend" / "core" / "update_slots.py"
+    helper = slots.install_helper(running)
+    slots.activate("slot_b")
+    assert "2.2.0" in running.read_text(encoding="utf-8")
+    assert helper.read_text(encoding="utf-8") == "HELPER = '2.1.0'\n"
+    assert slots.root / "slot_b" not in helper.resolve().parents
+    cmd = handoff_command(slots.root, "slot_b", "slot_a", "true", "http://127.0.0.1:8000/", 5.0, helper=helper)
+    assert cmd[cmd.index("handoff") - 1] == str(helper)
@@ -0,0 +1,105 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core import mqtt_client
+
+
+def test_offline_device_cuts_move_short_and_recalibrates_on_return(sim):
+    clock, plant, controller, loop = sim.clock, sim.plant, sim.controller, sim.loop
+    vent = controller.vents[1]
+    device = vent.boneio_device
+    siblings = [v for v in controller.vents.values() if v.boneio_device == device]
+    loop.call_later(5.0, controller.set_device_online, device, False)
+    loop.run_until_complete(vent.move_to(50.0))
+
+    # 5 s z 30 s przejazdu zamiast pełnych 15 s
+    assert clock.monotonic() == 5.0
+    assert round(vent.position, 1) == 16.7
+    assert vent.needs_resync and not vent.available
+    assert all(not v.available for v in siblings)
+
+    published = plant.publishes
+    loop.run_until_complete(asyncio.gather(*(v.move_to(80.0) for v in siblings)))
+    assert plant.publishes == published and clock.monotonic() == 5.0
+
+    loop.run_until_complete(asyncio.sleep(10.0))
+    controller.set_device_online(device, True)
+    loop.run_until_complete(asyncio.sleep(vent.travel_time + 5.0))
+
+    assert vent.available and not vent.needs_resync and vent.position == 0.0
+    # krótki zanik bez ruchu – pozostałe wietrzniki nie są kalibrowane
+    assert all(not v.needs_resync for v in siblings)
+    assert plant.vents[1].position_at(clock.monotonic()) == 0.0
+    assert [e for _, e, _ in controller.events].count("VENT_OFFLINE") == len(siblings)
+    online = [meta for _, e, meta in controller.events if e == "VENT_ONLINE"]
+    assert [m["resync"] for m in online if m["vent"] == 1] == [True]
+    assert all(not m["resync"] for m in online if m["vent"] != 1)
+
+
+def test_availability_topics_reach_controller(monkeypatch):
+    import backend.app as app_module
+
+    calls = []
+
+    class FakeController:
+        def set_device_online(self, device_id, online):
+            calls.append(("device", device_id, online))
+
+        def set_vent_online(self, vent_id, online):
+            calls.append(("vent", vent_id, online))
+
+    monkeypatch.setattr(app_module, "controller", FakeController())
+    monkeypatch.setattr(mqtt_client, "BONEIOS", [{"id": "boneio_main", "base_topic": "boneio/1"},
+                                                 {"id": "boneio_2", "base_topic": "boneio/2", "availability_topic": "lwt/b2"}])
+    monkeypatch.setattr(mqtt_client, "DEVICE_AVAIL_TOPIC_MAP", mqtt_client.device_availability_topics())
+    router = mqtt_client.build_router()
+
+    router.dispatch("boneio/1/status", b"offline")
+    router.dispatch("lwt/b2", b"online")
+    router.dispatch("farmcare/vents/3/available", b"false")
+    router.dispatch("farmcare/vents/x/available", b"true")
+    router.dispatch("farmcare/vents/4/available", b"maybe")
+
+    assert calls == [("device", "boneio_main", False), ("device", "boneio_2", True), ("vent", 3, False)]
+    assert {"boneio/1/status", "lwt/b2"} <= set(router.filters())
+
+
+def test_vents_added_in_installer_are_routed_without_restart(sim, monkeypatch):
+    import copy
+
+    import backend.app as app_module
+    from backend.core import config as core_config
+
+    saved = {name: copy.deepcopy(getattr(core_config, name)) for name in ("VENTS", "BONEIOS")}
+    controller, loop = sim.controller, sim.loop
+    subscribed = []
+
+    class FakeClient:
+        async def subscribe(self, topics):
+            subscribed.extend(topic for topic, _ in topics)
+
+    monkeypatch.setattr(app_module, "controller", controller)
+    monkeypatch.setattr(mqtt_client, "message_router", mqtt_client.build_router())
+    monkeypatch.setattr(mqtt_client, "_subscriber", (FakeClient(), loop))
+    vents = copy.deepcopy(core_config.VENTS)
+    vents.append({"id": 9, "name": "Bok 9", "boneio_device": "boneio_2", "travel_time_s": 30,
+                  "topics": {"up": "boneio/2/cover/vent9/up", "down": "boneio/2/cover/vent9/down",
+                             "error_in": "boneio/2/in/vent9_error"}})
+    devices = copy.deepcopy(core_config.BONEIOS) + [{"id": "boneio_2", "base_topic": "boneio/2", "availability_topic": "lwt/b2"}]
+    try:
+        controller.update_config(boneio_devices=devices, vents=vents)
+        loop.run_until_complete(asyncio.sleep(0))
+
+        # wejście błędu i LWT nowego BoneIO trafiają do kontrolera; nowy filtr subskrybowany bez restartu
+        mqtt_client.message_router.dispatch("boneio/2/in/vent9_error", b"ON")
+        assert not controller.vents[9].available
+        mqtt_client.message_router.dispatch("lwt/b2", b"offline")
+        assert controller.device_online("boneio_2") is False
+        assert subscribed == ["lwt/b2"]
+    finally:
+        for name, value in saved.items():
+            getattr(core_config, name)[:] = value
+        mqtt_client.refresh_topic_maps()
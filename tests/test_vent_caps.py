@@ -0,0 +1,70 @@
+import asyncio
+import random
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.vent_caps import VentCaps
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors
+
+
+def _legacy(target, vid, groups, vent_to_groups):
+    for gid in vent_to_groups.get(vid, []):
+        override = groups[gid]["target_override"]
+        if override is not None and (groups[gid]["force_close"] or target > override):
+            target = override
+    return target
+
+
+def test_caps_match_sequential_group_overrides():
+    rng = random.Random(7)
+    vents = {vid: SimpleNamespace(id=vid, position=0.0, available=True) for vid in range(1, 31)}
+    groups = OrderedDict()
+    vent_to_groups = {}
+    for idx in range(8):
+        members = rng.sample(sorted(vents), 6)
+        groups[f"g{idx}"] = {"vents": members, "target_override": None, "force_close": False}
+        for vid in members:
+            vent_to_groups.setdefault(vid, []).append(f"g{idx}")
+    caps = VentCaps()
+    caps.rebuild(vents, groups, vent_to_groups)
+    for _ in range(50):
+        gid = rng.choice(list(groups))
+        override = rng.choice([None, 0.0, 20.0, 55.0])
+        groups[gid].update(target_override=override, force_close=override is not None and rng.random() < 0.5)
+        caps.refresh_groups([gid])
+        for target in (0.0, 30.0, 100.0):
+            values = caps.targets(target)
+            for vid in vents:
+                expected = _legacy(target, vid, groups, vent_to_groups)
+                assert values[caps.slots[vid]] == expected == caps.effective(vid, target)
+
+
+def test_wind_lock_refreshes_caps_only_on_change():
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    groups = [
+        {"id": "north", "name": "N", "vents": [1, 2], "wind_upwind_deg": [[315, 45]], "wind_lock_close_percent": 10},
+        {"id": "south", "name": "S", "vents": [3, 4]},
+    ]
+    plant = SimulatedPlant(clock)
+    controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=plant, vent_groups=groups)
+    loop = controller.attach_event_loop(clock.new_event_loop())
+    try:
+        assert controller._caps.stats()["limited"] == 0
+        for direction in (0.0, 10.0, 20.0):
+            controller._update_group_wind_state({"wind_direction": direction})
+        assert controller._caps.stats()["refreshes"] == 1 and controller._caps.stats()["limited"] == 2
+        assert controller._enforce_vent_target(1, 80.0) == 10.0 and controller._enforce_vent_target(3, 80.0) == 80.0
+        controller._update_group_wind_state({"wind_direction": 180.0})
+        assert controller._caps.stats()["limited"] == 2  # zwolnienie dopiero po wind_lock_release_s
+        clock.advance(60.0)
+        controller._update_group_wind_state({"wind_direction": 180.0})
+        assert controller._caps.stats() == {"vents": 4, "limited": 0, "rebuilds": 2, "refreshes": 2}
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
@@ -0,0 +1,65 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.models import SensorSnapshot
+from backend.core.warm_start import SensorWindowCheckpointer, load_checkpoint, save_checkpoint
+
+
+def test_checkpoint_roundtrip_restores_windows(tmp_path):
+    path = tmp_path / "windows.json"
+    snap = SensorSnapshot()
+    snap.set_window(3)
+    for v in (20.0, 21.0, 22.0, 23.0):
+        snap.internal_temp.add(v)
+    snap.wind_speed.add(4.0)
+    save_checkpoint(path, {"mqtt": snap})
+
+    fresh = SensorSnapshot()
+    fresh.set_window(3)
+    restored = load_checkpoint(path, {"mqtt": fresh}, max_age_s=60)
+    assert sorted(restored["mqtt"]) == ["internal_temp", "wind_speed"]
+    assert list(fresh.internal_temp.q) == [21.0, 22.0, 23.0]
+    assert fresh.averages()["wind_speed"] == 4.0
+    assert fresh.external_temp.avg() is None
+
+
+def test_stale_checkpoint_is_ignored(tmp_path):
+    path = tmp_path / "windows.json"
+    snap = SensorSnapshot()
+    snap.internal_hum.add(80.0)
+    save_checkpoint(path, {"rs485": snap})
+
+    fresh = SensorSnapshot()
+    restored = load_checkpoint(path, {"rs485": fresh}, max_age_s=30, now=time.time() + 120)
+    assert restored == {}
+    assert fresh.internal_hum.avg() is None
+
+
+def test_live_samples_are_not_overwritten(tmp_path):
+    path = tmp_path / "windows.json"
+    snap = SensorSnapshot()
+    snap.internal_temp.add(10.0)
+    save_checkpoint(path, {"mqtt": snap})
+
+    fresh = SensorSnapshot()
+    fresh.internal_temp.add(30.0)
+    assert load_checkpoint(path, {"mqtt": fresh}, max_age_s=60) == {}
+    assert fresh.internal_temp.avg() == 30.0
+
+
+def test_checkpointer_saves_on_stop_and_tolerates_corrupt_file(tmp_path):
+    path = tmp_path / "windows.json"
+    path.write_text("{not json", encoding="utf-8")
+    snap = SensorSnapshot()
+    checkpointer = SensorWindowCheckpointer({"mqtt": snap}, path=str(path), interval_s=60, max_age_s=60)
+    assert checkpointer.restore() == {}
+
+    checkpointer.start()
+    snap.rain.add(1.0)
+    checkpointer.stop()
+
+    fresh = SensorSnapshot()
+    assert load_checkpoint(path, {"mqtt": fresh}, max_age_s=60) == {"mqtt": ["rain"]}
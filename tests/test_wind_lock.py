@@ -0,0 +1,87 @@
+import asyncio
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from backend.core.wind_lock import WindLock, compile_tables
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors, patched_config
+
+# kierunek z porywami na krawędzi zakresu [300, 60]
+GUSTS = [58.0, 63.0, 57.0, 66.0, 61.0, 59.0, 64.0, 68.0, 55.0, 62.0] * 12
+
+
+def _groups():
+    return OrderedDict(
+        north={"_wind_ranges": [(300.0, 60.0)], "wind_lock_enabled": True},
+        side={"_wind_ranges": [(180.0, 270.0)], "wind_lock_enabled": True},
+        full={"_wind_ranges": [(90.0, 90.0)], "wind_lock_enabled": False},
+    )
+
+
+def test_tables_match_range_check_and_widen_by_hysteresis():
+    lock, hold = compile_tables([[(300.0, 60.0)], [(180.0, 270.0)], [(90.0, 90.0)]], 10.0)
+    for deg in range(360):
+        north = deg >= 300 or deg <= 60
+        side = 180 <= deg <= 270
+        assert lock[deg] == (1 if north else 0) | (2 if side else 0) | 4
+        assert bool(hold[deg] & 1) == (deg >= 290 or deg <= 70)
+        assert bool(hold[deg] & 2) == (170 <= deg <= 280)
+
+
+def test_hysteresis_suppresses_flapping_at_range_edge():
+    plain = WindLock(hysteresis_deg=0.0, release_s=0.0)
+    damped = WindLock(hysteresis_deg=10.0, release_s=60.0)
+    for lock in (plain, damped):
+        lock.rebuild(_groups())
+        for tick, direction in enumerate(GUSTS):
+            lock.update(direction, True, tick * 10.0)
+    noisy = plain.stats()["groups"]["north"]
+    assert noisy["locks"] > 20 and noisy["flaps"] == noisy["locks"] - 1
+    stats = damped.stats()
+    north = stats["groups"]["north"]
+    assert (north["locks"], north["unlocks"], north["flaps"], north["held_by_delay"]) == (1, 0, 0, 0)
+    assert north["locked"] and north["held_by_angle"] > 20
+    assert not stats["groups"]["full"]["locked"]  # wyłączona blokada grupy
+
+    # wiatr poza poszerzonym zakresem: zwolnienie po release_s, powrót wcześniej je anuluje
+    damped.update(120.0, True, 1200.0)
+    damped.update(40.0, True, 1230.0)
+    damped.update(120.0, True, 1240.0)
+    assert damped.is_locked("north")
+    damped.update(120.0, True, 1300.0)
+    assert not damped.is_locked("north")
+    north = damped.stats()["groups"]["north"]
+    assert (north["held_by_delay"], north["release_cancelled"], north["unlocks"]) == (2, 1, 1)
+    # wyłączenie globalne zwalnia od razu
+    damped.update(0.0, True, 1310.0)
+    damped.update(0.0, False, 1311.0)
+    assert damped.locked == 0
+
+
+def test_controller_logs_fewer_wind_events_with_hysteresis():
+    groups = [{"id": "north", "name": "N", "vents": [1, 2], "wind_upwind_deg": [[300, 60]]}]
+
+    def _events(overrides):
+        clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+        with patched_config(overrides):
+            controller = SimulatedController(SimulatedSensors(), clock=clock, publisher=SimulatedPlant(clock),
+                                             vent_groups=groups)
+        loop = controller.attach_event_loop(clock.new_event_loop())
+        try:
+            for direction in GUSTS:
+                controller._update_group_wind_state({"wind_direction": direction})
+                clock.advance(10.0)
+        finally:
+            loop.close()
+            asyncio.set_event_loop(None)
+        return [e for _, e, _ in controller.events if e.startswith("WIND_LOCK")], controller
+
+    plain, _ = _events({"control.wind_lock_hysteresis_deg": 0, "control.wind_lock_release_s": 0})
+    damped, controller = _events({})
+    assert len(plain) > 40
+    assert damped == ["WIND_LOCK_ON"]
+    assert controller._groups["north"]["force_close"] and controller.wind_lock_stats()["totals"]["locks"] == 1
@@ -0,0 +1,157 @@
+import asyncio
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.core import config as core_config
+from backend.core import mqtt_client
+from backend.core.db import Base, SensorLog
+from backend.core.models import SensorSnapshot
+from backend.core.zones import ZoneRegistry, ZoneSensors, build_zone, primary_zone, zone_sensor_decoders
+from backend.sim.clock import VirtualClock
+from backend.sim.runner import SimulatedController, SimulatedPlant, SimulatedSensors
+
+TUNNEL = {
+    "id": "t2",
+    "name": "Tunel 2",
+    "vents": [3, 4],
+    "sensors": {"internal_temp": {"topic": "farmcare/t2/internalTemp"}, "rain": {"topic": None}},
+    "control": {"target_temp_c": 18},
+    "vent_groups": [{"id": "side", "name": "Bok", "vents": [3, 4]}],
+    "vent_plan_stages": [{"id": "s1", "mode": "parallel", "step_percent": 50, "groups": ["side"]}],
+    "close_strategy": "lifo",
+}
+
+
+@pytest.fixture
+def zone_setup(monkeypatch):
+    monkeypatch.setattr(core_config, "ZONES", [TUNNEL])
+    monkeypatch.setattr(mqtt_client, "sensor_bus", SensorSnapshot())
+    clock = VirtualClock(datetime(2024, 6, 21, 12, 0))
+    plant = SimulatedPlant(clock)
+    rs485 = SimulatedSensors()
+    own = SensorSnapshot()
+    primary = SimulatedController(rs485, clock=clock, publisher=plant)
+    tunnel = SimulatedController(rs485, clock=clock, publisher=plant, zone=build_zone(TUNNEL, own))
+    registry = ZoneRegistry(primary, [tunnel])
+    loop = registry.attach_event_loop(clock.new_event_loop())
+    try:
+        yield registry, rs485, own
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
+
+
+def test_zone_owns_its_vents_plan_and_control(zone_setup):
+    registry, _, _ = zone_setup
+    primary, tunnel = registry.primary, registry.get("t2")
+    assert sorted(primary.vents) == [1, 2] and sorted(tunnel.vents) == [3, 4]
+    assert registry.for_vent(3) is tunnel and registry.get(None) is primary and registry.get("x") is None
+    assert [g["id"] for g in tunnel.export_groups()] == ["side"] and tunnel.export_plan()["close_strategy"] == "lifo"
+    assert all(set(g["vents"]) <= {1, 2} for g in primary.export_groups())
+    assert tunnel._control_params().target_temp_c == 18.0
+    assert primary._control_params().target_temp_c == float(core_config.CONTROL["target_temp_c"])
+    assert tunnel.zone.setting_key("control.") == "zone.t2.control." and primary.zone.setting_key("mode") == "mode"
+    assert tunnel.export_heating() is None and not tunnel._is_heating_enabled()
+
+    # instalator zmienia listę wietrzników całego obiektu – strefa bierze swój podzbiór
+    vents = [dict(v) for v in core_config.VENTS if v["id"] != 4]
+    registry.apply_site_config(vents=vents)
+    assert sorted(tunnel.vents) == [3]
+    assert [z["id"] for z in registry.describe()] == ["main", "t2"]
+
+
+def test_zone_reads_own_sensors_and_shares_weather(zone_setup):
+    registry, rs485, own = zone_setup
+    tunnel = registry.get("t2")
+    assert isinstance(tunnel.zone.sensors, ZoneSensors) and tunnel.zone.own_sensors == {"internal_temp", "rain"}
+    assert {topic: zone for topic, (zone, _) in zone_sensor_decoders([TUNNEL]).items()} == {"farmcare/t2/internalTemp": "t2"}
+    # bez własnego odczytu: brak wartości, nie temperatura z tunelu głównego (RS485)
+    rs485.readings = {"internal_temp": 30.0, "external_temp": 15.0, "internal_hum": 60.0, "wind_speed": 2.0}
+    registry.step_all()
+    assert tunnel.export_environment_snapshot()["sensors"]["internal_temp"] is None
+    own.internal_temp.add(21.0)
+    registry.step_all()
+    snapshot = tunnel.export_environment_snapshot()
+    assert snapshot["sensors"]["internal_temp"] == 21.0 and snapshot["sources"]["internal_temp"] == "mqtt"
+    assert snapshot["sources"]["external_temp"] == "rs485"
+    assert registry.primary.export_environment_snapshot()["sensors"]["internal_temp"] == 30.0
+    assert tunnel._async_loop is registry.primary._async_loop
+
+
+def test_mqtt_routes_vent_messages_to_owning_zone(zone_setup, monkeypatch):
+    import backend.app as app_module
+
+    registry, _, _ = zone_setup
+    monkeypatch.setattr(app_module, "controller", registry.primary)
+    monkeypatch.setattr(app_module, "zones", registry)
+    router = mqtt_client.build_router()
+    router.dispatch("boneio/1/in/vent3_error", b"ON")
+    router.dispatch("boneio/1/in/vent1_error", b"ON")
+    assert not registry.get("t2").vents[3].available and not registry.primary.vents[1].available
+    assert mqtt_client._vent_controller(command_topic="boneio/1/cover/vent4/up") is registry.get("t2")
+    assert primary_zone().claimed == {3, 4}
+
+
+def test_zone_control_follows_live_shared_control(zone_setup, monkeypatch):
+    registry, _, _ = zone_setup
+    tunnel = registry.get("t2")
+    # zmiana przez POST /api/control (CONTROL) dociera do strefy, jej własny próg zostaje
+    monkeypatch.setitem(core_config.CONTROL, "temp_diff_percent", 12)
+    registry.apply_site_config(control={"temp_diff_percent": 12})
+    assert tunnel._control_params().temp_diff_percent == 12.0
+    assert tunnel._control_params().target_temp_c == 18.0
+
+    monkeypatch.setattr(type(tunnel), "_persist_control_overrides", lambda self, control: None)
+    tunnel.update_config(control={"temp_diff_percent": 3})
+    assert tunnel.zone.control["temp_diff_percent"] == 3 and core_config.CONTROL["temp_diff_percent"] == 12
+
+
+def test_step_all_moves_zones_concurrently(zone_setup):
+    registry, rs485, own = zone_setup
+    clock = registry.primary._clock
+    rs485.readings = {"internal_temp": 35.0, "external_temp": 15.0, "internal_hum": 60.0, "wind_speed": 2.0}
+    own.internal_temp.add(35.0)
+    started = clock.monotonic()
+    registry.step_all()
+    # obie strefy otwierają na 50 % w tym samym ticku – czas jak jednej strefy, nie suma
+    assert all(v.position == 50.0 for c in registry.controllers() for v in c.vents.values())
+    assert clock.monotonic() - started < 40.0
+
+
+def test_primary_history_skips_zone_rows(tmp_path, monkeypatch):
+    from backend.routers import api
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.sqlite3'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as session:
+        ts = datetime(2024, 6, 21, 12, 0)
+        session.add_all([SensorLog(ts=ts, name="internal_temp", value=30.0), SensorLog(ts=ts, name="t2.internal_temp", value=21.0)])
+        session.commit()
+    monkeypatch.setattr(api, "SessionLocal", factory)
+    assert [row.name for row in api.get_history(limit=10, zone=None)] == ["internal_temp"]
+    assert [row.name for row in api.get_history(limit=10, zone="t2")] == ["t2.internal_temp"]
+
+
+def test_zone_sensors_use_payload_decoders(monkeypatch):
+    zone = {"id": "t3", "sensors": {
+        "internal_temp": {"topic": "t3/climate", "json_path": "air.t", "timestamp_path": "ts"},
+        "internal_hum": {"topic": "t3/hum", "scale": 0.1},
+    }}
+    bus = SensorSnapshot()
+    monkeypatch.setattr(mqtt_client, "ZONE_SENSOR_DECODERS", zone_sensor_decoders([zone]))
+    monkeypatch.setattr(mqtt_client, "zone_sensor_buses", {"t3": bus})
+    monkeypatch.setattr(mqtt_client, "SessionLocal", None)
+    router = mqtt_client.build_router()
+
+    # JSON, skala i znacznik czasu jak w czujnikach strefy głównej (user-037)
+    router.dispatch("t3/climate", b'{"air": {"t": 21.5}, "ts": 1718964000}')
+    router.dispatch("t3/hum", b"655")
+    assert bus.internal_temp.avg() == 21.5 and bus.internal_hum.avg() == pytest.approx(65.5)